@@ -21,12 +21,14 @@ from .irutils import verify_module
 from .utils.reporting import DummyReportGenerator, HtmlReportGenerator
 from .opt.transform import DeleteUnusedInstructionsPass
 from .opt.transform import RemoveAddZeroPass
-from .opt import CommonSubexpressionEliminationPass
+from .opt import GlobalValueNumberingPass
 from .opt import ConstantFolder
 from .opt import LoadAfterStorePass
 from .opt import CleanPass
+from .opt import InlinePass
+from .opt import PassManager
+from .opt import SparseConditionalConstantPropagationPass
 from .opt.mem2reg import Mem2RegPromotor
-from .opt.cjmp import CJumpPass
 from .opt.tailcall import TailCallOptimization
 from .codegen import CodeGenerator
 from .binutils.linker import link
@@ -43,6 +45,7 @@ from .format import uboot_image
 from .format.ldb import write_ldb
 from .build.tasks import TaskError, TaskRunner
 from .build.recipe import RecipeLoader
+from .build.cache import get_cache
 from .common import CompilerError, DiagnosticsManager, get_file
 from .arch import get_arch, get_current_arch
 
@@ -181,7 +184,7 @@ def disasm(data, march):
     disassembler.disasm(data, ostream)
 
 
-OPT_LEVELS = ("0", "1", "2", "s")
+OPT_LEVELS = ("0", "1", "2", "3", "s")
 
 
 def optimize(ir_module, level=0, reporter=None):
@@ -191,10 +194,12 @@ def optimize(ir_module, level=0, reporter=None):
 
     Args:
         ir_module (ppci.ir.Module): The ir module to optimize.
-        level: The optimization level, 0 is default. Can be 0,1,2 or s
+        level: The optimization level, 0 is default. Can be 0,1,2,3 or s
             0: No optimization
             1: some optimization
-            2: more optimization
+            2: more optimization, including constant propagation and
+               inlining of small functions
+            3: even more optimization, inlining larger functions
             s: optimize for size
         reporter: Report detailed log to this reporter
     """
@@ -212,32 +217,53 @@ def optimize(ir_module, level=0, reporter=None):
     if level == "0":
         return
 
-    # TODO: differentiate between optimization levels!
-
-    # Optimization passes (bag of tricks) run them three times:
-    opt_passes = [
-        Mem2RegPromotor(),
-        RemoveAddZeroPass(),
-        ConstantFolder(),
-        CommonSubexpressionEliminationPass(),
-        TailCallOptimization(),
-        LoadAfterStorePass(),
-        DeleteUnusedInstructionsPass(),
-        CleanPass(),
-    ] * 3
+    # Passes which are run over each function until nothing changes:
+    inline_pass = None
+    if level == "1":
+        function_passes = [
+            Mem2RegPromotor(),
+            ConstantFolder(),
+            DeleteUnusedInstructionsPass(),
+            CleanPass(),
+        ]
+        opt_passes = function_passes
+    else:
+        function_passes = [
+            Mem2RegPromotor(),
+            RemoveAddZeroPass(),
+            ConstantFolder(),
+            SparseConditionalConstantPropagationPass(),
+            GlobalValueNumberingPass(),
+            TailCallOptimization(),
+            LoadAfterStorePass(),
+            DeleteUnusedInstructionsPass(),
+            CleanPass(),
+        ]
+        if level == "3":
+            inline_pass = InlinePass(max_inline_cost=100)
+        elif level == "s":
+            inline_pass = InlinePass(optimize_for="size")
+        else:
+            inline_pass = InlinePass()
 
-    if level == "3":
-        opt_passes.append(CJumpPass())
+        # Simplify functions before they are inlined, and after:
+        opt_passes = function_passes + [inline_pass] + function_passes
 
     # Run the passes over the module:
     verify_module(ir_module)
-    for opt_pass in opt_passes:
-        opt_pass.run(ir_module)
-        # reporter.message('{} after {}:'.format(ir_module, opt_pass))
-        # reporter.dump_ir(ir_module)
+    pass_manager = PassManager(opt_passes)
+    pass_manager.run(ir_module)
+
+    for line in pass_manager.report():
+        logger.debug(line)
 
     if reporter:
         # Dump report:
+        if inline_pass:
+            for line in inline_pass.report():
+                reporter.message(line)
+        for line in pass_manager.report():
+            reporter.message(line)
         reporter.message("{} after optimization:".format(ir_module))
         reporter.message("{} {}".format(ir_module, ir_module.stats()))
         reporter.dump_ir(ir_module)
@@ -246,19 +272,41 @@ def optimize(ir_module, level=0, reporter=None):
 
 
 def ir_to_stream(
-    ir_module, march, output_stream, reporter=None, debug=False, opt="speed"
+    ir_module,
+    march,
+    output_stream,
+    reporter=None,
+    debug=False,
+    opt="speed",
+    jobs=1,
+    register_allocator="graph_coloring",
+    schedule=False,
 ):
-    """Translate IR module to output stream."""
+    """Translate IR module to output stream.
+
+    Args:
+        jobs (int): the amount of processes used to generate the functions
+            in parallel.
+        register_allocator (str): the register allocator to use, see
+            :func:`ir_to_object`.
+        schedule (bool): schedule instructions, see :func:`ir_to_object`.
+    """
     march = get_arch(march)
 
     if not reporter:  # pragma: no cover
         reporter = DummyReportGenerator()
 
-    code_generator = CodeGenerator(march, reporter, optimize_for=opt)
+    code_generator = CodeGenerator(
+        march,
+        reporter,
+        optimize_for=opt,
+        register_allocator=register_allocator,
+        schedule=schedule,
+    )
     verify_module(ir_module)
 
     # Code generation:
-    code_generator.generate(ir_module, output_stream, debug=debug)
+    code_generator.generate(ir_module, output_stream, debug=debug, jobs=jobs)
 
 
 def ir_to_assembly(ir_modules, march, add_binary=False):
@@ -271,7 +319,16 @@ def ir_to_assembly(ir_modules, march, add_binary=False):
 
 
 def ir_to_object(
-    ir_modules, march, reporter=None, debug=False, opt="speed", outstream=None
+    ir_modules,
+    march,
+    reporter=None,
+    debug=False,
+    opt="speed",
+    outstream=None,
+    jobs=1,
+    cache=None,
+    register_allocator="graph_coloring",
+    schedule=False,
 ):
     """Translate IR-modules into code for the given architecture.
 
@@ -283,6 +340,20 @@ def ir_to_object(
         debug (bool): include debugging information
         opt (str): optimization goal. Can be 'speed', 'size' or 'co2'.
         outstream: instruction stream to write instructions to
+        jobs (int): the amount of processes used to generate the functions
+            in parallel. The resulting object is identical to the one
+            generated with a single job.
+        cache: an :class:`ppci.build.cache.ObjectCache` or a directory
+            name. When given, the object file is taken from this cache when
+            the same ir-code was compiled before with the same options.
+            The cache is not used when outstream is given.
+        register_allocator (str): the register allocator to use. Can be
+            'graph_coloring' or 'linear_scan'. Linear scan allocation is
+            faster, but results in more spilling and register moves.
+        schedule (bool): reorder instructions to avoid pipeline stalls.
+            The estimated amount of cycles before and after scheduling is
+            written to the reporter. This only has effect for targets with
+            a pipeline description.
 
     Returns:
         ObjectFile: An object file
@@ -295,6 +366,23 @@ def ir_to_object(
     reporter.heading(2, "Code generation")
     reporter.message("Target: {}".format(march))
 
+    cache = get_cache(cache)
+    if cache and not outstream:
+        cache_key = cache.make_key(
+            ir_modules,
+            march,
+            opt=opt,
+            debug=debug,
+            register_allocator=register_allocator,
+            schedule=schedule,
+        )
+        obj = cache.get(cache_key)
+        if obj:
+            reporter.message("Using cached object {}".format(cache_key))
+            return obj
+    else:
+        cache_key = None
+
     # Construct output object:
     obj = ObjectFile(march)
     if debug:
@@ -317,10 +405,16 @@ def ir_to_object(
             reporter=reporter,
             debug=debug,
             opt=opt,
+            jobs=jobs,
+            register_allocator=register_allocator,
+            schedule=schedule,
         )
 
     reporter.message("All modules generated!")
     reporter.dump_instructions(instruction_list, march)
+
+    if cache_key:
+        cache.put(cache_key, obj)
     return obj
 
 
@@ -331,6 +425,7 @@ def cc(
     opt_level=0,
     debug=False,
     reporter=None,
+    cache=None,
 ):
     """C compiler. compiles a single source file into an object file.
 
@@ -339,6 +434,7 @@ def cc(
         march: The architecture for which to compile
         coptions: options for the C frontend
         debug: Create debug info when set to True
+        cache: an object cache or cache directory, see :func:`ir_to_object`
 
     Returns:
         an object file
@@ -363,10 +459,14 @@ def cc(
     reporter.message("{} {}".format(ir_module, ir_module.stats()))
     reporter.dump_ir(ir_module)
     optimize(ir_module, level=opt_level, reporter=reporter)
-    return ir_to_object([ir_module], march, debug=debug, reporter=reporter)
+    return ir_to_object(
+        [ir_module], march, debug=debug, reporter=reporter, cache=cache
+    )
 
 
-def wasmcompile(source: io.TextIOBase, march, opt_level=2, reporter=None):
+def wasmcompile(
+    source: io.TextIOBase, march, opt_level=2, reporter=None, cache=None
+):
     """ Webassembly compile """
     march = get_arch(march)
 
@@ -381,7 +481,7 @@ def wasmcompile(source: io.TextIOBase, march, opt_level=2, reporter=None):
     # Optimize:
     optimize(ir_module, level=opt_level)
 
-    obj = ir_to_object([ir_module], march, reporter=reporter)
+    obj = ir_to_object([ir_module], march, reporter=reporter, cache=cache)
     return obj
 
 
@@ -400,6 +500,8 @@ def c3c(
     reporter=None,
     debug=False,
     outstream=None,
+    cache=None,
+    register_allocator="graph_coloring",
 ):
     """Compile a set of sources into binary format for the given target.
 
@@ -410,6 +512,9 @@ def c3c(
         march: the architecture for which to compile.
         reporter: reporter to write compilation report to
         debug: include debugging information
+        cache: an object cache or cache directory, see :func:`ir_to_object`
+        register_allocator: the register allocator to use, see
+            :func:`ir_to_object`
 
     Returns:
         An object file
@@ -437,15 +542,20 @@ def c3c(
         reporter=reporter,
         opt=opt_cg,
         outstream=outstream,
+        cache=cache,
+        register_allocator=register_allocator,
     )
 
 
-def pascal(sources, march, opt_level=0, reporter=None, debug=False):
+def pascal(
+    sources, march, opt_level=0, reporter=None, debug=False, cache=None
+):
     """Compile a set of pascal-sources for the given target.
 
     Args:
         sources: a collection of sources that will be compiled.
         march: the architecture for which to compile.
+        cache: an object cache or cache directory, see :func:`ir_to_object`
 
     Returns:
         An object file
@@ -455,7 +565,9 @@ def pascal(sources, march, opt_level=0, reporter=None, debug=False):
         reporter = DummyReportGenerator()
     sources = [get_file(fn) for fn in sources]
     ir_modules = pascal_to_ir(sources, march)
-    return ir_to_object(ir_modules, march, reporter=reporter, debug=debug)
+    return ir_to_object(
+        ir_modules, march, reporter=reporter, debug=debug, cache=cache
+    )
 
 
 def bfcompile(source, target, reporter=None):
@@ -43,6 +43,9 @@ class VirtualMachineArchitecture(MachineArchitecture):
 class Architecture(MachineArchitecture):
     """ Base class for all targets """
 
+    # Instruction timing, used for instruction scheduling (optional):
+    pipeline = None
+
     def __init__(self, options=None):
         """Create a new machine instance.
 
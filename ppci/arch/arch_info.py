@@ -6,6 +6,7 @@ The information present:
 - endianness
 - type sizes and alignment
 - int size for the machine
+- instruction timing, for the instruction scheduler
 
 """
 import enum
@@ -29,6 +30,54 @@ class TypeInfo:
         self.alignment = alignment
 
 
+class PipelineInfo:
+    """Instruction timing information of a target.
+
+    This is used by the instruction scheduler to reorder instructions so
+    that pipeline stalls are avoided, and to estimate the amount of cycles
+    a sequence of instructions takes.
+
+    Args:
+        issue_width: the number of instructions which can be started each
+            cycle.
+        latencies: a dictionary mapping instruction classes to the number
+            of cycles after which their result can be used. Only
+            instructions in this table are moved by the scheduler.
+        loads: instruction classes which read from memory.
+        stores: instruction classes which write to memory.
+    """
+
+    def __init__(self, issue_width=1, latencies=None, loads=(), stores=()):
+        self.issue_width = issue_width
+        self.latencies = latencies or {}
+        self.loads = frozenset(loads)
+        self.stores = frozenset(stores)
+
+    def latency(self, instruction):
+        """ Get the latency of the given instruction """
+        return self.latencies.get(type(instruction), 1)
+
+    def can_move(self, instruction):
+        """Check if the instruction can be reordered.
+
+        Instructions which jump, clobber registers or have implicit
+        register uses or definitions stay where they are.
+        """
+        return (
+            type(instruction) in self.latencies
+            and not instruction.jumps
+            and not instruction.clobbers
+            and not instruction.extra_uses
+            and not instruction.extra_defs
+        )
+
+    def is_load(self, instruction):
+        return type(instruction) in self.loads
+
+    def is_store(self, instruction):
+        return type(instruction) in self.stores
+
+
 class ArchInfo:
     """ A collection of information for language frontends """
 
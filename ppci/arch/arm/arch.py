@@ -3,7 +3,7 @@ import io
 from ... import ir
 from ...binutils.assembler import BaseAssembler
 from ..arch import Architecture
-from ..arch_info import ArchInfo, TypeInfo
+from ..arch_info import ArchInfo, TypeInfo, PipelineInfo
 from ..generic_instructions import Label, Alignment, RegisterUseDef
 from ..data_instructions import Db, Dd, Dcd2, data_isa
 from ..registers import RegisterClass
@@ -18,6 +18,45 @@ from . import thumb_instructions
 from . import arm_instructions
 
 
+# Timing of an in order pipeline, like the ARM9 and ARM11 cores. Loaded
+# values and products are available after a few cycles:
+_loads = (
+    arm_instructions.Ldr1,
+    arm_instructions.Ldr3,
+    arm_instructions.Ldrb,
+    arm_instructions.Ldrsb,
+    arm_instructions.Ldrh_imm,
+    arm_instructions.Ldrsh_imm,
+    arm_instructions.Ldrsh_reg,
+)
+_stores = (arm_instructions.Str1, arm_instructions.Strh, arm_instructions.Strb)
+_alu = (
+    arm_instructions.Mov1,
+    arm_instructions.Mov2,
+    arm_instructions.Add,
+    arm_instructions.And,
+    arm_instructions.Eor,
+    arm_instructions.Orr,
+    arm_instructions.Sub,
+    arm_instructions.Lsr1,
+    arm_instructions.Lsl1,
+    arm_instructions.Asr,
+    arm_instructions.AddImm,
+    arm_instructions.AndImm,
+    arm_instructions.EorImm,
+    arm_instructions.OrrImm,
+    arm_instructions.RsbImm,
+    arm_instructions.SubImm,
+)
+_latencies = dict.fromkeys(_alu + _stores, 1)
+_latencies.update(dict.fromkeys(_loads, 3))
+_latencies[arm_instructions.Mul1] = 3
+_latencies[arm_instructions.Mls] = 3
+arm_pipeline = PipelineInfo(
+    issue_width=1, latencies=_latencies, loads=_loads, stores=_stores
+)
+
+
 class ArmCallingConvention:
     pass
 
@@ -49,6 +88,7 @@ class ArmArch(Architecture):
         else:
             self.isa = arm_isa + data_isa
             self.assembler = ArmAssembler()
+            self.pipeline = arm_pipeline
             self.fp = R11
             self.callee_save = (R5, R6, R7, R8, R9, R10)
 
@@ -122,7 +162,7 @@ class ArmArch(Architecture):
 
         # Save the link register and the frame pointer:
         if self.has_option("thumb"):
-            yield thumb_instructions.Push({LR, R7})
+            yield thumb_instructions.Push(RegisterSet({LR, R7}))
         else:
             yield arm_instructions.Push(RegisterSet({LR, R11}))
 
@@ -153,7 +193,7 @@ class ArmArch(Architecture):
         callee_save = self.get_callee_saved(frame)
         if callee_save:
             if self.has_option("thumb"):
-                yield thumb_instructions.Push(callee_save)
+                yield thumb_instructions.Push(RegisterSet(callee_save))
             else:
                 yield arm_instructions.Push(RegisterSet(callee_save))
 
@@ -191,7 +231,7 @@ class ArmArch(Architecture):
         callee_save = self.get_callee_saved(frame)
         if callee_save:
             if self.has_option("thumb"):
-                yield thumb_instructions.Pop(callee_save)
+                yield thumb_instructions.Pop(RegisterSet(callee_save))
             else:
                 yield arm_instructions.Pop(RegisterSet(callee_save))
 
@@ -207,7 +247,7 @@ class ArmArch(Architecture):
                 yield arm_instructions.AddImm(SP, SP, ssize)
 
         if self.has_option("thumb"):
-            yield thumb_instructions.Pop({PC, R7})
+            yield thumb_instructions.Pop(RegisterSet({PC, R7}))
         else:
             yield arm_instructions.Pop(RegisterSet({PC, R11}))
 
@@ -467,7 +507,7 @@ class ThumbAssembler(BaseAssembler):
     def add_extra_rules(self):
         # Implement register list syntaxis:
         reg_nt = "$reg_cls_armregister$"
-        self.typ2nt[set] = "reg_list"
+        self.typ2nt[RegisterSet] = "reg_list"
         self.add_rule(
             "reg_list", ["{", "reg_list_inner", "}"], lambda rhs: rhs[1]
         )
@@ -477,17 +517,19 @@ class ThumbAssembler(BaseAssembler):
         self.add_rule(
             "reg_list_inner",
             ["reg_list_inner", ",", "reg_or_range"],
-            lambda rhs: rhs[0] | rhs[2],
+            lambda rhs: RegisterSet(rhs[0] | rhs[2]),
         )
         # self.add_rule(
         # 'reg_list_inner',
         # ['reg_or_range', ',', 'reg_list_inner'], lambda rhs: rhs[0] | rhs[2])
 
-        self.add_rule("reg_or_range", [reg_nt], lambda rhs: set([rhs[0]]))
+        self.add_rule(
+            "reg_or_range", [reg_nt], lambda rhs: RegisterSet([rhs[0]])
+        )
         self.add_rule(
             "reg_or_range",
             [reg_nt, "-", reg_nt],
-            lambda rhs: register_range(rhs[0], rhs[2]),
+            lambda rhs: RegisterSet(register_range(rhs[0], rhs[2])),
         )
 
 
@@ -5,7 +5,7 @@
 from .isa import arm_isa, ArmToken, ArmImmToken, Isa
 from ..encoding import Instruction, Constructor, Syntax, Operand, Transform
 from ..generic_instructions import RegisterUseDef, Global
-from ...utils.bitfun import encode_imm32
+from ...utils.bitfun import encode_imm32, decode_imm32
 from ...utils.tree import Tree
 from .registers import ArmRegister, Coreg, Coproc, RegisterSet, R11
 from .registers import R0, R1, R2
@@ -97,6 +97,9 @@ class ArmExpand(Transform):
     def forwards(self, value):
         return encode_imm32(value)
 
+    def backwards(self, value):
+        return decode_imm32(value)
+
 
 class Mov1(ArmInstruction):
     """ Mov Rd, imm16 """
@@ -200,7 +203,7 @@ class Sdiv(ArmInstruction):
     rd = Operand("rd", ArmRegister, write=True)
     rn = Operand("rn", ArmRegister, read=True)
     rm = Operand("rm", ArmRegister, read=True)
-    syntax = Syntax(["sdiv", rd, ",", rn, ",", rm])
+    syntax = Syntax(["sdiv", " ", rd, ",", " ", rn, ",", " ", rm])
 
     def encode(self):
         tokens = self.get_tokens()
@@ -222,7 +225,7 @@ class Udiv(ArmInstruction):
     rd = Operand("rd", ArmRegister, write=True)
     rn = Operand("rn", ArmRegister, read=True)
     rm = Operand("rm", ArmRegister, read=True)
-    syntax = Syntax(["udiv", rd, ",", rn, ",", rm])
+    syntax = Syntax(["udiv", " ", rd, ",", " ", rn, ",", " ", rm])
     patterns = {"cond": AL}
 
     def encode(self):
@@ -247,7 +250,9 @@ class Mls(ArmInstruction):
     rn = Operand("rn", ArmRegister, read=True)
     rm = Operand("rm", ArmRegister, read=True)
     ra = Operand("ra", ArmRegister, read=True)
-    syntax = Syntax(["mls", rd, ",", rn, ",", rm, ",", ra])
+    syntax = Syntax(
+        ["mls", " ", rd, ",", " ", rn, ",", " ", rm, ",", " ", ra]
+    )
     patterns = {"cond": AL}
 
     def encode(self):
@@ -361,15 +366,7 @@ class Asr(ShiftBase):
 class OpRegRegImm(ArmInstruction):
     """ add rd, rn, imm12 """
 
-    def encode(self):
-        tokens = self.get_tokens()
-        tokens[0][0:12] = encode_imm32(self.imm)
-        tokens[0].rd = self.rd.num
-        tokens[0].rn = self.rn.num
-        tokens[0].S = 0  # Set flags
-        tokens[0][21:28] = self.opcode
-        tokens[0].cond = AL
-        return tokens[0].encode()
+    tokens = [ArmImmToken]
 
 
 def make_regregimm(mnemonic, opcode):
@@ -377,12 +374,20 @@ def make_regregimm(mnemonic, opcode):
     rn = Operand("rn", ArmRegister, read=True)
     imm = Operand("imm", int)
     syntax = Syntax([mnemonic, " ", rd, ",", " ", rn, ",", " ", imm])
+    patterns = {
+        "cond": AL,
+        "opcode": opcode,
+        "s": 0,
+        "rn": rn,
+        "rd": rd,
+        "imm12": ArmExpand(imm),
+    }
     members = {
         "syntax": syntax,
         "rd": rd,
         "rn": rn,
         "imm": imm,
-        "opcode": opcode,
+        "patterns": patterns,
     }
     return type(mnemonic + "_ins", (OpRegRegImm,), members)
 
@@ -777,7 +782,7 @@ class Ldrsh_reg(ArmInstruction):
 class Adr(ArmInstruction):
     rd = Operand("rd", ArmRegister, write=True)
     label = Operand("label", str)
-    syntax = Syntax(["adr", rd, ",", label])
+    syntax = Syntax(["adr", " ", rd, ",", " ", label])
 
     def relocations(self):
         return [AdrImm12Relocation(self.label)]
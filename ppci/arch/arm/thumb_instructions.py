@@ -2,7 +2,7 @@
 
 from ..encoding import Instruction, Operand, Syntax
 from ..token import u16
-from .registers import ArmRegister, LowArmRegister, R7
+from .registers import ArmRegister, LowArmRegister, RegisterSet, R7
 from .thumb_relocations import Lit8Relocation, WrapNew11Relocation
 from .thumb_relocations import BImm11Imm6Relocation
 from .thumb_relocations import Rel8Relocation, BlImm11Relocation
@@ -278,7 +278,7 @@ class Str1(ls_sp_base_imm8):
 class Adr(ThumbInstruction):
     rd = Operand("rd", LowArmRegister, write=True)
     label = Operand("label", str)
-    syntax = Syntax(["adr", rd, ",", label])
+    syntax = Syntax(["adr", " ", rd, ",", " ", label])
 
     def relocations(self):
         return [Lit8Relocation(self.label)]
@@ -493,7 +493,7 @@ class regreg_base(ThumbInstruction):
 def make_regreg(mnemonic, opcode):
     rdn = Operand("rdn", LowArmRegister, write=True, read=True)
     rm = Operand("rm", LowArmRegister, read=True)
-    syntax = Syntax([mnemonic, rdn, ",", rm])
+    syntax = Syntax([mnemonic, " ", rdn, ",", " ", rm])
     members = {"syntax": syntax, "rdn": rdn, "rm": rm, "opcode": opcode}
     return type(mnemonic + "_ins", (regreg_base,), members)
 
@@ -514,7 +514,7 @@ class Cmp2(ThumbInstruction):
     opcode = 5  # 00101
     rn = Operand("rn", LowArmRegister, read=True)
     imm = Operand("imm", int)
-    syntax = Syntax(["cmp", rn, ",", imm])
+    syntax = Syntax(["cmp", " ", rn, ",", " ", imm])
 
     def encode(self):
         tokens = self.get_tokens()
@@ -611,7 +611,7 @@ class cond_base_ins(ThumbInstruction):
 
 def make_cond_branch(mnemonic, cond):
     target = Operand("target", str)
-    syntax = Syntax([mnemonic, target])
+    syntax = Syntax([mnemonic, " ", target])
     members = {"syntax": syntax, "target": target, "cond": cond}
     return type(mnemonic + "_ins", (cond_base_ins,), members)
 
@@ -641,7 +641,7 @@ class cond_base_ins_long(LongThumbInstruction):
 
 def make_long_cond_branch(mnemonic, cond):
     target = Operand("target", str)
-    syntax = Syntax([mnemonic, target])
+    syntax = Syntax([mnemonic, " ", target])
     members = {"syntax": syntax, "target": target, "cond": cond}
     return type(mnemonic + "_ins", (cond_base_ins_long,), members)
 
@@ -677,11 +677,11 @@ def pop_bit_pos(n):
 
 
 class Push(ThumbInstruction):
-    regs = Operand("regs", set)
+    regs = Operand("regs", RegisterSet)
     syntax = Syntax(["push", " ", regs])
 
     def __repr__(self):
-        return "Push {{{}}}".format(self.regs)
+        return "Push {}".format(self.regs)
 
     def encode(self):
         tokens = self.get_tokens()
@@ -697,11 +697,11 @@ def register_numbers(regs):
 
 
 class Pop(ThumbInstruction):
-    regs = Operand("regs", set)
+    regs = Operand("regs", RegisterSet)
     syntax = Syntax(["pop", " ", regs])
 
     def __repr__(self):
-        return "Pop {{{}}}".format(self.regs)
+        return "Pop {}".format(self.regs)
 
     def encode(self):
         tokens = self.get_tokens()
@@ -756,7 +756,7 @@ class Bkpt(ThumbInstruction):
 
     opcode = 0b10111110
     imm = Operand("imm", int)
-    syntax = Syntax(["bkpt", imm])
+    syntax = Syntax(["bkpt", " ", imm])
 
     def encode(self):
         tokens = self.get_tokens()
@@ -2,8 +2,9 @@
 
 
 import abc
+from .arch_info import Endianness
 from .registers import Register
-from .token import TokenSequence
+from .token import TokenSequence, _p2
 
 
 class Operand(property):
@@ -423,6 +424,9 @@ class Instruction(Constructor, metaclass=InsMeta):
 
         returns bytes for this instruction.
         """
+        encoder, constructors = InstructionEncoder.get(self)
+        if encoder:
+            return encoder.encode(constructors)
 
         tokens = self.get_tokens()
         self.set_all_patterns(tokens)
@@ -457,6 +461,180 @@ class Instruction(Constructor, metaclass=InsMeta):
         return []
 
 
+class InstructionEncoder:
+    """Encoder for an instruction with a given choice of constructors.
+
+    Encoding an instruction via tokens creates a token object for each
+    token, and sets each field with range checks. The encoder is created
+    once from the tokens and bit patterns of the constructors, and
+    computes the value of each token directly from the operands. The
+    result is identical to encoding via tokens.
+
+    Only constructors which use the standard way of encoding, with bit
+    patterns only, can be encoded like this.
+    """
+
+    # Encoders by tuple of constructor classes, None if not possible:
+    _encoders = {}
+
+    # Constructor classes which have no constructor operands:
+    _simple = {}
+
+    def __init__(self, steps, tokens, values):
+        self.steps = steps
+        self.tokens = tokens
+        self.values = values
+
+    @classmethod
+    def get(cls, instruction):
+        """Get the encoder for an instruction.
+
+        Returns the encoder, or None, and the constructors which make up
+        the instruction.
+        """
+        instruction_class = type(instruction)
+        simple = cls._simple.get(instruction_class)
+        if simple is None:
+            simple = not any(p.is_constructor for p in instruction.properties)
+            cls._simple[instruction_class] = simple
+
+        if simple:
+            constructors = (instruction,)
+            key = (instruction_class,)
+        else:
+            constructors = tuple(instruction.non_leaves)
+            key = tuple(type(c) for c in constructors)
+
+        if key not in cls._encoders:
+            cls._encoders[key] = cls.create(key)
+        return cls._encoders[key], constructors
+
+    @classmethod
+    def create(cls, constructor_classes):
+        """Create an encoder for the given constructor classes.
+
+        Returns None when the constructors cannot be encoded this way.
+        """
+        for constructor_class in constructor_classes:
+            if (
+                constructor_class.set_patterns
+                is not Constructor.set_patterns
+                or constructor_class.set_user_patterns
+                is not Constructor.set_user_patterns
+            ):
+                return
+
+        # Order the tokens like get_tokens does:
+        precodes = []
+        token_classes = []
+        for constructor_class in constructor_classes:
+            for token_class in getattr(constructor_class, "tokens", ()):
+                if token_class.Info.precode:
+                    precodes.append(token_class)
+                else:
+                    token_classes.append(token_class)
+        token_classes = precodes + token_classes
+
+        # Tokens can set bits when they are created:
+        tokens = []
+        values = []
+        for token_class in token_classes:
+            try:
+                values.append(token_class().bit_value)
+            except TypeError:
+                return
+            size = token_class.Info.size
+            if token_class.Info.endianness == Endianness.LITTLE:
+                endianness = "little"
+            else:
+                endianness = "big"
+            tokens.append((size // 8, endianness, (1 << size) - 1))
+
+        # Create a step per pattern. Fixed values are set in the initial
+        # value of the tokens, unless they overwrite a variable field.
+        steps = []
+        variable_masks = [0] * len(tokens)
+        for index, constructor_class in enumerate(constructor_classes):
+            patterns = constructor_class.dict_to_patterns(
+                constructor_class.patterns
+            )
+            for pattern in patterns:
+                for token_index, token_class in enumerate(token_classes):
+                    if hasattr(token_class, pattern.field):
+                        break
+                else:
+                    return
+                field = getattr(token_class, pattern.field)
+                if not isinstance(field, _p2):
+                    return
+
+                parts = list(reversed(field._parts))
+                if len(parts) == 1:
+                    limit = 1 << parts[0][1]
+                else:
+                    # Parts of concatenated fields are masked:
+                    limit = None
+                mask = 0
+                for start, size in parts:
+                    mask |= ((1 << size) - 1) << start
+
+                if (
+                    isinstance(pattern, FixedPattern)
+                    and not mask & variable_masks[token_index]
+                ):
+                    try:
+                        value = cls.set_field(
+                            values[token_index], parts, limit, pattern.value
+                        )
+                    except (ValueError, AssertionError):
+                        return
+                    values[token_index] = value
+                else:
+                    steps.append(
+                        (token_index, index, pattern, parts, limit)
+                    )
+                    variable_masks[token_index] |= mask
+        return cls(steps, tokens, values)
+
+    @staticmethod
+    def set_field(value, parts, limit, field_value):
+        """ Set a field in the value of a token, like a token does """
+        if limit is not None:
+            if field_value >= limit:
+                raise ValueError(
+                    "value {} cannot be fit into {} bits".format(
+                        field_value, parts[0][1]
+                    )
+                )
+            if field_value < 0:
+                field_value = limit + field_value
+            assert field_value >= 0
+        for start, size in parts:
+            mask = (1 << size) - 1
+            value &= ~(mask << start)
+            value |= (field_value & mask) << start
+            field_value >>= size
+        return value
+
+    def encode(self, constructors):
+        """ Encode an instruction, given its constructors """
+        values = list(self.values)
+        set_field = self.set_field
+        for token_index, index, pattern, parts, limit in self.steps:
+            constructor = constructors[index]
+            field_value = pattern.get_value(constructor)
+            assert isinstance(field_value, int), str(constructor) + str(
+                field_value
+            )
+            values[token_index] = set_field(
+                values[token_index], parts, limit, field_value
+            )
+        return b"".join(
+            (value & mask).to_bytes(size, endianness)
+            for value, (size, endianness, mask) in zip(values, self.tokens)
+        )
+
+
 class Syntax:
     """Defines a syntax for an instruction or part of an instruction.
 
@@ -53,6 +53,33 @@ class RelocationHolder(Instruction):
         return bytes()
 
 
+class EncodedInstruction(Instruction):
+    """An instruction which was already encoded elsewhere.
+
+    This is used to transfer instructions between processes, for example
+    from a parallel code generator worker, while keeping their binary
+    encoding, relocations and textual representation.
+    """
+
+    def __init__(self, text, data, relocations=()):
+        super().__init__()
+        self.text = text
+        self.data = data
+        self._relocations = list(relocations)
+
+    def __repr__(self):
+        return self.text
+
+    def __str__(self):
+        return self.text
+
+    def encode(self):
+        return self.data
+
+    def relocations(self):
+        return list(self._relocations)
+
+
 class Nop(Instruction):
     """ Instruction that does nothing and has zero size """
 
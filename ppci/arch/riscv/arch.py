@@ -2,7 +2,7 @@
 
 import io
 from ..arch import Architecture
-from ..arch_info import ArchInfo, TypeInfo
+from ..arch_info import ArchInfo, TypeInfo, PipelineInfo
 from ..generic_instructions import Label, RegisterUseDef
 from ..data_instructions import DByte, DZero
 from .asm_printer import RiscvAsmPrinter
@@ -30,6 +30,59 @@ from .rvc_instructions import CAddi16sp, CAddi4spn
 from . import instructions
 
 
+# Timing of a classic single issue, in order pipeline. Loaded values can
+# be used after one extra cycle, multiplication and division take
+# several cycles:
+_loads = (
+    instructions.Lb,
+    instructions.Lh,
+    instructions.Lw,
+    instructions.Lbu,
+    instructions.Lhu,
+)
+_stores = (instructions.Sb, instructions.Sh, instructions.Sw)
+_alu = (
+    instructions.Addr,
+    instructions.Subr,
+    instructions.Sll,
+    instructions.Slt,
+    instructions.Sltu,
+    instructions.Xorr,
+    instructions.Srl,
+    instructions.Sra,
+    instructions.Orr,
+    instructions.Andr,
+    instructions.Slli,
+    instructions.Srli,
+    instructions.Srai,
+    instructions.Addi,
+    instructions.Slti,
+    instructions.Sltiu,
+    instructions.Xori,
+    instructions.Ori,
+    instructions.Andi,
+    instructions.Lui,
+    instructions.Movr,
+)
+_latencies = dict.fromkeys(_alu + _stores, 1)
+_latencies.update(dict.fromkeys(_loads, 2))
+_latencies[instructions.Mul] = 3
+_latencies.update(
+    dict.fromkeys(
+        (
+            instructions.Div,
+            instructions.Divu,
+            instructions.Rem,
+            instructions.Remu,
+        ),
+        20,
+    )
+)
+riscv_pipeline = PipelineInfo(
+    issue_width=1, latencies=_latencies, loads=_loads, stores=_stores
+)
+
+
 def isinsrange(bits, val):
     msb = 1 << (bits - 1)
     ll = -msb
@@ -66,6 +119,7 @@ class RiscvAssembler(BaseAssembler):
 class RiscvArch(Architecture):
     name = "riscv"
     option_names = ("rvc", "rvf", "rvfx")
+    pipeline = riscv_pipeline
 
     def __init__(self, options=None):
         super().__init__(options=options)
@@ -110,11 +110,16 @@ class Frame:
         for lab_name, val in self.constants:
             if value == val:
                 return lab_name
-        assert isinstance(value, (str, int, bytes)), str(value)
+        assert isinstance(value, (str, int, bytes, tuple)), str(value)
         lab_name = self.new_name("literal")
         self.constants.append((lab_name, value))
         return lab_name
 
+    def add_jump_table(self, labels):
+        """Add a table with the addresses of the given labels to the
+        constant pool"""
+        return self.add_constant(tuple(label.name for label in labels))
+
     def is_used(self, register, alias):
         """Check if a register or one of its aliases is used by this frame."""
         # assert register in alias
@@ -122,7 +127,7 @@ class Frame:
 
     def live_ranges(self, vreg):
         """ Determine the live range of some register """
-        return self.cfg._live_ranges[vreg]
+        return self.cfg.live_ranges(vreg)
 
     def new_reg(self, cls, twain=""):
         """ Retrieve a new virtual register """
@@ -143,12 +148,24 @@ class Frame:
 
     def insert_code_before(self, instruction, code):
         """ Insert a code sequence before an instruction """
-        pt = self.instructions.index(instruction)
-        for idx, ins in enumerate(code):
-            self.instructions.insert(idx + pt, ins)
+        self.insert_code({instruction: code}, {})
 
     def insert_code_after(self, instruction, code):
         """ Insert a code sequence after an instruction """
-        pt = self.instructions.index(instruction) + 1
-        for idx, ins in enumerate(code):
-            self.instructions.insert(idx + pt, ins)
+        self.insert_code({}, {instruction: code})
+
+    def insert_code(self, before, after):
+        """Insert code sequences around instructions.
+
+        The dictionaries map instructions to the code to be placed
+        before and after them. All sequences are inserted in a single
+        pass over the instructions.
+        """
+        instructions = []
+        for ins in self.instructions:
+            if ins in before:
+                instructions.extend(before[ins])
+            instructions.append(ins)
+            if ins in after:
+                instructions.extend(after[ins])
+        self.instructions[:] = instructions
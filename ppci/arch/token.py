@@ -31,12 +31,19 @@ def u8(x):
 
 
 class _p2(property):
-    def __init__(self, getter, setter, bitsize, signed):
+    """A field of a token.
+
+    The parts of the field are the start and size of the bit ranges of
+    which the field consists, with the most significant part first.
+    """
+
+    def __init__(self, getter, setter, bitsize, signed, parts):
         if bitsize < 1:
             raise TypeError("Cannot create field with less than 1 bit")
         self._bitsize = bitsize
         self._signed = signed
         self._mask = (1 << bitsize) - 1
+        self._parts = parts
         super().__init__(getter, setter)
 
     def __add__(self, other):
@@ -52,7 +59,7 @@ def bit_range(b, e, signed=False):
     def setter(s, v):
         s[b:e] = v
 
-    return _p2(getter, setter, e - b, signed)
+    return _p2(getter, setter, e - b, signed, [(b, e - b)])
 
 
 def bit(b):
@@ -77,7 +84,8 @@ def bit_concat(*partials):
 
     bitsize = sum(at._bitsize for at in partials)
     signed = partials[0]._signed
-    return _p2(getter, setter, bitsize, signed)
+    parts = [part for at in partials for part in at._parts]
+    return _p2(getter, setter, bitsize, signed, parts)
 
 
 class TokenMeta(type):
@@ -23,13 +23,13 @@ Calling conventions
 from ... import ir
 from ..arch import Architecture
 from ..arch_info import ArchInfo, TypeInfo
-from ..generic_instructions import Label, RegisterUseDef
+from ..generic_instructions import Label, Alignment, RegisterUseDef
 from ..stack import StackLocation
 from ..cc import CallingConvention
 from ..registers import Register
 from ...binutils.assembler import BaseAssembler
 from ..data_instructions import data_isa
-from ..data_instructions import Db
+from ..data_instructions import Db, Dq2
 from .instructions import bits64, RmReg64, MovRegRm8, RmReg8, RmMemDisp, isa
 from .instructions import Push, Pop, SubImm, AddImm, MovsxReg64Rm8
 from .instructions import Call, Ret, bits16, RmReg16, bits32, RmReg32
@@ -650,8 +650,14 @@ class X86_64Arch(Architecture):
 
         # Add final literal pool:
         for label, value in frame.constants:
-            yield Label(label)
-            if isinstance(value, bytes):
+            if isinstance(value, tuple):
+                # Jump table:
+                yield Alignment(8)
+                yield Label(label)
+                for target in value:
+                    yield Dq2(target)
+            elif isinstance(value, bytes):
+                yield Label(label)
                 for byte in value:
                     yield Db(byte)
             else:  # pragma: no cover
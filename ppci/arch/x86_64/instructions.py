@@ -8,6 +8,7 @@ from ..isa import Isa
 from ..encoding import Instruction, Operand, Syntax, Constructor, Relocation
 from .. import effects
 from ...utils.bitfun import wrap_negative
+from ...utils.collections import OrderedSet
 from ..token import Token, u8, u16, u32, u64, bit_range, bit
 from .registers import rcx, al, cl, rax, rdx, rbp, eax, edx, ecx, cx, dx
 from .registers import rsp, ax, Register32
@@ -238,7 +239,7 @@ class ShortJump(X86Instruction):
 
     tokens = [OpcodeToken, Imm8Token]
     target = Operand("target", str)
-    syntax = Syntax(["jmpshort", target])
+    syntax = Syntax(["jmpshort", " ", target])
     patterns = {"opcode": 0xEB}
 
     def relocations(self):
@@ -1025,6 +1026,41 @@ XorImm = make_regimm("xor", 0x81, 6)
 CmpImm = make_regimm("cmp", 0x81, 7)
 
 
+class regint8base(X86Instruction):
+    tokens = [RexToken, OpcodeToken, ModRmToken, Imm8Token]
+    patterns = {"w": 1, "mod": 3}
+
+    def encode(self):
+        tokens = self.get_tokens()
+        self.set_all_patterns(tokens)
+        tokens[0].b = self.reg.rexbit
+        tokens[1][0:8] = self.opcode
+        tokens[2].rm = self.reg.regbits
+        tokens[2].reg = self.reg_code
+        tokens[3][0:8] = self.imm
+        return tokens.encode()
+
+
+def make_regimm8(mnemonic, opcode, reg_code):
+    """ Create an instruction with a register and an 8 bit immediate """
+    reg = Operand("reg", Register64, write=True, read=True)
+    imm = Operand("imm", int)
+    syntax = Syntax([mnemonic, " ", reg, ",", " ", imm])
+    members = {
+        "syntax": syntax,
+        "reg": reg,
+        "imm": imm,
+        "opcode": opcode,
+        "reg_code": reg_code,
+    }
+    return type(mnemonic + "_imm8_ins", (regint8base,), members)
+
+
+ShlImm = make_regimm8("shl", 0xC1, 4)
+ShrImm = make_regimm8("shr", 0xC1, 5)
+SarImm = make_regimm8("sar", 0xC1, 7)
+
+
 class shift8_cl_base(X86Instruction):
     rm = Operand("rm", rm8_modes)
     tokens = [RexToken, OpcodeToken, ModRmToken]
@@ -1424,6 +1460,27 @@ def pattern_cjmp_u8(context, tree, c0, c1):
     pattern_cjmp(context, tree.value, False)
 
 
+@isa.pattern("stm", "JMPTABLE(reg64)", size=40)
+def pattern_jmp_table(context, tree, c0):
+    labels, default_label = tree.value
+    size = context.new_reg(Register64)
+    context.emit(MovImm(size, len(labels)))
+    context.emit(bits64.CmpRmReg(RmReg64(c0), size))
+
+    # Out of range, when larger or equal than size, or negative:
+    offset = context.new_reg(Register64)
+    move_ins = bits64.MovRegRm(offset, RmReg64(c0))
+    context.emit(Jae(default_label.name, jumps=[default_label, move_ins]))
+    context.emit(move_ins)
+    context.emit(ShlImm(offset, 3))
+
+    table = context.new_reg(Register64)
+    context.emit(MovAdr(table, context.frame.add_jump_table(labels)))
+    target = context.new_reg(Register64)
+    context.emit(bits64.MovRegRm(target, RmMemDisp2(table, offset, 0)))
+    context.emit(Jmp(RmReg64(target), jumps=list(OrderedSet(labels))))
+
+
 @isa.pattern("stm", "ALLOCA", size=10)
 def pattern_alloca(context, tree):
     size = tree.value
@@ -1,9 +1,13 @@
 """ Grouping of multiple object files into a single archive.
+
+Like object files, archives can be stored in json or in binary format.
 """
 
 import json
 import logging
+from ..common import get_file
 from . import objectfile
+from . import binary_object
 
 
 def archive(objs):
@@ -16,7 +20,11 @@ def get_archive(filename):
     if isinstance(filename, Archive):
         return filename
 
-    return Archive.load(filename)
+    f = get_file(filename, mode="rb")
+    lib = Archive.load(f)
+    if f is not filename:
+        f.close()
+    return lib
 
 
 class Archive:
@@ -30,22 +38,43 @@ class Archive:
     def __iter__(self):
         return iter(self.objs)
 
-    def save(self, output_file):
-        """ Save archive to file. """
+    def save(self, output_file, fmt="json"):
+        """Save archive to file.
+
+        Args:
+            output_file: the file to write to. This must be a binary
+                file when fmt is 'binary'.
+            fmt: the format to use, either 'json' or 'binary'.
+        """
         self.logger.debug("Saving archive")
-        # Create funky json.
-        objs = [obj.serialize() for obj in self.objs]
+        if fmt == "json":
+            # Create funky json.
+            objs = [obj.serialize() for obj in self.objs]
 
-        d = {"objects": objs}
+            d = {"objects": objs}
 
-        # Save to file:
-        json.dump(d, output_file, indent=2, sort_keys=True)
-        print(file=output_file)
+            # Save to file:
+            json.dump(d, output_file, indent=2, sort_keys=True)
+            print(file=output_file)
+        elif fmt == "binary":
+            binary_object.write_archive(self.objs, output_file)
+        else:
+            raise ValueError("Invalid archive format {}".format(fmt))
 
     @classmethod
     def load(cls, f):
-        """ Load archive from disk. """
+        """Load archive from disk.
+
+        The format of the file (json or binary) is detected automatically.
+        """
         cls.logger.debug("Loading archive")
-        d = json.load(f)
+        binary_file = objectfile.get_binary_file(f)
+        if binary_file is None:
+            d = json.load(f)
+        else:
+            data = binary_object.read_file(binary_file)
+            if binary_object.is_binary_archive(data):
+                return cls(binary_object.read_archive(data))
+            d = json.loads(bytes(data).decode("utf8"))
         objs = list(map(objectfile.deserialize, d["objects"]))
         return cls(objs)
@@ -5,6 +5,7 @@
 """
 
 import re
+from collections import defaultdict
 from ..lang.tools.grammar import Grammar
 from ..lang.tools.earley import EarleyParser
 from ..lang.tools.baselex import BaseLexer, EPS, EOF
@@ -12,7 +13,7 @@ from ..common import make_num
 from ..arch.generic_instructions import Label, Alignment, SectionInstruction
 from ..arch.generic_instructions import DebugData, Global
 from ..arch.encoding import Operand, Syntax, Register
-from ..common import CompilerError, SourceLocation
+from ..common import CompilerError, ParseError, SourceLocation
 from .debuginfo import DebugLocation, DebugDb
 
 id_regex = r"[A-Za-z_][A-Za-z\d_]*"
@@ -57,8 +58,225 @@ class AsmLexer(BaseLexer):
         return typ, val
 
 
+class DispatchParser:
+    """Parser for a single line of assembly.
+
+    The earley parser considers all productions of a non terminal, which
+    for the instruction non terminal are thousands. This parser only tries
+    the productions which can start with the next token. Since assembly
+    instructions start with a mnemonic, this selects the few syntaxes of
+    that mnemonic.
+
+    All derivations of the line are determined, and remembered per non
+    terminal and position. Left recursive productions are handled by
+    extending derivations which are found without them. When the line
+    can be derived in more than one way, the derivation is picked by the
+    priorities of the productions, in the order in which the earley
+    parser considers them. When this does not decide, or when indirect
+    left recursion is found, the line is parsed with the earley parser.
+    """
+
+    def __init__(self, grammar):
+        self.grammar = grammar
+        self.production_count = len(grammar.productions)
+        self.productions = defaultdict(list)
+        self.order = {}
+        for production in grammar.productions:
+            self.productions[production.name].append(production)
+            self.order[production] = len(self.order)
+        self.nullable, self.first = self.calculate_first_sets()
+        self.dispatch = {}
+        self.tokens = None
+        self.derivations = None
+        self.active = None
+
+    def calculate_first_sets(self):
+        """ Determine the terminals with which each symbol can start """
+        nullable = set()
+        first = defaultdict(set)
+        for terminal in self.grammar.terminals:
+            first[terminal].add(terminal)
+        changed = True
+        while changed:
+            changed = False
+            for production in self.grammar.productions:
+                name = production.name
+                size = len(first[name])
+                for symbol in production.symbols:
+                    first[name] |= first[symbol]
+                    if symbol not in nullable:
+                        break
+                else:
+                    if name not in nullable:
+                        nullable.add(name)
+                        changed = True
+                if len(first[name]) != size:
+                    changed = True
+        return nullable, first
+
+    def can_start(self, production, typ):
+        """ Check if a production can derive a string starting with typ """
+        for symbol in production.symbols:
+            if typ in self.first[symbol]:
+                return True
+            if symbol not in self.nullable:
+                return False
+        return True
+
+    def get_productions(self, name, typ):
+        """Get the productions of a non terminal, which can start with a
+        token of the given type.
+
+        The result is a tuple with the productions which are not left
+        recursive, and the productions which are.
+        """
+        key = (name, typ)
+        if key not in self.dispatch:
+            productions = [
+                production
+                for production in self.productions[name]
+                if self.can_start(production, typ)
+            ]
+            self.dispatch[key] = (
+                [p for p in productions if p.symbols[:1] != (name,)],
+                [
+                    p
+                    for p in self.productions[name]
+                    if p.symbols[:1] == (name,)
+                ],
+            )
+        return self.dispatch[key]
+
+    def parse(self, tokens):
+        """Parse a line, given as a list of tokens.
+
+        Returns the derivation of the line, or None when the parser
+        cannot decide between derivations. Raises a parse error when the
+        line cannot be derived.
+        """
+        self.tokens = tokens
+        self.derivations = {}
+        self.active = set()
+        try:
+            derivations = [
+                derivation
+                for derivation in self.derive(self.grammar.start_symbol, 0)
+                if derivation[0] == len(tokens)
+            ]
+        except DispatchError:
+            return
+        finally:
+            self.tokens = self.derivations = self.active = None
+
+        if not derivations:
+            raise ParseError("Parsing failed")
+        elif len(derivations) == 1:
+            return derivations[0]
+
+        ranked = sorted((self.rank(d), i) for i, d in enumerate(derivations))
+        if ranked[0][0] != ranked[1][0]:
+            return derivations[ranked[0][1]]
+
+    def rank(self, derivation):
+        """Determine the rank of a derivation.
+
+        This is the priority and the order of the production, followed by
+        the ranks of its parts from right to left. A lower rank is
+        preferred.
+        """
+        _, production, parts = derivation
+        return (production.priority, self.order[production]) + tuple(
+            self.rank(part)
+            for part in reversed(parts)
+            if isinstance(part, tuple)
+        )
+
+    def derive(self, name, position):
+        """Get all derivations of a non terminal at a position.
+
+        A derivation is a tuple with the end position, the production
+        and the derivations and tokens of the symbols of the production.
+        """
+        key = (name, position)
+        if key in self.derivations:
+            return self.derivations[key]
+
+        if key in self.active:
+            # Indirect left recursion cannot be handled:
+            raise DispatchError()
+        self.active.add(key)
+
+        if position < len(self.tokens):
+            typ = self.tokens[position].typ
+        else:
+            typ = EOF
+        productions, left_recursive = self.get_productions(name, typ)
+        derivations = []
+        for production in productions:
+            derivations.extend(self.match(production, 0, position, ()))
+
+        # Extend the derivations with the left recursive productions:
+        new_derivations = derivations
+        while left_recursive and new_derivations:
+            extended = []
+            for derivation in new_derivations:
+                for production in left_recursive:
+                    extended.extend(
+                        self.match(production, 1, derivation[0], (derivation,))
+                    )
+            derivations.extend(extended)
+            new_derivations = extended
+
+        self.active.remove(key)
+        self.derivations[key] = derivations
+        return derivations
+
+    def match(self, production, index, position, parts):
+        """ Match the symbols of a production from the given index """
+        tokens = self.tokens
+        partial = [(position, parts)]
+        for symbol in production.symbols[index:]:
+            matched = []
+            if symbol in self.grammar.nonterminals:
+                for position, parts in partial:
+                    for derivation in self.derive(symbol, position):
+                        matched.append((derivation[0], parts + (derivation,)))
+            else:
+                for position, parts in partial:
+                    if (
+                        position < len(tokens)
+                        and tokens[position].typ == symbol
+                    ):
+                        token = tokens[position]
+                        matched.append((position + 1, parts + (token,)))
+            partial = matched
+            if not partial:
+                break
+        return [(position, production, parts) for position, parts in partial]
+
+    def evaluate(self, derivation):
+        """ Apply the semantics of the productions of a derivation """
+        _, production, parts = derivation
+        args = [
+            self.evaluate(part) if isinstance(part, tuple) else part
+            for part in parts
+        ]
+        if production.f:
+            return production.f(*args)
+
+
+class DispatchError(Exception):
+    """ Raised when the dispatch parser cannot determine the derivation """
+
+    pass
+
+
 class AsmParser:
-    """ Base parser for assembler language """
+    """Base parser for assembler language.
+
+    Lines are parsed with the dispatch parser. When it cannot decide how
+    to parse a line, the earley parser is used instead.
+    """
 
     def __init__(self):
         # Construct a parser given a grammar:
@@ -77,6 +295,7 @@ class AsmParser:
         self.g.add_production("asmline2", ["directive"])
         self.g.add_production("asmline2", [])
         self.g.start_symbol = "asmline"
+        self.dispatch_parser = None
 
     def handle_ins(self, i):
         # if i:
@@ -94,7 +313,24 @@ class AsmParser:
         """ Entry function to parser """
         if not hasattr(self, "p"):
             self.p = EarleyParser(self.g)
-        self.p.parse(lexer)
+        if (
+            self.dispatch_parser is None
+            or self.dispatch_parser.production_count != len(self.g.productions)
+        ):
+            self.dispatch_parser = DispatchParser(self.g)
+
+        tokens = []
+        token = lexer.next_token()
+        while token.typ != EOF:
+            tokens.append(token)
+            token = lexer.next_token()
+
+        derivation = self.dispatch_parser.parse(tokens)
+        if derivation:
+            self.dispatch_parser.evaluate(derivation)
+        else:
+            lexer.tokens = iter(tokens)
+            self.p.parse(lexer)
 
 
 class BaseAssembler:
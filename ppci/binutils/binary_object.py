@@ -0,0 +1,494 @@
+""" Compact binary format for object files and archives.
+
+The json format is easy to inspect, but large and slow to load. This
+module implements a versioned binary alternative. An object file in
+binary format is layed out as follows:
+
+- a fixed header, starting with :data:`OBJECT_MAGIC`
+- a string table. All names (sections, symbols, relocation types, etc..)
+  are stored once and referred to by index.
+- packed section, symbol, relocation and image records
+- debug information. Source locations are stored as packed records,
+  the other debug information in a compact tagged encoding.
+- the raw data of all sections
+
+All values are stored in little endian byte order. When loading, the
+file is read at once, and the section data is not copied, but sliced from
+the file contents. The data of a section is only copied when it is accessed.
+
+.. doctest::
+
+    >>> import io
+    >>> from ppci.api import asm
+    >>> from ppci.binutils.objectfile import ObjectFile
+    >>> obj = asm(io.StringIO("db 0x77"), 'arm')
+    >>> f = io.BytesIO()
+    >>> obj.save(f, fmt='binary')
+    >>> obj2 = ObjectFile.load(io.BytesIO(f.getvalue()))
+    >>> obj == obj2
+    True
+
+"""
+
+import struct
+
+#: Magic bytes at the start of an object file in binary format.
+OBJECT_MAGIC = b"PPCIOBJ\x00"
+
+#: Magic bytes at the start of an archive in binary format.
+ARCHIVE_MAGIC = b"PPCIARC\x00"
+
+#: Version of the binary format. Increment when the format changes.
+VERSION = 1
+
+# Index used to refer to a missing string:
+NO_STRING = 0xFFFFFFFF
+
+HEADER = struct.Struct("<8sHHIIIIIIiII")
+SECTION = struct.Struct("<IQIQQ")
+SYMBOL = struct.Struct("<iIIBqIIq")
+RELOCATION = struct.Struct("<IiIQq")
+IMAGE = struct.Struct("<IQI")
+LOCATION = struct.Struct("<IiiiBq")
+ARCHIVE_HEADER = struct.Struct("<8sHHI")
+LENGTH = struct.Struct("<Q")
+
+# Symbol flags:
+SYMBOL_DEFINED = 1
+SYMBOL_SIZED = 2
+
+# Header flags:
+HAS_ENTRY = 1
+HAS_DEBUG = 2
+
+# Kinds of debug addresses:
+ADDRESS_KINDS = ("unknown", "fixed", "fprel")
+
+# Tags used in the encoding of debug information:
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_STR = 4
+TAG_LIST = 5
+TAG_DICT = 6
+
+TAG_VALUE = struct.Struct("<Bq")
+TAG_INDEX = struct.Struct("<BI")
+
+
+def is_binary_object(data):
+    """ Test if the given data contains an object file in binary format """
+    return bytes(data[: len(OBJECT_MAGIC)]) == OBJECT_MAGIC
+
+
+def is_binary_archive(data):
+    """ Test if the given data contains an archive in binary format """
+    return bytes(data[: len(ARCHIVE_MAGIC)]) == ARCHIVE_MAGIC
+
+
+def read_file(f):
+    """Get the contents of a binary file as a buffer.
+
+    The file is read at once into an immutable bytes object, so that
+    the data does not change when the file is changed afterwards.
+    Parts of the buffer are only copied when they are modified.
+    """
+    return memoryview(f.read())
+
+
+class StringTable:
+    """ Table with unique strings which are referred to by index """
+
+    def __init__(self):
+        self.strings = []
+        self.indici = {}
+
+    def get_index(self, string):
+        if string is None:
+            return NO_STRING
+        if string not in self.indici:
+            self.indici[string] = len(self.strings)
+            self.strings.append(string)
+        return self.indici[string]
+
+    def serialize(self):
+        encoded = [s.encode("utf8") for s in self.strings]
+        lengths = struct.pack("<{}I".format(len(encoded)), *map(len, encoded))
+        return lengths + b"".join(encoded)
+
+
+def write_object(obj, f):
+    """ Write an object file in binary format to the binary file f """
+    f.write(object_to_bytes(obj))
+
+
+def object_to_bytes(obj):
+    """ Serialize an object file into bytes """
+    strings = StringTable()
+    records = bytearray()
+
+    # Section headers. The data of the sections is placed at the end:
+    data_offset = 0
+    for section in obj.sections:
+        records += SECTION.pack(
+            strings.get_index(section.name),
+            section.address,
+            section.alignment,
+            data_offset,
+            section.size,
+        )
+        data_offset += section.size
+
+    for symbol in obj.symbols:
+        flags = 0
+        if symbol.defined:
+            flags |= SYMBOL_DEFINED
+        if symbol.size is not None:
+            flags |= SYMBOL_SIZED
+        records += SYMBOL.pack(
+            symbol.id,
+            strings.get_index(symbol.name),
+            strings.get_index(symbol.binding),
+            flags,
+            symbol.value if symbol.defined else 0,
+            strings.get_index(symbol.section),
+            strings.get_index(symbol.typ),
+            symbol.size if symbol.size is not None else 0,
+        )
+
+    for reloc in obj.relocations:
+        records += RELOCATION.pack(
+            strings.get_index(reloc.reloc_type),
+            reloc.symbol_id,
+            strings.get_index(reloc.section),
+            reloc.offset,
+            reloc.addend,
+        )
+
+    for image in obj.images:
+        records += IMAGE.pack(
+            strings.get_index(image.name), image.address, len(image.sections)
+        )
+        records += struct.pack(
+            "<{}I".format(len(image.sections)),
+            *(strings.get_index(s.name) for s in image.sections)
+        )
+
+    flags = 0
+    if obj.entry_symbol_id is not None:
+        flags |= HAS_ENTRY
+    debug_data = bytearray()
+    if obj.debug_info:
+        flags |= HAS_DEBUG
+        write_debug_info(obj.debug_info, debug_data, strings)
+
+    arch = strings.get_index(obj.arch.make_id_str())
+    string_table = strings.serialize()
+    header = HEADER.pack(
+        OBJECT_MAGIC,
+        VERSION,
+        flags,
+        len(strings.strings),
+        len(obj.sections),
+        len(obj.symbols),
+        len(obj.relocations),
+        len(obj.images),
+        arch,
+        obj.entry_symbol_id if obj.entry_symbol_id is not None else -1,
+        len(string_table),
+        len(debug_data),
+    )
+
+    data = bytearray(header)
+    data += string_table
+    data += records
+    data += debug_data
+    data += bytes(-len(data) % 8)  # Align section data
+    for section in obj.sections:
+        data += section.data
+    return data
+
+
+def read_object(data):
+    """Create an object file from binary data.
+
+    The section data refers to the given data, which should not change.
+    """
+    from .objectfile import ObjectFile, Section, Image, RelocationEntry
+    from ..api import get_arch
+
+    data = memoryview(data)
+    if not is_binary_object(data):
+        raise ValueError("Not a binary object file")
+
+    (
+        _,
+        version,
+        flags,
+        n_strings,
+        n_sections,
+        n_symbols,
+        n_relocations,
+        n_images,
+        arch,
+        entry_symbol_id,
+        string_table_size,
+        debug_size,
+    ) = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(
+            "Unsupported object file version {}".format(version)
+        )
+    offset = HEADER.size
+
+    # String table:
+    lengths = struct.unpack_from("<{}I".format(n_strings), data, offset)
+    offset += 4 * n_strings
+    blob = bytes(data[offset : offset + string_table_size - 4 * n_strings])
+    offset += string_table_size - 4 * n_strings
+    # Map string indici to strings, including the missing string:
+    strings = {NO_STRING: None}
+    position = 0
+    for index, length in enumerate(lengths):
+        strings[index] = blob[position : position + length].decode("utf8")
+        position += length
+
+    obj = ObjectFile(get_arch(strings[arch]))
+    if flags & HAS_ENTRY:
+        obj.entry_symbol_id = entry_symbol_id
+
+    section_records, offset = read_records(data, offset, SECTION, n_sections)
+
+    symbol_records, offset = read_records(data, offset, SYMBOL, n_symbols)
+    for (
+        symbol_id,
+        name,
+        binding,
+        symbol_flags,
+        value,
+        section,
+        typ,
+        size,
+    ) in symbol_records:
+        if symbol_flags & SYMBOL_DEFINED:
+            section = strings[section]
+        else:
+            value = section = None
+        obj.add_symbol(
+            symbol_id,
+            strings[name],
+            strings[binding],
+            value,
+            section,
+            strings[typ],
+            size if symbol_flags & SYMBOL_SIZED else None,
+        )
+
+    relocation_records, offset = read_records(
+        data, offset, RELOCATION, n_relocations
+    )
+    relocations = [
+        RelocationEntry(
+            strings[reloc_type],
+            symbol_id,
+            strings[section],
+            reloc_offset,
+            addend,
+        )
+        for (
+            reloc_type,
+            symbol_id,
+            section,
+            reloc_offset,
+            addend,
+        ) in relocation_records
+    ]
+
+    images = []
+    for _ in range(n_images):
+        name, address, n_image_sections = IMAGE.unpack_from(data, offset)
+        offset += IMAGE.size
+        section_names = struct.unpack_from(
+            "<{}I".format(n_image_sections), data, offset
+        )
+        offset += 4 * n_image_sections
+        images.append((strings[name], address, section_names))
+
+    if flags & HAS_DEBUG:
+        obj.debug_info = read_debug_info(data, offset, strings)
+    offset += debug_size
+    offset += -offset % 8
+
+    for name, address, alignment, data_offset, size in section_records:
+        section = Section(strings[name])
+        section.address = address
+        section.alignment = alignment
+        start = offset + data_offset
+        section.data = data[start : start + size]
+        obj.add_section(section)
+
+    for relocation in relocations:
+        obj.add_relocation(relocation)
+
+    for name, address, section_names in images:
+        image = Image(name, address)
+        obj.add_image(image)
+        for section_name in section_names:
+            image.add_section(obj.get_section(strings[section_name]))
+
+    return obj
+
+
+def read_records(data, offset, record, count):
+    """Unpack count records at the given offset.
+
+    Returns an iterator over the records and the offset after the records.
+    """
+    end = offset + count * record.size
+    return record.iter_unpack(data[offset:end]), end
+
+
+def write_debug_info(debug_info, data, strings):
+    """Write debug information into data.
+
+    Locations make up the bulk of the debug information, and are written
+    as an array of packed records, followed by the rest of the debug
+    information in tagged encoding.
+    """
+    from . import debuginfo
+
+    debug_dict = debuginfo.serialize(debug_info)
+    locations = debug_dict.pop("locations")
+    data += struct.pack("<I", len(locations))
+    for location in locations:
+        source = location["source"]
+        address = location["address"]
+        kind = address["kind"]
+        if kind == "fixed":
+            value = address["symbol_id"]
+        elif kind == "fprel":
+            value = address["offset"]
+        else:
+            value = 0
+        data += LOCATION.pack(
+            strings.get_index(source["filename"]),
+            source["row"],
+            source["column"],
+            source["length"],
+            ADDRESS_KINDS.index(kind),
+            value,
+        )
+    encode_value(debug_dict, data, strings)
+
+
+def read_debug_info(data, offset, strings):
+    """ Read debug information written by :func:`write_debug_info` """
+    from . import debuginfo
+    from ..common import SourceLocation
+    from ..arch.stack import StackLocation
+
+    (count,) = struct.unpack_from("<I", data, offset)
+    records, offset = read_records(data, offset + 4, LOCATION, count)
+    locations = []
+    for filename, row, column, length, kind, value in records:
+        loc = SourceLocation(strings[filename], row, column, length)
+        if kind == 1:
+            address = debuginfo.DebugAddress(value)
+        elif kind == 2:
+            address = debuginfo.FpOffsetAddress(StackLocation(value, 1))
+        else:
+            address = debuginfo.UnknownAddress()
+        locations.append(debuginfo.DebugLocation(loc, address=address))
+
+    debug_dict, _ = decode_value(data, offset, strings)
+    debug_dict["locations"] = []
+    debug_info = debuginfo.deserialize(debug_dict)
+    debug_info.locations = locations
+    return debug_info
+
+
+def encode_value(value, data, strings):
+    """ Encode a json-like value into data """
+    if value is None:
+        data.append(TAG_NONE)
+    elif value is False:
+        data.append(TAG_FALSE)
+    elif value is True:
+        data.append(TAG_TRUE)
+    elif isinstance(value, int):
+        data += TAG_VALUE.pack(TAG_INT, value)
+    elif isinstance(value, str):
+        data += TAG_INDEX.pack(TAG_STR, strings.get_index(value))
+    elif isinstance(value, (list, tuple)):
+        data += TAG_INDEX.pack(TAG_LIST, len(value))
+        for element in value:
+            encode_value(element, data, strings)
+    elif isinstance(value, dict):
+        data += TAG_INDEX.pack(TAG_DICT, len(value))
+        for key, element in value.items():
+            data += struct.pack("<I", strings.get_index(key))
+            encode_value(element, data, strings)
+    else:  # pragma: no cover
+        raise NotImplementedError(str(type(value)))
+
+
+def decode_value(data, offset, strings):
+    """ Decode a json-like value, return the value and the new offset """
+    tag = data[offset]
+    if tag == TAG_NONE:
+        return None, offset + 1
+    elif tag == TAG_FALSE:
+        return False, offset + 1
+    elif tag == TAG_TRUE:
+        return True, offset + 1
+    elif tag == TAG_INT:
+        return TAG_VALUE.unpack_from(data, offset)[1], offset + TAG_VALUE.size
+
+    count = TAG_INDEX.unpack_from(data, offset)[1]
+    offset += TAG_INDEX.size
+    if tag == TAG_STR:
+        return strings[count], offset
+    elif tag == TAG_LIST:
+        value = []
+        for _ in range(count):
+            element, offset = decode_value(data, offset, strings)
+            value.append(element)
+        return value, offset
+    elif tag == TAG_DICT:
+        value = {}
+        for _ in range(count):
+            (key,) = struct.unpack_from("<I", data, offset)
+            element, offset = decode_value(data, offset + 4, strings)
+            value[strings[key]] = element
+        return value, offset
+    else:
+        raise ValueError("Invalid debug info tag {}".format(tag))
+
+
+def write_archive(objs, f):
+    """ Write an archive of object files in binary format to f """
+    f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, VERSION, 0, len(objs)))
+    for obj in objs:
+        data = object_to_bytes(obj)
+        data += bytes(-len(data) % 8)
+        f.write(LENGTH.pack(len(data)))
+        f.write(data)
+
+
+def read_archive(data):
+    """ Read all object files from an archive in binary format """
+    data = memoryview(data)
+    if not is_binary_archive(data):
+        raise ValueError("Not a binary archive")
+    _, version, _, count = ARCHIVE_HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError("Unsupported archive version {}".format(version))
+    offset = ARCHIVE_HEADER.size
+    objs = []
+    for _ in range(count):
+        (size,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        objs.append(read_object(data[offset : offset + size]))
+        offset += size
+    return objs
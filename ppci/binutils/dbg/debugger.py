@@ -6,6 +6,7 @@ Start the debug server for your target and connect to it using the
 debugger interface.
 """
 
+import bisect
 import logging
 import struct
 import operator
@@ -60,6 +61,10 @@ class Debugger:
         self.events = driver.events
         self.variable_map = {}
         self.addr_map = {}
+        self.addresses = []
+        self.row_map = {}
+        self.function_ranges = []
+        self.function_begins = []
 
     def __repr__(self):
         return "Debugger for {} using {}".format(self.arch, self.driver)
@@ -154,11 +159,28 @@ class Debugger:
 
         self.obj = obj
         self.variable_map = {v.name: v for v in self.debug_info.variables}
+
+        # Create indices, to lookup locations and functions quickly:
         self.addr_map = {}
+        self.row_map = {}
         for loc in self.debug_info.locations:
             addr = self.calc_address(loc.address)
             self.addr_map[addr] = loc
+            self.row_map.setdefault((loc.loc.filename, loc.loc.row), addr)
             self.logger.debug("%s at 0x%x", loc, addr)
+        self.addresses = sorted(self.addr_map)
+
+        function_ranges = [
+            (
+                self.calc_address(function.begin),
+                self.calc_address(function.end),
+                function,
+            )
+            for function in self.debug_info.functions
+        ]
+        function_ranges.sort(key=lambda r: r[:2])
+        self.function_ranges = function_ranges
+        self.function_begins = [r[0] for r in function_ranges]
 
     def validate_memory(self, obj):
         """ Validate memory given an object file """
@@ -188,8 +210,11 @@ class Debugger:
     def find_pc(self):
         """ Given the current program counter (pc) determine the source """
         pc = self.get_pc()
-        # if pc in self.addr_map:
-        minkey = min(self.addr_map.keys(), key=lambda k: abs(k - pc))
+
+        # Take the closest of the addresses around the pc:
+        index = bisect.bisect_left(self.addresses, pc)
+        candidates = self.addresses[max(index - 1, 0) : index + 1]
+        minkey = min(candidates, key=lambda k: abs(k - pc))
         debug = self.addr_map[minkey]
         self.logger.info(
             "Found program counter at %s with delta %i" % (debug, minkey - pc)
@@ -201,12 +226,11 @@ class Debugger:
     def current_function(self):
         """ Determine the PC and then determine which function we are in """
         pc = self.get_pc()
-        if self.debug_info:
-            for function in self.debug_info.functions:
-                begin = self.calc_address(function.begin)
-                end = self.calc_address(function.end)
-                if pc in range(begin, end):
-                    return function
+        index = bisect.bisect_right(self.function_begins, pc)
+        if index:
+            begin, end, function = self.function_ranges[index - 1]
+            if begin <= pc < end:
+                return function
 
     def local_vars(self):
         """ Return map of local variable names """
@@ -217,11 +241,8 @@ class Debugger:
 
     def find_address(self, filename, row):
         """ Given a filename and a row, determine the address """
-        if self.debug_info:
-            for debug in self.debug_info.locations:
-                loc = debug.loc
-                if loc.filename == filename and loc.row == row:
-                    return self.calc_address(debug.address)
+        if (filename, row) in self.row_map:
+            return self.row_map[(filename, row)]
         self.logger.warning("Could not find address for %s:%i", filename, row)
 
     # Registers:
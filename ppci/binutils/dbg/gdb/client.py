@@ -69,9 +69,16 @@ class GdbDebugDriver(DebugDriver):
     sending and receiving of bytes. The protocol must be able to
     work using sockets and threads, serial port and threads and asyncio
     sockets.
+
+    Each packet costs a round trip to the target. To keep the amount of
+    packets low, memory is read in aligned blocks of `cache_block_size`
+    bytes, which are cached until the target runs again. Registers are
+    all read at once with the `g` command.
     """
 
     logger = logging.getLogger("gdbclient")
+    cache_block_size = 64
+    max_read_size = 1024
 
     def __init__(self, arch, transport, pcresval=0, swbrkpt=False):
         super().__init__()
@@ -80,12 +87,13 @@ class GdbDebugDriver(DebugDriver):
         self.status = DebugState.RUNNING
         self.pcresval = pcresval
         self._register_value_cache = {}  # Cached map of register values
+        self._memory_cache = {}  # Cached memory blocks by address
         self.swbrkpt = swbrkpt
         self.stopreason = INTERRUPT
 
         self._message_handler = None
         self._stop_msg_queue = queue.Queue()
-        self._msg_queue = queue.Queue(maxsize=1)
+        self._msg_queue = queue.Queue()
         self._rsp = RspHandler(transport)
         self._rsp.on_message = self._handle_message
 
@@ -120,8 +128,8 @@ class GdbDebugDriver(DebugDriver):
         else:
             self.logger.warning("Already running!")
 
-        self._send_message("c")
         self._start()
+        self._send_message("c")
 
     def restart(self):
         """ restart the device """
@@ -135,8 +143,8 @@ class GdbDebugDriver(DebugDriver):
         """ Single step the device """
         if self.status == DebugState.STOPPED:
             self._prepare_continue()
-            self._send_message("s")
             self._start()
+            self._send_message("s")
         else:
             self.logger.warning("Cannot step, still running!")
 
@@ -144,8 +152,8 @@ class GdbDebugDriver(DebugDriver):
         """ Single step `count` times """
         if self.status == DebugState.STOPPED:
             self._prepare_continue()
-            self._send_message("n %x" % count)
             self._start()
+            self._send_message("n %x" % count)
         else:
             self.logger.warning("Cannot step, still running!")
 
@@ -169,9 +177,14 @@ class GdbDebugDriver(DebugDriver):
         self.transport.send(bytes([0x03]))
 
     def _start(self):
-        """ Update state to started """
+        """Update state to started.
+
+        This is done before the target is resumed, since the stop reply
+        can arrive before sending the command returns.
+        """
         self.status = DebugState.RUNNING
         self._register_value_cache.clear()
+        self._memory_cache.clear()
         self.events.on_start()
 
     def _stop(self):
@@ -195,16 +208,14 @@ class GdbDebugDriver(DebugDriver):
                 if not pair:
                     continue
                 name, value = pair.split(":")
-                if is_hex(name):
+                if is_hex(name) and int(name, 16) < len(
+                    self.arch.gdb_registers
+                ):
                     # We are dealing with a register value here!
-                    reg_num = int(name, 16)
-                    # self.logger.error('%s', reg_num)
-                    if reg_num == self.arch.gdb_registers.index(
-                        self.arch.gdb_pc
-                    ):
-                        # TODO: fill a cache of registers
-                        data = bytes.fromhex(rest[3:-1])
-                        (self.pcstopval,) = struct.unpack("<I", data)
+                    register = self.arch.gdb_registers[int(name, 16)]
+                    data = binascii.a2b_hex(value.encode("ascii"))
+                    value = self._unpack_register(register, data)
+                    self._register_value_cache[register] = value
 
         if code & (BRKPOINT | INTERRUPT) != 0:
             self.logger.debug("Target stopped..")
@@ -244,7 +255,16 @@ class GdbDebugDriver(DebugDriver):
 
     def get_registers(self, registers):
         if self.status == DebugState.STOPPED:
-            regs = self._get_general_registers()
+            if all(
+                register in self._register_value_cache
+                for register in self.arch.gdb_registers
+            ):
+                regs = {
+                    register: self._register_value_cache[register]
+                    for register in self.arch.gdb_registers
+                }
+            else:
+                regs = self._get_general_registers()
         else:
             self.logger.warning("Cannot read registers while running")
             regs = {}
@@ -287,21 +307,21 @@ class GdbDebugDriver(DebugDriver):
             res = self._send_command("G %s" % data)
             if res == "OK":
                 self.logger.debug("Register written")
+                for register in self.arch.gdb_registers:
+                    self._register_value_cache[register] = regvalues[register]
             else:
                 self.logger.warning("Registers writing failed: %s", res)
 
     def _get_register(self, register):
-        """ Get a single register """
+        """Get a single register.
+
+        All registers are fetched at once, since a `g` command costs the
+        same round trip as a `p` command for a single register.
+        """
         if self.status == DebugState.STOPPED:
-            if register in self._register_value_cache:
-                value = self._register_value_cache[register]
-            else:
-                idx = self.arch.gdb_registers.index(register)
-                data = self._send_command("p %x" % idx)
-                data = binascii.a2b_hex(data.encode("ascii"))
-                value = self._unpack_register(register, data)
-                self._register_value_cache[register] = value
-            return value
+            if register not in self._register_value_cache:
+                self._get_general_registers()
+            return self._register_value_cache[register]
         else:
             self.logger.warning(
                 "Cannot read register %s while not stopped", register
@@ -312,11 +332,12 @@ class GdbDebugDriver(DebugDriver):
         """ Set a single register """
         if self.status == DebugState.STOPPED:
             idx = self.arch.gdb_registers.index(register)
-            value = self._pack_register(register, value)
-            value = binascii.b2a_hex(value).decode("ascii")
-            res = self._send_command("P %x=%s" % (idx, value))
+            data = self._pack_register(register, value)
+            data = binascii.b2a_hex(data).decode("ascii")
+            res = self._send_command("P %x=%s" % (idx, data))
             if res == "OK":
                 self.logger.debug("Register written")
+                self._register_value_cache[register] = value
             else:
                 self.logger.warning("Register write failed: %s", res)
 
@@ -381,16 +402,60 @@ class GdbDebugDriver(DebugDriver):
     def read_mem(self, address: int, size: int):
         """ Read memory from address """
         if self.status == DebugState.STOPPED:
-            res = self._send_command("m %x,%x" % (address, size))
-            ret = binascii.a2b_hex(res.encode("ascii"))
-            return ret
+            block_size = self.cache_block_size
+            first = address - address % block_size
+            blocks = range(first, address + size, block_size)
+            missing = [b for b in blocks if b not in self._memory_cache]
+            if missing and not self._fill_memory_cache(missing):
+                # Some block is not readable, read exactly what is asked.
+                res = self._send_command("m %x,%x" % (address, size))
+                return binascii.a2b_hex(res.encode("ascii"))
+            data = b"".join(self._memory_cache[b] for b in blocks)
+            return data[address - first : address - first + size]
         else:
             self.logger.warning("Cannot read memory, target not stopped!")
             return bytes()
 
+    def _fill_memory_cache(self, blocks):
+        """Read the given memory blocks into the cache.
+
+        Adjacent blocks are merged into a single read, and the reads are
+        sent without waiting for the replies in between. Returns False
+        if the target could not read some block.
+        """
+        reads = []
+        for block in blocks:
+            if (
+                reads
+                and reads[-1][0] + reads[-1][1] == block
+                and reads[-1][1] < self.max_read_size
+            ):
+                reads[-1][1] += self.cache_block_size
+            else:
+                reads.append([block, self.cache_block_size])
+
+        commands = ["m %x,%x" % (address, size) for address, size in reads]
+        replies = self._send_commands(commands)
+        ok = True
+        for (address, size), res in zip(reads, replies):
+            if len(res) != 2 * size:
+                self.logger.debug("Read %x,%x failed: %s", address, size, res)
+                ok = False
+                continue
+            data = binascii.a2b_hex(res.encode("ascii"))
+            for offset in range(0, size, self.cache_block_size):
+                self._memory_cache[address + offset] = data[
+                    offset : offset + self.cache_block_size
+                ]
+        return ok
+
     def write_mem(self, address: int, data):
         """ Write memory """
         if self.status == DebugState.STOPPED:
+            block_size = self.cache_block_size
+            first = address - address % block_size
+            for block in range(first, address + len(data), block_size):
+                self._memory_cache.pop(block, None)
             length = len(data)
             data = binascii.b2a_hex(data).decode("ascii")
             res = self._send_command("M %x,%x:%s" % (address, length, data))
@@ -413,6 +478,16 @@ class GdbDebugDriver(DebugDriver):
         self._send_message(command)
         return self._recv_message()
 
+    def _send_commands(self, commands):
+        """Send several gdb commands, and then receive their responses.
+
+        The commands are pipelined, so the target can process the next
+        command while the response of the previous one is underway.
+        """
+        for command in commands:
+            self._send_message(command)
+        return [self._recv_message() for _ in commands]
+
     def _recv_message(self, timeout=3):
         """ Block until a packet is received """
         return self._msg_queue.get(timeout=timeout)
@@ -1,6 +1,55 @@
-""" Contains disassembler stuff. """
+""" Contains disassembler stuff.
 
-from ..arch.data_instructions import DByte
+The disassembler is table driven. For each instruction of an instruction
+set, the bits which are fixed for the instruction, and the bits which
+hold its operands, are determined. Since many instructions are encoded
+by custom encode functions instead of bit patterns, this is done by
+encoding sample instructions, in which one operand at a time is varied.
+The fixed bits include the bit patterns declared for the instruction.
+
+From the fixed bits, a decode tree is created. Each node of the tree
+looks at a single byte of the data, and selects the next node by the
+value of that byte. The leaves contain the encodings that match all the
+examined bytes. Decoding an instruction takes a lookup per byte of the
+instruction, regardless of the number of instructions in the set.
+
+Integers which are encoded in a token field by a transform, such as a
+rotated immediate, are decoded from the field with the reverse transform.
+Integers of which the size of the encoding depends on the value, such as
+displacements, have an encoding for each size.
+
+Instructions with constructor operands, such as addressing modes, have
+an encoding for each combination of constructors. When the size of an
+instruction depends on a register operand, the registers are grouped by
+size into separate encodings.
+
+Decoded instructions are encoded again, and compared with the data, so
+only correct instructions are produced. The outcome of this check is
+remembered, since programs contain the same instructions many times.
+Data that cannot be decoded is emitted as bytes.
+
+The decode tree is created once per instruction set.
+"""
+
+import itertools
+import logging
+from ..arch.data_instructions import DByte, DataInstruction
+from ..arch.encoding import Transform, VariablePattern
+from ..arch.generic_instructions import VirtualInstruction, PseudoInstruction
+from ..arch.registers import Register
+
+logger = logging.getLogger("disasm")
+
+# Decode trees shared by all disassemblers, by instructions of the isa:
+_trees = {}
+
+
+def get_decode_tree(isa):
+    """ Get the decode tree for the given instruction set """
+    key = tuple(isa.instructions)
+    if key not in _trees:
+        _trees[key] = DecodeTree(isa.instructions)
+    return _trees[key]
 
 
 class Disassembler:
@@ -8,33 +57,805 @@ class Disassembler:
 
     def __init__(self, arch):
         self.arch = arch
-        for instruction in arch.isa.instructions:
-            # print(instruction, instruction.patterns)
-            # for nl in instruction.non_leaves:
-            #    print('  ', nl.patterns)
-            pass
+        self.decode_tree = get_decode_tree(arch.isa)
 
     def disasm(self, data, outs, address=0):
         """ Disassemble data into an instruction stream """
-        # TODO: implement this!
-
-        # The trial and error method, will be slow as a snail:
-        # for instruction in self.arch.isa.instructions:
-        #    for size in instruction.sizes():
-        #        part = data[:size]
-        #        try:
-        #            print(instruction, part, size)
-        #            i = instruction.decode(part)
-        #            print(i)
-        #        except ValueError:
-        #            pass
-
-        # For now, all is bytes!
-        for byte in data:
-            ins = DByte(byte)
-            ins.address = address
-            outs.emit(ins)
-            address += len(ins.encode())
-
-    def take_one(self):
-        pass
+        offset = 0
+        while offset < len(data):
+            for ins, size in self.take_one(data, offset, address + offset):
+                ins.address = address + offset
+                outs.emit(ins)
+                offset += size
+
+    def take_one(self, data, offset, address):
+        """Decode the instruction at the given offset and address.
+
+        Returns a list of instructions and their sizes. This is a single
+        instruction, or data bytes when the data cannot be decoded.
+        """
+        decoded = self.decode_tree.decode(data, offset, address)
+        if decoded:
+            return [decoded]
+        else:
+            size = min(self.decode_tree.step, len(data) - offset)
+            return [(DByte(byte), 1) for byte in data[offset : offset + size]]
+
+
+class DecodeTree:
+    """ Decode tree for a set of instructions """
+
+    def __init__(self, instructions):
+        self.encodings = []
+        register_classes = register_classes_of(instructions)
+        for instruction in instructions:
+            self.encodings.extend(
+                Encoding.create(instruction, register_classes)
+            )
+
+        # The most specific encodings must be tried first. Encodings with
+        # labels are only used when no other encoding matches:
+        self.encodings.sort(
+            key=lambda e: (bool(e.relocation_mask), -e.fixed_bits, -e.size)
+        )
+        if self.encodings:
+            self.step = min(e.size for e in self.encodings)
+        else:
+            self.step = 1
+
+        self._nodes = {}
+        self.root = self._make_node(0, tuple(self.encodings))
+        logger.debug(
+            "Decode tree with %s encodings and %s nodes",
+            len(self.encodings),
+            len(self._nodes),
+        )
+
+    def _make_node(self, index, encodings):
+        """Get the node for the given encodings.
+
+        The node examines the first byte, starting at index, which has
+        fixed bits in one of the encodings.
+        """
+        while True:
+            if all(index >= e.size for e in encodings):
+                index = None
+                break
+            if any(e.mask[index] for e in encodings if index < e.size):
+                break
+            index += 1
+
+        key = (index, encodings)
+        if key not in self._nodes:
+            self._nodes[key] = DecodeNode(index, encodings)
+        return self._nodes[key]
+
+    def _make_child(self, node, byte):
+        """Create the node to go to from a node for the given byte.
+
+        Nodes are created when they are first needed, since the tree for
+        instruction sets with many encodings is large.
+        """
+        if node.checks is None:
+            # Group the encodings which check the byte in the same way:
+            checks = {}
+            for encoding in node.encodings:
+                if node.index < encoding.size:
+                    check = (
+                        encoding.mask[node.index],
+                        encoding.value[node.index],
+                    )
+                else:
+                    check = (0, 0)
+                checks.setdefault(check, set()).add(encoding)
+            node.checks = list(checks.items())
+
+        matches = set()
+        for (mask, value), group in node.checks:
+            if byte & mask == value:
+                matches.update(group)
+        selection = tuple(e for e in node.encodings if e in matches)
+        child = self._make_node(node.index + 1, selection)
+        node.table[byte] = child
+        return child
+
+    def decode(self, data, offset, address=0):
+        """Decode the instruction at the given offset of the data.
+
+        Returns the instruction and its size, or None when no instruction
+        matches the data.
+        """
+        node = self.root
+        remaining = len(data) - offset
+        while node.table is not None and node.index < remaining:
+            byte = data[offset + node.index]
+            child = node.table[byte]
+            if child is None:
+                child = self._make_child(node, byte)
+            node = child
+
+        # All fixed bits of the encodings which fit into the remaining
+        # data are checked now:
+        for encoding in node.encodings:
+            if encoding.size <= remaining:
+                ins = encoding.decode(
+                    data[offset : offset + encoding.size], address
+                )
+                if ins is not None:
+                    return ins, encoding.size
+
+
+class DecodeNode:
+    """ A node in the decode tree, which looks at the byte at index """
+
+    __slots__ = ("index", "encodings", "checks", "table")
+
+    def __init__(self, index, encodings):
+        self.index = index
+        self.encodings = encodings
+        self.checks = None
+        self.table = None if index is None else [None] * 256
+
+
+def register_classes_of(instructions):
+    """ Determine the register classes used by a set of instructions """
+    register_classes = []
+    for instruction in instructions:
+        for argument in operands_of(instruction):
+            if isinstance(argument._cls, type) and issubclass(
+                argument._cls, Register
+            ):
+                if argument._cls not in register_classes:
+                    register_classes.append(argument._cls)
+    return register_classes
+
+
+def operands_of(constructor):
+    """ Yield all operands of a constructor and its sub constructors """
+    if constructor.syntax:
+        for argument in constructor.syntax.formal_arguments:
+            if argument.is_constructor:
+                for sub in argument._cls:
+                    yield from operands_of(sub)
+            else:
+                yield argument
+
+
+class Encoding:
+    """An encoding of an instruction.
+
+    Contains the size, the fixed bits and the operand fields of the
+    encoding. Bits are numbered as if the data is a little endian
+    integer. Operand fields are decoded from the bits which differ from
+    the sample instruction the encoding was created from.
+    """
+
+    # Instructions which are not decoded:
+    excluded = (VirtualInstruction, PseudoInstruction, DataInstruction)
+
+    def __init__(self, instruction, choice, fields, size, word):
+        self.instruction = instruction
+        self.choice = choice
+        self.fields = fields
+        self.size = size
+        self.word = word
+
+        # Outcome of the check of decoded instructions, by their bits:
+        self.checked = {}
+
+        variable = 0
+        self.relocation_mask = 0
+        for field in fields.values():
+            variable |= field.mask
+            if isinstance(field, LabelField):
+                self.relocation_mask |= field.mask
+        fixed = ((1 << (size * 8)) - 1) & ~variable
+        self.mask = fixed.to_bytes(size, "little")
+        self.value = (word & fixed).to_bytes(size, "little")
+        self.fixed_bits = bin(fixed).count("1")
+
+    def __repr__(self):
+        return "Encoding({}, {} bytes)".format(
+            self.instruction.__name__, self.size
+        )
+
+    @classmethod
+    def create(cls, instruction, register_classes):
+        """ Create the encodings of an instruction """
+        if not (instruction.syntax and hasattr(instruction, "tokens")):
+            return []
+        if issubclass(instruction, cls.excluded):
+            return []
+
+        encodings = []
+        for choice in choices(instruction):
+            sampler = Sampler(instruction, choice, register_classes)
+            for encoding in sampler.create_encodings():
+                if encoding.fixed_bits:
+                    encodings.append(encoding)
+        return encodings
+
+    def decode(self, data, address):
+        """Decode an instruction from the data at the given address.
+
+        Returns None when the data is not an encoding of the instruction.
+        """
+        word = int.from_bytes(data, "little")
+        difference = word ^ self.word
+        key = word & ~self.relocation_mask
+        if self.checked.get(key) is False:
+            return
+        try:
+            values = {
+                path: field.decode(difference, address)
+                for path, field in self.fields.items()
+            }
+            ins = instantiate(self.instruction, self.choice, values)
+        except (KeyError, ValueError):
+            self.checked[key] = False
+            return
+
+        if key not in self.checked:
+            self.checked[key] = self.check(ins, word)
+        if self.checked[key]:
+            return ins
+
+    def check(self, ins, word):
+        """ Check that an instruction is encoded into the given bits """
+        try:
+            encoded = ins.encode()
+        except (KeyError, ValueError):
+            return False
+
+        # Compare the data, without the bits filled in by relocations:
+        if len(encoded) != self.size:
+            return False
+        encoded = int.from_bytes(encoded, "little")
+        return (encoded ^ word) & ~self.relocation_mask == 0
+
+
+def choices(constructor):
+    """Yield all choices of constructors of the operands.
+
+    A choice maps an operand to a tuple with the chosen constructor and
+    the choice for that constructor.
+    """
+    options = []
+    for argument in constructor.syntax.formal_arguments:
+        if argument.is_constructor:
+            options.append(
+                [
+                    (argument, (sub, choice))
+                    for sub in argument._cls
+                    for choice in choices(sub)
+                ]
+            )
+    for combination in itertools.product(*options):
+        yield dict(combination)
+
+
+def leaf_operands(constructor, choice, path=()):
+    """ Yield the paths to the operands which are not constructors """
+    for argument in constructor.syntax.formal_arguments:
+        if argument.is_constructor:
+            sub, sub_choice = choice[argument]
+            yield from leaf_operands(sub, sub_choice, path + (argument,))
+        else:
+            yield path + (argument,)
+
+
+def instantiate(constructor, choice, values, path=()):
+    """ Create a constructor with the operand values given by path """
+    arguments = []
+    for argument in constructor.syntax.formal_arguments:
+        if argument.is_constructor:
+            sub, sub_choice = choice[argument]
+            value = instantiate(sub, sub_choice, values, path + (argument,))
+        else:
+            value = values[path + (argument,)]
+        arguments.append(value)
+    return constructor(*arguments)
+
+
+def replace(values, path, value):
+    """ Create a copy of the operand values, with one value replaced """
+    values = dict(values)
+    values[path] = value
+    return values
+
+
+def probe(function, base=0, max_bits=64):
+    """Determine how the bits of an integer are encoded.
+
+    The function gives the bits which change when the integer changes
+    from the base into the given value, or None if the value cannot be
+    encoded. The bits of the integer are varied with respect to the
+    base. Returns an integer field, or None when the integer bits cannot
+    be encoded separately.
+    """
+    bits = []
+    used = 0
+    index = 0
+    run = 2
+    while index < max_bits:
+        # When the bits are encoded in consecutive bits, guess that the
+        # next run of bits is as well, and check the guess at once:
+        last = bits[-1][1] if bits else 0
+        if run and len(bits) > 1 and last == bits[-2][1] << 1:
+            run = min(run, max_bits - index)
+            guess = [
+                (1 << (index + k), last << (k + 1)) for k in range(run)
+            ]
+            value = sum(bit for bit, _ in guess)
+            delta = sum(delta for _, delta in guess)
+            if not delta & used and function(base ^ value) == delta:
+                bits.extend(guess)
+                used |= delta
+                index += run
+                run *= 2
+                continue
+            run = 0
+
+        delta = function(base ^ (1 << index))
+        if delta:
+            if delta & used:
+                break
+            bits.append((1 << index, delta))
+            used |= delta
+        elif bits:
+            break
+        index += 1
+
+    if not bits:
+        return
+
+    # Check for bits which are set for negative values only. These are
+    # either sign bits of a two's complement value, or bits which
+    # indicate that the value must be negated:
+    sign = negate = None
+    delta = function(base ^ -bits[0][0])
+    if delta is not None and delta & ~used:
+        if delta & used == used:
+            sign = delta & ~used
+        elif delta & used == bits[0][1]:
+            negate = delta & ~used
+    return IntegerField(bits, sign, negate, base)
+
+
+class Sampler:
+    """Determine the encodings of an instruction with a single choice of
+    constructors, by encoding sample instructions.
+    """
+
+    def __init__(self, instruction, choice, register_classes):
+        self.instruction = instruction
+        self.choice = choice
+        self.register_classes = register_classes
+        self.paths = list(leaf_operands(instruction, choice))
+        self.samples = {}
+        self.base = None
+        self.base_sample = None
+
+    def encode(self, values):
+        """Encode a sample instruction.
+
+        Returns the size and bits of the encoding, or None when the
+        values cannot be encoded.
+        """
+        key = tuple(
+            frozenset(values[path])
+            if isinstance(values[path], set)
+            else values[path]
+            for path in self.paths
+        )
+        if key not in self.samples:
+            try:
+                ins = instantiate(self.instruction, self.choice, values)
+                data = ins.encode()
+            except Exception:  # pylint: disable=broad-except
+                # Encoders check their operands in all kinds of ways.
+                sample = None
+            else:
+                sample = len(data), int.from_bytes(data, "little")
+            self.samples[key] = sample
+        return self.samples[key]
+
+    def create_encodings(self):
+        """ Create an encoding for each group of registers """
+        domains = {}
+        base = {}
+        for path in self.paths:
+            argument = path[-1]
+            if argument._cls is int:
+                base[path] = 0
+            elif argument._cls is str:
+                base[path] = "label{}".format(len(base))
+            elif issubclass(argument._cls, Register):
+                domains[path] = argument._cls.all_registers()
+                base[path] = domains[path][0]
+            elif issubclass(argument._cls, set):
+                base[path] = argument._cls()
+            else:  # pragma: no cover
+                return []
+
+        if not self.encode(base):
+            return []
+
+        # Group the registers by encoding size. Registers which are
+        # encoded in a different form, for example with an extra address
+        # byte, must be in different groups as well. The register bits
+        # of registers in the same group differ in no more bits than
+        # needed to number all registers:
+        groups = []
+        for path, domain in domains.items():
+            width = (len(domain) - 1).bit_length()
+            leaders = []
+            for register in domain:
+                sample = self.encode(replace(base, path, register))
+                if not sample:
+                    continue
+                for leader, group in leaders:
+                    if leader[0] == sample[0] and (
+                        bin(leader[1] ^ sample[1]).count("1") <= width
+                    ):
+                        group.append(register)
+                        break
+                else:
+                    leaders.append((sample, [register]))
+            groups.append([(path, group) for _, group in leaders])
+
+        # Integers of which the size depends on the value, such as
+        # displacements which fit in a byte or not, get a base value for
+        # each size:
+        integers = []
+        for path in self.paths:
+            if path[-1]._cls is int:
+                values = self.integer_bases(base, path)
+                integers.append([(path, value) for value in values])
+
+        encodings = []
+        known = {}
+        for combination in itertools.product(*groups):
+            for values in itertools.product(*integers):
+                group_base = dict(base)
+                group_base.update(values)
+                registers = {}
+                for path, group in combination:
+                    group_base[path] = group[0]
+                    registers[path] = group
+                encoding = self.create_encoding(group_base, registers, known)
+                if encoding:
+                    encodings.append(encoding)
+        return encodings
+
+    def integer_bases(self, base, path):
+        """Determine a base value of an integer for each encoding size.
+
+        The size can change when a value no longer fits in a number of
+        bytes, so values around byte boundaries are sampled. The base
+        value of a size is chosen such that each of its bits can be
+        flipped without changing the size. The lowest value is taken when
+        it is negative, so that the value is decoded as signed.
+        """
+        size, _ = self.encode(base)
+        sizes = {}
+        for index in range(7, 40, 8):
+            for value in (
+                1 << index,
+                -(1 << index),
+                1 << (index + 1),
+                -(1 << (index + 1)),
+            ):
+                sample = self.encode(replace(base, path, value))
+                if sample and sample[0] != size:
+                    sizes.setdefault(sample[0], []).append(value)
+
+        bases = [base[path]]
+        for size in sorted(sizes):
+            values = sorted(sizes[size])
+            value = values[0]
+            if value > 0 and len(values) > 1:
+                # Combine the two highest bits, so that the value keeps
+                # a high bit when one of them is flipped:
+                combined = values[-1] | values[-2]
+                sample = self.encode(replace(base, path, combined))
+                if sample and sample[0] == size:
+                    value = combined
+            bases.append(value)
+        return bases
+
+    def create_encoding(self, base, registers, known):
+        """Create an encoding with the given values as base.
+
+        Each operand is varied with respect to the base, to determine
+        the bits in which it is encoded. The known fields of previous
+        encodings, by operand and base value, are used when they still
+        fit.
+        """
+        self.base = base
+        self.base_sample = self.encode(base)
+        if not self.base_sample:
+            return
+        size, word = self.base_sample
+
+        fields = {}
+        for path in self.paths:
+            argument = path[-1]
+            if path in registers:
+                field = self.reuse(path, known) or self.register_field(
+                    path, registers[path]
+                )
+                known[path, base[path]] = field
+            elif argument._cls is int and self.transform_of(path):
+                field = self.transform_field(path)
+            elif argument._cls is int:
+                field = self.reuse(path, known) or probe(
+                    lambda value: self.delta(path, value), base[path]
+                )
+                known[path, base[path]] = field
+            elif argument._cls is str:
+                field = self.label_field(path)
+            else:
+                field = self.register_set_field(path)
+            if field is None:
+                return
+            fields[path] = field
+        return Encoding(self.instruction, self.choice, fields, size, word)
+
+    def delta(self, path, value):
+        """Determine which bits change when an operand gets a value.
+
+        Returns None when the value cannot be encoded, or when the size
+        of the instruction changes.
+        """
+        size, word = self.base_sample
+        sample = self.encode(replace(self.base, path, value))
+        if sample and sample[0] == size:
+            return sample[1] ^ word
+
+    def reuse(self, path, known):
+        """Get the field of an operand of a previous encoding, if it fits.
+
+        Operands are usually encoded independently of the other
+        operands, so only the highest register or bit is checked. The
+        decoded instructions are checked anyway.
+        """
+        field = known.get((path, self.base[path]))
+        if isinstance(field, RegisterField) and field.deltas:
+            register, delta = field.deltas[-1]
+            if self.delta(path, register) == delta:
+                return field
+        elif isinstance(field, IntegerField):
+            bit, delta = field.bits[-1]
+            if self.delta(path, field.base ^ bit) == delta:
+                return field
+
+    def transform_of(self, path):
+        """Get the pattern which encodes an integer operand in a token
+        field by a transform which can be reversed, if any.
+        """
+        constructor, choice = self.instruction, self.choice
+        for argument in path[:-1]:
+            constructor, choice = choice[argument]
+        for pattern in constructor.dict_to_patterns(constructor.patterns):
+            if (
+                isinstance(pattern, VariablePattern)
+                and isinstance(pattern.prop, Transform)
+                and pattern.prop.source is path[-1]
+                and type(pattern.prop).backwards is not Transform.backwards
+            ):
+                return pattern
+
+    def transform_field(self, path):
+        """Determine the bits of the token field of a transformed integer.
+
+        Transforms, such as rotated immediates, do not encode the bits of
+        the integer in separate bits, so the token field is decoded
+        instead, and transformed back into the integer.
+        """
+        pattern = self.transform_of(path)
+        sample = instantiate(self.instruction, self.choice, self.base)
+        tokens = sample.get_tokens()
+        token = next(t for t in tokens if hasattr(t, pattern.field))
+        width = getattr(type(token), pattern.field)._bitsize
+        mask = (1 << width) - 1
+        raw = pattern.get_value(sample) & mask
+        tokens.set_field(pattern.field, 0)
+        zero = int.from_bytes(tokens.encode(), "little")
+        bits = []
+        for index in range(width):
+            tokens.set_field(pattern.field, 1 << index)
+            delta = int.from_bytes(tokens.encode(), "little") ^ zero
+            bits.append((1 << index, delta))
+        return TransformField(bits, raw, pattern.prop)
+
+    def register_field(self, path, registers):
+        deltas = []
+        for register in registers:
+            delta = self.delta(path, register)
+            if delta is not None:
+                deltas.append((register, delta))
+        if len(deltas) > 1 and not any(delta for _, delta in deltas):
+            # The register is not encoded at all.
+            return
+        return RegisterField(deltas)
+
+    def register_set_field(self, path):
+        cls = path[-1]._cls
+        members = []
+        used = 0
+        for register_class in self.register_classes:
+            for register in register_class.all_registers():
+                delta = self.delta(path, cls([register]))
+                if delta and not delta & used:
+                    members.append((register, delta))
+                    used |= delta
+        return RegisterSetField(cls, members)
+
+    def label_field(self, path):
+        size, _ = self.base_sample
+        sample = instantiate(self.instruction, self.choice, self.base)
+        relocations = [
+            relocation
+            for relocation in sample.relocations()
+            if relocation.symbol_name == self.base[path]
+        ]
+        if relocations and all(
+            0 <= relocation.offset <= size - relocation.size()
+            for relocation in relocations
+        ):
+            return LabelField(relocations)
+
+
+class RegisterField:
+    """ A register operand, decoded by looking up its bits """
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.mask = 0
+        for _, delta in deltas:
+            self.mask |= delta
+        self.table = {}
+        for register, delta in deltas:
+            self.table.setdefault(delta, register)
+
+    def decode(self, difference, address):
+        return self.table[difference & self.mask]
+
+
+class IntegerField:
+    """An integer operand, of which each bit is encoded in some bits.
+
+    Negative values are either encoded in two's complement, with the
+    bits in sign set, or as the value to be negated, with the bits in
+    negate set. When the bits were determined with respect to a base
+    value, the decoded bits are the bits which differ from the base, and
+    the value is signed when the base is negative.
+    """
+
+    def __init__(self, bits, sign, negate, base=0):
+        self.bits = bits
+        self.sign = sign
+        self.negate = negate
+        self.base = base
+        self.limit = bits[-1][0] * 2
+        self.mask = sign or negate or 0
+        for _, delta in bits:
+            self.mask |= delta
+
+    def decode(self, difference, address):
+        value = 0
+        for bit, delta in self.bits:
+            if difference & delta == delta:
+                value |= bit
+        if self.base:
+            value = (value ^ self.base) & (self.limit - 1)
+            if self.base < 0 and value >= self.limit // 2:
+                value -= self.limit
+        elif self.sign and difference & self.sign == self.sign:
+            value -= self.limit
+        elif self.negate and difference & self.negate == self.negate:
+            value = -value
+        return value
+
+
+class TransformField:
+    """ An integer operand, encoded in a token field by a transform """
+
+    def __init__(self, bits, raw, transform):
+        self.bits = bits
+        self.raw = raw
+        self.transform = transform
+        self.mask = 0
+        for _, delta in bits:
+            self.mask |= delta
+
+    def decode(self, difference, address):
+        value = self.raw
+        for bit, delta in self.bits:
+            if difference & delta:
+                value ^= bit
+        return self.transform.from_value(value)
+
+
+class RegisterSetField:
+    """ A set of registers, in which each register is encoded as a bit """
+
+    def __init__(self, cls, members):
+        self.cls = cls
+        self.members = members
+        self.mask = 0
+        for _, delta in members:
+            self.mask |= delta
+
+    def decode(self, difference, address):
+        return self.cls(
+            register
+            for register, delta in self.members
+            if difference & delta == delta
+        )
+
+
+class LabelField:
+    """A label operand, which is filled in by relocations.
+
+    The label is decoded into the address to which the relocation
+    refers, by applying the relocation to sample addresses. When this is
+    not possible, the label is shown as a question mark.
+    """
+
+    def __init__(self, relocations):
+        self.relocation = relocations[0]
+        self.mask = 0
+        for relocation in relocations:
+            if relocation.field:
+                token = relocation.token()
+                field = getattr(type(token), relocation.field)
+                setattr(token, relocation.field, field._mask)
+                mask = token.bit_value
+            else:
+                mask = 0
+                for index in range(64):
+                    mask |= self.apply(relocation, 1 << index) or 0
+                    mask |= self.apply(relocation, -(1 << index)) or 0
+            self.mask |= mask << (relocation.offset * 8)
+
+        # Find a label value for which the relocation is zero:
+        self.field = None
+        relocation = self.relocation
+        for start in sorted(range(-16, 17), key=abs):
+            if self.apply(relocation, start) == 0:
+                self.start = start
+                self.relative = (
+                    self.apply(relocation, start + 4, reloc_value=4) == 0
+                )
+                field = probe(lambda v: self.apply(relocation, start + v))
+                if field:
+                    self.field = field
+                break
+
+    @staticmethod
+    def apply(relocation, sym_value, reloc_value=0):
+        """Get the bits of the relocation for the given label address.
+
+        Returns None when the relocation cannot be applied.
+        """
+        data = bytearray(relocation.size())
+        try:
+            data = relocation.apply(sym_value, data, reloc_value)
+        except Exception:  # pylint: disable=broad-except
+            return
+        return int.from_bytes(data, "little")
+
+    def decode(self, difference, address):
+        if self.field is None:
+            return "?"
+        offset = self.relocation.offset
+        field = self.field
+        value = field.decode(difference >> (offset * 8), 0)
+        if self.relative:
+            # Relative labels can be before the instruction:
+            if not field.sign and value >= field.limit // 2:
+                value -= field.limit
+            value += address + offset
+        return hex(self.start + value)
@@ -14,23 +14,40 @@ The hierarchy is as follows:
 - debug data have an offset into a section and contain data.
 - sections cannot overlap
 
+Object files can be stored in json format, or in the more compact binary
+format implemented in :mod:`ppci.binutils.binary_object`. When loading,
+the format is detected automatically.
+
 """
 
+import io
 import json
 from ..common import CompilerError, make_num, get_file
 from ..utils.binary_txt import bin2asc, asc2bin
 from . import debuginfo
+from . import binary_object
 
 
 def get_object(obj):
     """ Try hard to load an object """
     if not isinstance(obj, ObjectFile):
-        f = get_file(obj)
+        f = get_file(obj, mode="rb")
         obj = ObjectFile.load(f)
         f.close()
     return obj
 
 
+def get_binary_file(f):
+    """Get the binary file underlying f, or None for text-only files.
+
+    This allows the format of a file opened in text mode to be detected.
+    """
+    if isinstance(f, io.TextIOBase):
+        return getattr(f, "buffer", None)
+    else:
+        return f
+
+
 class Symbol:
     """ A symbol definition in an object file """
 
@@ -117,7 +134,11 @@ class RelocationEntry:
 
 
 class Section:
-    """ A defined region of data in the object file """
+    """A defined region of data in the object file
+
+    The data can be assigned a memoryview, for example a part of an object
+    file read into memory. This data is only copied when it is accessed.
+    """
 
     def __init__(self, name):
         self.name = name
@@ -125,13 +146,29 @@ class Section:
         self.alignment = 4
         self.data = bytearray()
 
+    @property
+    def data(self):
+        if self._view is not None:
+            self._data = bytearray(self._view)
+            self._view = None
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        if isinstance(data, memoryview):
+            self._data, self._view = None, data
+        else:
+            self._data, self._view = data, None
+
     def add_data(self, data):
         """ Append data to the end of this section """
         self.data += data
 
     @property
     def size(self):
-        return len(self.data)
+        if self._view is not None:
+            return len(self._view)
+        return len(self._data)
 
     def __repr__(self):
         return "SECTION {} size=0x{:x} address=0x{:x}".format(
@@ -367,15 +404,39 @@ class ObjectFile:
         """Serialize the object into a dictionary structure suitable for json."""
         return serialize(self)
 
-    def save(self, output_file):
-        """ Save object file to a file like object """
-        json.dump(self.serialize(), output_file, indent=2, sort_keys=True)
-        print(file=output_file)
+    def save(self, output_file, fmt="json"):
+        """Save object file to a file like object
+
+        Args:
+            output_file: the file to write to. This must be a binary
+                file when fmt is 'binary'.
+            fmt: the format to use, either 'json' or 'binary'.
+        """
+        if fmt == "json":
+            json.dump(
+                self.serialize(), output_file, indent=2, sort_keys=True
+            )
+            print(file=output_file)
+        elif fmt == "binary":
+            binary_object.write_object(self, output_file)
+        else:
+            raise ValueError("Invalid object file format {}".format(fmt))
 
     @staticmethod
     def load(input_file):
-        """ Load object file from file """
-        return deserialize(json.load(input_file))
+        """Load object file from file
+
+        The format of the file (json or binary) is detected automatically.
+        """
+        binary_file = get_binary_file(input_file)
+        if binary_file is None:
+            return deserialize(json.load(input_file))
+
+        data = binary_object.read_file(binary_file)
+        if binary_object.is_binary_object(data):
+            return binary_object.read_object(data)
+        else:
+            return deserialize(json.loads(bytes(data).decode("utf8")))
 
 
 def print_object(obj):
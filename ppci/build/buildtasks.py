@@ -7,6 +7,7 @@ module
 """
 
 from .tasks import Task, TaskError, register_task
+from .cache import ObjectCache, get_default_cache
 from ..utils.reporting import HtmlReportGenerator, DummyReportGenerator
 from .. import api
 from ..lang.tools.common import ParserException
@@ -55,6 +56,17 @@ class OutputtingTask(Task):
         with open(output_filename, 'wt', encoding='utf8') as output_file:
             obj.save(output_file)
 
+    def get_cache(self):
+        """ Get the object cache specified by the cache argument.
+
+        When no cache argument is given, the cache specified by the
+        PPCI_CACHE_DIR environment variable is used, if any.
+        """
+        if 'cache' in self.arguments:
+            return ObjectCache(self.relpath(self.get_argument('cache')))
+        else:
+            return get_default_cache()
+
 
 @register_task
 class AssembleTask(OutputtingTask):
@@ -107,7 +119,7 @@ class C3CompileTask(OutputtingTask):
         with reporter:
             obj = api.c3c(
                 sources, includes, arch, opt_level=opt,
-                reporter=reporter, debug=debug)
+                reporter=reporter, debug=debug, cache=self.get_cache())
 
         self.store_object(obj)
 
@@ -137,13 +149,14 @@ class CCompileTask(OutputtingTask):
         coptions = api.COptions()
         coptions.add_include_paths(includes)
 
+        cache = self.get_cache()
         with reporter:
             objs = []
             for source in sources:
                 with open(source, 'r') as f:
                     obj = api.cc(
                         f, arch, coptions=coptions, opt_level=opt,
-                        reporter=reporter, debug=debug)
+                        reporter=reporter, debug=debug, cache=cache)
                 objs.append(obj)
             obj = api.link(
                 objs, partial_link=True, reporter=reporter, debug=debug)
@@ -170,7 +183,9 @@ class PascalCompileTask(OutputtingTask):
         opt = int(self.get_argument('optimize', default='0'))
 
         with reporter:
-            obj = api.pascal(sources, arch, opt_level=opt, reporter=reporter)
+            obj = api.pascal(
+                sources, arch, opt_level=opt, reporter=reporter,
+                cache=self.get_cache())
             obj = api.link(
                 (obj,), partial_link=True, reporter=reporter, debug=debug)
 
@@ -197,7 +212,8 @@ class WasmCompileTask(OutputtingTask):
         with reporter:
             with open(source[0], 'rb') as f:
                 obj = api.wasmcompile(
-                    f, arch, opt_level=opt, reporter=reporter)
+                    f, arch, opt_level=opt, reporter=reporter,
+                    cache=self.get_cache())
         self.store_object(obj)
 
 
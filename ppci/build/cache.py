@@ -0,0 +1,390 @@
+""" Content addressed cache for compiled object files.
+
+Compiling the same ir-code for the same target with the same options
+always results in the same object file. The object cache stores object
+files on disk, keyed by a hash of the ir-code, the target and the code
+generation options, so that repeated builds can skip code generation.
+
+.. doctest::
+
+    >>> import io, tempfile
+    >>> from ppci.api import c_to_ir, ir_to_object
+    >>> from ppci.build.cache import ObjectCache
+    >>> cache = ObjectCache(tempfile.mkdtemp())
+    >>> c_src = "int add(int a, int b) { return a + b; }"
+    >>> mod = c_to_ir(io.StringIO(c_src), "arm")
+    >>> obj1 = ir_to_object([mod], "arm", cache=cache)
+    >>> obj2 = ir_to_object([mod], "arm", cache=cache)
+    >>> cache.hits, cache.misses
+    (1, 1)
+
+The cache is bounded in size. When the total size of the stored objects
+exceeds the bound, the least recently used objects are removed. The bound
+holds for all caches sharing the directory, such as the cache of natively
+compiled wasm modules.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import struct
+import tempfile
+from .. import __version__, ir
+from ..irutils import Writer
+from ..binutils.binary_object import read_object, object_to_bytes
+from ..codegen import burs
+
+logger = logging.getLogger("cache")
+
+#: Environment variable which can be used to specify a cache directory.
+CACHE_DIR_ENV = "PPCI_CACHE_DIR"
+
+#: Suffixes of the entries of the caches which can share a directory.
+CACHE_SUFFIXES = (".obj", ".wasmobj")
+
+
+def get_default_cache():
+    """Get the cache specified by the PPCI_CACHE_DIR environment variable.
+
+    Returns None when the environment variable is not set.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if directory:
+        return ObjectCache(directory)
+
+
+def get_cache(cache):
+    """Get a cache from the given argument.
+
+    The argument can be None, an ObjectCache or a directory name.
+    """
+    if cache is None or isinstance(cache, ObjectCache):
+        return cache
+    elif isinstance(cache, str):
+        return ObjectCache(cache)
+    else:
+        raise TypeError("Invalid cache {}".format(cache))
+
+
+class ObjectCache:
+    """Persistent on-disk cache of object files.
+
+    Args:
+        directory: the directory in which the objects are stored.
+        max_size: the maximum amount of bytes to store in the cache.
+    """
+
+    suffix = ".obj"
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return "ObjectCache({})".format(self.directory)
+
+    def make_key(
+        self,
+        ir_modules,
+        march,
+        opt="speed",
+        debug=False,
+        register_allocator="graph_coloring",
+        schedule=False,
+    ):
+        """Calculate the cache key for the given ir-modules.
+
+        The key is a hash of the textual ir-code, the machine id string,
+        the optimization goal, the debug flag, the register allocator and
+        the scheduling flag.
+        """
+        h = hashlib.sha256()
+        h.update("ppci {}\n".format(__version__).encode())
+        h.update(
+            "{} {} {} {} {}\n".format(
+                march.make_id_str(), opt, debug, register_allocator, schedule
+            ).encode()
+        )
+        for ir_module in ir_modules:
+            h.update(fingerprint(ir_module, debug=debug).encode())
+        return h.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Retrieve an object file from the cache.
+
+        Returns None when the object is not in the cache.
+        """
+        filename = self._filename(key)
+        try:
+            with open(filename, "rb") as f:
+                obj = self.deserialize(f.read())
+        except (OSError, ValueError, struct.error):
+            self.misses += 1
+            logger.debug("Cache miss for %s", key)
+            return
+
+        # Mark as recently used:
+        os.utime(filename)
+        self.hits += 1
+        logger.debug("Cache hit for %s", key)
+        return obj
+
+    def put(self, key, obj):
+        """ Store an object file in the cache. """
+        data = self.serialize(obj)
+
+        # Write to temporary file and rename, so that concurrent users of
+        # the cache never see partially written objects.
+        fd, temp_filename = tempfile.mkstemp(
+            dir=self.directory, suffix=".tmp"
+        )
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_filename, self._filename(key))
+        logger.debug("Stored %s in cache", key)
+        self.evict()
+
+    def serialize(self, obj):
+        """ Convert a cached item into bytes """
+        return object_to_bytes(obj)
+
+    def deserialize(self, data):
+        """Convert bytes into a cached item.
+
+        Raises ValueError or struct.error when the data is invalid.
+        """
+        return read_object(data)
+
+    def entries(self, suffixes=None):
+        """Get a list of (access time, size, filename) tuples of all
+        cached objects, least recently used first.
+
+        By default only the entries of this cache are listed. Give the
+        suffixes of other caches to include their entries as well.
+        """
+        suffixes = tuple(suffixes or (self.suffix,))
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(suffixes):
+                continue
+            filename = os.path.join(self.directory, name)
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, filename))
+        entries.sort()
+        return entries
+
+    @property
+    def size(self):
+        """ The total amount of bytes stored in the cache """
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self):
+        """Remove least recently used objects until the size bound holds.
+
+        The bound holds for the entries of all caches in the directory.
+        """
+        entries = self.entries(CACHE_SUFFIXES)
+        total_size = sum(entry[1] for entry in entries)
+        for _, size, filename in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            total_size -= size
+            self.evictions += 1
+            logger.debug("Evicted %s from cache", filename)
+
+    def clear(self):
+        """ Remove all objects from the cache """
+        for _, _, filename in self.entries():
+            os.remove(filename)
+
+    def statistics(self):
+        """ Get a dictionary with usage statistics of this cache """
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size": sum(entry[1] for entry in entries),
+        }
+
+
+class StateTableStore:
+    """Keeps the state tables of the instruction selectors in a directory.
+
+    Filling the state tables takes a while, so the tables are stored, and
+    used again in later builds. Use the store as a context manager around
+    a build. Within the context, new tables are loaded from the directory.
+    At the end of the context, the tables which were extended are saved.
+
+    Args:
+        directory: the directory in which the tables are stored. When
+            None, the tables are not stored.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __enter__(self):
+        if self.directory:
+            burs.table_hooks.append(self.load)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.directory:
+            burs.table_hooks.remove(self.load)
+            self.save()
+
+    def _filename(self, tables):
+        return os.path.join(self.directory, "burs-{}.json".format(tables.key))
+
+    def load(self, tables):
+        """ Fill the given tables from the directory, when present """
+        filename = self._filename(tables)
+        if not os.path.exists(filename):
+            return
+
+        try:
+            with open(filename, "r") as f:
+                tables.from_json(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            logger.warning("Could not load %s: %s", filename, ex)
+            return
+        logger.debug("Loaded %s states from %s", len(tables.states), filename)
+
+    def save(self):
+        """ Save all tables which were extended since they were loaded """
+        for tables in burs.get_all_tables():
+            if not tables.dirty:
+                continue
+
+            # Write into a temporary file first, and move it into place,
+            # so that concurrent compilers never see a half written file:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_filename = tempfile.mkstemp(
+                dir=self.directory, suffix=".tmp"
+            )
+            with os.fdopen(fd, "w") as f:
+                json.dump(tables.to_json(), f)
+            os.replace(temp_filename, self._filename(tables))
+            tables.dirty = False
+
+
+def get_state_table_store(directory=None):
+    """Get a store for the state tables of the instruction selectors.
+
+    When no directory is given, the directory in the PPCI_CACHE_DIR
+    environment variable is used, if set.
+    """
+    if directory is None:
+        directory = os.environ.get(CACHE_DIR_ENV)
+    return StateTableStore(directory)
+
+
+def fingerprint(ir_module, debug=False):
+    """Create a textual fingerprint of an ir-module.
+
+    This is the textual ir-code, extended with the information which is
+    not present in the textual form, such as initial values of variables,
+    and, when debug is True, the debug information.
+    """
+    f = io.StringIO()
+    Writer(file=f).write(ir_module, verify=False)
+
+    for variable in ir_module.variables:
+        print(variable.name, repr(variable.value), file=f)
+
+    for function in ir_module.functions:
+        for block in function:
+            for instruction in block:
+                if isinstance(instruction, ir.InlineAsm):
+                    print(
+                        repr(instruction.template),
+                        instruction.clobbers,
+                        [v.name for v in instruction.output_values],
+                        [v.name for v in instruction.input_values],
+                        file=f,
+                    )
+
+    if debug and ir_module.debug_db:
+        _debug_fingerprint(ir_module, f)
+
+    return f.getvalue()
+
+
+def _debug_fingerprint(ir_module, f):
+    """ Write all debug information attached to the module into f """
+    debug_db = ir_module.debug_db
+    seen = {}
+    for info in debug_db.infos:
+        print(_canonical(info, seen), file=f)
+
+    # Record which ir objects map to which debug info:
+    objects = list(ir_module.variables)
+    for function in ir_module.functions:
+        objects.append(function)
+        for block in function:
+            objects.extend(block)
+    for position, value in enumerate(objects):
+        if debug_db.contains(value):
+            print(position, _canonical(debug_db.get(value), seen), file=f)
+
+
+_ADDRESS_FIELDS = ("address", "begin", "end")
+
+
+def _canonical(value, seen):
+    """ Create a deterministic string representation of debug info """
+    if isinstance(value, (str, int, float, bool, bytes, type(None))):
+        return repr(value)
+    elif isinstance(value, (ir.Value, ir.Block)):
+        return "ir:{}".format(value.name)
+    elif isinstance(value, (list, tuple)):
+        return "[{}]".format(",".join(_canonical(v, seen) for v in value))
+    elif isinstance(value, dict):
+        return "{{{}}}".format(
+            ",".join(
+                sorted(
+                    "{}:{}".format(_canonical(k, seen), _canonical(v, seen))
+                    for k, v in value.items()
+                )
+            )
+        )
+    elif id(value) in seen:
+        return "@{}".format(seen[id(value)])
+    else:
+        seen[id(value)] = len(seen)
+        if hasattr(value, "__slots__"):
+            fields = [(name, getattr(value, name)) for name in value.__slots__]
+        else:
+            fields = vars(value).items()
+
+        # Leave out the addresses, they are filled in by code generation:
+        fields = sorted(
+            (name, field)
+            for name, field in fields
+            if name not in _ADDRESS_FIELDS
+        )
+        return "{}({})".format(
+            type(value).__name__,
+            ",".join(
+                "{}={}".format(name, _canonical(field, seen))
+                for name, field in fields
+            ),
+        )
@@ -7,6 +7,7 @@ import logging
 import re
 import os
 import glob
+from .cache import get_state_table_store
 
 
 task_map = {}
@@ -211,14 +212,15 @@ class TaskRunner:
 
         self.logger.info('Target sequence: {}'.format(target_list))
 
-        # Run tasks:
-        for target in target_list:
-            self.logger.info('Target {} Started'.format(target.name))
-            for tname, props in target.tasks:
-                for arg in props:
-                    props[arg] = project.expand_macros(props[arg])
-                task = self.get_task(tname)(target, props)
-                self.logger.info('Running {}'.format(task))
-                task.run()
-            self.logger.info('Target {} Ready'.format(target.name))
+        # Run tasks, and store the instruction selector tables once:
+        with get_state_table_store():
+            for target in target_list:
+                self.logger.info('Target {} Started'.format(target.name))
+                for tname, props in target.tasks:
+                    for arg in props:
+                        props[arg] = project.expand_macros(props[arg])
+                    task = self.get_task(tname)(target, props)
+                    self.logger.info('Running {}'.format(task))
+                    task.run()
+                self.logger.info('Target {} Ready'.format(target.name))
         self.logger.info('All targets done!')
@@ -17,17 +17,21 @@ parser = argparse.ArgumentParser(
 )
 subparsers = parser.add_subparsers(dest="command", required=True)
 create_parser = subparsers.add_parser("create", help="create new archive")
+create_parser.add_argument("archive", help="Archive filename.")
 create_parser.add_argument(
-    "archive", type=argparse.FileType("w"), help="Archive filename."
+    "obj", type=argparse.FileType("rb"), nargs="*", help="the object to link"
 )
 create_parser.add_argument(
-    "obj", type=argparse.FileType("r"), nargs="*", help="the object to link"
+    "--binary",
+    help="store the archive in the compact binary format",
+    action="store_true",
+    default=False,
 )
 display_parser = subparsers.add_parser(
     "display", help="display contents of an archive."
 )
 display_parser.add_argument(
-    "archive", type=argparse.FileType("r"), help="Archive filename."
+    "archive", type=argparse.FileType("rb"), help="Archive filename."
 )
 
 
@@ -38,7 +42,12 @@ def archive(args=None):
         if args.command == "create":
             objects = [get_object(obj) for obj in args.obj]
             lib = api.archive(objects)
-            lib.save(args.archive)
+            if args.binary:
+                with open(args.archive, "wb") as f:
+                    lib.save(f, fmt="binary")
+            else:
+                with open(args.archive, "w") as f:
+                    lib.save(f)
         elif args.command == "display":
             lib = get_archive(args.archive)
             for obj in lib:
@@ -6,6 +6,7 @@ import argparse
 import logging
 from .. import api, irutils
 from ..binutils.outstream import TextOutputStream
+from ..build.cache import get_default_cache, get_state_table_store
 from .base import out_parser
 from ..wasm import ir_to_wasm
 from ..irutils.instrument import add_tracer
@@ -39,6 +40,38 @@ compile_parser.add_argument(
 compile_parser.add_argument(
     "-O", help="optimize code", default="0", choices=api.OPT_LEVELS
 )
+compile_parser.add_argument(
+    "-j",
+    "--jobs",
+    help="number of processes to use for code generation",
+    type=int,
+    default=1,
+)
+compile_parser.add_argument(
+    "--register-allocator",
+    help="register allocator to use. Linear scan is faster, graph coloring "
+    "generates better code",
+    choices=["graph_coloring", "linear_scan"],
+    default="graph_coloring",
+)
+compile_parser.add_argument(
+    "--schedule",
+    help="reorder instructions to avoid pipeline stalls",
+    action="store_true",
+    default=False,
+)
+compile_parser.add_argument(
+    "--binary",
+    help="store the object file in the compact binary format",
+    action="store_true",
+    default=False,
+)
+compile_parser.add_argument(
+    "--cache",
+    help="directory in which compiled objects are cached "
+    "(default: the PPCI_CACHE_DIR environment variable)",
+    metavar="directory",
+)
 compile_parser.add_argument(
     "--instrument-functions",
     help="Instrument given functions",
@@ -61,31 +94,54 @@ def do_compile(ir_modules, march, reporter, args):
 
     # TODO: what to do with the -c option? Add it here?
 
-    # Generate output of choice:
-    if args.ir:  # Stop after ir code generation
-        with open(args.output, "w") as output:
-            for ir_module in ir_modules:
-                irutils.Writer(file=output).write(ir_module)
-    elif args.S:  # Output assembly code
-        with open(args.output, "w") as output:
-            stream = TextOutputStream(printer=march.asm_printer, f=output)
-            for ir_module in ir_modules:
-                api.ir_to_stream(ir_module, march, stream, reporter=reporter)
-    elif args.wasm:  # Output web-assembly code
-        assert len(ir_modules) == 1
-        ir_module = ir_modules[0]
-        wasm_module = ir_to_wasm(ir_module)
-        with open(args.output, "wb") as output:
-            wasm_module.to_file(output)
-    elif args.pycode:  # Output python code
-        with open(args.output, "w") as output:
-            api.ir_to_python(ir_modules, output, reporter=reporter)
-    else:  # Full object output
-        obj = api.ir_to_object(
-            ir_modules, march, reporter=reporter, debug=args.g
-        )
-        with open(args.output, "w") as output:
-            obj.save(output)
+    # Generate output of choice, and keep the instruction selector tables
+    # for later runs:
+    with get_state_table_store(args.cache):
+        if args.ir:  # Stop after ir code generation
+            with open(args.output, "w") as output:
+                for ir_module in ir_modules:
+                    irutils.Writer(file=output).write(ir_module)
+        elif args.S:  # Output assembly code
+            with open(args.output, "w") as output:
+                stream = TextOutputStream(
+                    printer=march.asm_printer, f=output
+                )
+                for ir_module in ir_modules:
+                    api.ir_to_stream(
+                        ir_module,
+                        march,
+                        stream,
+                        reporter=reporter,
+                        jobs=args.jobs,
+                        register_allocator=args.register_allocator,
+                        schedule=args.schedule,
+                    )
+        elif args.wasm:  # Output web-assembly code
+            assert len(ir_modules) == 1
+            ir_module = ir_modules[0]
+            wasm_module = ir_to_wasm(ir_module)
+            with open(args.output, "wb") as output:
+                wasm_module.to_file(output)
+        elif args.pycode:  # Output python code
+            with open(args.output, "w") as output:
+                api.ir_to_python(ir_modules, output, reporter=reporter)
+        else:  # Full object output
+            obj = api.ir_to_object(
+                ir_modules,
+                march,
+                reporter=reporter,
+                debug=args.g,
+                jobs=args.jobs,
+                cache=args.cache or get_default_cache(),
+                register_allocator=args.register_allocator,
+                schedule=args.schedule,
+            )
+            if args.binary:
+                with open(args.output, "wb") as output:
+                    obj.save(output, fmt="binary")
+            else:
+                with open(args.output, "w") as output:
+                    obj.save(output)
 
-        # TODO: link objects together?
-        logging.warning("TODO: Linking with stdlibs")
+            # TODO: link objects together?
+            logging.warning("TODO: Linking with stdlibs")
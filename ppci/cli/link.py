@@ -44,6 +44,12 @@ parser.add_argument(
     action="store_true",
     default=False,
 )
+parser.add_argument(
+    "--binary",
+    help="store relocatable output in the compact binary object format",
+    action="store_true",
+    default=False,
+)
 parser.add_argument(
     "--entry",
     "-e",
@@ -66,8 +72,12 @@ def link(args=None):
             libraries=args.library,
         )
         if relocatable:
-            with open(args.output, "w") as output:
-                obj.save(output)
+            if args.binary:
+                with open(args.output, "wb") as output:
+                    obj.save(output, fmt="binary")
+            else:
+                with open(args.output, "w") as output:
+                    obj.save(output)
         else:
             create_platform_executable(obj, args.output)
 
@@ -0,0 +1,318 @@
+""" Bottom up rewrite system state tables.
+
+The tree selector labels each node of a tree with the cheapest rule, and
+its cost, for each non terminal the node can be reduced to. Doing this
+with dynamic programming means that all rules for the node are checked
+against the tree, for every node of every tree.
+
+Only the differences between the costs of a label are important for the
+selection. When all costs of a label are reduced by the lowest cost, the
+label of a node only depends on the name of the node and on the labels
+of its children. Labels, also called states, can then be numbered, and
+labelling a node becomes a lookup in a table indexed by the name of the
+node and the states of its children.
+
+Patterns which span more than one level of the tree, such as
+``ADDI32(MULI32(reg, reg), reg)``, are split into fragments. A fragment
+is an inner terminal subtree of a pattern, like ``MULI32(reg, reg)``.
+The state of a node records which fragments the node matches, and at
+which cost.
+
+Rules with an acceptance condition do not only depend on the shape of
+the tree, but also on the values in the tree. These conditions are
+still evaluated during labelling, and their outcome is part of the key
+into the table.
+
+The tables are filled when a state transition is first needed. They can
+be converted to and from json, so that subsequent runs can reuse them.
+The build layer does this with the hooks which are called for new
+tables, see :class:`ppci.build.cache.StateTableStore`.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from .treematcher import State
+
+logger = logging.getLogger("burs")
+
+# Tables shared by all selectors in this process, by key of the system:
+_tables = {}
+
+#: Functions which are called with each newly created table, for example
+#: to fill it with the states of an earlier run.
+table_hooks = []
+
+
+def get_tables(system):
+    """Get the state tables for a burg system.
+
+    The tables are created on first use, and shared by all selectors for
+    the same system.
+    """
+    key = make_key(system)
+    if key not in _tables:
+        tables = BursTables(system, key)
+        for hook in table_hooks:
+            hook(tables)
+        _tables[key] = tables
+    return _tables[key]
+
+
+def get_all_tables():
+    """ Get all state tables created in this process """
+    return list(_tables.values())
+
+
+def make_key(system):
+    """ Create a key from all parts of a system that affect the tables """
+    description = [
+        BursTables.version,
+        sorted(system.non_terminals),
+        [
+            (rule.non_term, str(rule.tree), rule.cost, bool(rule.acceptance))
+            for rule in system.rules
+        ],
+    ]
+    data = json.dumps(description).encode("utf8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class BursTables:
+    """State transition tables for a burg system.
+
+    States are numbered. For each state, the labels, including those of
+    fragments, and the matched fragments are stored.
+    """
+
+    version = 1
+
+    def __init__(self, system, key):
+        self.key = key
+        self.dirty = False
+
+        # Per root name, the rules and fragments with their kid symbols:
+        self.rules = defaultdict(list)
+        self.fragments = defaultdict(list)
+        self._fragment_symbols = {}
+        self.costs = {}
+        self.non_terms = {}
+        self.chain_rules = defaultdict(list)
+        self.acceptance = set()
+        for rule in system.rules:
+            self.costs[rule.nr] = rule.cost
+            self.non_terms[rule.nr] = rule.non_term
+            if rule.acceptance:
+                self.acceptance.add(rule.nr)
+            if rule.tree.name in system.non_terminals:
+                self.chain_rules[rule.tree.name].append(rule.nr)
+            else:
+                kids = self._kid_symbols(rule.tree, system)
+                self.rules[rule.tree.name].append((rule.nr, kids))
+
+        self.labels = []
+        self.shapes = []
+        self.states = []
+        self.state_numbers = {}
+        self.transitions = {}
+
+    def _kid_symbols(self, tree, system):
+        """ Get symbols for the children of a pattern tree """
+        return tuple(self._symbol(kid, system) for kid in tree.children)
+
+    def _symbol(self, tree, system):
+        """Get the symbol matched by a part of a pattern.
+
+        This is either a non terminal, or a fragment.
+        """
+        if tree.name in system.non_terminals:
+            return tree.name
+        kids = self._kid_symbols(tree, system)
+        key = (tree.name, kids)
+        if key not in self._fragment_symbols:
+            symbol = "#{}".format(len(self._fragment_symbols))
+            self._fragment_symbols[key] = symbol
+            self.fragments[tree.name].append((symbol, kids))
+        return self._fragment_symbols[key]
+
+    def label(self, tree, rules):
+        """Label a tree and its children with states.
+
+        Returns the number of the state of the tree. Rules must be the
+        rules of the burg system, since the acceptance conditions are
+        evaluated during labelling.
+        """
+        key = (tree.name,) + tuple(
+            self.label(child_tree, rules) for child_tree in tree.children
+        )
+        try:
+            entry = self.transitions[key]
+        except KeyError:
+            entry = self._add_transition(key)
+
+        if isinstance(entry, int):
+            number = entry
+        else:
+            checks, numbers = entry
+            accepted = tuple(
+                nr for nr in checks if rules[nr - 1].acceptance(tree)
+            )
+            try:
+                number = numbers[accepted]
+            except KeyError:
+                number = self._add_state(key, accepted)
+                numbers[accepted] = number
+                self.dirty = True
+        tree.state = self.states[number]
+        return number
+
+    def _add_transition(self, key):
+        """ Create the table entry for a node with given children """
+        name, kid_states = key[0], key[1:]
+        checks = tuple(
+            nr
+            for nr, kids in self.rules[name]
+            if nr in self.acceptance
+            and self._cost(kids, kid_states) is not None
+        )
+        if checks:
+            entry = (checks, {})
+        else:
+            entry = self._add_state(key, ())
+        self.transitions[key] = entry
+        self.dirty = True
+        return entry
+
+    def _matches(self, kids, kid_states):
+        """ Check if the terminals of a pattern match the children """
+        return all(
+            symbol[0] != "#" or symbol in self.shapes[kid_state]
+            for symbol, kid_state in zip(kids, kid_states)
+        )
+
+    def _cost(self, kids, kid_states):
+        """Determine the cost of the children of a pattern.
+
+        Returns None when the pattern does not match.
+        """
+        if not self._matches(kids, kid_states):
+            return
+        cost = 0
+        for symbol, kid_state in zip(kids, kid_states):
+            labels = self.labels[kid_state]
+            if symbol not in labels:
+                return
+            cost += labels[symbol][0]
+        return cost
+
+    def _add_state(self, key, accepted):
+        """Determine the state of a node given the states of its children.
+
+        Accepted is the tuple of rules with acceptance conditions which
+        accepted the node.
+        """
+        name, kid_states = key[0], key[1:]
+        labels = {}
+        shapes = set()
+        for symbol, kids in self.fragments[name]:
+            if self._matches(kids, kid_states):
+                shapes.add(symbol)
+                cost = self._cost(kids, kid_states)
+                if cost is not None:
+                    labels[symbol] = (cost, 0)
+
+        for nr, kids in self.rules[name]:
+            if nr in self.acceptance and nr not in accepted:
+                continue
+            cost = self._cost(kids, kid_states)
+            if cost is not None:
+                self._mark(labels, nr, cost, set())
+
+        # Normalize costs:
+        if labels:
+            lowest = min(cost for cost, _ in labels.values())
+            labels = {
+                symbol: (cost - lowest, nr)
+                for symbol, (cost, nr) in labels.items()
+            }
+        return self._state_number(labels, shapes)
+
+    def _mark(self, labels, nr, cost, marked_rules):
+        """ Record a rule in the labels, and apply chain rules """
+        cost = cost + self.costs[nr]
+        non_term = self.non_terms[nr]
+        if non_term not in labels or labels[non_term][0] > cost:
+            labels[non_term] = (cost, nr)
+        marked_rules.add(nr)
+
+        # Also set cost for chain rules here:
+        for chain_rule in self.chain_rules[non_term]:
+            if chain_rule not in marked_rules:
+                self._mark(labels, chain_rule, cost, marked_rules)
+
+    def _state_number(self, labels, shapes):
+        """ Get the number of a state, creating it when needed """
+        key = (tuple(sorted(labels.items())), tuple(sorted(shapes)))
+        if key not in self.state_numbers:
+            state = State()
+            state.labels = {
+                symbol: label
+                for symbol, label in labels.items()
+                if symbol[0] != "#"
+            }
+            self.state_numbers[key] = len(self.states)
+            self.labels.append(labels)
+            self.shapes.append(frozenset(shapes))
+            self.states.append(state)
+            self.dirty = True
+        return self.state_numbers[key]
+
+    def from_json(self, data):
+        """Add the states and transitions stored with to_json.
+
+        Raises ValueError, KeyError or TypeError when the data is invalid.
+        """
+        if self.states:
+            raise ValueError("Tables are already in use")
+
+        # Convert all data before changing the tables:
+        states = [
+            ({symbol: (cost, nr) for symbol, cost, nr in labels}, shapes)
+            for labels, shapes in data["states"]
+        ]
+        transitions = {}
+        for key, entry in data["transitions"]:
+            if isinstance(entry, int):
+                transitions[tuple(key)] = entry
+            else:
+                checks, numbers = entry
+                numbers = {
+                    tuple(accepted): number for accepted, number in numbers
+                }
+                transitions[tuple(key)] = (tuple(checks), numbers)
+
+        for labels, shapes in states:
+            self._state_number(labels, shapes)
+        self.transitions.update(transitions)
+        self.dirty = False
+
+    def to_json(self):
+        """ Get the states and transitions as json compatible data """
+        states = [
+            (
+                [
+                    (symbol, cost, nr)
+                    for symbol, (cost, nr) in sorted(labels.items())
+                ],
+                sorted(shapes),
+            )
+            for labels, shapes in zip(self.labels, self.shapes)
+        ]
+        transitions = []
+        for key, entry in self.transitions.items():
+            if not isinstance(entry, int):
+                checks, numbers = entry
+                entry = (checks, list(numbers.items()))
+            transitions.append((key, entry))
+        return {"states": states, "transitions": transitions}
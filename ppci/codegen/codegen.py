@@ -6,6 +6,7 @@ The architecture is provided when the generator is created.
 import logging
 from .. import ir
 from ..irutils import Verifier, split_block
+from ..irutils.builder import lower_jump_table
 from ..arch.arch import Architecture
 from ..arch.generic_instructions import Label, Comment, Global, DebugData
 from ..arch.generic_instructions import RegisterUseDef, VirtualInstruction
@@ -21,18 +22,52 @@ from .irdag import SelectionGraphBuilder
 from .instructionselector import InstructionSelector1
 from .instructionscheduler import InstructionScheduler
 from .registerallocator import GraphColoringRegisterAllocator
+from .registerallocator import LinearScanRegisterAllocator
 from .peephole import PeepHoleStream
+from .parallel import generate_functions
 
 
 class CodeGenerator:
-    """ Machine code generator """
+    """Machine code generator
+
+    Args:
+        arch: the architecture to generate code for.
+        reporter: the reporter to log the code generation in.
+        optimize_for: what to optimize the instruction selection for,
+            for example 'size' or 'speed'.
+        register_allocator: the register allocator to use, one of
+            'graph_coloring' (the default) or 'linear_scan'. The linear
+            scan allocator is much faster, but generates less efficient
+            code.
+        schedule: reorder the selected instructions to avoid pipeline
+            stalls. This requires a pipeline description of the target.
+    """
 
     logger = logging.getLogger("codegen")
 
-    def __init__(self, arch, reporter, optimize_for="size"):
+    register_allocators = {
+        "graph_coloring": GraphColoringRegisterAllocator,
+        "linear_scan": LinearScanRegisterAllocator,
+    }
+
+    def __init__(
+        self,
+        arch,
+        reporter,
+        optimize_for="size",
+        register_allocator="graph_coloring",
+        schedule=False,
+    ):
         assert isinstance(arch, Architecture), arch
+        if register_allocator not in self.register_allocators:
+            raise ValueError(
+                "Invalid register allocator {}".format(register_allocator)
+            )
         self.arch = arch
         self.reporter = reporter
+        self.optimize_for = optimize_for
+        self.register_allocator_name = register_allocator
+        self.schedule = schedule
         self.verifier = Verifier()
         self.sgraph_builder = SelectionGraphBuilder(arch)
         weights_map = {
@@ -45,13 +80,27 @@ class CodeGenerator:
         self.instruction_selector = InstructionSelector1(
             arch, self.sgraph_builder, reporter, weights=selection_weights
         )
-        self.instruction_scheduler = InstructionScheduler()
-        self.register_allocator = GraphColoringRegisterAllocator(
-            arch, self.instruction_selector, reporter
+        self.instruction_scheduler = InstructionScheduler(arch)
+        self.jump_tables = any(
+            pattern.tree.name == "JMPTABLE" for pattern in arch.isa.patterns
         )
+        self.register_allocator = self.register_allocators[
+            register_allocator
+        ](arch, self.instruction_selector, reporter)
 
-    def generate(self, ircode: ir.Module, output_stream, debug=False):
-        """ Generate machine code from ir-code into output stream """
+    def generate(
+        self, ircode: ir.Module, output_stream, debug=False, jobs=1
+    ):
+        """Generate machine code from ir-code into output stream
+
+        Args:
+            ircode: the ir-module to generate code for.
+            output_stream: the stream to emit the instructions into.
+            debug: emit debug information.
+            jobs: the number of processes to use for generating the
+                functions. When larger than one, functions are generated
+                in parallel. The output is identical to a serial run.
+        """
         assert isinstance(ircode, ir.Module)
         if ircode.debug_db:
             self.debug_db = ircode.debug_db
@@ -78,8 +127,13 @@ class CodeGenerator:
         # Munch program into a bunch of frames. One frame per function.
         # Each frame has a flat list of abstract instructions.
         output_stream.select_section("code")
-        for function in ircode.functions:
-            self.generate_function(function, output_stream, debug=debug)
+        if jobs > 1 and not debug and len(ircode.functions) > 1:
+            # Debug information is tied to the ir-code objects, so only
+            # generate in parallel without debug information.
+            generate_functions(self, ircode, output_stream, jobs)
+        else:
+            for function in ircode.functions:
+                self.generate_function(function, output_stream, debug=debug)
 
         # Output debug type data:
         if debug:
@@ -142,6 +196,14 @@ class CodeGenerator:
         self.reporter.heading(3, "Log for {}".format(ir_function))
         self.reporter.dump_ir(ir_function)
 
+        # Expand jump tables which cannot be selected for this target:
+        for block in list(ir_function):
+            jump_table = block.last_instruction
+            if isinstance(
+                jump_table, ir.JumpTable
+            ) and not self.supports_jump_table(jump_table):
+                lower_jump_table(jump_table)
+
         # Split too large basic blocks in smaller chunks (for literal pools):
         # TODO: fix arbitrary number of 500. This works for arm and thumb..
         split_block_nr = 1
@@ -202,22 +264,30 @@ class CodeGenerator:
 
         self.reporter.dump_instructions(instruction_list, self.arch)
 
+    def supports_jump_table(self, jump_table):
+        """Test if the target can select the given jump table.
+
+        The index of the jump table must fit in a pointer.
+        """
+        info = self.arch.info
+        return self.jump_tables and info.get_size(
+            jump_table.v.ty
+        ) <= info.get_size(ir.ptr)
+
     def select_and_schedule(self, ir_function, frame):
         """ Perform instruction selection and scheduling """
         self.logger.debug("Selecting instructions")
 
-        tree_method = True
-        if tree_method:
-            self.instruction_selector.select(ir_function, frame)
-        else:  # pragma: no cover
-            raise NotImplementedError("TODO")
-            # Build a graph:
-            # self.sgraph_builder.build(ir_function, function_info)
-            # reporter.message('Selection graph')
-            # reporter.dump_sgraph(sgraph)
+        self.instruction_selector.select(ir_function, frame)
 
-            # Schedule instructions:
-            # self.instruction_scheduler.schedule(sgraph, frame)
+        # Schedule instructions:
+        if self.schedule:
+            cycles = self.instruction_scheduler.schedule(frame)
+            if cycles:
+                self.reporter.message(
+                    "Estimated cycles: {} before and {} after "
+                    "scheduling".format(*cycles)
+                )
 
     def emit_frame_to_stream(self, frame, output_stream, debug=False):
         """
@@ -278,7 +348,8 @@ class CodeGenerator:
             output_stream.emit(dd)
 
         # Check if we know what variables are live
-        for tmp in frame.ig.temp_map:
+        ig = getattr(frame, "ig", None)
+        for tmp in ig.temp_map if ig else ():
             if self.debug_db.contains(tmp):
                 self.debug_db.get(tmp)
                 # print(tmp, di)
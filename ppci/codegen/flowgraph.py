@@ -1,6 +1,6 @@
 import logging
-from collections import defaultdict
-from ..graph.digraph import DiGraph, DiNode, dfs
+from ..graph import dataflow
+from ..graph.digraph import DiGraph, DiNode
 
 
 class FlowGraphNode(DiNode):
@@ -52,7 +52,7 @@ class FlowGraph(DiGraph):
         super().__init__()
         self.logger = logging.getLogger("flowgraph")
         self._map = {}
-        self._live_ranges = defaultdict(list)
+        self._locations = {}
 
         # TODO: make this very tricky part of code better readable!!!
 
@@ -102,7 +102,6 @@ class FlowGraph(DiGraph):
             self.add_node(node)
         return self._map[ins]
 
-    # def live_range(
     def calculate_liveness(self):
         """ Calculate liveness in CFG: """
         ###
@@ -110,54 +109,163 @@ class FlowGraph(DiGraph):
         #  in[n] = use[n] UNION (out[n] - def[n])
         #  out[n] = for s in n.succ in union in[s]
         ###
+        # Number the registers, to represent sets of registers as
+        # bit sets:
+        registers = dataflow.Numbering()
+        gen = {}
+        kill = {}
+        local = {}
         for node in self:
-            node.live_in = set()
-            node.live_out = set()
-
-        # Sort flowgraph nodes by backward depth first search:
-        # TODO: cfg_nodes = [x[1] for x in dfs(self.nodes[0], reverse=True)]
-        cfg_nodes = list(self.nodes)
-
-        # Dataflow fixed point iteration over the nodes in the CFG:
-        n_iterations = 0
-        change = True
-        while change:
-            change = False
-            for node in cfg_nodes:
-                _in = node.live_in
-                _out = node.live_out
-                node.live_in = node.gen | (node.live_out - node.kill)
-                if node.successors:
-                    node.live_out = set.union(
-                        *(s.live_in for s in node.successors)
-                    )
-                else:
-                    node.live_out = set()
-
-                # Record for change:
-                change = (
-                    change or (_in != node.live_in) or (_out != node.live_out)
-                )
-            n_iterations += 1
+            node_gen = node_kill = 0
+            local[node] = []
+            for ins in node.instructions:
+                ins_gen = ins_kill = 0
+                for reg in ins.gen:
+                    ins_gen |= 1 << registers.add(reg)
+                for reg in ins.kill:
+                    ins_kill |= 1 << registers.add(reg)
+                node_gen |= ins_gen & ~node_kill
+                node_kill |= ins_kill
+                local[node].append((ins, ins_gen, ins_kill))
+            gen[node] = node_gen
+            kill[node] = node_kill
+
+        live_in, live_out = dataflow.solve(
+            list(self.nodes), gen, kill, backward=True
+        )
 
         # In one pass fix all instructions:
+        members = registers.members
         for node in self:
             assert len(node.instructions) > 0
-            ins2 = node.instructions[-1]
-            ins2.live_out = node.live_out  # Propagate into last instruction
-            ins2.live_in = ins2.gen | (ins2.live_out - ins2.kill)
-            if len(node.instructions) > 1:
-                for ins in reversed(node.instructions[:-1]):
-                    ins1 = ins
+            node.live_in = set(members(live_in[node]))
+            node.live_out = set(members(live_out[node]))
 
-                    ins1.live_out = ins2.live_in
-                    ins1.live_in = ins1.gen | (ins1.live_out - ins1.kill)
+            # Propagate into the instructions, from last to first:
+            live = live_out[node]
+            ins_live_out = node.live_out
+            for ins, ins_gen, ins_kill in reversed(local[node]):
+                ins.live_out = ins_live_out
+                live = ins_gen | (live & ~ins_kill)
+                ins.live_in = ins_live_out = set(members(live))
 
-                    for vreg in ins2.live_in & ins1.live_out:
-                        self._live_ranges[vreg].append((ins1, ins2))
+        self.logger.debug("Calculated liveness of %s nodes", len(self))
 
-                    ins2 = ins1
+    def live_ranges(self, vreg):
+        """Determine the live range of a register.
 
-        self.logger.debug(
-            "Iterations: %s,  nodes: %s", n_iterations, len(self)
-        )
+        The live range is a list of pairs of successive instructions
+        between which the register is live.
+        """
+        ranges = []
+        for node in self:
+            for ins1, ins2 in zip(node.instructions, node.instructions[1:]):
+                if vreg in ins1.live_out and vreg in ins2.live_in:
+                    ranges.append((ins1, ins2))
+        return ranges
+
+    # Incremental updates:
+    # After a register allocator has inserted spill code, the liveness
+    # information can be updated locally, instead of recalculating the
+    # liveness of the whole function. Only the liveness of the
+    # instructions is updated, not the liveness of the flowgraph nodes.
+
+    def locate(self, ins):
+        """ Get the node containing the instruction and its index """
+        if not self._locations:
+            for node in self:
+                self._number(node, 0)
+        return self._locations[ins]
+
+    def _number(self, node, start):
+        """ Record the locations of the instructions of a node """
+        instructions = node.instructions
+        for index in range(start, len(instructions)):
+            self._locations[instructions[index]] = (node, index)
+
+    def insert_before(self, ins, code):
+        """ Insert a code sequence before an instruction.
+
+        The inserted instructions pass the registers live at the
+        instruction.
+        """
+        node, index = self.locate(ins)
+        self._splice(node, index, code, ins.live_in)
+
+    def insert_after(self, ins, code):
+        """ Insert a code sequence after an instruction. """
+        node, index = self.locate(ins)
+        self._splice(node, index + 1, code, ins.live_out)
+
+    def _splice(self, node, index, code, live_out):
+        for ins in reversed(code):
+            ins.gen = set(ins.used_registers)
+            ins.kill = set(ins.defined_registers)
+            ins.live_out = live_out
+            ins.live_in = live_out - ins.kill
+            live_out = ins.live_in
+        node.instructions[index:index] = code
+        if index > 0:
+            node.instructions[index - 1].live_out = live_out
+
+        # Only the instructions after the insertion point moved:
+        self._number(node, index)
+
+    def update_instruction(self, ins):
+        """ Update gen and kill sets after registers were replaced """
+        ins.gen = set(ins.used_registers)
+        ins.kill = set(ins.defined_registers)
+
+    def add_liveness(self, register, instructions):
+        """Make a register live at the instructions which use it.
+
+        The register is propagated backwards until its definitions.
+        Return the instructions after which the register was made live.
+        """
+        changed = []
+        worklist = []
+        for ins in instructions:
+            if register not in ins.live_in:
+                ins.live_in.add(register)
+                worklist.append(self.locate(ins))
+
+        while worklist:
+            node, index = worklist.pop()
+            for pred_node, pred_index in self._predecessors(node, index):
+                pred = pred_node.instructions[pred_index]
+                pred.live_out.add(register)
+                changed.append(pred)
+                if register not in pred.kill and register not in pred.live_in:
+                    pred.live_in.add(register)
+                    worklist.append((pred_node, pred_index))
+        return changed
+
+    def remove_liveness(self, register, instructions):
+        """Remove a register from the live sets.
+
+        The given instructions are the instructions using the register.
+        Only the live range of the register is visited.
+        """
+        worklist = []
+        for ins in instructions:
+            ins.live_in.discard(register)
+            worklist.append(self.locate(ins))
+
+        while worklist:
+            node, index = worklist.pop()
+            for pred_node, pred_index in self._predecessors(node, index):
+                pred = pred_node.instructions[pred_index]
+                pred.live_out.discard(register)
+                if register in pred.live_in:
+                    pred.live_in.discard(register)
+                    worklist.append((pred_node, pred_index))
+
+    def _predecessors(self, node, index):
+        """ Get the locations of the instructions preceding a location """
+        if index > 0:
+            return [(node, index - 1)]
+        else:
+            return [
+                (pred, len(pred.instructions) - 1)
+                for pred in node.predecessors
+            ]
@@ -1,11 +1,198 @@
 """
     This algorithm takes the selected instructions and schedules them in
     a linear form.
+
+    The scheduler is a list scheduler. Instructions which can be moved,
+    according to the pipeline description of the target (see
+    :class:`ppci.arch.arch_info.PipelineInfo`), are grouped into regions.
+    Other instructions, such as labels, jumps and calls, are never moved,
+    and no instruction is moved across them.
+
+    Within a region, a dependency graph is created. An instruction depends
+    on the instructions which define the registers it uses, and on the
+    instructions which use or define a register it redefines. Memory
+    accesses stay in order, except that loads can pass other loads.
+
+    Then, instructions are issued cycle by cycle. Of the instructions
+    whose operands are available, the one with the longest path to the
+    end of the region is issued first.
 """
 
+import logging
+from collections import defaultdict
+from ..arch.generic_instructions import VirtualInstruction, PseudoInstruction
+
 
 class InstructionScheduler:
-    def schedule(self, graph, frame):
-        # TODO: schedule traces in better order.
-        # This is optional!
-        pass
+    """ List scheduler for the instructions of a frame """
+
+    logger = logging.getLogger("scheduler")
+    non_instructions = (VirtualInstruction, PseudoInstruction)
+
+    def __init__(self, arch):
+        self.pipeline = arch.pipeline
+
+    def schedule(self, frame):
+        """Reorder the instructions of a frame.
+
+        Returns a tuple with the estimated amount of cycles before and
+        after scheduling, or None when the target has no pipeline
+        description.
+        """
+        if self.pipeline is None:
+            return
+
+        before = self.estimate_cycles(frame.instructions)
+        instructions = []
+        region = []
+        for instruction in frame.instructions:
+            if self.pipeline.can_move(instruction):
+                region.append(instruction)
+            else:
+                instructions.extend(self.schedule_region(region))
+                region = []
+                instructions.append(instruction)
+        instructions.extend(self.schedule_region(region))
+        frame.instructions[:] = instructions
+
+        after = self.estimate_cycles(frame.instructions)
+        self.logger.debug(
+            "Estimated cycles of %s: %s before and %s after scheduling",
+            frame.name,
+            before,
+            after,
+        )
+        return before, after
+
+    def schedule_region(self, region):
+        """ Determine the best order of a region of instructions """
+        if len(region) < 2:
+            return region
+
+        successors, predecessor_counts = self.dependencies(region)
+        latencies = [self.pipeline.latency(i) for i in region]
+
+        # Priority is the longest path to the end of the region:
+        heights = list(latencies)
+        for index in reversed(range(len(region))):
+            for successor, latency in successors[index]:
+                heights[index] = max(
+                    heights[index], latency + heights[successor]
+                )
+
+        order = []
+        earliest = [0] * len(region)
+        available = [
+            index
+            for index, count in enumerate(predecessor_counts)
+            if not count
+        ]
+        cycle = 0
+        slots = self.pipeline.issue_width
+        while available:
+            candidates = [i for i in available if earliest[i] <= cycle]
+            if not candidates:
+                # Stall until an instruction is ready:
+                cycle = min(earliest[i] for i in available)
+                slots = self.pipeline.issue_width
+                continue
+            elif not slots:
+                cycle += 1
+                slots = self.pipeline.issue_width
+                continue
+
+            index = max(candidates, key=lambda i: (heights[i], -i))
+            available.remove(index)
+            order.append(region[index])
+            slots -= 1
+            for successor, latency in successors[index]:
+                earliest[successor] = max(
+                    earliest[successor], cycle + latency
+                )
+                predecessor_counts[successor] -= 1
+                if not predecessor_counts[successor]:
+                    available.append(successor)
+
+        assert len(order) == len(region)
+        return order
+
+    def dependencies(self, region):
+        """Create the dependency graph of a region.
+
+        Returns the successors, with the latency of the dependency, and
+        the number of predecessors of each instruction.
+        """
+        successors = [[] for _ in region]
+        predecessor_counts = [0] * len(region)
+
+        def depend(first, second, latency):
+            successors[first].append((second, latency))
+            predecessor_counts[second] += 1
+
+        definitions = {}
+        uses = defaultdict(list)
+        last_store = None
+        loads = []
+        for index, instruction in enumerate(region):
+            for register in instruction.used_registers:
+                if register in definitions:
+                    definition = definitions[register]
+                    depend(
+                        definition,
+                        index,
+                        self.pipeline.latency(region[definition]),
+                    )
+                uses[register].append(index)
+
+            for register in instruction.defined_registers:
+                for use in uses.pop(register, ()):
+                    if use != index:
+                        depend(use, index, 0)
+                if register in definitions:
+                    depend(definitions[register], index, 1)
+                definitions[register] = index
+
+            if self.pipeline.is_load(instruction):
+                if last_store is not None:
+                    depend(last_store, index, 1)
+                loads.append(index)
+            elif self.pipeline.is_store(instruction):
+                if last_store is not None:
+                    depend(last_store, index, 1)
+                for load in loads:
+                    depend(load, index, 0)
+                loads = []
+                last_store = index
+        return successors, predecessor_counts
+
+    def estimate_cycles(self, instructions):
+        """Estimate the amount of cycles a sequence of instructions takes.
+
+        The instructions are issued in order, and an instruction waits
+        until its operands are available. Branches are not taken into
+        account, so each instruction is counted once.
+        """
+        if self.pipeline is None:
+            return
+
+        ready = {}
+        cycle = -1
+        slots = 0
+        for instruction in instructions:
+            if isinstance(instruction, self.non_instructions):
+                continue
+            start = max(
+                [cycle]
+                + [ready.get(r, 0) for r in instruction.used_registers]
+            )
+            if start > cycle:
+                cycle = start
+                slots = self.pipeline.issue_width
+            elif not slots:
+                cycle += 1
+                slots = self.pipeline.issue_width
+            slots -= 1
+            latency = self.pipeline.latency(instruction)
+            for register in instruction.defined_registers:
+                ready[register] = cycle + latency
+        return cycle + 1
@@ -43,6 +43,8 @@ operations are listed in the below table:
 +---------------+---------+-----------------------------------------+
 | CJMP          | I,U     | Conditional jump to a label             |
 +---------------+---------+-----------------------------------------+
+| JMPTABLE(c0)  |         | Jump to the label at index c0 in a table|
++---------------+---------+-----------------------------------------+
 
 ...
 
@@ -57,10 +59,10 @@ Memory move operations:
 import abc
 import logging
 from ..utils.tree import Tree
-from .treematcher import State
 from .. import ir
 from ..arch.encoding import Instruction
 from .burg import BurgSystem
+from . import burs
 from .irdag import FunctionInfo, prepare_function_info
 from .dagsplit import DagSplitter
 from ..arch.generic_instructions import RegisterUseDef, InlineAssembly
@@ -109,6 +111,7 @@ terminals = tuple(x + y for x in ops for y in data_types) + (
     "LABEL",
     "MOVB",  # Attempts at blob data copies
     "JMP",
+    "JMPTABLE",  # Jump via a table of labels
     "EXIT",
     "ENTRY",
     "ALLOCA",
@@ -157,6 +160,7 @@ class TreeSelector:
 
     def __init__(self, sys):
         self.sys = sys
+        self.tables = burs.get_tables(sys)
 
     def gen(self, context, tree):
         """Generate code for a given tree. The tree will be tiled with
@@ -169,43 +173,12 @@ class TreeSelector:
         return self.apply_rules(context, tree, "stm")
 
     def burm_label(self, tree):
-        """ Label all nodes in the tree bottom up """
-        for child_tree in tree.children:
-            self.burm_label(child_tree)
-
-        # Now the child nodes have been labeled, assign a state to the tree:
-        tree.state = State()
-
-        # Check all rules for matching with this subtree and
-        # check if a state can be determined
-        for rule in self.sys.get_rules_for_root(tree.name):
-            if self.sys.tree_terminal_equal(tree, rule.tree):
-                nts = self.nts(rule.nr)
-                kids = self.kids(tree, rule.nr)
-
-                # Check for acceptance:
-                if rule.acceptance:
-                    accept = rule.acceptance(tree)
-                else:
-                    accept = True
-
-                if (
-                    all(x.state.has_goal(y) for x, y in zip(kids, nts))
-                    and accept
-                ):
-                    cost = sum(x.state.get_cost(y) for x, y in zip(kids, nts))
-                    marked_rules = set()
-                    self.mark_tree(tree, rule, cost, marked_rules)
-
-    def mark_tree(self, tree, rule, cost, marked_rules):
-        cost = cost + rule.cost
-        tree.state.set_cost(rule.non_term, cost, rule.nr)
-        marked_rules.add(rule)
-
-        # Also set cost for chain rules here:
-        for cr in self.sys.chain_rules_for_nt(rule.non_term):
-            if cr not in marked_rules:
-                self.mark_tree(tree, cr, cost, marked_rules)
+        """Label all nodes in the tree bottom up.
+
+        The labels are looked up in precomputed state tables, see
+        :mod:`ppci.codegen.burs`.
+        """
+        self.tables.label(tree, self.sys.rules)
 
     def apply_rules(self, context, tree, goal):
         """ Apply all selected instructions to the tree """
@@ -1,15 +1,17 @@
 """
 
 .. autoclass:: ppci.codegen.interferencegraph.InterferenceGraph
-    :members: get_node, combine, interfere
+    :members: get_node, combine, interfere, copy, update_interference
 
 """
 
 import logging
 from collections import defaultdict
+from ..graph.dataflow import Numbering
 from ..graph.graph import Node
 from ..graph.maskable_graph import MaskableGraph
 from ..arch.registers import Register
+from ..utils.collections import OrderedSet
 
 
 class InterferenceGraphNode(Node):
@@ -17,8 +19,8 @@ class InterferenceGraphNode(Node):
 
     def __init__(self, graph, vreg):
         super().__init__(graph)
-        self.temps = {vreg}
-        self.moves = set()
+        self.temps = OrderedSet([vreg])
+        self.moves = OrderedSet()
         self.reg = vreg if vreg.is_colored else None
         self.reg_class = type(vreg)
 
@@ -42,6 +44,7 @@ class InterferenceGraph(MaskableGraph):
         self.temp_map = {}
         self._def_map = defaultdict(list)
         self._use_map = defaultdict(list)
+        self._registers = Numbering()
 
     def defs(self, tmp):
         return self._def_map[tmp]
@@ -51,26 +54,72 @@ class InterferenceGraph(MaskableGraph):
 
     def calculate_interference(self, flowgraph):
         """ Construct interference graph """
+        # Number the registers in order of first appearance, and
+        # represent the live sets as bit sets. Visiting the bits in
+        # order visits the registers in order of first appearance, so
+        # that the resulting graph (and thereby the register allocation)
+        # does not depend on set ordering.
+        registers = self._registers
         for n in flowgraph:
             for ins in n.instructions:
-                # ins.live_out |= ins.
-                for tmp in ins.live_in:
-                    self.get_node(tmp)
+                for reg in ins.defined_registers + ins.used_registers:
+                    registers.add(reg)
+
+        bits = registers.bits
+        members = registers.members
+        items = registers.items
+        neighbours = defaultdict(int)
+        created = 0
+        for n in flowgraph:
+            for ins in n.instructions:
+                new = bits(ins.live_in) & ~created
+                if new:
+                    for tmp in members(new):
+                        self._new_node(tmp)
+                    created |= new
 
                 # Live out and zero length defined variables:
-                live_and_def = ins.live_out | ins.kill
+                live_and_def = bits(ins.live_out) | bits(ins.kill)
+
+                if live_and_def:
+                    new = live_and_def & ~created
+                    if new:
+                        for tmp in members(new):
+                            self._new_node(tmp)
+                        created |= new
+
+                    clobbers = ins.clobbers
+                    clobbered = 0
+                    for tmp in clobbers:
+                        bit = 1 << registers.add(tmp)
+                        clobbered |= bit
+                        if not created & bit:
+                            self._new_node(tmp)
+                            created |= bit
 
-                # Add interfering edges:
-                for tmp in live_and_def:
-                    n1 = self.get_node(tmp)
-                    for tmp2 in live_and_def - {tmp}:
-                        n2 = self.get_node(tmp2)
-                        self.add_edge(n1, n2)
+                    # Add interfering edges:
+                    rest = live_and_def
+                    while rest:
+                        bit = rest & -rest
+                        rest ^= bit
+                        tmp = items[bit.bit_length() - 1]
+                        new = rest & ~neighbours[tmp]
+                        if new:
+                            for tmp2 in members(new):
+                                self._new_edge(tmp, tmp2)
+                                neighbours[tmp2] |= bit
+                            neighbours[tmp] |= new
 
-                    # Add clobbered interfering edges:
-                    for tmp2 in ins.clobbers:
-                        n2 = self.get_node(tmp2)
-                        self.add_edge(n1, n2)
+                        # Add clobbered interfering edges:
+                        new = clobbered & ~neighbours[tmp] & ~bit
+                        if new:
+                            for tmp2 in clobbers:
+                                bit2 = registers.bit(tmp2)
+                                if new & bit2:
+                                    new ^= bit2
+                                    self._new_edge(tmp, tmp2)
+                                    neighbours[tmp] |= bit2
+                                    neighbours[tmp2] |= bit
 
                 # Generate usage info:
                 for reg in ins.defined_registers:
@@ -78,6 +127,115 @@ class InterferenceGraph(MaskableGraph):
                 for reg in ins.used_registers:
                     self._use_map[reg].append(ins)
 
+    def copy(self):
+        """Create a copy of the graph.
+
+        Coloring the copy combines and masks its nodes, while this
+        graph is kept intact, so that it can be updated after spilling.
+        The usage information is shared with the copy.
+        """
+        graph = InterferenceGraph()
+        nodes = {}
+        for node in self.nodes:
+            (tmp,) = node.temps
+            nodes[node] = InterferenceGraphNode(graph, tmp)
+            graph.temp_map[tmp] = nodes[node]
+        for node in self.nodes:
+            graph.adj_map[nodes[node]] = OrderedSet(
+                nodes[neighbour] for neighbour in self.adj_map[node]
+            )
+        graph._def_map = self._def_map
+        graph._use_map = self._use_map
+        graph._registers = self._registers
+        return graph
+
+    def update_interference(self, removed, changes, code):
+        """Update the graph after spill code was inserted.
+
+        Instead of calculating the interference of all instructions
+        again, the nodes of the spilled registers are removed, and
+        nodes and edges are added where the liveness was extended.
+
+        Args:
+            removed: The spilled registers.
+            changes: Pairs of a register and the instructions after
+                which it was made live.
+            code: The spill code and the rewritten instructions.
+        """
+        rewritten = OrderedSet()
+        for tmp in removed:
+            self.del_node(self.temp_map.pop(tmp))
+            for ins in self._def_map.pop(tmp, []):
+                rewritten.add(ins)
+            for ins in self._use_map.pop(tmp, []):
+                rewritten.add(ins)
+
+        # Only the registers replacing the spilled registers are new
+        # in the rewritten instructions:
+        renamed = []
+        for ins in rewritten:
+            new = OrderedSet(
+                reg
+                for reg in ins.defined_registers + ins.used_registers
+                if reg not in self.temp_map
+            )
+            for reg in ins.defined_registers:
+                if reg in new:
+                    self._def_map[reg].append(ins)
+            for reg in ins.used_registers:
+                if reg in new:
+                    self._use_map[reg].append(ins)
+            for reg in new:
+                self.get_node(reg)
+            renamed.append((ins, new))
+
+        inserted = [ins for ins in code if ins not in rewritten]
+        for ins in inserted:
+            for reg in ins.defined_registers:
+                self._def_map[reg].append(ins)
+            for reg in ins.used_registers:
+                self._use_map[reg].append(ins)
+            for reg in ins.defined_registers + ins.used_registers:
+                self.get_node(reg)
+
+        # Add the interference, now that all registers have a node:
+        for ins, new in renamed:
+            self._interfere(ins, new)
+        for ins in inserted:
+            self._interfere(ins)
+        for reg, instructions in changes:
+            for ins in instructions:
+                self._interfere(ins, [reg])
+
+    def _interfere(self, ins, registers=None):
+        """Add edges from the given registers, or from all registers live
+        at an instruction, to the registers live at or clobbered by it.
+        """
+        live_and_def = self._registers.bits(ins.live_out | ins.kill)
+        if not live_and_def:
+            return
+
+        others = self._registers.members(live_and_def)
+        if registers is None:
+            registers = list(others)
+        else:
+            registers = [r for r in registers if r in others]
+        others.extend(ins.clobbers)
+        for tmp in registers:
+            node = self.get_node(tmp)
+            for tmp2 in others:
+                if tmp2 is not tmp:
+                    self.add_edge(node, self.get_node(tmp2))
+
+    def _new_node(self, tmp):
+        self.temp_map[tmp] = InterferenceGraphNode(self, tmp)
+
+    def _new_edge(self, tmp1, tmp2):
+        n1 = self.temp_map[tmp1]
+        n2 = self.temp_map[tmp2]
+        self.adj_map[n1].add(n2)
+        self.adj_map[n2].add(n1)
+
     def has_node(self, tmp):
         """ Check if there exists a node for this temp register """
         assert isinstance(tmp, Register)
@@ -94,6 +252,7 @@ class InterferenceGraph(MaskableGraph):
             node = InterferenceGraphNode(self, tmp)
             self.add_node(node)
             self.temp_map[tmp] = node
+            self._registers.add(tmp)
         return node
 
     def interfere(self, tmp1, tmp2):
@@ -108,7 +267,7 @@ class InterferenceGraph(MaskableGraph):
         """ Combine n and m into n and return n """
         # Copy associated moves and temporaries into n:
         n.temps |= m.temps
-        n.moves.update(m.moves)
+        n.moves |= m.moves
 
         # Update local temp map:
         for tmp in m.temps:
@@ -286,6 +286,24 @@ class SelectionGraphBuilder:
         self.chain(sgnode)
         self.debug_db.map(node, sgnode)
 
+    def do_jump_table(self, node):
+        """ Process jump table into dag """
+        index = self.get_value(node.v)
+        from_ty = node.v.ty
+        if from_ty is ir.ptr:
+            from_ty = self.ptr_ty
+        if from_ty.bits != self.ptr_ty.bits:
+            op = "{}TO".format(str(from_ty).upper())
+            index = self.new_node(op, self.ptr_ty, index).new_output("index")
+        sgnode = self.new_node("JMPTABLE", None, index)
+        label_map = self.function_info.label_map
+        sgnode.value = (
+            [label_map[block] for block in node.table],
+            label_map[node.lab_default],
+        )
+        self.chain(sgnode)
+        self.debug_db.map(node, sgnode)
+
     def do_exit(self, node):
         # Jump to epilog:
         sgnode = self.new_node("JMP", None)
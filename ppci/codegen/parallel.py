@@ -0,0 +1,136 @@
+""" Parallel code generation.
+
+Code generation for a function is independent of the other functions
+in a module. This module distributes the functions of a module over a
+pool of worker processes. Each worker selects instructions, allocates
+registers and applies peephole optimizations for a single function. The
+resulting instruction streams are merged back in the original function
+order, so the output is identical to a serial build.
+
+Instruction classes are often created on the fly by helper functions and
+cannot be pickled. Workers therefore encode machine instructions before
+sending them back, and only generic instructions such as labels and
+alignments are transferred as they are.
+"""
+
+import logging
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from .. import ir
+from ..arch import get_arch
+from ..arch import generic_instructions
+from ..arch.generic_instructions import EncodedInstruction
+from ..binutils.debuginfo import DebugDb
+from ..binutils.outstream import FunctionOutputStream
+
+logger = logging.getLogger("codegen")
+
+# State of a worker process, filled by the pool initializer:
+_worker = {}
+
+
+def _init_worker(
+    arch_id, optimize_for, register_allocator, schedule, module_data
+):
+    from ..utils.reporting import DummyReportGenerator
+    from .codegen import CodeGenerator
+
+    arch = get_arch(arch_id)
+    code_generator = CodeGenerator(
+        arch,
+        DummyReportGenerator(),
+        optimize_for=optimize_for,
+        register_allocator=register_allocator,
+        schedule=schedule,
+    )
+    code_generator.debug_db = DebugDb()
+    _worker["code_generator"] = code_generator
+    _worker["module"] = pickle.loads(module_data)
+
+
+def _generate_function(index):
+    """ Generate code for a single function in a worker process """
+    code_generator = _worker["code_generator"]
+    ir_function = _worker["module"].functions[index]
+    instructions = []
+    output_stream = FunctionOutputStream(instructions.append)
+    code_generator.generate_function(ir_function, output_stream)
+    return [transportable(instruction) for instruction in instructions]
+
+
+def transportable(instruction):
+    """ Turn an instruction into something which can be pickled.
+
+    Generic instructions are defined at module level and can be pickled
+    as is. Architecture specific instructions are encoded.
+    """
+    if type(instruction).__module__ == generic_instructions.__name__:
+        return instruction
+    else:
+        return EncodedInstruction(
+            str(instruction), instruction.encode(), instruction.relocations()
+        )
+
+
+def has_inline_assembly(ir_function):
+    """ Test if the given function contains inline assembly.
+
+    The assembler keeps state across functions (for example the literal
+    counter of the arm assembler), so these functions must be generated
+    in the main process.
+    """
+    return any(
+        isinstance(instruction, ir.InlineAsm)
+        for block in ir_function
+        for instruction in block
+    )
+
+
+def generate_functions(code_generator, ir_module, output_stream, jobs):
+    """ Generate code for all functions in the module using a process pool.
+
+    The instructions of each function are emitted into output_stream in
+    the order of the functions in the module.
+    """
+    logger.info(
+        "Generating code for %s functions using %s jobs",
+        len(ir_module.functions),
+        jobs,
+    )
+
+    # Debug info is not required in the workers, leave it out:
+    debug_db, ir_module.debug_db = ir_module.debug_db, None
+    try:
+        module_data = pickle.dumps(ir_module)
+    finally:
+        ir_module.debug_db = debug_db
+
+    initargs = (
+        code_generator.arch.make_id_str(),
+        code_generator.optimize_for,
+        code_generator.register_allocator_name,
+        code_generator.schedule,
+        module_data,
+    )
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=initargs
+    ) as executor:
+        futures = [
+            None
+            if has_inline_assembly(function)
+            else executor.submit(_generate_function, index)
+            for index, function in enumerate(ir_module.functions)
+        ]
+
+        for function, future in zip(ir_module.functions, futures):
+            if future is None:
+                code_generator.generate_function(function, output_stream)
+            else:
+                instructions = future.result()
+                output_stream.emit_all(instructions)
+                code_generator.reporter.heading(
+                    3, "Log for {}".format(function)
+                )
+                code_generator.reporter.dump_instructions(
+                    instructions, code_generator.arch
+                )
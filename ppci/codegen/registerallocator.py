@@ -81,6 +81,20 @@ effect on the colorability of the graph.
 
 **Spilling**
 
+When a node cannot be colored, its registers are placed on the stack. Each
+use of such a register is preceded by a load from the stack, and each
+definition is followed by a store to the stack. Then the program is
+colored again.
+
+Spilling only changes the program around the spilled registers, so the
+liveness is updated locally instead of recalculated for the whole frame.
+The spilled registers are removed from the live sets, and the loaded and
+stored registers are propagated backwards from their uses. Only the live
+ranges of these registers are visited. Likewise, the nodes of the spilled
+registers are removed from the interference graph, and edges are only added
+at the instructions where the live sets were extended. Since coloring
+changes the graph, a copy of the updated graph is colored in each round.
+
 **Iterated register coalescing**
 
 Iterated register coalescing (IRC) is a combination of graph coloring,
@@ -106,6 +120,21 @@ classes that possibly interfere.
 [Runeson2003]_
 [Smith2004]_
 
+**Linear scan**
+
+Graph coloring produces good code, but building the interference graph
+is expensive, and must be updated after each round of spilling. When
+compilation speed matters more than code quality, for example when
+compiling code just in time, linear scan register allocation can be used
+instead.
+
+Linear scan allocation approximates the live range of each virtual
+register by a single interval of instruction numbers. The intervals are
+visited in order of their start, and each interval is assigned a register
+which is not used by any of the intervals that are still active. When no
+register is available, the interval that ends last is spilled.
+
+[Poletto1999]_
 
 **Implementations**
 
@@ -113,7 +142,9 @@ The following class can be used to perform register allocation.
 
 """
 
+import bisect
 import logging
+from collections import defaultdict
 from functools import lru_cache
 from .flowgraph import FlowGraph
 from .interferencegraph import InterferenceGraph
@@ -190,9 +221,6 @@ class MiniGen:
         return offset_tree
 
 
-# TODO: implement linear scan allocator and other allocators!
-
-
 class GraphColoringRegisterAllocator:
     """Target independent register allocator.
 
@@ -203,11 +231,17 @@ class GraphColoringRegisterAllocator:
     logger = logging.getLogger("regalloc")
     verbose = False  # Set verbose to True to get more logging info
 
+    # Update the liveness and the interference graph locally after
+    # spilling, instead of recalculating them for the whole frame:
+    incremental = True
+
     def __init__(self, arch: Architecture, instruction_selector, reporter):
         assert isinstance(arch, Architecture), arch
         self.arch = arch
         self.spill_gen = MiniGen(arch, instruction_selector)
         self.reporter = reporter
+        self.cfg = None
+        self.interference = None
 
         # A map with register alias info:
         self.alias = arch.info.alias
@@ -224,6 +258,9 @@ class GraphColoringRegisterAllocator:
             self.K[kls] = len(regs)
             self.cls_regs[kls] = OrderedSet(regs)
 
+        # Statistics:
+        self.spill_count = 0
+
     def alloc_frame(self, frame: Frame):
         """Do iterated register allocation for a single frame.
 
@@ -234,6 +271,7 @@ class GraphColoringRegisterAllocator:
             frame: The frame to perform register allocation on.
         """
         spill_rounds = 0
+        self.cfg = None
 
         self.logger.debug("Starting iterative coloring")
         while True:
@@ -270,8 +308,10 @@ class GraphColoringRegisterAllocator:
                     )
 
                 # Rewrite program now.
+                self.spill_count += len(spilled_nodes)
                 for node in spilled_nodes:
                     self.rewrite_program(node)
+                self.update_frame()
 
                 if self.verbose:
                     self.reporter.message("Rewrote program with spilling")
@@ -303,14 +343,26 @@ class GraphColoringRegisterAllocator:
         """ Initialize data structures """
         self.frame = frame
 
-        cfg = FlowGraph(self.frame.instructions)
-        self.logger.debug(
-            "Constructed flowgraph with %s nodes", len(cfg.nodes)
-        )
+        if self.cfg is None:
+            cfg = FlowGraph(self.frame.instructions)
+            self.logger.debug(
+                "Constructed flowgraph with %s nodes", len(cfg.nodes)
+            )
 
-        cfg.calculate_liveness()
-        self.frame.ig = InterferenceGraph()
-        self.frame.ig.calculate_interference(cfg)
+            cfg.calculate_liveness()
+            ig = InterferenceGraph()
+            ig.calculate_interference(cfg)
+            if self.incremental:
+                # Color a copy, and keep the graph to update it later:
+                self.cfg = cfg
+                self.interference = ig
+                ig = ig.copy()
+        else:
+            # The liveness and the interference were updated after
+            # spilling:
+            ig = self.interference.copy()
+
+        self.frame.ig = ig
         self.logger.debug(
             "Constructed interferencegraph with %s nodes",
             len(self.frame.ig.nodes),
@@ -322,6 +374,12 @@ class GraphColoringRegisterAllocator:
 
         self.select_stack = []
 
+        # Instructions changed by spilling:
+        self.spill_code = OrderedSet()
+        self.spilled_temps = []
+        self.code_before = {}
+        self.code_after = {}
+
         # Move related sets:
         self.coalescedMoves = OrderedSet()
         self.constrainedMoves = OrderedSet()
@@ -709,9 +767,13 @@ class GraphColoringRegisterAllocator:
 
         # TODO: maybe break-up coalesced node before doing this?
         for tmp in node.temps:
+            self.spilled_temps.append(tmp)
             instructions = OrderedSet(
                 self.frame.ig.uses(tmp) + self.frame.ig.defs(tmp)
             )
+            if self.cfg is not None:
+                self.cfg.remove_liveness(tmp, self.frame.ig.uses(tmp))
+
             for instruction in instructions:
                 if self.verbose:
                     self.reporter.message(
@@ -725,6 +787,9 @@ class GraphColoringRegisterAllocator:
                         "Replace {} by {}".format(tmp, vreg2)
                     )
                 instruction.replace_register(tmp, vreg2)
+                if self.cfg is not None:
+                    self.cfg.update_instruction(instruction)
+                    self.spill_code.add(instruction)
 
                 if instruction.reads_register(vreg2):
                     code = self.spill_gen.gen_load(self.frame, vreg2, slot)
@@ -734,7 +799,8 @@ class GraphColoringRegisterAllocator:
                                 list(map(str, code))
                             )
                         )
-                    self.frame.insert_code_before(instruction, code)
+                    self.code_before.setdefault(instruction, []).extend(code)
+                    self.insert_spill_code(instruction, code, True)
 
                 if instruction.writes_register(vreg2):
                     code = self.spill_gen.gen_store(self.frame, vreg2, slot)
@@ -744,10 +810,65 @@ class GraphColoringRegisterAllocator:
                                 list(map(str, code))
                             )
                         )
-                    self.frame.insert_code_after(instruction, code)
+                    # Placed directly after the instruction, like in the
+                    # flowgraph:
+                    self.code_after[instruction] = code + self.code_after.get(
+                        instruction, []
+                    )
+                    self.insert_spill_code(instruction, code, False)
 
-                if self.verbose:
-                    self.reporter.dump_frame(self.frame)
+    def insert_spill_code(self, instruction, code, before):
+        """Insert spill code into the flowgraph.
+
+        When the code cannot be inserted locally, for example before
+        the first instruction of a basic block, the flowgraph is dropped
+        and calculated again in the next round.
+        """
+        if self.cfg is None:
+            return
+
+        if before:
+            if self.cfg.has_node(instruction):
+                self.cfg = None
+                return
+            self.cfg.insert_before(instruction, code)
+        else:
+            if instruction.jumps:
+                self.cfg = None
+                return
+            self.cfg.insert_after(instruction, code)
+
+        # Spill code must not overwrite live registers:
+        for ins in code:
+            if ins.kill & ins.live_out:
+                self.cfg = None
+                return
+        self.spill_code |= code
+
+    def update_frame(self):
+        """Insert the spill code into the frame, and update the liveness
+        and the interference graph.
+
+        The registers used by the spill code and the rewritten
+        instructions are made live at their uses, and propagated
+        backwards to their definitions. Interference is added only
+        where the liveness changed.
+        """
+        self.frame.insert_code(self.code_before, self.code_after)
+        if self.cfg is None:
+            return
+
+        users = OrderedDict()
+        for ins in self.spill_code:
+            for reg in ins.used_registers:
+                users.setdefault(reg, []).append(ins)
+        changes = []
+        for reg, instructions in users.items():
+            changes.append((reg, self.cfg.add_liveness(reg, instructions)))
+
+        self.interference.update_interference(
+            self.spilled_temps, changes, self.spill_code
+        )
 
     def assign_colors(self):
         """Add nodes back to the graph to color it.
@@ -826,3 +947,341 @@ class GraphColoringRegisterAllocator:
             & self.frozenMoves
             == set()
         )
+
+
+class LiveInterval:
+    """The range of instruction positions in which a register is live.
+
+    Each instruction has two positions, the even position is the point
+    where the instruction reads its operands, the odd position the point
+    where it writes its results.
+    """
+
+    __slots__ = ("vreg", "start", "end", "reg", "spill_temp")
+
+    def __init__(self, vreg, position):
+        self.vreg = vreg
+        self.start = position
+        self.end = position
+        self.reg = None
+        self.spill_temp = False
+
+    def __repr__(self):
+        return "LiveInterval({}, {}-{})".format(
+            self.vreg, self.start, self.end
+        )
+
+
+class LinearScanRegisterAllocator:
+    """Linear scan register allocator.
+
+    This allocator is much faster than the graph coloring allocator, at
+    the cost of more spilling and less move coalescing. It has the same
+    interface as the :class:`GraphColoringRegisterAllocator`.
+    """
+
+    logger = logging.getLogger("regalloc")
+    verbose = False  # Set verbose to True to get more logging info
+
+    def __init__(self, arch: Architecture, instruction_selector, reporter):
+        assert isinstance(arch, Architecture), arch
+        self.arch = arch
+        self.spill_gen = MiniGen(arch, instruction_selector)
+        self.reporter = reporter
+
+        # A map with register alias info:
+        self.alias = arch.info.alias
+
+        self.cls_regs = {}  # Mapping from class to register set
+        for reg_class in self.arch.info.register_classes:
+            self.cls_regs[reg_class.typ] = OrderedSet(reg_class.registers)
+
+        # Statistics:
+        self.spill_count = 0
+
+    def alloc_frame(self, frame: Frame):
+        """Do linear scan register allocation for a single frame.
+
+        Args:
+            frame: The frame to perform register allocation on.
+        """
+        self.frame = frame
+        spill_temps = set()
+        spill_rounds = 0
+
+        while True:
+            intervals, blocked, uses, defs = self.build_intervals(
+                frame.instructions, spill_temps
+            )
+            spilled = self.scan(intervals, blocked)
+            if not spilled:
+                break
+
+            spill_rounds += 1
+            self.logger.debug("Spilling round %s", spill_rounds)
+            max_spill_rounds = 30
+            if spill_rounds > max_spill_rounds:
+                raise RuntimeError(
+                    "Give up: more than {} spill rounds done!".format(
+                        max_spill_rounds
+                    )
+                )
+
+            self.spill_count += len(spilled)
+            self.rewrite_program(spilled, uses, defs, spill_temps)
+
+        self.apply_colors(intervals, blocked)
+        self.remove_redundant_moves()
+
+    def build_intervals(self, instructions, spill_temps):
+        """Determine live intervals of the virtual registers.
+
+        Returns the intervals sorted by start position, a map from real
+        registers to the sorted positions at which they are blocked by
+        pre-colored registers, and the uses and definitions of each
+        virtual register.
+        """
+        cfg = FlowGraph(instructions)
+        cfg.calculate_liveness()
+
+        intervals = {}
+        fixed = defaultdict(list)
+        uses = defaultdict(list)
+        defs = defaultdict(list)
+
+        def mark(register, position):
+            if register.is_colored:
+                fixed[register.get_real()].append(position)
+            elif register in intervals:
+                interval = intervals[register]
+                if position < interval.start:
+                    interval.start = position
+                if position > interval.end:
+                    interval.end = position
+            else:
+                interval = LiveInterval(register, position)
+                interval.spill_temp = register in spill_temps
+                intervals[register] = interval
+
+        for index, ins in enumerate(instructions):
+            read_position = 2 * index
+            write_position = read_position + 1
+            for register in ins.live_in:
+                mark(register, read_position)
+            for register in ins.live_out | ins.kill:
+                mark(register, write_position)
+            for register in ins.clobbers:
+                mark(register, write_position)
+
+            for register in ins.used_registers:
+                uses[register].append(ins)
+            for register in ins.defined_registers:
+                defs[register].append(ins)
+
+        # Pre colored registers block all their aliases:
+        blocked = defaultdict(list)
+        for register, positions in fixed.items():
+            for alias in self.alias.get(register, (register,)):
+                blocked[alias].extend(positions)
+        for positions in blocked.values():
+            positions.sort()
+
+        intervals = sorted(intervals.values(), key=lambda i: i.start)
+        self.logger.debug("Created %s live intervals", len(intervals))
+        return intervals, blocked, uses, defs
+
+    def is_blocked(self, register, interval, blocked):
+        """ Check if the register is used by a pre-colored register during
+        the given interval """
+        positions = blocked.get(register)
+        if not positions:
+            return False
+        index = bisect.bisect_left(positions, interval.start)
+        return index < len(positions) and positions[index] <= interval.end
+
+    def scan(self, intervals, blocked):
+        """Assign registers to the live intervals.
+
+        Returns a list of intervals which must be spilled.
+        """
+        active = []
+        spilled = []
+        hints = self.move_hints()
+        assigned = {}
+
+        for interval in intervals:
+            # Expire old intervals:
+            active = [a for a in active if a.end >= interval.start]
+
+            reg_class = type(interval.vreg)
+            taken = set()
+            for other in active:
+                taken.update(self.aliases(other.reg))
+
+            candidates = [
+                r
+                for r in self.cls_regs[reg_class]
+                if r not in taken and not self.is_blocked(r, interval, blocked)
+            ]
+
+            if candidates:
+                interval.reg = self.select_register(
+                    interval, candidates, hints, assigned
+                )
+                assigned[interval.vreg] = interval.reg
+                active.append(interval)
+            else:
+                register, victims = self.select_spill(
+                    interval, active, blocked
+                )
+                if register is None:
+                    spilled.append(interval)
+                else:
+                    for victim in victims:
+                        del assigned[victim.vreg]
+                        victim.reg = None
+                        active.remove(victim)
+                        spilled.append(victim)
+                    interval.reg = register
+                    assigned[interval.vreg] = register
+                    active.append(interval)
+
+        return spilled
+
+    def aliases(self, register):
+        return self.alias.get(register, (register,))
+
+    def move_hints(self):
+        """Get registers which are moved into each other.
+
+        Giving these registers the same color makes the move redundant.
+        """
+        hints = defaultdict(list)
+        for ins in self.frame.instructions:
+            if ins.ismove:
+                dst = ins.defined_registers[0]
+                src = ins.used_registers[0]
+                hints[dst].append(src)
+                hints[src].append(dst)
+        return hints
+
+    def select_register(self, interval, candidates, hints, assigned):
+        """ Select a register, prefer registers which save a move """
+        for other in hints[interval.vreg]:
+            if other.is_colored:
+                register = other.get_real()
+            else:
+                register = assigned.get(other)
+            if register in candidates:
+                return register
+        return candidates[0]
+
+    def select_spill(self, interval, active, blocked):
+        """Select intervals to spill.
+
+        Returns a register and the active intervals which must be spilled
+        to free this register. When the register is None, the given
+        interval itself must be spilled.
+
+        The register whose occupants end last is chosen. Registers occupied
+        by intervals of registers introduced by spilling are never
+        selected, since spilling those would not help.
+        """
+        best, best_victims, best_end = None, (), interval.end
+        if interval.spill_temp:
+            best_end = -1
+
+        for register in self.cls_regs[type(interval.vreg)]:
+            if self.is_blocked(register, interval, blocked):
+                continue
+
+            # Find all intervals occupying (aliases of) the register:
+            aliases = self.aliases(register)
+            victims = [
+                other
+                for other in active
+                if any(r in aliases for r in self.aliases(other.reg))
+            ]
+            if not victims or any(other.spill_temp for other in victims):
+                continue
+
+            end = min(other.end for other in victims)
+            if end > best_end:
+                best, best_victims, best_end = register, victims, end
+
+        if best is None and interval.spill_temp:
+            raise RuntimeError(
+                "No register available for {}".format(interval.vreg)
+            )
+        return best, best_victims
+
+    def rewrite_program(self, spilled, uses, defs, spill_temps):
+        """Place the spilled registers on the stack.
+
+        Each instruction using a spilled register gets a new register,
+        which is loaded from the stack before, and stored to the stack
+        after the instruction.
+        """
+        affected = defaultdict(list)
+        for interval in spilled:
+            tmp = interval.vreg
+            self.logger.debug("Placing %s on stack", tmp)
+            size = type(tmp).bitsize // 8
+            slot = self.frame.alloc(size, size)
+            for instruction in OrderedSet(uses[tmp] + defs[tmp]):
+                affected[instruction].append((tmp, slot))
+
+        instructions = []
+        for instruction in self.frame.instructions:
+            if instruction not in affected:
+                instructions.append(instruction)
+                continue
+
+            loads, stores = [], []
+            for tmp, slot in affected[instruction]:
+                vreg2 = self.frame.new_reg(type(tmp))
+                spill_temps.add(vreg2)
+                instruction.replace_register(tmp, vreg2)
+                if instruction.reads_register(vreg2):
+                    loads.extend(
+                        self.spill_gen.gen_load(self.frame, vreg2, slot)
+                    )
+                if instruction.writes_register(vreg2):
+                    stores.extend(
+                        self.spill_gen.gen_store(self.frame, vreg2, slot)
+                    )
+            instructions.extend(loads)
+            instructions.append(instruction)
+            instructions.extend(stores)
+        self.frame.instructions = instructions
+
+        if self.verbose:
+            self.reporter.message("Rewrote program with spilling")
+            self.reporter.dump_frame(self.frame)
+
+    def apply_colors(self, intervals, blocked):
+        """ Assign colors to registers """
+        for interval in intervals:
+            assert interval.reg is not None
+            interval.vreg.set_color(interval.reg.color)
+            self.frame.used_regs.add(interval.reg.get_real())
+
+        # Mark the pre-colored registers as used in this frame:
+        for ins in self.frame.instructions:
+            for register in ins.registers:
+                if register.is_colored:
+                    self.frame.used_regs.add(register.get_real())
+            for register in ins.clobbers:
+                self.frame.used_regs.add(register.get_real())
+
+    def remove_redundant_moves(self):
+        """ Remove moves of which source and destination are the same """
+        self.frame.instructions = [
+            ins
+            for ins in self.frame.instructions
+            if not (
+                ins.ismove
+                and ins.defined_registers[0].get_real()
+                is ins.used_registers[0].get_real()
+            )
+        ]
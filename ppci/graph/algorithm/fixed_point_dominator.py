@@ -1,28 +1,13 @@
+""" Dominator sets calculated with bit vector data flow analysis. """
+
+from .. import dataflow
+
+
 def calculate_dominators(nodes, entry_node):
     """ Calculate the dominator sets iteratively """
-
-    # Initialize dominator map:
-    _dom = {}
-    for node in nodes:
-        if node is entry_node:
-            _dom[node] = {node}
-        else:
-            _dom[node] = set(nodes)
-
-    # Run fixed point iteration:
-    change = True
-    while change:
-        change = False
-        for node in nodes:
-            # A node is dominated by itself and by the intersection of
-            # the dominators of its predecessors
-            pred_doms = list(_dom[p] for p in node.predecessors)
-            if pred_doms:
-                new_dom_n = set.union({node}, set.intersection(*pred_doms))
-                if new_dom_n != _dom[node]:
-                    change = True
-                    _dom[node] = new_dom_n
-    return _dom
+    # A node is dominated by itself and by the intersection of
+    # the dominators of its predecessors
+    return _dominator_sets(nodes, entry_node, False)
 
 
 def calculate_post_dominators(nodes, exit_node):
@@ -31,30 +16,30 @@ def calculate_post_dominators(nodes, exit_node):
     Post domination is the same as domination, but then starting at
     the exit node.
     """
-
-    # Initialize dominator map:
-    _pdom = {}
-    for node in nodes:
-        if node is exit_node:
-            _pdom[node] = {node}
-        else:
-            _pdom[node] = set(nodes)
-
-    # Run fixed point iteration:
-    change = True
-    while change:
-        change = False
-        for node in nodes:
-            # A node is post dominated by itself and by the intersection
-            # of the post dominators of its successors
-            succ_pdoms = list(_pdom[s] for s in node.successors)
-            if succ_pdoms:
-                new_pdom_n = set.union({node}, set.intersection(*succ_pdoms))
-                if new_pdom_n != _pdom[node]:
-                    change = True
-                    _pdom[node] = new_pdom_n
-
-    return _pdom
+    return _dominator_sets(nodes, exit_node, True)
+
+
+def _dominator_sets(nodes, boundary_node, backward):
+    """ Solve (post) dominators as an intersecting data flow problem """
+    nodes = list(nodes)
+    numbering = dataflow.Numbering(nodes)
+    full = numbering.full
+    gen = {node: numbering.bit(node) for node in nodes}
+    kill = {node: 0 for node in nodes}
+
+    # The entry (or exit) node is only dominated by itself:
+    kill[boundary_node] = full
+    starts, ends = dataflow.solve(
+        nodes,
+        gen,
+        kill,
+        backward=backward,
+        intersect=True,
+        boundary=full,
+        top=full,
+    )
+    sets = starts if backward else ends
+    return {node: set(numbering.members(sets[node])) for node in nodes}
 
 
 def calculate_immediate_dominators(nodes, _dom, _sdom):
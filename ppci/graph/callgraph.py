@@ -2,12 +2,41 @@
 
 """
 
-from .digraph import DiGraph, DiNode
+from .digraph import DiGraph, DiNode, strongly_connected_components
 from .. import ir
 
 
 class CallGraph(DiGraph):
-    pass
+    """A graph with a node per routine, and an edge from each routine to
+    the routines it calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.node_map = {}
+
+    def get_node(self, routine):
+        """ Get the node of the given routine """
+        return self.node_map[routine]
+
+    def bottom_up(self):
+        """Get the groups of routines which call each other, in an order
+        in which called routines come before their callers."""
+        return [
+            [node.routine for node in component]
+            for component in strongly_connected_components(self)
+        ]
+
+
+class CallGraphNode(DiNode):
+    """ A routine in the call graph """
+
+    def __init__(self, graph, routine):
+        super().__init__(graph)
+        self.routine = routine
+        graph.node_map[routine] = self
+
+    def __repr__(self):
+        return "CallGraphNode({})".format(self.routine.name)
 
 
 def mod_to_call_graph(ir_module) -> CallGraph:
@@ -15,20 +44,21 @@ def mod_to_call_graph(ir_module) -> CallGraph:
     cg = CallGraph()
 
     # Create call graph nodes:
-    node_map = {}
     for routine in ir_module.functions:
-        node_map[routine] = DiNode(cg)
+        CallGraphNode(cg, routine)
     for routine in ir_module.externals:
         if isinstance(routine, ir.ExternalSubRoutine):
-            node_map[routine] = DiNode(cg)
+            CallGraphNode(cg, routine)
 
     # Add call graph edges:
     for routine in ir_module.functions:
-        n1 = node_map[routine]
+        n1 = cg.get_node(routine)
         for instruction in routine.get_instructions():
             if isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
                 routine2 = instruction.callee
-                n2 = node_map[routine2]
-                cg.add_edge(n1, n2)
+                # Calls via a function pointer are not in the graph:
+                if routine2 in cg.node_map:
+                    n2 = cg.get_node(routine2)
+                    cg.add_edge(n1, n2)
 
     return cg
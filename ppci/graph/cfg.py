@@ -13,8 +13,10 @@ Functions present:
 import logging
 
 # TODO: this is possibly the third edition of flow graph code.. Merge at will!
+from .. import ir
 from .digraph import DiGraph, DiNode
 from . import lt
+from . import dataflow
 from .algorithm.fixed_point_dominator import calculate_post_dominators
 from .algorithm.fixed_point_dominator import (
     calculate_immediate_post_dominators,
@@ -88,7 +90,7 @@ def ir_function_to_graph(ir_function):
                 node.add_edge(successor_node)
 
             # TODO: hack to store yes and no blocks:
-            if len(block.successors) == 2:
+            if isinstance(block.last_instruction, ir.CJump):
                 node.yes = block_map[block.last_instruction.lab_yes]
                 node.no = block_map[block.last_instruction.lab_no]
 
@@ -157,6 +159,13 @@ class ControlFlowGraph(DiGraph):
             self._calculate_post_dominator_info()
         return one in self._pdom[other]
 
+    @property
+    def dominator_tree(self):
+        """ The root node of the dominator tree """
+        if self._idom is None:
+            self._calculate_dominator_info()
+        return self.root_tree
+
     def get_immediate_dominator(self, node):
         """ Retrieve a nodes immediate dominator """
         if self._idom is None:
@@ -284,25 +293,15 @@ class ControlFlowGraph(DiGraph):
         """ Calculate which nodes can reach what other nodes """
         self.validate()
 
-        # Initialize reach map:
-        self._reach = {}
-        for node in self.nodes:
-            self._reach[node] = self.successors(node)
-
-        # Run fixed point iteration:
-        change = True
-        while change:
-            change = False
-            for node in self.nodes:
-
-                # Fill reachable condition:
-                new_reach = set(self._reach[node])  # Take the old reach
-                for m in node.successors:
-                    new_reach |= self._reach[m]
-
-                if new_reach != self._reach[node]:
-                    change = True
-                    self._reach[node] = new_reach
+        # A node reaches its successors, and all nodes reached by them:
+        nodes = list(self.nodes)
+        numbering = dataflow.Numbering(nodes)
+        gen = {node: numbering.bit(node) for node in nodes}
+        kill = {node: 0 for node in nodes}
+        _, reach = dataflow.solve(nodes, gen, kill, backward=True)
+        self._reach = {
+            node: set(numbering.members(reach[node])) for node in nodes
+        }
 
     def calculate_loops(self):
         """ Calculate loops by use of the dominator info """
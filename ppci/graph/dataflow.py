@@ -0,0 +1,204 @@
+""" Bit vector data flow analysis.
+
+Many analysis problems on control flow graphs, such as liveness of
+registers and dominance, can be formulated as data flow problems on sets.
+When the elements of those sets are numbered densely, a set can be
+represented by a python integer, in which bit i is set when element i is
+in the set. Union, intersection and difference of these bit sets are
+single operations on integers, which is a lot faster, and uses a lot
+less memory, than the same operations on sets of objects.
+
+.. doctest::
+
+    >>> from ppci.graph.dataflow import Numbering
+    >>> numbering = Numbering(['a', 'b', 'c'])
+    >>> bits = numbering.bits(['c', 'a'])
+    >>> bits
+    5
+    >>> numbering.members(bits)
+    ['a', 'c']
+
+.. autoclass:: ppci.graph.dataflow.Numbering
+    :members:
+
+.. autofunction:: ppci.graph.dataflow.solve
+
+.. autofunction:: ppci.graph.dataflow.reverse_postorder
+
+"""
+
+import heapq
+
+
+class Numbering:
+    """Dense numbering of items, used to represent sets of items as
+    integer bit sets.
+
+    Items are numbered in the order in which they are added.
+    """
+
+    def __init__(self, items=()):
+        self.items = []
+        self.numbers = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.numbers
+
+    def add(self, item):
+        """ Add an item, when not yet numbered, and return its number """
+        if item not in self.numbers:
+            self.numbers[item] = len(self.items)
+            self.items.append(item)
+        return self.numbers[item]
+
+    def bit(self, item):
+        """ Get the bit set containing only the given item """
+        return 1 << self.numbers[item]
+
+    def bits(self, items):
+        """ Get the bit set containing the given items """
+        numbers = self.numbers
+        bits = 0
+        for item in items:
+            bits |= 1 << numbers[item]
+        return bits
+
+    @property
+    def full(self):
+        """ The bit set with all numbered items """
+        return (1 << len(self.items)) - 1
+
+    def members(self, bits):
+        """ Get the items in a bit set, ordered by their number """
+        items = self.items
+        members = []
+        while bits:
+            lowest = bits & -bits
+            members.append(items[lowest.bit_length() - 1])
+            bits ^= lowest
+        return members
+
+
+def reverse_postorder(nodes, successors):
+    """Determine the reverse postorder of a graph.
+
+    The graph is searched depth first, starting at each of the given
+    nodes in turn, so all nodes end up in the order, also nodes which
+    cannot be reached from the first node.
+    """
+    order = []
+    visited = set()
+    for start in nodes:
+        if start in visited:
+            continue
+        visited.add(start)
+        stack = [(start, iter(successors(start)))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(successors(child))))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    order.reverse()
+    return order
+
+
+def solve(
+    nodes, gen, kill, backward=False, intersect=False, boundary=0, top=0
+):
+    """Solve a bit vector data flow problem.
+
+    The transfer function of each node is ``gen | (x & ~kill)``. The
+    problem is solved with a worklist, which visits the nodes in reverse
+    postorder, or in reverse postorder of the reversed graph for
+    backward problems.
+
+    Args:
+        nodes: the nodes of the graph. The nodes must have successors
+            and predecessors.
+        gen: a dictionary mapping each node to its gen bit set.
+        kill: a dictionary mapping each node to its kill bit set.
+        backward: True for backward problems, such as liveness.
+        intersect: when True, the sets of joining paths are intersected,
+            for example for dominators. Otherwise the union is taken.
+        boundary: the set entering the graph at the entry nodes, or at
+            the exit nodes for backward problems.
+        top: the initial set of the other nodes. For problems using
+            intersection, this should be the set with all elements.
+
+    Returns:
+        A tuple of two dictionaries with the set at the start and at
+        the end of each node.
+    """
+    if backward:
+
+        def sources(node):
+            return node.successors
+
+        def targets(node):
+            return node.predecessors
+
+        # Start searching at the exit nodes:
+        starts = [n for n in nodes if not n.successors]
+        starts.extend(nodes)
+
+    else:
+
+        def sources(node):
+            return node.predecessors
+
+        def targets(node):
+            return node.successors
+
+        starts = [n for n in nodes if not n.predecessors]
+        starts.extend(nodes)
+
+    order = reverse_postorder(starts, targets)
+    position = {node: i for i, node in enumerate(order)}
+
+    inputs = {}
+    outputs = {}
+    for node in order:
+        inputs[node] = boundary if not sources(node) else top
+        outputs[node] = gen[node] | (inputs[node] & ~kill[node])
+
+    worklist = list(range(len(order)))
+    pending = [True] * len(order)
+    while worklist:
+        i = heapq.heappop(worklist)
+        pending[i] = False
+        node = order[i]
+        preceding = sources(node)
+        if preceding:
+            if intersect:
+                value = -1
+                for source in preceding:
+                    value &= outputs[source]
+            else:
+                value = 0
+                for source in preceding:
+                    value |= outputs[source]
+            inputs[node] = value
+
+        output = gen[node] | (inputs[node] & ~kill[node])
+        if output != outputs[node]:
+            outputs[node] = output
+            for target in targets(node):
+                j = position[target]
+                if not pending[j]:
+                    pending[j] = True
+                    heapq.heappush(worklist, j)
+
+    if backward:
+        return outputs, inputs
+    else:
+        return inputs, outputs
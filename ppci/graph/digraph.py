@@ -101,3 +101,58 @@ def dfs(start_node, reverse=False):
             else:
                 for successor in node.successors:
                     worklist.append((node, successor))
+
+
+def strongly_connected_components(graph):
+    """Find the strongly connected components of a graph.
+
+    Uses the algorithm of Tarjan. The components are returned in reverse
+    topological order, so a component comes after all components it has
+    edges to.
+    """
+    order = {node: number for number, node in enumerate(graph.nodes)}
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    for root in graph.nodes:
+        if root in index:
+            continue
+        worklist = [(root, None)]
+        while worklist:
+            node, successors = worklist[-1]
+            if successors is None:
+                # Discover node:
+                index[node] = lowlink[node] = len(index)
+                stack.append(node)
+                on_stack.add(node)
+                successors = iter(
+                    sorted(graph.successors(node), key=order.__getitem__)
+                )
+                worklist[-1] = (node, successors)
+
+            for successor in successors:
+                if successor not in index:
+                    worklist.append((successor, None))
+                    break
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                # All successors visited:
+                worklist.pop()
+                if worklist:
+                    parent = worklist[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
@@ -48,6 +48,11 @@ class Typ:
     def __repr__(self):
         return "ir-typ {}".format(str(self))
 
+    def __reduce__(self):
+        # The builtin types are singletons, pickle them by reference so
+        # that identity checks like ``ty is ir.ptr`` survive a round trip.
+        return self.name
+
 
 class PointerTyp(Typ):
     """ Pointer type """
@@ -134,6 +139,9 @@ class BlobDataTyp(Typ):
         # More or less the same as 'u8[size]'.
         return "blob<{}:{}>".format(self.size, self.alignment)
 
+    def __reduce__(self):
+        return (BlobDataTyp, (self.size, self.alignment))
+
 
 # The builtin types:
 f64 = FloatingPointTyp("f64", 64)  #: 64-bit floating point type
@@ -745,9 +753,12 @@ class Instruction:
         # assert old in self._var_map.values()
         for name in self._var_map:
             if self._var_map[name] is old:
-                self.del_use(old)
                 self._var_map[name] = new
-                self.add_use(new)
+
+        # The value can be used more than once by this instruction:
+        if old in self.uses:
+            self.del_use(old)
+            self.add_use(new)
 
     def remove_from_block(self):
         for use in list(self.uses):
@@ -893,11 +904,7 @@ class FunctionCall(LocalValue):
 
     def replace_use(self, old, new):
         super().replace_use(old, new)
-        if old in self.arguments:
-            idx = self.arguments.index(old)
-            self.del_use(old)
-            self.arguments[idx] = new
-            self.add_use(new)
+        self.arguments = [new if a is old else a for a in self.arguments]
 
     def __str__(self):
         args = ", ".join(arg.name for arg in self.arguments)
@@ -928,11 +935,7 @@ class ProcedureCall(Instruction):
 
     def replace_use(self, old, new):
         super().replace_use(old, new)
-        if old in self.arguments:
-            idx = self.arguments.index(old)
-            self.del_use(old)
-            self.arguments[idx] = new
-            self.add_use(new)
+        self.arguments = [new if a is old else a for a in self.arguments]
 
     def __str__(self):
         args = ", ".join(arg.name for arg in self.arguments)
@@ -1036,10 +1039,10 @@ class Phi(LocalValue):
         """ Replace old value reference by new value reference """
         assert old in self.inputs.values()
         for inp in self.inputs:
-            if self.inputs[inp] == old:
-                self.del_use(old)
+            if self.inputs[inp] is old:
                 self.inputs[inp] = new
-                self.add_use(new)
+        self.del_use(old)
+        self.add_use(new)
 
     def set_incoming(self, block, value):
         """ Set the value for the phi node when entering through block """
@@ -1050,7 +1053,7 @@ class Phi(LocalValue):
                 )
             )
         if block in self.inputs:
-            self.del_use(self.inputs[block])
+            self.del_incoming(block)
         self.inputs[block] = value
         self.add_use(value)
 
@@ -1061,7 +1064,9 @@ class Phi(LocalValue):
     def del_incoming(self, block):
         """ Remove incoming branch from this phi node and delete the usage """
         value = self.inputs.pop(block)
-        self.del_use(value)
+        # The value can still be used for another incoming branch:
+        if value not in self.inputs.values():
+            self.del_use(value)
 
 
 class Alloc(LocalValue):
@@ -1231,11 +1236,12 @@ class InlineAsm(Instruction):
 
     def replace_use(self, old, new):
         super().replace_use(old, new)
-        if old in self.input_values:
-            idx = self.input_values.index(old)
-            self.del_use(old)
-            self.input_values[idx] = new
-            self.add_use(new)
+        self.input_values = [
+            new if v is old else v for v in self.input_values
+        ]
+        self.output_values = [
+            new if v is old else v for v in self.output_values
+        ]
 
     def __str__(self):
         return 'asm ({})'.format(self.template)
@@ -1326,9 +1332,10 @@ class JumpBase(FinalInstruction):
 
     def delete(self):
         """ Clear references """
-        while self._block_map:
-            _, block = self._block_map.popitem()
+        super().delete()
+        for block in OrderedSet(self._block_map.values()):
             block.references.remove(self)
+        self._block_map.clear()
 
     @property
     def targets(self):
@@ -1385,9 +1392,13 @@ class CJump(JumpBase):
 
 
 class JumpTable(JumpBase):
-    """ Jump table.
+    """Jump table.
 
-    In the worst case, this is expanded to a whole bunch of CJump statements.
+    Jump to the block at index v in the table. When v is negative, or not
+    smaller than the length of the table, jump to the default block.
+
+    Backends without support for jump tables expand this into a bunch of
+    CJump statements.
     """
 
     v = value_use("v")
@@ -1396,9 +1407,24 @@ class JumpTable(JumpBase):
     def __init__(self, v, table, default):
         super().__init__()
         self.v = v
-        self.table = table
+        self.size = len(table)
+        for index, block in enumerate(table):
+            self.set_target_block(index, block)
         self.lab_default = default
-        raise NotImplementedError("TODO")
+
+    @property
+    def table(self):
+        """ The blocks to jump to, indexed by v """
+        return [self._block_map[index] for index in range(self.size)]
+
+    @property
+    def targets(self):
+        """ Gets a list of targets that this instruction jumps to """
+        return list(OrderedSet(self._block_map.values()))
 
     def __str__(self):
-        return "jmp_table {}".format(self.v.name)
+        return "jmp_table {} ? [{}] : {}".format(
+            self.v.name,
+            ", ".join(block.name for block in self.table),
+            self.lab_default.name,
+        )
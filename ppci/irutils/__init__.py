@@ -4,7 +4,7 @@
 from .verify import verify_module, Verifier
 from .writer import Writer, print_module
 from .reader import Reader, read_module
-from .builder import Builder, split_block
+from .builder import Builder, split_block, lower_jump_tables
 from .link import ir_link
 from .io import to_json, from_json
 from .instrument import add_tracer
@@ -12,6 +12,7 @@ from .instrument import add_tracer
 __all__ = [
     "Builder",
     "ir_link",
+    "lower_jump_tables",
     "print_module",
     "read_module",
     "Reader",
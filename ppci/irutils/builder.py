@@ -4,6 +4,7 @@
 
 import contextlib
 from .. import ir
+from ..utils.collections import OrderedSet
 from ..binutils.debuginfo import DebugLocation
 
 
@@ -44,6 +45,41 @@ def split_block(block, pos=None, newname="splitblock"):
     return block, block2
 
 
+def lower_jump_table(jump_table):
+    """Replace a jump table by a balanced tree of compares.
+
+    This is useful for targets which do not support jump tables.
+    """
+    block = jump_table.block
+    value = jump_table.v
+    options = dict(enumerate(jump_table.table))
+    default = jump_table.lab_default
+    block.remove_instruction(jump_table)
+    jump_table.delete()
+
+    builder = Builder()
+    builder.set_function(block.function)
+    builder.set_block(block)
+    builder.emit_switch(value, options, default, jump_tables=False)
+
+
+def lower_jump_tables(function):
+    """ Replace all jump tables in a function by compares """
+    for block in list(function.blocks):
+        if isinstance(block.last_instruction, ir.JumpTable):
+            lower_jump_table(block.last_instruction)
+
+
+def is_dense(cases, ty, min_size=4, min_density=0.5):
+    """Test if a sorted list of (option, block) cases is dense enough to
+    use a jump table, indexed by a value of the given type."""
+    if len(cases) < min_size:
+        return False
+    span = cases[-1][0] - cases[0][0] + 1
+    max_index = 2 ** (ty.bits - 1 if ty.is_signed else ty.bits)
+    return len(cases) >= span * min_density and span <= max_index
+
+
 class Builder:
     """Helper class for IR-code generators.
 
@@ -165,6 +201,82 @@ class Builder:
         """ Emit subtract operation. """
         return self.emit_binop(a, "-", b, ty)
 
+    def emit_switch(self, value, options, default, jump_tables=True):
+        """Emit a multi-way branch on an integer value.
+
+        Dense ranges of options are dispatched with a jump table, the
+        other options with a balanced binary search tree of compares.
+        Incoming values of phi nodes in the targets for the current block
+        are used for the newly created blocks as well.
+
+        Args:
+            value: the value to switch on.
+            options: a dictionary mapping integers to blocks. The integers
+                are taken modulo the size of the type of the value.
+            default: the block to jump to when no option matches.
+            jump_tables: use jump tables when the options are dense.
+        """
+        # Imported here, since the optimizers use the builder:
+        from ..opt.constantfolding import correct
+
+        block = self.block
+        block_count = len(self.function.blocks)
+        phi_values = []
+        for target in OrderedSet(list(options.values()) + [default]):
+            for phi in target.phis:
+                if block in phi.inputs:
+                    phi_values.append((phi, phi.get_value(block)))
+
+        # Options are compared as values of the type of the value, so
+        # for example -1 is the highest option of an unsigned switch:
+        cases = [
+            (correct(option, value.ty), block)
+            for option, block in options.items()
+        ]
+        cases.sort(key=lambda case: case[0])
+        self._emit_switch_cases(value, cases, default, jump_tables)
+
+        # Phi nodes of the targets get the same value for all new blocks:
+        new_blocks = [block] + self.function.blocks[block_count:]
+        for phi, phi_value in phi_values:
+            phi.del_incoming(block)
+            for predecessor in new_blocks:
+                if phi.block in predecessor.successors:
+                    phi.set_incoming(predecessor, phi_value)
+
+    def _emit_switch_cases(self, value, cases, default, jump_tables):
+        if jump_tables and is_dense(cases, value.ty):
+            low = cases[0][0]
+            table = [default] * (cases[-1][0] - low + 1)
+            for option, block in cases:
+                table[option - low] = block
+            if low != 0:
+                value = self.emit_sub(value, low, value.ty)
+            self.emit(ir.JumpTable(value, table, default))
+        elif len(cases) <= 3:
+            # Linear chain of compares:
+            for option, block in cases:
+                next_block = self.new_block()
+                option = self.emit_const(option, value.ty)
+                self.emit(ir.CJump(value, "==", option, block, next_block))
+                self.set_block(next_block)
+            self.emit_jump(default)
+        else:
+            # Binary search:
+            middle = len(cases) // 2
+            lower_block = self.new_block()
+            upper_block = self.new_block()
+            pivot = self.emit_const(cases[middle][0], value.ty)
+            self.emit(ir.CJump(value, "<", pivot, lower_block, upper_block))
+            self.set_block(lower_block)
+            self._emit_switch_cases(
+                value, cases[:middle], default, jump_tables
+            )
+            self.set_block(upper_block)
+            self._emit_switch_cases(
+                value, cases[middle:], default, jump_tables
+            )
+
     def emit_const(self, value, ty):
         """ Emit a constant. """
         return self.emit(ir.Const(value, "num", ty))
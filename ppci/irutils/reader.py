@@ -421,6 +421,8 @@ class Reader:
             ins = self.parse_jmp()
         elif self.at_keyword("cjmp"):
             ins = self.parse_cjmp()
+        elif self.at_keyword("jmp_table"):
+            ins = self.parse_jmp_table()
         elif self.at_keyword("return"):
             ins = self.parse_return()
         elif self.at_keyword("store"):
@@ -455,6 +457,23 @@ class Reader:
         ins = ir.CJump(a, op, b, L1, L2)
         return ins
 
+    def parse_jmp_table(self):
+        self.consume_keyword("jmp_table")
+        v = self.parse_value_ref()
+        self.consume("?")
+        self.consume("[")
+        table = []
+        if self.peek != "]":
+            table.append(self.parse_block_ref())
+            while self.peek == ",":
+                self.consume(",")
+                table.append(self.parse_block_ref())
+        self.consume("]")
+        self.consume(":")
+        default = self.parse_block_ref()
+        ins = ir.JumpTable(v, table, default)
+        return ins
+
     def parse_jmp(self):
         self.consume_keyword("jmp")
         L1 = self.parse_block_ref()
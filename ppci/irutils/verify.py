@@ -167,6 +167,13 @@ class Verifier:
                         instruction.a.ty, instruction.b.ty, instruction
                     )
                 )
+        elif isinstance(instruction, ir.JumpTable):
+            if not instruction.v.ty.is_integer:
+                raise IrFormError(
+                    "Jump table requires an integer value, not {}".format(
+                        instruction.v.ty
+                    )
+                )
         elif isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
             if isinstance(
                 instruction.callee, (ir.SubRoutine, ir.ExternalSubRoutine)
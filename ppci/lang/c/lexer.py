@@ -2,7 +2,9 @@
 
 import logging
 import io
+import re
 
+from ...common import CompilerError
 from ..common import SourceLocation
 from .token import CToken
 from ..tools.handlexer import HandLexerBase, Char
@@ -29,19 +31,22 @@ def create_characters(f, source_file):
         source_file.row += 1
 
 
+TRIGRAPHS = {
+    "=": "#",
+    "(": "[",
+    ")": "]",
+    "<": "{",
+    ">": "}",
+    "-": "~",
+    "!": "|",
+    "/": "\\",
+    "'": "^",
+}
+
+
 def trigraph_filter(characters):
     """ Replace trigraphs in a character sequence """
-    tri_map = {
-        "=": "#",
-        "(": "[",
-        ")": "]",
-        "<": "{",
-        ">": "}",
-        "-": "~",
-        "!": "|",
-        "/": "\\",
-        "'": "^",
-    }
+    tri_map = TRIGRAPHS
     buf = []
     for char in characters:
         buf.append(char)
@@ -80,6 +85,103 @@ def continued_lines_filter(characters):
                 yield char
 
 
+def create_lines(f, source_file, trigraphs=False, continued_lines=False):
+    """Create a sequence of logical lines.
+
+    This does the same as the character filters, but on whole lines.
+    Each line is given together with the positions of its characters.
+    Positions are None when the line is not altered by the filters. In
+    that case, character n is at column n + 1 of the current row of the
+    source file. Otherwise, the positions are a list with the row, relative
+    to the current row, and the column of each character.
+    """
+    text = ""
+    positions = []
+    part = 0
+    for line in f:
+        line = line.expandtabs()
+        columns = None
+        if trigraphs and "??" in line:
+            line, columns = _replace_trigraphs(line)
+        if continued_lines and "\\" in line:
+            line, columns, continued = _glue_line(line, columns)
+        else:
+            continued = False
+
+        if continued or part:
+            if columns is None:
+                columns = range(1, len(line) + 1)
+            positions.extend((part, col) for col in columns)
+            text += line
+            if continued:
+                part += 1
+                continue
+            yield text, positions
+            source_file.row += part
+            text = ""
+            positions = []
+            part = 0
+        elif columns is None:
+            yield line, None
+        else:
+            yield line, [(0, col) for col in columns]
+        source_file.row += 1
+
+    if part:
+        # The last line was continued, and the file ended:
+        if text:
+            yield text, positions
+        source_file.row += part
+
+
+def _replace_trigraphs(line):
+    """ Replace the trigraphs in a line, and determine the columns """
+    text = []
+    columns = []
+    col = 0
+    while col < len(line):
+        char = line[col + 2 : col + 3]
+        if line.startswith("??", col) and char in TRIGRAPHS:
+            text.append(TRIGRAPHS[char])
+            columns.append(col + 1)
+            col += 3
+        else:
+            text.append(line[col])
+            columns.append(col + 1)
+            col += 1
+    return "".join(text), columns
+
+
+def _glue_line(line, columns):
+    r"""Remove backslash newline sequences from a line.
+
+    Returns the line, its columns and whether the line continues.
+    """
+    if not ("\\\n" in line or "\\\r" in line or line.endswith("\\")):
+        return line, columns, False
+
+    if columns is None:
+        columns = range(1, len(line) + 1)
+    text = []
+    new_columns = []
+    backslash = None
+    continued = False
+    for char, col in zip(line, columns):
+        if backslash:
+            if char in "\r\n":
+                continued = char == "\n"
+            else:
+                text.extend(("\\", char))
+                new_columns.extend((backslash, col))
+            backslash = None
+        elif char == "\\":
+            backslash = col
+        else:
+            text.append(char)
+            new_columns.append(col)
+    return "".join(text), new_columns, continued
+
+
 def lex_text(text, coptions):
     """ Lex a piece of text """
     lexer = CLexer(coptions)
@@ -97,13 +199,54 @@ class CLexer(HandLexerBase):
     numbers = octal_numbers + "89"
     hex_numbers = numbers + "abcdefABCDEF"
 
-    def __init__(self, coptions):
+    # Regular expression for the fast path. Constructs which are not
+    # matched, such as unterminated strings, are left to the character
+    # based state machine:
+    _escape = (
+        r"(?:['\"?\\abfnrtve]|[0-7]{1,3}|x[0-9a-fA-F]{0,2}"
+        r"|[uU][0-9a-fA-F]{0,4})"
+    )
+    _number_suffix = r"(?:[uU][lL]{0,2}|[lL](?:[uU][lL]?|[lL][uU]?)?)?"
+    token_regex = re.compile(
+        "|".join(
+            [
+                r"(?P<WS>[ \t]+)",
+                r"(?P<BOL>\n)",
+                r"(?P<FORMFEED>\f)",
+                r"(?P<LINECOMMENT>//[^\n]*)",
+                r"(?P<BLOCKCOMMENT>/\*.*?\*/)",
+                r"(?P<OPENCOMMENT>/\*)",
+                r"(?P<FLOAT>(?:0\.|[1-9][0-9]*[.eEpP]|\.[0-9])"
+                r"[0-9]*(?:[eEpP][+-]?[0-9]*)?)",
+                r"(?P<NUMBER>(?:0(?:[xX][0-9a-fA-F]*|[bB][01]*|[0-7]*)"
+                r"|[1-9][0-9]*)" + _number_suffix + ")",
+                r"(?P<CHAR>L?'(?:\\" + _escape + r"|[^\\\n])')",
+                r'(?P<STRING>"(?:[^"\\\n]|\\[\'"?\\abfnrtve0-7xuU])*")',
+                r"(?P<SLOW>L?'|\")",
+                r"(?P<ID>[A-Za-z_][A-Za-z0-9_]*)",
+                r"(?P<PUNCTUATOR><<=|>>=|\.\.\.|->|\+\+|--|<<|>>|&&|\|\||##"
+                r"|[-+*/%^&|~<>=!]=|[-+*/%^&|~<>=!#.;{}()\[\],?:\\])",
+                r"(?P<OTHER>[\s\S])",
+            ]
+        )
+    )
+
+    def __init__(self, coptions, fast=True):
         super().__init__()
         self.coptions = coptions
+        self.fast = fast
 
     def lex(self, src, source_file):
         """ Read a source and generate a series of tokens """
         self.logger.debug("Lexing %s", source_file.filename)
+        if isinstance(src, str):
+            # Iterate over the lines, and not the characters, of the text:
+            src = io.StringIO(src)
+
+        if self.fast:
+            return self.tokenize_lines(
+                src, source_file, self.coptions["trigraphs"], True
+            )
 
         characters = create_characters(src, source_file)
         if self.coptions["trigraphs"]:
@@ -121,32 +264,155 @@ class CLexer(HandLexerBase):
         f = io.StringIO(txt)
         filename = None
         source_file = SourceFile(filename)
+        if self.fast:
+            return self.tokenize_lines(f, source_file, False, False)
         characters = characters = create_characters(f, source_file)
         return self.tokenize(characters)
 
     def tokenize(self, characters):
         """ Generate tokens from characters """
-        space = ""
-        first = True
-        token = None
-        for token in super().tokenize(characters, self.lex_c):
+        return self.glue_tokens(super().tokenize(characters, self.lex_c))
+
+    def glue_tokens(self, tokens, space="", first=True, loc=None):
+        """Attach whitespace and start of line information to tokens.
+
+        The space, first and loc arguments describe the tokens before the
+        given tokens, where loc is the location of the last token.
+        """
+        for token in tokens:
+            loc = token.loc
             if token.typ == "BOL":
                 if first:
                     # Yield an extra start of line
-                    yield CToken("BOL", "", "", first, token.loc)
+                    yield CToken("BOL", "", "", first, loc)
                 first = True
                 space = ""
             elif token.typ == "WS":
                 space += token.val
             else:
-                yield CToken(token.typ, token.val, space, first, token.loc)
+                yield CToken(token.typ, token.val, space, first, loc)
                 space = ""
                 first = False
 
         # Emit last newline:
-        if first and token:
+        if first and loc:
+            # Yield an extra start of line
+            yield CToken("BOL", "", "", first, loc)
+
+    def tokenize_lines(self, f, source_file, trigraphs, continued_lines):
+        """Generate tokens from the lines of a file.
+
+        This is the fast path of the lexer. Lines are scanned with a
+        regular expression, no characters are created, and locations are
+        only determined for the tokens. When a line contains something the
+        regular expression does not handle, the rest of the file is lexed
+        by the character based state machine, which produces the proper
+        tokens or error messages.
+        """
+        lines = iter(f)
+        scan = self.token_regex.finditer
+        line_comments = self.coptions["std"] != "c89"
+        in_comment = False
+        space = ""
+        first = True
+        last = None
+        for text, positions in create_lines(
+            lines, source_file, trigraphs, continued_lines
+        ):
+            pos = 0
+            if in_comment:
+                pos = text.find("*/")
+                if pos < 0:
+                    continue
+                pos += 2
+                in_comment = False
+
+            for mo in scan(text, pos):
+                typ = mo.lastgroup
+                if typ == "WS":
+                    space += mo.group()
+                    last = positions, mo.start(), source_file.row
+                elif typ == "BOL":
+                    pos = mo.start()
+                    if first:
+                        # Yield an extra start of line
+                        loc = self._location(
+                            source_file, positions, pos, source_file.row
+                        )
+                        yield CToken("BOL", "", "", first, loc)
+                    first = True
+                    space = ""
+                    last = positions, pos, source_file.row
+                elif typ in ("BLOCKCOMMENT", "FORMFEED"):
+                    pass
+                elif typ == "LINECOMMENT" and line_comments:
+                    pass
+                elif typ == "OPENCOMMENT":
+                    in_comment = True
+                    break
+                elif typ in ("SLOW", "OTHER", "LINECOMMENT"):
+                    # Continue with the characters from here on. This
+                    # also reports C++ style comments in C90:
+                    characters = self._continue_characters(
+                        text, positions, mo.start(), lines, source_file,
+                        trigraphs, continued_lines,
+                    )
+                    tokens = super().tokenize(characters, self.lex_c)
+                    if last:
+                        last = self._location(source_file, *last)
+                    yield from self.glue_tokens(tokens, space, first, last)
+                    return
+                else:
+                    if positions is None:
+                        row, col = source_file.row, mo.start() + 1
+                    else:
+                        row, col = positions[mo.start()]
+                        row += source_file.row
+                    loc = SourceLocation(source_file.filename, row, col, 1)
+                    val = mo.group()
+                    if typ == "PUNCTUATOR":
+                        typ = "<<" if val == "<<=" else val
+                    yield CToken(typ, val, space, first, loc)
+                    space = ""
+                    first = False
+                    last = None
+
+        if in_comment:
+            raise CompilerError("Expected a character, but at end of file")
+
+        # Emit last newline:
+        if first and last:
             # Yield an extra start of line
-            yield CToken("BOL", "", "", first, token.loc)
+            loc = self._location(source_file, *last)
+            yield CToken("BOL", "", "", first, loc)
+
+    @staticmethod
+    def _location(source_file, positions, pos, row):
+        """ Determine the location of a position in a line """
+        if positions is None:
+            col = pos + 1
+        else:
+            offset, col = positions[pos]
+            row += offset
+        return SourceLocation(source_file.filename, row, col, 1)
+
+    def _continue_characters(
+        self, text, positions, pos, lines, source_file, trigraphs,
+        continued_lines,
+    ):
+        """ Create characters from a position in a line onwards """
+        for index in range(pos, len(text)):
+            row = source_file.row
+            loc = self._location(source_file, positions, index, row)
+            yield Char(text[index], loc)
+        source_file.row += 1 if positions is None else positions[-1][0] + 1
+
+        characters = create_characters(lines, source_file)
+        if trigraphs:
+            characters = trigraph_filter(characters)
+        if continued_lines:
+            characters = continued_lines_filter(characters)
+        yield from characters
 
     def lex_c(self):
         """ Root parsing function """
@@ -37,6 +37,9 @@ class CPreProcessor:
         self.macros = {}  # A mapping of macros
         self.files = []  # Stack of included files.
         self.counter = 0  # For the __COUNTER__ macro
+        self.include_guards = {}  # Guard macro per included file
+        self.once_files = set()  # Files which contain '#pragma once'
+        self.located_files = {}  # Include files by search path and name
         self._int_type = types.BasicType(types.BasicType.INT)
 
         self.predefine_builtin_macros()
@@ -190,6 +193,11 @@ class CPreProcessor:
                 loc=self.files[-1].if_stack[-1].location,
             )
 
+        guard = self.files[-1].include_guard.macro
+        if guard:
+            self.logger.debug("%s is guarded by %s", filename, guard)
+            self.include_guards[filename] = guard
+
         self.logger.debug("Finished %s", source_file.filename)
         self.files.pop()
 
@@ -226,8 +234,14 @@ class CPreProcessor:
         # self.logger.debug((search_directories)
         for path in search_directories:
             self.logger.debug("Searching in %s", path)
-            full_path = os.path.join(path, filename)
-            if os.path.exists(full_path):
+            key = (path, filename)
+            if key not in self.located_files:
+                full_path = os.path.join(path, filename)
+                if not os.path.exists(full_path):
+                    full_path = None
+                self.located_files[key] = full_path
+            full_path = self.located_files[key]
+            if full_path:
                 if include_next:
                     current_filename = self.files[-1].source_file.filename
                     if full_path == current_filename:
@@ -241,17 +255,43 @@ class CPreProcessor:
     def include(
         self, filename, loc, use_current_dir=False, include_next=False
     ):
-        """Turn the given filename into a series of tokens."""
+        """Turn the given filename into a series of tokens.
+
+        Files which are only to be included once are skipped without
+        opening them, when they were included before.
+        """
         full_path = self.locate_include(
             filename, loc, use_current_dir, include_next
         )
-        self.logger.debug("Including %s", full_path)
         source_file = SourceFile(full_path)
         self.files[-1].dependencies.append(source_file)
+        if self.is_included(full_path):
+            self.logger.debug("Skipping already included %s", full_path)
+            return
+
+        self.logger.debug("Including %s", full_path)
         with open(full_path, "r") as f:
             for token in self.process_file(f, full_path):
                 yield token
 
+        yield LineInfo(
+            loc.row + 1,
+            loc.filename,
+            flags=[LineInfo.FLAG_RETURN_FROM_INCLUDE],
+        )
+
+    def is_included(self, filename):
+        """Test if a file was included before, and has no effect when
+        included again.
+
+        This is the case when the file contains '#pragma once', or when
+        the file is guarded by a macro which is defined.
+        """
+        if filename in self.once_files:
+            return True
+        guard = self.include_guards.get(filename)
+        return guard is not None and self.is_defined(guard)
+
     # Token consume / peeking:
     @property
     def token(self):
@@ -360,6 +400,10 @@ class CPreProcessor:
                     self.error("Expected end of line", loc=self.token.loc)
             else:
                 # This is not a directive, but normal text:
+                if token.typ != "BOL":
+                    self.files[-1].include_guard.text(
+                        len(self.files[-1].if_stack)
+                    )
                 yield token
             token = self.next_token()
 
@@ -645,8 +689,10 @@ class CPreProcessor:
     def handle_directive(self, loc):
         """ Handle a single preprocessing directive """
         self.files[-1].in_directive = True
+        depth = len(self.files[-1].if_stack)
         if self.at_line_start:
             # Handle null directive:
+            self.files[-1].include_guard.directive("", depth, None)
             new_line_token = CToken("WS", "", "", True, loc)
             yield new_line_token
         else:
@@ -654,6 +700,9 @@ class CPreProcessor:
             directive = directive_token.val
             if self.verbose:
                 self.logger.debug("Handing #%s directive", directive)
+            self.files[-1].include_guard.directive(
+                directive, depth, self.token
+            )
 
             if directive == "ifdef":
                 yield from self.handle_ifdef_directive(directive_token)
@@ -817,12 +866,6 @@ class CPreProcessor:
         ):
             yield token
 
-        yield LineInfo(
-            directive_token.loc.row + 1,
-            directive_token.loc.filename,
-            flags=[LineInfo.FLAG_RETURN_FROM_INCLUDE],
-        )
-
     def handle_include_next_directive(self, directive_token):
         """ Process the `#include_next` directive. """
         use_current_dir, include_filename = self.parse_included_filename()
@@ -835,12 +878,6 @@ class CPreProcessor:
         ):
             yield token
 
-        yield LineInfo(
-            directive_token.loc.row + 1,
-            directive_token.loc.filename,
-            flags=[LineInfo.FLAG_RETURN_FROM_INCLUDE],
-        )
-
     def parse_included_filename(self):
         """ Parse filename after #include/#include_next """
         token = self.consume(("<", "STRING"))
@@ -946,7 +983,10 @@ class CPreProcessor:
         """ Process `#pragma` directive. """
         # Pragma's must be handled, or ignored.
         message = self.tokens_to_string(self.eat_line())
-        self.logger.warning("Ignoring pragma: %s", message)
+        if message == "once":
+            self.once_files.add(self.files[-1].filename)
+        else:
+            self.logger.warning("Ignoring pragma: %s", message)
         new_line_token = CToken("WS", "", "", True, directive_token.loc)
         yield new_line_token
 
@@ -1141,6 +1181,8 @@ class FileExpander:
 
     def __init__(self, source_file, tokens):
         self.source_file = source_file
+        self.filename = source_file.filename
+        self.include_guard = IncludeGuard()
         self.dependencies = []  # List of dependent files.
         self.if_stack = []  # If-def stack
         self.token_buffer = []  # Token undo stack
@@ -1318,6 +1360,54 @@ class IfState:
         return "If-state(loc={})".format(self.location)
 
 
+class IncludeGuard:
+    """Detect whether a file is guarded against multiple inclusion.
+
+    This is the case when all of the file is enclosed in an #ifndef
+    directive, without #elif or #else, like this:
+
+        #ifndef FOO_H
+        #define FOO_H
+        ...
+        #endif
+
+    After the file is processed, macro contains the name of the guard
+    macro, or None when the file is not guarded.
+    """
+
+    def __init__(self):
+        self.macro = None
+        self.state = "start"
+
+    def text(self, depth):
+        """ Register text at the given nesting of #if directives """
+        if depth == 0:
+            self.invalidate()
+
+    def directive(self, directive, depth, name_token):
+        """ Register a directive at the given nesting of #if directives """
+        if depth == 0:
+            if (
+                directive == "ifndef"
+                and self.state == "start"
+                and name_token
+                and name_token.typ == "ID"
+            ):
+                self.state = "open"
+                self.macro = name_token.val
+            else:
+                self.invalidate()
+        elif depth == 1 and self.state == "open":
+            if directive == "endif":
+                self.state = "closed"
+            elif directive in ["elif", "else"]:
+                self.invalidate()
+
+    def invalidate(self):
+        self.state = "invalid"
+        self.macro = None
+
+
 def skip_ws(tokens):
     """ Filter whitespace tokens """
     for token in tokens:
@@ -491,7 +491,11 @@ class CodeGenerator:
         self.builder.set_block(final_block)
 
     def gen_switch_stmt(self, switch):
-        """ Generate code for a switch statement """
+        """Generate code for a switch statement.
+
+        Dense sets of options are implemented with a jump table, other
+        options with a binary search.
+        """
         ir_val = self.gen_expr_code(switch.expression, rvalue=True)
         assert self.context.equal_types("int", switch.expression.typ)
 
@@ -500,6 +504,7 @@ class CodeGenerator:
         self.emit(ir.Jump(test_block))
 
         def_block = None
+        options = {}
         # Generate code in linear way:
         for option_val, option_code in switch.options:
             # Generate code for case:
@@ -513,21 +518,12 @@ class CodeGenerator:
                 def_block = code_block
             else:
                 # TODO: type check constant:
-                loc = option_val.loc
-                self.builder.set_block(test_block)
                 o_val = self.context.eval_const(option_val)
-                ir_val2 = self.emit(
-                    ir.Const(o_val, "cmpval", self.get_ir_int()), loc=loc
-                )
-                tb2 = self.new_block()
-                self.emit(
-                    ir.CJump(ir_val, "==", ir_val2, code_block, tb2), loc=loc
-                )
-                test_block = tb2
+                options.setdefault(o_val, code_block)
 
         self.builder.set_block(test_block)
         assert def_block
-        self.emit(ir.Jump(def_block))
+        self.builder.emit_switch(ir_val, options, def_block)
         self.builder.set_block(final_block)
 
     def gen_cond_code(self, expr, bbtrue, bbfalse):
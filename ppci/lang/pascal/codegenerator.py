@@ -564,7 +564,11 @@ class CodeGenerator:
         self.builder.set_block(final_block)
 
     def gen_case_of_stmt(self, switch: statements.CaseOf):
-        """ Generate code for a case-of statement """
+        """Generate code for a case-of statement.
+
+        When all options are constants, dense sets of options are
+        implemented with a jump table, other options with a binary search.
+        """
         ir_val = self.gen_expr_code(switch.expression, rvalue=True)
         tha_type = switch.expression.typ
         assert isinstance(tha_type, types.IntegerType)
@@ -574,6 +578,7 @@ class CodeGenerator:
         self.emit(ir.Jump(test_block))
 
         default_block = None
+        option_blocks = []
         # Generate code in linear way:
         for option_values, option_code in switch.options:
             # Generate code for case:
@@ -587,20 +592,26 @@ class CodeGenerator:
                 default_block = code_block
             else:
                 # TODO: type check constant:
+                self.builder.set_block(test_block)
                 for option in option_values:
-                    self.builder.set_block(test_block)
                     o_val = self.gen_expr_code(option, rvalue=True)
-                    new_test_block = self.builder.new_block()
-                    self.emit(
-                        ir.CJump(
-                            ir_val, "==", o_val, code_block, new_test_block
-                        )
-                    )
-                    test_block = new_test_block
+                    option_blocks.append((o_val, code_block))
 
         self.builder.set_block(test_block)
         assert default_block
-        self.emit(ir.Jump(default_block))
+        if all(isinstance(o_val, ir.Const) for o_val, _ in option_blocks):
+            options = {}
+            for o_val, code_block in option_blocks:
+                options.setdefault(o_val.value, code_block)
+            self.builder.emit_switch(ir_val, options, default_block)
+        else:
+            for o_val, code_block in option_blocks:
+                new_test_block = self.builder.new_block()
+                self.emit(
+                    ir.CJump(ir_val, "==", o_val, code_block, new_test_block)
+                )
+                self.builder.set_block(new_test_block)
+            self.emit(ir.Jump(default_block))
         self.builder.set_block(final_block)
 
     def gen_procedure_call(self, call: statements.ProcedureCall):
@@ -6,7 +6,29 @@ import io
 import logging
 import time
 from ... import ir
-from ...graph import relooper
+from ...graph.cfg import ir_function_to_graph
+from ...irutils import lower_jump_tables
+
+
+# Struct formats of the types which can be loaded and stored:
+MEMORY_FORMATS = [
+    (ir.f64, "d", 8),
+    (ir.f32, "f", 4),
+    (ir.i64, "q", 8),
+    (ir.u64, "Q", 8),
+    (ir.i32, "i", 4),
+    (ir.u32, "I", 4),
+    (ir.ptr, "i", 4),
+    (ir.i16, "h", 2),
+    (ir.u16, "H", 2),
+    (ir.i8, "b", 1),
+    (ir.u8, "B", 1),
+]
+
+
+# Integer operations of which the result modulo 2**bits only depends on
+# the operands modulo 2**bits:
+MODULAR_OPERATIONS = {"+", "-", "*", "&", "|", "^"}
 
 
 def literal_label(lit):
@@ -14,13 +36,23 @@ def literal_label(lit):
     return "{}_{}".format(lit.function.name, lit.name)
 
 
-def ir_to_python(ir_modules, f, reporter=None):
-    """ Convert ir-code to python code """
+def ir_to_python(ir_modules, f, reporter=None, bounds_check=False):
+    """Convert ir-code to python code
+
+    Args:
+        ir_modules: the ir-modules to convert
+        f: the file to write the python code to
+        reporter: an optional reporter
+        bounds_check: when True, check each memory access for a valid
+            address. Otherwise, an access beyond the end of memory raises
+            a struct.error, but an access at a negative address silently
+            uses the end of the stack.
+    """
     if reporter:
         f2 = f
         f = io.StringIO()
 
-    generator = IrToPythonCompiler(f, reporter)
+    generator = IrToPythonCompiler(f, reporter, bounds_check=bounds_check)
     generator.header()
     for ir_module in ir_modules:
         if not isinstance(ir_module, ir.Module):
@@ -33,14 +65,146 @@ def ir_to_python(ir_modules, f, reporter=None):
         reporter.dump_source("Python code", source_code)
 
 
+def is_modular(ins):
+    """ Test if an instruction is a modular integer operation """
+    return (
+        isinstance(ins, ir.Binop)
+        and ins.ty.is_integer
+        and ins.operation in MODULAR_OPERATIONS
+    )
+
+
+def find_raw_values(ir_function):
+    """Find integer values which need not be wrapped to their type.
+
+    The results of modular operations, which are only used by modular
+    operations of the same type, can be left as any python integer. They
+    are wrapped when they reach a comparison, store, division or call.
+    """
+    raw_values = set()
+    for block in ir_function:
+        for ins in block:
+            if is_modular(ins) and all(
+                is_modular(use) and use.ty is ins.ty for use in ins.used_by
+            ):
+                raw_values.add(ins)
+    return raw_values
+
+
+def wrap_integer(expr, ty):
+    """ Create a python expression wrapping an integer expression """
+    mask = hex((1 << ty.bits) - 1)
+    if ty.signed:
+        half = hex(1 << (ty.bits - 1))
+        return "((({}) + {}) & {}) - {}".format(expr, half, mask, half)
+    else:
+        return "({}) & {}".format(expr, mask)
+
+
+def fits_in(src_ty, ty):
+    """ Test if all values of an integer type fit into another type """
+    if src_ty.signed:
+        return ty.signed and src_ty.bits <= ty.bits
+    else:
+        return src_ty.bits < ty.bits or (
+            src_ty.bits == ty.bits and not ty.signed
+        )
+
+
+class UnstructuredJump(ValueError):
+    """ A jump which cannot be expressed with python control flow """
+
+    def __init__(self, target):
+        super().__init__(target.name)
+        self.target = target
+
+
+class ControlFlowInfo:
+    """Dominator tree, loops and merge points of an ir-function.
+
+    Raises a ValueError when the control flow is irreducible.
+    """
+
+    def __init__(self, ir_function):
+        cfg, block_map = ir_function_to_graph(ir_function)
+        reverse_map = {node: block for block, node in block_map.items()}
+
+        # Depth first search to number the blocks and find back edges:
+        entry = ir_function.entry
+        postorder = []
+        self.back_edges = set()
+        visited = {entry}
+        active = {entry}
+        stack = [(entry, iter(entry.successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if successor in active:
+                    if not cfg.dominates(
+                        block_map[successor], block_map[block]
+                    ):
+                        raise ValueError("Irreducible control flow")
+                    self.back_edges.add((block, successor))
+                elif successor not in visited:
+                    visited.add(successor)
+                    active.add(successor)
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                active.remove(block)
+                postorder.append(block)
+
+        # Dominator tree children of each block, in postorder, such that
+        # the last block in the control flow comes first:
+        self.children = {block: [] for block in postorder}
+        for block in postorder:
+            idom = cfg.get_immediate_dominator(block_map[block])
+            if idom in reverse_map:
+                self.children[reverse_map[idom]].append(block)
+
+        # Natural loops:
+        self.loops = {}
+        for block, header in self.back_edges:
+            body = self.loops.setdefault(header, {header})
+            worklist = [block]
+            while worklist:
+                block = worklist.pop()
+                if block not in body:
+                    body.add(block)
+                    worklist.extend(
+                        p for p in block.predecessors if p in visited
+                    )
+
+        # Blocks with multiple forward predecessors:
+        self.merges = set()
+        for block in postorder:
+            predecessors = {
+                p
+                for p in block.predecessors
+                if p in visited and (p, block) not in self.back_edges
+            }
+            if len(predecessors) > 1:
+                self.merges.add(block)
+
+        # Blocks which follow other code, instead of being emitted at
+        # the jump towards them:
+        self.placed = set(self.merges)
+        for header, body in self.loops.items():
+            self.placed.update(
+                c for c in self.children[header] if c not in body
+            )
+
+
 class IrToPythonCompiler:
     """ Can generate python script from ir-code """
 
     logger = logging.getLogger("ir2py")
 
-    def __init__(self, output_file, reporter):
+    def __init__(self, output_file, reporter, bounds_check=False):
         self.output_file = output_file
         self.reporter = reporter
+        self.bounds_check = bounds_check
         self.stack_size = 0
         self.func_ptr_map = {}
         self._level = 0
@@ -112,35 +276,36 @@ class IrToPythonCompiler:
             self.emit("return len(_irpy_heap) + HEAP_START")
         self.emit("")
 
-        # Generate load functions:
-        foo = [
-            (ir.f64, "d", 8),
-            (ir.f32, "f", 4),
-            (ir.i64, "q", 8),
-            (ir.u64, "Q", 8),
-            (ir.i32, "i", 4),
-            (ir.u32, "I", 4),
-            (ir.ptr, "i", 4),
-            (ir.i16, "h", 2),
-            (ir.u16, "H", 2),
-            (ir.i8, "b", 1),
-            (ir.u8, "B", 1),
-        ]
-
-        for ty, fmt, size in foo:
+        for ty, fmt, size in MEMORY_FORMATS:
+            # Precompile the struct once, and bind its methods, so that
+            # a load or store is a single call on the memory itself:
+            self.emit('_irpy_{} = struct.Struct("<{}")'.format(ty.name, fmt))
+            self.emit(
+                "_irpy_unpack_{0} = _irpy_{0}.unpack_from".format(ty.name)
+            )
+            self.emit("_irpy_pack_{0} = _irpy_{0}.pack_into".format(ty.name))
+            self.emit("")
+
             # Generate load helpers:
             self.emit("def load_{}(p):".format(ty.name))
-            self.print(
-                1,
-                'return struct.unpack("{0}", read_mem(p, {1}))[0]'.format(
-                    fmt, size
-                ),
-            )
+            with self.indented():
+                self.emit("mem, address = _irpy_get_memory(p)")
+                self.emit(
+                    "assert 0 <= address <= len(mem) - {}, hex(p)".format(size)
+                )
+                self.emit(
+                    "return _irpy_unpack_{}(mem, address)[0]".format(ty.name)
+                )
             self.emit("")
 
             # Generate store helpers:
             self.emit("def store_{}(v, p):".format(ty.name))
-            self.print(1, 'write_mem(p, struct.pack("{0}", v))'.format(fmt))
+            with self.indented():
+                self.emit("mem, address = _irpy_get_memory(p)")
+                self.emit(
+                    "assert 0 <= address <= len(mem) - {}, hex(p)".format(size)
+                )
+                self.emit("_irpy_pack_{}(mem, address, v)".format(ty.name))
             self.emit("")
 
     def generate_builtins(self):
@@ -177,20 +342,6 @@ class IrToPythonCompiler:
         self.print(1, "return -v if sign else v")
         self.emit("")
 
-        # More c like shift left:
-        self.emit("def _irpy_ishl(x, amount, bits):")
-        with self.indented():
-            self.emit("amount = amount % bits")
-            self.emit("return x << amount")
-        self.emit("")
-
-        # More c like shift right:
-        self.emit("def _irpy_ishr(x, amount, bits):")
-        with self.indented():
-            self.emit("amount = amount % bits")
-            self.emit("return x >> amount")
-        self.emit("")
-
         self.emit("def _irpy_alloca(amount):")
         with self.indented():
             self.emit("ptr = len(_irpy_stack)")
@@ -199,8 +350,7 @@ class IrToPythonCompiler:
         self.emit("")
 
         self.emit("def _irpy_free(amount):")
-        self.print(1, "for _ in range(amount):")
-        self.print(2, "_irpy_stack.pop()")
+        self.print(1, "del _irpy_stack[len(_irpy_stack) - amount:]")
         self.emit("")
 
     def generate(self, ir_mod):
@@ -237,65 +387,249 @@ class IrToPythonCompiler:
     def generate_function(self, ir_function):
         """ Generate a function to python code """
         self.stack_size = 0
+        lower_jump_tables(ir_function)
+        self._raw_values = find_raw_values(ir_function)
         args = ",".join(a.name for a in ir_function.arguments)
         self.emit("def {}({}):".format(ir_function.name, args))
         with self.indented():
-            # TODO: enable shape style:
-            # try:
-            #     # TODO: remove this to enable shape style:
-            #     raise ValueError
-            #     shape, _rmap = relooper.find_structure(ir_function)
-            #     src = io.StringIO()
-            #     relooper.print_shape(shape, file=src)
-            #     self.reporter.dump_source(ir_function.name, src.getvalue())
-            #     self._rmap = _rmap
-            #     self._shape_style = True
-            #     self.generate_shape(shape)
-            # except ValueError:
-            self.logger.debug("Falling back to block-switch-style")
-            # Fall back to block switch stack!
-            self._shape_style = False
-            self.generate_function_fallback(ir_function)
+            try:
+                source = self.generate_structured(ir_function)
+            except ValueError as ex:
+                self.logger.debug(
+                    "Falling back to block-switch-style for %s: %s",
+                    ir_function.name,
+                    ex,
+                )
+                # Fall back to block switch stack!
+                self.stack_size = 0
+                self.generate_function_fallback(ir_function)
+            else:
+                self.output_file.write(source)
 
         # Register function for function pointers:
         self.emit("_irpy_func_pointers.append({})".format(ir_function.name))
         self.func_ptr_map[ir_function] = len(self.func_ptr_map)
         self.emit("")
 
-    def generate_shape(self, shape):
-        """ Generate python code for a shape structured program """
-        if isinstance(shape, relooper.BasicShape):
-            self.generate_block(self._rmap[shape.content])
-        elif isinstance(shape, relooper.SequenceShape):
-            if shape.shapes:
-                for sub_shape in shape.shapes:
-                    self.generate_shape(sub_shape)
+    def generate_structured(self, ir_function):
+        """Generate python code with while loops and if statements.
+
+        The blocks are emitted along the dominator tree. A loop becomes
+        a ``while True:`` loop, and a block with multiple predecessors
+        is emitted after the code of its immediate dominator. Jumps
+        become a fall through, a ``break`` or a ``continue``.
+
+        Python has no labeled breaks. A jump out of several loops sets
+        the ``_irpy_target`` variable, which is checked after the loop.
+        When a jump cannot reach its target, because there is no loop
+        to break out of, the code in front of the target is wrapped into
+        a ``while True:`` loop and the function is generated again.
+
+        Returns the python code of the function body. Raises a
+        ValueError when the control flow cannot be structured.
+        """
+        self._flow = ControlFlowInfo(ir_function)
+        self._wrapped = set()
+        level = self._level
+        output_file = self.output_file
+        try:
+            while True:
+                self.output_file = io.StringIO()
+                self.stack_size = 0
+                self._exits = {}
+                try:
+                    self.generate_tree(ir_function.entry, ())
+                except UnstructuredJump as ex:
+                    if (
+                        ex.target in self._wrapped
+                        or ex.target not in self._flow.placed
+                    ):
+                        raise ValueError(
+                            "Cannot jump to {}".format(ex.target.name)
+                        )
+                    self._wrapped.add(ex.target)
+                    self._level = level
+                else:
+                    return self.output_file.getvalue()
+        finally:
+            self.output_file = output_file
+            self._level = level
+
+    def generate_tree(self, block, context):
+        """Generate a block, followed by the blocks it dominates.
+
+        The context is a tuple of the enclosing constructs, as pairs of
+        kind and block. The kind is 'loop' for a loop with the given
+        header, 'wrap' for a loop wrapped around code in front of the
+        given block, and 'follow' for code in front of the given block.
+        """
+        flow = self._flow
+        children = flow.children[block]
+        if block in flow.loops:
+            body = flow.loops[block]
+            inner = [c for c in children if c in body and c in flow.merges]
+            outer = [c for c in children if c not in body]
+
+            def generate_loop(context):
+                entry = ("loop", block)
+                self.generate_while(
+                    entry,
+                    context,
+                    lambda: self.generate_followed(
+                        inner,
+                        context + (entry,),
+                        lambda context: self.generate_code(block, context),
+                    ),
+                )
+
+            self.generate_followed(outer, context, generate_loop)
+        else:
+            merges = [c for c in children if c in flow.merges]
+            self.generate_followed(
+                merges,
+                context,
+                lambda context: self.generate_code(block, context),
+            )
+
+    def generate_followed(self, follows, context, generate):
+        """ Generate code, followed by the given blocks """
+        if follows:
+            follow = follows[0]
+            if follow in self._wrapped:
+                entry = ("wrap", follow)
+
+                def generate_wrapped():
+                    self.generate_followed(
+                        follows[1:], context + (entry,), generate
+                    )
+                    self.emit("break")
+
+                # The code after the loop is the followed block:
+                self.generate_while(
+                    entry, context + (("follow", follow),), generate_wrapped
+                )
             else:
-                self.emit("pass")
-        elif isinstance(shape, relooper.IfShape):
-            blk = self._rmap[shape.content]
-            self.generate_block(blk)
+                self.generate_followed(
+                    follows[1:], context + (("follow", follow),), generate
+                )
+            self.generate_tree(follow, context)
+        else:
+            generate(context)
+
+    def generate_while(self, entry, context, generate):
+        """Generate a while loop.
+
+        Jumps which break out of the loop towards another target than
+        the code after the loop are continued after the loop.
+        """
+        self._exits[entry] = []
+        with self.indented():
+            body = self.generate_to_string(generate)
+        exits = self._exits.pop(entry)
+        if exits:
+            self.emit("_irpy_target = None")
+        self.emit("while True:")
+        self.output_file.write(body)
+        for target in exits:
+            self.emit('if _irpy_target == "{}":'.format(target.name))
             with self.indented():
-                if shape.yes_shape:
-                    self.generate_shape(shape.yes_shape)
-                else:
-                    self.emit("pass")
-            if shape.no_shape:
-                self.emit("else:")
-                with self.indented():
-                    self.generate_shape(shape.no_shape)
-        elif isinstance(shape, relooper.LoopShape):
-            self.emit("while True:")
+                self.generate_jump(target, context)
+
+    def generate_code(self, block, context):
+        """ Generate the instructions of a block and jump to the next """
+        for ins in block:
+            if not isinstance(ins, ir.JumpBase):
+                self.generate_instruction(ins, block)
+
+        ins = block.last_instruction
+        if isinstance(ins, ir.Jump):
+            self.generate_branch(block, ins.target, context)
+        elif isinstance(ins, ir.CJump):
+            condition = "{} {} {}".format(
+                self.fetch_value(ins.a), ins.cond, self.fetch_value(ins.b)
+            )
             with self.indented():
-                self.generate_shape(shape.body)
-        elif isinstance(shape, relooper.ContinueShape):
+                yes_code = self.generate_to_string(
+                    lambda: self.generate_branch(block, ins.lab_yes, context)
+                )
+                no_code = self.generate_to_string(
+                    lambda: self.generate_branch(block, ins.lab_no, context)
+                )
+
+            # Leave out branches which fall through:
+            if yes_code:
+                self.emit("if {}:".format(condition))
+                self.output_file.write(yes_code)
+                if no_code:
+                    self.emit("else:")
+                    self.output_file.write(no_code)
+            elif no_code:
+                self.emit("if not ({}):".format(condition))
+                self.output_file.write(no_code)
+        elif isinstance(ins, ir.JumpBase):  # pragma: no cover
+            raise ValueError("Cannot structure {}".format(ins))
+
+    def generate_branch(self, block, target, context):
+        """ Generate a jump from block to target """
+        phis = target.phis
+        if phis:
+            self.emit(
+                "{} = {}".format(
+                    ", ".join(p.name for p in phis),
+                    ", ".join(p.inputs[block].name for p in phis),
+                )
+            )
+
+        flow = self._flow
+        if target in flow.placed or (block, target) in flow.back_edges:
+            self.generate_jump(target, context)
+        else:
+            # The target is only reached from this block:
+            self.generate_tree(target, context)
+
+    def generate_to_string(self, generate):
+        """ Run the given code generation and return the python code """
+        output_file = self.output_file
+        self.output_file = io.StringIO()
+        try:
+            generate()
+            return self.output_file.getvalue()
+        finally:
+            self.output_file = output_file
+
+    def generate_jump(self, target, context):
+        """Jump to the given target, which is either the header of an
+        enclosing loop or a block following the current code.
+        """
+        if context and context[-1][0] != "loop" and context[-1][1] is target:
+            return  # Fall through to the target
+
+        # Find the innermost python loop:
+        for index in range(len(context) - 1, -1, -1):
+            kind, label = context[index]
+            if kind != "follow":
+                break
+        else:
+            raise UnstructuredJump(target)
+
+        if kind == "loop" and label is target:
             self.emit("continue")
-        elif isinstance(shape, relooper.BreakShape):
-            self.emit("break")
-        elif shape is None:
-            self.emit("pass")
-        else:  # pragma: no cover
-            raise NotImplementedError(str(shape))
+            return
+
+        # Determine the block reached after breaking out of the loop:
+        if kind == "wrap":
+            reached = label
+        elif index > 0:
+            reached = context[index - 1][1]
+        else:
+            reached = None
+
+        if reached is not target:
+            exits = self._exits[context[index]]
+            if target not in exits:
+                exits.append(target)
+            self.emit('_irpy_target = "{}"'.format(target.name))
+        self.emit("break")
 
     def generate_function_fallback(self, ir_function):
         """Generate a while-true with a switch-case on current block.
@@ -317,8 +651,7 @@ class IrToPythonCompiler:
         for ins in block:
             self.generate_instruction(ins, block)
 
-        if not self._shape_style:
-            self.fill_phis(block)
+        self.fill_phis(block)
 
     def fill_phis(self, block):
         # Generate eventual phi fill code:
@@ -329,8 +662,8 @@ class IrToPythonCompiler:
             self.emit("{} = {}".format(phi_names, value_names))
 
     def reset_stack(self):
-        self.emit("_irpy_free({})".format(self.stack_size))
-        self.stack_size = 0
+        if self.stack_size:
+            self.emit("_irpy_free({})".format(self.stack_size))
 
     def emit_jump(self, target: ir.Block):
         """ Perform a jump in block mode. """
@@ -363,24 +696,25 @@ class IrToPythonCompiler:
         elif isinstance(ins, ir.Unop):
             op = ins.operation
             a = self.fetch_value(ins.a)
-            self.emit("{} = {}{}".format(ins.name, op, ins.a.name))
+            expr = "{}{}".format(op, a)
             if ins.ty.is_integer:
-                self.emit(
-                    "{0} = _irpy_correct({0}, {1}, {2})".format(
-                        ins.name, ins.ty.bits, ins.ty.signed
-                    )
-                )
+                expr = wrap_integer(expr, ins.ty)
+            self.emit("{} = {}".format(ins.name, expr))
         elif isinstance(ins, ir.Binop):
             self.gen_binop(ins)
         elif isinstance(ins, ir.Cast):
+            src_ty = ins.src.ty
+            if src_ty.is_integer or src_ty is ir.ptr:
+                expr = ins.src.name
+            else:
+                expr = "int(round({}))".format(ins.src.name)
+
             if ins.ty.is_integer:
-                self.emit(
-                    "{} = _irpy_correct(int(round({})), {}, {})".format(
-                        ins.name, ins.src.name, ins.ty.bits, ins.ty.signed
-                    )
-                )
+                if not (src_ty.is_integer and fits_in(src_ty, ins.ty)):
+                    expr = wrap_integer(expr, ins.ty)
+                self.emit("{} = {}".format(ins.name, expr))
             elif ins.ty is ir.ptr:
-                self.emit("{} = int(round({}))".format(ins.name, ins.src.name))
+                self.emit("{} = {}".format(ins.name, expr))
             elif ins.ty in [ir.f32, ir.f64]:
                 self.emit("{} = float({})".format(ins.name, ins.src.name))
             else:  # pragma: no cover
@@ -414,23 +748,15 @@ class IrToPythonCompiler:
     def gen_cjump(self, ins):
         a = self.fetch_value(ins.a)
         b = self.fetch_value(ins.b)
-        if self._shape_style:
-            self.fill_phis(block)
-            self.emit("if {} {} {}:".format(a, ins.cond, b))
-        else:
-            self.emit("if {} {} {}:".format(a, ins.cond, b))
-            with self.indented():
-                self.emit_jump(ins.lab_yes)
-            self.emit("else:")
-            with self.indented():
-                self.emit_jump(ins.lab_no)
+        self.emit("if {} {} {}:".format(a, ins.cond, b))
+        with self.indented():
+            self.emit_jump(ins.lab_yes)
+        self.emit("else:")
+        with self.indented():
+            self.emit_jump(ins.lab_no)
 
     def gen_jump(self, ins):
-        if self._shape_style:
-            self.fill_phis(block)
-            self.emit("pass")
-        else:
-            self.emit_jump(ins.target)
+        self.emit_jump(ins.target)
 
     def gen_binop(self, ins):
         a = self.fetch_value(ins.a)
@@ -439,27 +765,18 @@ class IrToPythonCompiler:
         op = ins.operation
         int_ops = {"/": "_irpy_idiv", "%": "_irpy_irem"}
 
-        shift_ops = {">>": "_irpy_ishr", "<<": "_irpy_ishl"}
-
         if op in int_ops and ins.ty.is_integer:
             fname = int_ops[op]
-            self.emit("{} = {}({}, {})".format(ins.name, fname, a, b))
-        elif op in shift_ops and ins.ty.is_integer:
-            fname = shift_ops[op]
-            self.emit(
-                "{} = {}({}, {}, {})".format(
-                    ins.name, fname, a, b, ins.ty.bits
-                )
-            )
+            expr = "{}({}, {})".format(fname, a, b)
+        elif op in [">>", "<<"] and ins.ty.is_integer:
+            # More c like shift, the shift amount wraps around:
+            expr = "{} {} ({} % {})".format(a, op, b, ins.ty.bits)
         else:
-            self.emit("{} = {} {} {}".format(ins.name, a, op, b))
+            expr = "{} {} {}".format(a, op, b)
 
-        if ins.ty.is_integer:
-            self.emit(
-                "{0} = _irpy_correct({0}, {1}, {2})".format(
-                    ins.name, ins.ty.bits, ins.ty.signed
-                )
-            )
+        if ins.ty.is_integer and ins not in self._raw_values:
+            expr = wrap_integer(expr, ins.ty)
+        self.emit("{} = {}".format(ins.name, expr))
 
     def gen_load(self, ins):
         address = self.fetch_value(ins.address)
@@ -469,10 +786,28 @@ class IrToPythonCompiler:
                     ins.name, address, ins.ty.size
                 )
             )
-        else:
+        elif self.bounds_check:
             self.emit(
                 "{0} = load_{1}({2})".format(ins.name, ins.ty.name, address)
             )
+        else:
+            # Inline the load helper, without the check for a negative
+            # address:
+            heap_address = "{} - HEAP_START".format(address)
+            self.emit("if {} >= HEAP_START:".format(address))
+            with self.indented():
+                self.emit(
+                    "{}, = _irpy_unpack_{}(_irpy_heap, {})".format(
+                        ins.name, ins.ty.name, heap_address
+                    )
+                )
+            self.emit("else:")
+            with self.indented():
+                self.emit(
+                    "{}, = _irpy_unpack_{}(_irpy_stack, {})".format(
+                        ins.name, ins.ty.name, address
+                    )
+                )
 
     def gen_store(self, ins):
         if isinstance(ins.value.ty, ir.BlobDataTyp):
@@ -481,13 +816,33 @@ class IrToPythonCompiler:
                     ins.address.name, ins.value.ty.size, ins.value.name
                 )
             )
-        else:
+        elif self.bounds_check:
             v = self.fetch_value(ins.value)
             self.emit(
                 "store_{0}({2}, {1})".format(
                     ins.value.ty.name, ins.address.name, v
                 )
             )
+        else:
+            # Inline the store helper, without the check for a negative
+            # address:
+            v = self.fetch_value(ins.value)
+            address = self.fetch_value(ins.address)
+            heap_address = "{} - HEAP_START".format(address)
+            self.emit("if {} >= HEAP_START:".format(address))
+            with self.indented():
+                self.emit(
+                    "_irpy_pack_{}(_irpy_heap, {}, {})".format(
+                        ins.value.ty.name, heap_address, v
+                    )
+                )
+            self.emit("else:")
+            with self.indented():
+                self.emit(
+                    "_irpy_pack_{}(_irpy_stack, {}, {})".format(
+                        ins.value.ty.name, address, v
+                    )
+                )
 
     def gen_const(self, ins):
         if math.isinf(ins.value):
@@ -2,7 +2,11 @@ from .clean import CleanPass
 from .mem2reg import Mem2RegPromotor
 from .cse import CommonSubexpressionEliminationPass
 from .constantfolding import ConstantFolder
+from .gvn import GlobalValueNumberingPass
+from .inline import InlinePass
 from .load_after_store import LoadAfterStorePass
+from .passmanager import PassManager
+from .sccp import SparseConditionalConstantPropagationPass
 from .transform import RemoveAddZeroPass
 from .transform import DeleteUnusedInstructionsPass
 from .transform import ModulePass, FunctionPass, BlockPass, InstructionPass
@@ -17,7 +21,11 @@ __all__ = [
     "CommonSubexpressionEliminationPass",
     "ConstantFolder",
     "DeleteUnusedInstructionsPass",
+    "GlobalValueNumberingPass",
+    "InlinePass",
     "LoadAfterStorePass",
     "Mem2RegPromotor",
+    "PassManager",
     "RemoveAddZeroPass",
+    "SparseConditionalConstantPropagationPass",
 ]
@@ -0,0 +1,33 @@
+""" Caching of analysis results, which are used by optimization passes. """
+
+from ..graph.domtree import CfgInfo
+
+
+class AnalysisCache:
+    """Keeps the analysis results of functions.
+
+    The control flow graph of a function, with its dominators, dominance
+    frontier and loops, is calculated once, and kept until the function
+    is changed.
+    """
+
+    def __init__(self):
+        self._cfg_infos = {}
+
+    def get_cfg_info(self, function):
+        """ Get the control flow graph info of a function """
+        if function not in self._cfg_infos:
+            self._cfg_infos[function] = CfgInfo(function)
+        return self._cfg_infos[function]
+
+    def get_loops(self, function):
+        """ Get the loops of a function """
+        return self.get_cfg_info(function).loops
+
+    def invalidate(self, function=None):
+        """Forget the analysis results of a function, or of all functions
+        when no function is given."""
+        if function is None:
+            self._cfg_infos.clear()
+        else:
+            self._cfg_infos.pop(function, None)
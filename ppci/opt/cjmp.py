@@ -4,6 +4,21 @@ from .. import ir
 
 
 class CJumpPass(InstructionPass):
+    """Replace conditional jumps on two constants with a jump.
+
+    Blocks which cannot be reached anymore are removed.
+    """
+
+    def on_function(self, function):
+        changed = super().on_function(function)
+        if changed:
+            function.delete_unreachable()
+        return changed
+
+    def on_block(self, block):
+        # Only the last instruction can be a conditional jump:
+        return self.on_instruction(block.last_instruction)
+
     def on_instruction(self, instruction):
         if (
             isinstance(instruction, ir.CJump)
@@ -21,10 +36,18 @@ class CJumpPass(InstructionPass):
                 "!=": operator.ne,
             }
             if mp[instruction.cond](a, b):
-                label = instruction.lab_yes
+                label, other = instruction.lab_yes, instruction.lab_no
             else:
-                label = instruction.lab_no
+                label, other = instruction.lab_no, instruction.lab_yes
             block = instruction.block
+
+            # The block is no longer a predecessor of the other target:
+            if other is not label:
+                for phi in other.phis:
+                    phi.del_incoming(block)
+
             block.remove_instruction(instruction)
             block.add_instruction(ir.Jump(label))
             instruction.delete()
+            return True
+        return False
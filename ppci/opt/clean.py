@@ -25,8 +25,9 @@ class CleanPass(FunctionPass):
     """
 
     def on_function(self, function):
-        self.remove_empty_blocks(function)
-        self.remove_one_preds(function)
+        removed = self.remove_empty_blocks(function)
+        glued = self.remove_one_preds(function)
+        return removed or glued
 
     def find_empty_blocks(self, function):
         """ Look for all blocks containing only a jump in it """
@@ -39,7 +40,10 @@ class CleanPass(FunctionPass):
         return empty_blocks
 
     def remove_empty_blocks(self, function):
-        """ Remove empty basic blocks from function. """
+        """Remove empty basic blocks from function.
+
+        Returns True when a block was removed.
+        """
         stat = 0
         for block in self.find_empty_blocks(function):
             predecessors = block.predecessors
@@ -64,6 +68,7 @@ class CleanPass(FunctionPass):
             stat += 1
         if stat > 0:
             self.logger.debug("Removed %s empty blocks", stat)
+        return stat > 0
 
     def find_single_predecessor_block(self, function):
         """ Find a block with a single predecessor """
@@ -85,7 +90,11 @@ class CleanPass(FunctionPass):
                 return block
 
     def remove_one_preds(self, function):
-        """ Remove basic blocks with only one predecessor """
+        """Remove basic blocks with only one predecessor.
+
+        Returns True when blocks were glued together.
+        """
+        glued = False
         change = True
         while change:
             change = False
@@ -94,6 +103,8 @@ class CleanPass(FunctionPass):
                 (pred,) = block.predecessors  # Unpack 1 block
                 self.glue_blocks(pred, block)
                 change = True
+                glued = True
+        return glued
 
     def glue_blocks(self, block1, block2):
         """ Glue two blocks together into the first block """
@@ -106,6 +117,12 @@ class CleanPass(FunctionPass):
         block1.remove_instruction(last_jump)
         last_jump.delete()
 
+        # Phi instructions have a single incoming value now:
+        for phi in block2.phis:
+            phi.replace_by(phi.get_value(block1))
+            block2.remove_instruction(phi)
+            phi.delete()
+
         # Copy all instructions to block1:
         for instruction in block2:
             block1.add_instruction(instruction)
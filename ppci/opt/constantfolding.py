@@ -23,6 +23,17 @@ def correct(value, ty):
     return value - base if signed and value.bit_length() == bits else value
 
 
+def c_div(a, b):
+    """ Integer division rounding towards zero, like in C """
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def c_mod(a, b):
+    """ Remainder of the division rounding towards zero """
+    return a - b * c_div(a, b)
+
+
 def enhance(f):
     """ Create a new enhanced method that corrects for the given type """
     return lambda ty, a, b: correct(f(a, b), ty)
@@ -31,13 +42,15 @@ def enhance(f):
 class ConstantFolder(BlockPass):
     """ Try to fold common constant expressions """
 
+    preserves_cfg = True
+
     def __init__(self):
         super().__init__()
         self.ops = {
             "+": enhance(operator.add),
             "-": enhance(operator.sub),
             "*": enhance(operator.mul),
-            "%": enhance(operator.mod),
+            "%": enhance(c_mod),
             "<<": enhance(operator.lshift),
             ">>": enhance(operator.rshift),
         }
@@ -84,6 +97,10 @@ class ConstantFolder(BlockPass):
             if isinstance(instruction, ir.Const):
                 continue
 
+            # Skip instructions without a used value, such as folded values:
+            if not (isinstance(instruction, ir.Value) and instruction.is_used):
+                continue
+
             if self.is_const(instruction):
                 # Now we can replace x = (4+5) with x = 9
                 cnst = self.eval_const(instruction)
@@ -135,3 +152,4 @@ class ConstantFolder(BlockPass):
                     count += 1
         if count > 0:
             self.logger.debug("Folded %i expressions", count)
+        return count > 0
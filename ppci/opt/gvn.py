@@ -0,0 +1,164 @@
+""" Global value numbering.
+
+Values which are computed more than once are replaced by the value
+computed first. The blocks are visited in a pre-order walk over the
+dominator tree, so that a value is only replaced by a value of which
+the definition dominates it.
+
+For example:
+
+.. code::
+
+    block1: {
+      i32 c = a + b;
+      cjmp c > 0 ? block2 : block3;
+    }
+
+    block2: {
+      i32 d = b + a;
+      ...
+    }
+
+Here ``d`` is replaced by ``c``. Constants are only numbered within
+a block.
+
+Loads are numbered as well, together with the state of the memory. A
+store, a call or a piece of inline assembly can change the memory, and
+give the memory a new number. A block takes over the state of the memory
+of its immediate dominator when that is its only predecessor, otherwise
+the memory gets a new number. A load after a store to the same address
+is replaced by the stored value.
+"""
+
+from .transform import FunctionPass
+from .. import ir
+
+
+# Binary operations of which the operands can be swapped:
+COMMUTATIVE_OPS = {"+", "*", "&", "|", "^"}
+
+# Instructions which can change memory:
+MEMORY_CLOBBERS = (
+    ir.Store,
+    ir.FunctionCall,
+    ir.ProcedureCall,
+    ir.CopyBlob,
+    ir.InlineAsm,
+)
+
+
+def value_key(instruction, memory):
+    """Determine a key for the value computed by an instruction.
+
+    Instructions with the same key compute the same value. Returns None
+    when the value cannot be numbered.
+    """
+    if isinstance(instruction, ir.Binop):
+        a, b = instruction.a, instruction.b
+        if instruction.operation in COMMUTATIVE_OPS and id(b) < id(a):
+            a, b = b, a
+        return (ir.Binop, instruction.operation, a, b, instruction.ty)
+    elif isinstance(instruction, ir.Unop):
+        return (ir.Unop, instruction.operation, instruction.a, instruction.ty)
+    elif isinstance(instruction, ir.Cast):
+        return (ir.Cast, instruction.src, instruction.ty)
+    elif isinstance(instruction, ir.Const):
+        # Constants are only numbered within a block, so that they can still
+        # be selected as immediate operands. Use the representation, to
+        # separate 1 from 1.0 and 0.0 from -0.0:
+        return (
+            ir.Const,
+            repr(instruction.value),
+            instruction.ty,
+            instruction.block,
+        )
+    elif isinstance(instruction, ir.Load) and not instruction.volatile:
+        return (ir.Load, instruction.address, instruction.ty, memory)
+
+
+class GlobalValueNumberingPass(FunctionPass):
+    """Replace values which are computed more than once by the value
+    computed first, also across basic blocks.
+    """
+
+    preserves_cfg = True
+
+    def on_function(self, function):
+        cfg_info = self.get_cfg_info(function)
+        cfg = cfg_info.cfg
+
+        self.memory_counter = 0
+        self.values = {}
+        self.replaced = 0
+
+        # Walk the dominator tree, and forget the values of a block
+        # when leaving it:
+        memory_out = {}
+        worklist = [(cfg.dominator_tree, None)]
+        while worklist:
+            tree_node, keys = worklist.pop()
+            if keys is not None:
+                for key in keys:
+                    del self.values[key]
+                continue
+
+            if not cfg_info.has_block(tree_node.node):
+                continue
+            block = cfg_info.get_block(tree_node.node)
+
+            # Determine the state of memory at the start of the block:
+            predecessors = cfg.predecessors(tree_node.node)
+            idom = cfg.get_immediate_dominator(tree_node.node)
+            if len(predecessors) == 1 and idom in predecessors:
+                memory = memory_out[idom]
+            else:
+                memory = self.new_memory()
+
+            keys = []
+            memory_out[tree_node.node] = self.number_block(
+                block, memory, keys
+            )
+            worklist.append((tree_node, keys))
+            for child in tree_node.children:
+                worklist.append((child, None))
+
+        if self.replaced:
+            self.logger.debug(
+                "Replaced %i values in %s", self.replaced, function.name
+            )
+        return self.replaced > 0
+
+    def new_memory(self):
+        self.memory_counter += 1
+        return self.memory_counter
+
+    def number_block(self, block, memory, keys):
+        """Number all values in a block.
+
+        Returns the state of the memory at the end of the block.
+        """
+        for instruction in list(block):
+            if isinstance(instruction, MEMORY_CLOBBERS):
+                memory = self.new_memory()
+                if (
+                    isinstance(instruction, ir.Store)
+                    and not instruction.volatile
+                ):
+                    # A load of the stored value gives the value itself:
+                    value = instruction.value
+                    key = (ir.Load, instruction.address, value.ty, memory)
+                    self.values[key] = value
+                    keys.append(key)
+
+            key = value_key(instruction, memory)
+            if key is None:
+                continue
+
+            if key in self.values:
+                instruction.replace_by(self.values[key])
+                instruction.remove_from_block()
+                self.replaced += 1
+            else:
+                self.values[key] = instruction
+                keys.append(key)
+        return memory
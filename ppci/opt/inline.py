@@ -1,12 +1,333 @@
+""" Function inlining.
+
+Calls to small functions are replaced by a copy of the function body.
+This saves the call overhead, such as the moves of the arguments and
+the setup of the stack frame, and gives the other optimizations more
+code to work on.
+"""
+
+from .transform import ModulePass
 from .. import ir
+from ..graph.callgraph import mod_to_call_graph
+from ..irutils.builder import split_block
+
+
+def inline_function(call, function: ir.SubRoutine):
+    """Replace the call instruction with the function implementation.
+
+    The blocks of the function are copied into the calling function. The
+    block containing the call is split in two, the first part jumps into
+    the copied function body, and each return jumps back to the second
+    part. The result of a function call is the returned value, or a phi
+    of the returned values when the function returns in several places.
+    """
+    assert isinstance(call, (ir.FunctionCall, ir.ProcedureCall))
+    assert call.callee is function
+    block = call.block
+    dst_function = block.function
+    _, continuation = split_block(
+        block,
+        pos=call.position + 1,
+        newname="{}_after_{}".format(block.name, function.name),
+    )
+
+    # Copy the function body:
+    cloner = Cloner(dst_function)
+    for parameter, argument in zip(function.arguments, call.arguments):
+        cloner.value_map[parameter] = argument
+    returns = cloner.clone_blocks(function.blocks, continuation)
+
+    # Jump into the copy, instead of calling the function:
+    jump = block.last_instruction
+    block.remove_instruction(jump)
+    jump.delete()
+    block.add_instruction(ir.Jump(cloner.block_map[function.entry]))
+
+    if isinstance(call, ir.FunctionCall):
+        if len(returns) == 1:
+            result = returns[0][1]
+        else:
+            result = ir.Phi("{}_result".format(call.name), call.ty)
+            for return_block, value in returns:
+                result.set_incoming(return_block, value)
+            continuation.insert_instruction(result)
+        call.replace_by(result)
+    call.remove_from_block()
+
+
+class Cloner:
+    """ Copies blocks with their instructions into a function """
+
+    def __init__(self, function):
+        self.function = function
+        self.value_map = {}
+        self.block_map = {}
+        self.placeholders = {}
+
+    def clone_blocks(self, blocks, continuation):
+        """Copy the given blocks, and let returns jump to the continuation.
+
+        Returns a list of blocks and the values they return.
+        """
+        for block in blocks:
+            # Prefix the name, since block names are used as labels:
+            block_copy = ir.Block(
+                "{}_{}".format(self.function.name, block.name)
+            )
+            self.function.add_block(block_copy)
+            self.block_map[block] = block_copy
+
+        returns = []
+        for block in blocks:
+            block_copy = self.block_map[block]
+            for instruction in block:
+                if isinstance(instruction, (ir.Return, ir.Exit)):
+                    if isinstance(instruction, ir.Return):
+                        returns.append(
+                            (block_copy, self.get_value(instruction.result))
+                        )
+                    block_copy.add_instruction(ir.Jump(continuation))
+                elif isinstance(instruction, ir.Alloc):
+                    # Allocate stack space once, not each time the copied
+                    # code is executed:
+                    alloc = self.clone_instruction(instruction)
+                    entry = self.function.entry
+                    first = next(i for i in entry if not i.is_phi)
+                    entry.insert_instruction(alloc, before_instruction=first)
+                    self.value_map[instruction] = alloc
+                else:
+                    instruction_copy = self.clone_instruction(instruction)
+                    block_copy.add_instruction(instruction_copy)
+                    if isinstance(instruction, ir.Value):
+                        self.value_map[instruction] = instruction_copy
+
+        # Values used before their definition was copied:
+        for value, placeholder in self.placeholders.items():
+            placeholder.replace_by(self.value_map[value])
+        return returns
+
+    def get_value(self, value):
+        """ Get the copy of a value """
+        if value in self.value_map:
+            return self.value_map[value]
+        elif isinstance(value, ir.LocalValue):
+            # The value is defined in a block which is not copied yet:
+            if value not in self.placeholders:
+                self.placeholders[value] = ir.Undefined(value.name, value.ty)
+            return self.placeholders[value]
+        else:
+            # Global values are shared:
+            return value
+
+    def clone_instruction(self, instruction):
+        """ Create a copy of the given instruction """
+        get_value = self.get_value
+        if isinstance(instruction, ir.Binop):
+            return ir.Binop(
+                get_value(instruction.a),
+                instruction.operation,
+                get_value(instruction.b),
+                instruction.name,
+                instruction.ty,
+            )
+        elif isinstance(instruction, ir.Unop):
+            return ir.Unop(
+                instruction.operation,
+                get_value(instruction.a),
+                instruction.name,
+                instruction.ty,
+            )
+        elif isinstance(instruction, ir.Const):
+            return ir.Const(
+                instruction.value, instruction.name, instruction.ty
+            )
+        elif isinstance(instruction, ir.Cast):
+            return ir.Cast(
+                get_value(instruction.src), instruction.name, instruction.ty
+            )
+        elif isinstance(instruction, ir.Load):
+            return ir.Load(
+                get_value(instruction.address),
+                instruction.name,
+                instruction.ty,
+                volatile=instruction.volatile,
+            )
+        elif isinstance(instruction, ir.Store):
+            return ir.Store(
+                get_value(instruction.value),
+                get_value(instruction.address),
+                volatile=instruction.volatile,
+            )
+        elif isinstance(instruction, ir.Alloc):
+            return ir.Alloc(
+                instruction.name, instruction.amount, instruction.alignment
+            )
+        elif isinstance(instruction, ir.AddressOf):
+            return ir.AddressOf(get_value(instruction.src), instruction.name)
+        elif isinstance(instruction, ir.CopyBlob):
+            return ir.CopyBlob(
+                get_value(instruction.dst),
+                get_value(instruction.src),
+                instruction.amount,
+            )
+        elif isinstance(instruction, ir.LiteralData):
+            return ir.LiteralData(instruction.data, instruction.name)
+        elif isinstance(instruction, ir.Undefined):
+            return ir.Undefined(instruction.name, instruction.ty)
+        elif isinstance(instruction, ir.FunctionCall):
+            return ir.FunctionCall(
+                get_value(instruction.callee),
+                [get_value(a) for a in instruction.arguments],
+                instruction.name,
+                instruction.ty,
+            )
+        elif isinstance(instruction, ir.ProcedureCall):
+            return ir.ProcedureCall(
+                get_value(instruction.callee),
+                [get_value(a) for a in instruction.arguments],
+            )
+        elif isinstance(instruction, ir.Phi):
+            phi = ir.Phi(instruction.name, instruction.ty)
+            for block, value in instruction.inputs.items():
+                phi.set_incoming(self.block_map[block], get_value(value))
+            return phi
+        elif isinstance(instruction, ir.Jump):
+            return ir.Jump(self.block_map[instruction.target])
+        elif isinstance(instruction, ir.CJump):
+            return ir.CJump(
+                get_value(instruction.a),
+                instruction.cond,
+                get_value(instruction.b),
+                self.block_map[instruction.lab_yes],
+                self.block_map[instruction.lab_no],
+            )
+        elif isinstance(instruction, ir.JumpTable):
+            return ir.JumpTable(
+                get_value(instruction.v),
+                [self.block_map[block] for block in instruction.table],
+                self.block_map[instruction.lab_default],
+            )
+        else:  # pragma: no cover
+            raise NotImplementedError(str(instruction))
+
+
+# Estimated amount of instructions for a call, and per argument:
+CALL_COST = 4
+ARGUMENT_COST = 1
+
+
+def routine_cost(routine):
+    """ Estimate the amount of machine instructions for a routine """
+    cost = 0
+    for instruction in routine.get_instructions():
+        if isinstance(instruction, ir.LiteralData):
+            # Literal data is copied as well, count it in words:
+            cost += (len(instruction.data) + 3) // 4
+        elif not isinstance(
+            instruction, (ir.Phi, ir.Undefined, ir.Alloc, ir.AddressOf)
+        ):
+            cost += 1
+    return cost
+
+
+def call_cost(call):
+    """Estimate the amount of machine instructions required for a call.
+    This is the code saved by inlining, apart from the returns."""
+    return CALL_COST + ARGUMENT_COST * len(call.arguments)
+
+
+def is_inlinable(routine):
+    """ Test if the body of a routine can be copied into another routine """
+    if routine.entry.predecessors or routine.entry.phis:
+        return False
+
+    instructions = list(routine.get_instructions())
+    if any(isinstance(i, ir.InlineAsm) for i in instructions):
+        return False
+
+    # A routine which never returns is not worth it:
+    return any(isinstance(i, (ir.Return, ir.Exit)) for i in instructions)
+
+
+class InlinePass(ModulePass):
+    """Inline calls to small functions.
+
+    The routines are visited bottom-up in the call graph, so that calls
+    within a function are inlined before the function itself is inlined.
+    Recursive calls are never inlined.
+
+    When optimizing for size, a call is only inlined when the function
+    body is not larger than the code for the call. When optimizing for
+    speed, functions up to a certain size are inlined, as long as the
+    calling function does not grow too large.
+
+    Args:
+        optimize_for: either 'size' or 'speed'.
+        max_inline_cost: the estimated size of the largest function to
+            inline when optimizing for speed.
+        max_caller_cost: the estimated size above which no more calls are
+            inlined into a function when optimizing for speed.
+    """
+
+    def __init__(
+        self, optimize_for="speed", max_inline_cost=40, max_caller_cost=2000
+    ):
+        super().__init__()
+        if optimize_for not in ("size", "speed"):
+            raise ValueError("Cannot optimize for {}".format(optimize_for))
+        self.optimize_for = optimize_for
+        self.max_inline_cost = max_inline_cost
+        self.max_caller_cost = max_caller_cost
+        self.inlined = []
+
+    def run(self, ir_module):
+        self.inlined = []
+        call_graph = mod_to_call_graph(ir_module)
+        functions = set(ir_module.functions)
+        for routines in call_graph.bottom_up():
+            for routine in routines:
+                if routine in functions:
+                    self.on_function(routine, set(routines))
+        return bool(self.inlined)
+
+    def on_function(self, function, recursive):
+        """Inline calls in the given function.
+
+        Calls to the routines in recursive are not inlined.
+        """
+        calls = [
+            instruction
+            for instruction in function.get_instructions()
+            if isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall))
+            and isinstance(instruction.callee, ir.SubRoutine)
+            and instruction.callee not in recursive
+        ]
+        cost = routine_cost(function)
+        for call in calls:
+            callee = call.callee
+            if not is_inlinable(callee):
+                continue
 
+            callee_cost = routine_cost(callee)
+            if self.optimize_for == "size":
+                inline = callee_cost <= call_cost(call)
+            else:
+                inline = (
+                    callee_cost <= self.max_inline_cost
+                    and cost + callee_cost <= self.max_caller_cost
+                )
 
-def inline_function(call: ir.ProcedureCall, function: ir.SubRoutine):
-    """ Replace the call instruction with the function implementation """
-    dst_function = call.function
-    for block in function:
-        block_copy = block.copy
-        dst_function.add_block(block_copy)
+            if inline:
+                self.logger.debug(
+                    "Inlining %s into %s", callee.name, function.name
+                )
+                inline_function(call, callee)
+                self.inlined.append((function.name, callee.name))
+                cost += callee_cost - call_cost(call)
 
-    for value, parameter in zip(call.arguments, function.arguments):
-        block
+    def report(self):
+        """ Get a list of lines telling which calls were inlined """
+        return [
+            "Inlined call to {} in {}".format(callee, caller)
+            for caller, callee in self.inlined
+        ]
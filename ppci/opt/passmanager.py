@@ -0,0 +1,150 @@
+""" Run a pipeline of optimization passes.
+
+The function passes of a pipeline are run over a function until none of
+them changes the function anymore. This is cheaper than running all
+passes a fixed number of times, since most functions are done after one
+or two rounds.
+"""
+
+import logging
+import time
+from collections import deque
+from .analysis import AnalysisCache
+from .transform import FunctionPass
+
+
+class PassStatistics:
+    """ Statistics of a single optimization pass """
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.changes = 0
+        self.time = 0.0
+
+    def __repr__(self):
+        return "{}: {} runs, {} changes, {:.3f} seconds".format(
+            self.name, self.runs, self.changes, self.time
+        )
+
+
+class PassManager:
+    """Run optimization passes over a module.
+
+    Consecutive function passes form a group. The passes of a group are
+    run over each function, and a function is queued again when one of
+    the passes changed it. Other passes, such as the inliner, are run
+    once over the whole module.
+
+    The control flow info of each function is kept in an analysis cache,
+    shared by the passes. A pass which changes the control flow of a
+    function drops its control flow info.
+
+    The time spent in each pass is collected in the statistics.
+
+    Args:
+        passes: the optimization passes to run, in order.
+        max_rounds: the maximum number of times a group of function
+            passes is run over a single function.
+    """
+
+    logger = logging.getLogger("passmanager")
+
+    def __init__(self, passes, max_rounds=10):
+        self.passes = list(passes)
+        self.max_rounds = max_rounds
+        self.analyses = AnalysisCache()
+        self.statistics = {}
+
+    def run(self, ir_module):
+        """Run the passes over the given module.
+
+        Returns True when the module was changed.
+        """
+        changed = False
+        for group in self.groups():
+            if isinstance(group, list):
+                if self.run_function_passes(group, ir_module):
+                    changed = True
+            elif self.run_module_pass(group, ir_module):
+                changed = True
+        return changed
+
+    def groups(self):
+        """ Split the passes into groups of function passes """
+        groups = []
+        for opt_pass in self.passes:
+            if isinstance(opt_pass, FunctionPass):
+                if groups and isinstance(groups[-1], list):
+                    groups[-1].append(opt_pass)
+                else:
+                    groups.append([opt_pass])
+            else:
+                groups.append(opt_pass)
+        return groups
+
+    def run_module_pass(self, opt_pass, ir_module):
+        """ Run a single pass over a module """
+        t1 = time.perf_counter()
+        changed = bool(opt_pass.run(ir_module))
+        self.record(opt_pass, changed, time.perf_counter() - t1)
+
+        if changed:
+            # This pass could have changed any function:
+            self.analyses.invalidate()
+        return changed
+
+    def run_function_passes(self, passes, ir_module):
+        """Run function passes over each function, until nothing changes
+        anymore."""
+        for opt_pass in passes:
+            opt_pass.start(ir_module, self.analyses)
+
+        changed = False
+        rounds = {}
+        worklist = deque(ir_module.functions)
+        while worklist:
+            function = worklist.popleft()
+            rounds[function] = rounds.get(function, 0) + 1
+            function_changed = False
+            for opt_pass in passes:
+                t1 = time.perf_counter()
+                pass_changed = opt_pass.run_on_function(function)
+                self.record(opt_pass, pass_changed, time.perf_counter() - t1)
+                if pass_changed:
+                    function_changed = True
+
+            if function_changed:
+                changed = True
+                if rounds[function] < self.max_rounds:
+                    worklist.append(function)
+                else:
+                    self.logger.warning(
+                        "%s still changes after %s rounds",
+                        function.name,
+                        rounds[function],
+                    )
+
+        for opt_pass in passes:
+            opt_pass.finish()
+        return changed
+
+    def record(self, opt_pass, changed, duration):
+        """ Add a run of a pass to the statistics """
+        name = repr(opt_pass)
+        if name not in self.statistics:
+            self.statistics[name] = PassStatistics(name)
+        statistics = self.statistics[name]
+        statistics.runs += 1
+        if changed:
+            statistics.changes += 1
+        statistics.time += duration
+
+    def report(self):
+        """ Get a line of statistics per pass, the slowest pass first """
+        return [
+            str(statistics)
+            for statistics in sorted(
+                self.statistics.values(), key=lambda s: s.time, reverse=True
+            )
+        ]
@@ -0,0 +1,316 @@
+""" Sparse conditional constant propagation.
+
+The values in a function are determined, assuming that each value is a
+constant, until shown otherwise. Only the blocks which can be reached,
+given the values known so far, are taken into account. This way,
+constants are propagated through phi instructions and loops, and
+conditional jumps on constant values are found.
+
+For example:
+
+.. code::
+
+    block1: {
+      i32 one = 1;
+      jmp block2;
+    }
+
+    block2: {
+      i32 x = phi block1: one, block3: y;
+      cjmp x > one ? block4 : block3;
+    }
+
+    block3: {
+      i32 y = x * one;
+      jmp block2;
+    }
+
+Here ``x`` and ``y`` are always one, the jump to ``block4`` is never
+taken, and ``block4`` is removed.
+
+The algorithm is from Mark N. Wegman and F. Kenneth Zadeck, Constant
+propagation with conditional branches.
+"""
+
+import operator
+from .transform import FunctionPass
+from .constantfolding import c_div, c_mod, cast, correct
+from .. import ir
+
+
+class Unknown:
+    """ Lattice value of a value which is not computed yet """
+
+    def __repr__(self):
+        return "unknown"
+
+
+class Varying:
+    """ Lattice value of a value which is not a constant """
+
+    def __repr__(self):
+        return "varying"
+
+
+UNKNOWN = Unknown()
+VARYING = Varying()
+
+
+BINARY_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "&": operator.and_,
+    "|": operator.or_,
+    "^": operator.xor,
+    "<<": operator.lshift,
+    ">>": operator.rshift,
+    "/": c_div,
+    "%": c_mod,
+}
+
+UNARY_OPS = {"-": operator.neg, "~": operator.invert}
+
+CONDITIONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+
+
+def is_constant(value):
+    return value is not UNKNOWN and value is not VARYING
+
+
+def meet(a, b):
+    """ Combine two lattice values """
+    if a is UNKNOWN:
+        return b
+    elif b is UNKNOWN:
+        return a
+    elif a is VARYING or b is VARYING:
+        return VARYING
+    elif repr(a) == repr(b):
+        # Compare the representation, to keep 1 and 1.0 apart:
+        return a
+    else:
+        return VARYING
+
+
+class SparseConditionalConstantPropagationPass(FunctionPass):
+    """Propagate constants through the blocks of a function, and replace
+    conditional jumps with a known outcome by jumps.
+
+    Blocks which are no longer reachable are removed.
+    """
+
+    def on_function(self, function):
+        self.values = {}
+        self.executable_blocks = set()
+        self.executable_edges = set()
+        self.value_worklist = []
+        self.block_worklist = [function.entry]
+        self.executable_blocks.add(function.entry)
+
+        while self.block_worklist or self.value_worklist:
+            while self.value_worklist:
+                value = self.value_worklist.pop()
+                for user in value.used_by:
+                    if user.block in self.executable_blocks:
+                        self.visit(user)
+
+            while self.block_worklist:
+                block = self.block_worklist.pop()
+                for instruction in block:
+                    self.visit(instruction)
+
+        return self.rewrite(function)
+
+    def visit(self, instruction):
+        """ Evaluate an instruction, given the values known so far """
+        if isinstance(instruction, ir.Phi):
+            value = UNKNOWN
+            for block, incoming in instruction.inputs.items():
+                if (block, instruction.block) in self.executable_edges:
+                    value = meet(value, self.get_value(incoming))
+            self.set_value(instruction, value)
+        elif isinstance(instruction, ir.JumpBase):
+            for target in self.get_targets(instruction):
+                self.add_edge(instruction.block, target)
+        elif isinstance(instruction, ir.Value):
+            self.set_value(instruction, self.evaluate(instruction))
+
+    def add_edge(self, block, target):
+        """ Mark a jump from block to target as executable """
+        if (block, target) in self.executable_edges:
+            return
+        self.executable_edges.add((block, target))
+        if target in self.executable_blocks:
+            # The phis get another incoming value:
+            for phi in target.phis:
+                self.visit(phi)
+        else:
+            self.executable_blocks.add(target)
+            self.block_worklist.append(target)
+
+    def get_value(self, value):
+        """ Get the lattice value of the given value """
+        if isinstance(value, ir.Const):
+            if value.ty.is_integer and isinstance(value.value, int):
+                return correct(value.value, value.ty)
+            return value.value
+        elif isinstance(value, ir.Parameter) or not isinstance(
+            value, ir.LocalValue
+        ):
+            return VARYING
+        else:
+            return self.values.get(value, UNKNOWN)
+
+    def set_value(self, value, lattice_value):
+        """ Lower the lattice value of a value """
+        old = self.values.get(value, UNKNOWN)
+        new = meet(old, lattice_value)
+        if new is not old:
+            self.values[value] = new
+            self.value_worklist.append(value)
+
+    def evaluate(self, instruction):
+        """ Determine the lattice value of an instruction """
+        if isinstance(instruction, ir.Const):
+            return self.get_value(instruction)
+        elif isinstance(instruction, ir.Binop):
+            return self.evaluate_binop(instruction)
+        elif isinstance(instruction, ir.Unop):
+            a = self.get_value(instruction.a)
+            if not is_constant(a):
+                return a
+            elif instruction.ty.is_integer and isinstance(a, int):
+                op = UNARY_OPS[instruction.operation]
+                return correct(op(a), instruction.ty)
+        elif isinstance(instruction, ir.Cast):
+            a = self.get_value(instruction.src)
+            if not is_constant(a):
+                return a
+            elif isinstance(a, int) and (
+                instruction.ty.is_integer
+                or isinstance(instruction.ty, ir.PointerTyp)
+            ):
+                return cast(a, instruction.ty)
+        return VARYING
+
+    def evaluate_binop(self, instruction):
+        a = self.get_value(instruction.a)
+        b = self.get_value(instruction.b)
+        if a is VARYING or b is VARYING:
+            return VARYING
+        elif a is UNKNOWN or b is UNKNOWN:
+            return UNKNOWN
+
+        ty = instruction.ty
+        operation = instruction.operation
+        if not (
+            ty.is_integer
+            and isinstance(a, int)
+            and isinstance(b, int)
+            and operation in BINARY_OPS
+        ):
+            return VARYING
+
+        # Leave undefined operations for run time:
+        if operation in ("/", "%") and b == 0:
+            return VARYING
+        if operation in ("<<", ">>") and not 0 <= b < ty.bits:
+            return VARYING
+
+        return correct(BINARY_OPS[operation](a, b), ty)
+
+    def get_targets(self, instruction):
+        """ Determine the blocks which a jump instruction can jump to """
+        if isinstance(instruction, ir.CJump):
+            a = self.get_value(instruction.a)
+            b = self.get_value(instruction.b)
+            if a is UNKNOWN or b is UNKNOWN:
+                return []
+            elif a is VARYING or b is VARYING:
+                return instruction.targets
+            elif CONDITIONS[instruction.cond](a, b):
+                return [instruction.lab_yes]
+            else:
+                return [instruction.lab_no]
+        elif isinstance(instruction, ir.JumpTable):
+            v = self.get_value(instruction.v)
+            if v is UNKNOWN:
+                return []
+            elif v is VARYING:
+                return instruction.targets
+            elif 0 <= v < len(instruction.table):
+                return [instruction.table[v]]
+            else:
+                return [instruction.lab_default]
+        else:
+            return instruction.targets
+
+    def rewrite(self, function):
+        """Replace constant values by constants, and remove jumps which
+        are never taken."""
+        replaced = 0
+        jumps = 0
+        for block in function:
+            if block not in self.executable_blocks:
+                continue
+
+            for instruction in list(block):
+                if isinstance(
+                    instruction, (ir.Binop, ir.Unop, ir.Cast, ir.Phi)
+                ) and is_constant(self.values.get(instruction, UNKNOWN)):
+                    self.replace_by_const(instruction)
+                    replaced += 1
+
+            jump = block.last_instruction
+            if isinstance(jump, (ir.CJump, ir.JumpTable)):
+                targets = self.get_targets(jump)
+                if len(targets) == 1:
+                    self.replace_jump(jump, targets[0])
+                    jumps += 1
+
+        unreachable = len(function.blocks) - len(self.executable_blocks)
+        if unreachable:
+            function.delete_unreachable()
+
+        if replaced or jumps:
+            self.logger.debug(
+                "Replaced %i values and %i jumps in %s",
+                replaced,
+                jumps,
+                function.name,
+            )
+        return bool(replaced or jumps or unreachable)
+
+    def replace_by_const(self, instruction):
+        """ Replace a value with a constant value """
+        block = instruction.block
+        const = ir.Const(
+            self.values[instruction], instruction.name, instruction.ty
+        )
+        if isinstance(instruction, ir.Phi):
+            # Constants are placed after the phis:
+            position = next(i for i in block if not i.is_phi)
+        else:
+            position = instruction
+        block.insert_instruction(const, before_instruction=position)
+        instruction.replace_by(const)
+        instruction.remove_from_block()
+
+    def replace_jump(self, jump, target):
+        """ Replace a conditional jump by a jump to the given target """
+        block = jump.block
+        for other in jump.targets:
+            if other is not target:
+                for phi in other.phis:
+                    phi.del_incoming(block)
+        block.remove_instruction(jump)
+        jump.delete()
+        block.add_instruction(ir.Jump(target))
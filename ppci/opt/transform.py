@@ -3,6 +3,8 @@
 import logging
 import abc
 from .. import ir
+from ..graph.domtree import CfgInfo
+from .analysis import AnalysisCache
 
 
 class ModulePass(metaclass=abc.ABCMeta):
@@ -22,25 +24,78 @@ class ModulePass(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def run(self, ir_module):  # pragma: no cover
-        """ Run this pass over a module """
+        """Run this pass over a module.
+
+        Returns True when the module was changed.
+        """
         raise NotImplementedError()
 
 
 class FunctionPass(ModulePass):
     """ Base pass that loops over all functions in a module """
 
+    # Passes which do not change the control flow set this to True, so
+    # the control flow info of a function is kept after a change:
+    preserves_cfg = False
+
+    def __init__(self):
+        super().__init__()
+        self.debug_db = None
+        self.analyses = None
+
     def run(self, ir_module: ir.Module):
-        """ Main entry point for the pass """
+        """Main entry point for the pass.
+
+        Returns True when a function was changed.
+        """
+        self.start(ir_module, AnalysisCache())
+        changed = False
+        for function in ir_module.functions:
+            if self.run_on_function(function):
+                changed = True
+        self.finish()
+        return changed
+
+    def start(self, ir_module, analyses):
+        """Prepare to run over the functions of a module, using the given
+        cache of analysis results."""
+        assert isinstance(ir_module, ir.Module)
         self.prepare()
         self.debug_db = ir_module.debug_db
-        assert isinstance(ir_module, ir.Module)
-        for function in ir_module.functions:
-            self.on_function(function)
+        self.analyses = analyses
+
+    def finish(self):
+        """ Done with the functions of a module """
         self.debug_db = None
+        self.analyses = None
+
+    def run_on_function(self, function):
+        """Run the pass over a single function.
+
+        Returns True when the function was changed. The cached analysis
+        results of a changed function are dropped.
+        """
+        changed = bool(self.on_function(function))
+        if changed and not self.preserves_cfg:
+            self.analyses.invalidate(function)
+        return changed
+
+    def get_cfg_info(self, function):
+        """Get control flow info, such as the dominators, of a function.
+
+        The info is shared with the other passes, so it must not be
+        changed.
+        """
+        if self.analyses is None:
+            return CfgInfo(function)
+        return self.analyses.get_cfg_info(function)
 
     @abc.abstractmethod
     def on_function(self, function: ir.SubRoutine):  # pragma: no cover
-        """ Override this virtual method """
+        """Override this virtual method.
+
+        Returns True when the function was changed.
+        """
         raise NotImplementedError()
 
 
@@ -49,12 +104,18 @@ class BlockPass(FunctionPass):
 
     def on_function(self, function):
         """ Loops over each block in the function """
+        changed = False
         for block in function.blocks:
-            self.on_block(block)
+            if self.on_block(block):
+                changed = True
+        return changed
 
     @abc.abstractmethod
     def on_block(self, block: ir.Block):  # pragma: no cover
-        """ Override this virtual method """
+        """Override this virtual method.
+
+        Returns True when the block was changed.
+        """
         raise NotImplementedError()
 
 
@@ -63,12 +124,18 @@ class InstructionPass(BlockPass):
 
     def on_block(self, block):
         """ Loops over each instruction in the block """
+        changed = False
         for instruction in block:
-            self.on_instruction(instruction)
+            if self.on_instruction(instruction):
+                changed = True
+        return changed
 
     @abc.abstractmethod
     def on_instruction(self, instruction):  # pragma: no cover
-        """ Override this virtual method """
+        """Override this virtual method.
+
+        Returns True when the instruction was changed.
+        """
         raise NotImplementedError()
 
 
@@ -77,30 +144,38 @@ class RemoveAddZeroPass(InstructionPass):
     Replace multiplication by 1 with value itself.
     """
 
+    preserves_cfg = True
+
     def on_instruction(self, instruction):
-        if type(instruction) is ir.Binop:
+        if type(instruction) is ir.Binop and instruction.is_used:
             if instruction.operation == "+":
                 if (
                     type(instruction.b) is ir.Const
                     and instruction.b.value == 0
                 ):
                     instruction.replace_by(instruction.a)
+                    return True
                 elif (
                     type(instruction.a) is ir.Const
                     and instruction.a.value == 0
                 ):
                     instruction.replace_by(instruction.b)
+                    return True
             elif instruction.operation == "*":
                 if (
                     type(instruction.b) is ir.Const
                     and instruction.b.value == 1
                 ):
                     instruction.replace_by(instruction.a)
+                    return True
+        return False
 
 
 class DeleteUnusedInstructionsPass(BlockPass):
     """ Remove unused variables from a block """
 
+    preserves_cfg = True
+
     def on_block(self, block):
         unused_instructions = [
             i
@@ -116,3 +191,4 @@ class DeleteUnusedInstructionsPass(BlockPass):
             instruction.remove_from_block()
         if count > 0:
             self.logger.debug("Deleted %i unused instructions", count)
+        return count > 0
@@ -201,8 +201,16 @@ def load_code_as_module(source_file, reporter=None):
     if march is None:
         raise NotImplementedError(sys.platform)
 
+    # Use the fast linear scan register allocator, since this code is
+    # compiled just before it is used:
     obj = c3c(
-        [source_file], [], march, debug=True, opt_level=2, reporter=reporter
+        [source_file],
+        [],
+        march,
+        debug=True,
+        opt_level=2,
+        reporter=reporter,
+        register_allocator="linear_scan",
     )
 
     # Convert obj to executable module
@@ -3,11 +3,11 @@
 """
 
 
+import io
 import logging
+import mmap
 import struct
 from contextlib import contextmanager
-from io import BytesIO
-from ...utils.leb128 import unsigned_leb128_decode, signed_leb128_decode
 from ..opcodes import ArgType, OPERANDS, REVERZ
 from ..components import Ref, Instruction, SECTION_IDS, DEFINITION_CLASSES
 from .. import components
@@ -16,19 +16,53 @@ from .io import LANG_TYPES_REVERSE
 
 logger = logging.getLogger("wasm")
 
+SECTION_NAMES = {
+    id: name for name, id in SECTION_IDS.items() if name != "code"
+}  # use "func" instead of "code"
+
+
+def map_file(f):
+    """Get the remaining contents of a file as a bytes-like object.
+
+    Regular files are memory mapped, to avoid copying them into memory.
+    Use :meth:`BinaryFileReader.close` to close the mapping.
+    """
+    try:
+        fileno = f.fileno()
+        offset = f.tell()
+        contents = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # Not a regular file, for example an io.BytesIO, or an empty file.
+        return f.read()
+    f.seek(0, io.SEEK_END)
+    return memoryview(contents)[offset:]
+
 
 class BinaryFileReader:
-    """ Reader which can read binary wasm. """
+    """Reader which can read binary wasm.
+
+    The binary data is accessed via a memoryview, so that sections can be
+    processed without copying them. The data can be given as a bytes-like
+    object or as a file. Files backed by a file descriptor are memory
+    mapped, other files are read into memory at once. Function bodies are
+    copied, since they are decoded after the data is closed.
+    """
 
     def __init__(self, f):
-        self._f = [f]
-        self._buffer = bytes()
+        if hasattr(f, "read"):
+            f = map_file(f)
+        self._data = memoryview(f)
         self._pos = 0
+        self._end = len(self._data)
 
-        self._section_id_to_name = {}
-        for name, id in SECTION_IDS.items():
-            if name != "code":  # use "func" instead
-                self._section_id_to_name[id] = name
+    def close(self):
+        """ Release the binary data, and close the mapping of a file """
+        data = self._data
+        self._data = None
+        mapping = data.obj
+        data.release()
+        if isinstance(mapping, mmap.mmap):
+            mapping.close()
 
     def read_module(self, module):
         """ Load a module from wasm binary format. """
@@ -49,14 +83,9 @@ class BinaryFileReader:
 
         # Read sections that contain definitions
         self._definitions = []
-        while True:
-            try:
-                section_id = self.read_byte()
-            except EOFError:
-                break
-
-            section_data = self.read_length_prefixed_bytes()
-            with self.push_data(section_data):
+        while self._pos < self._end:
+            section_id = self.read_byte()
+            with self.limit(self.read_uint()):
                 self.read_section(section_id)
 
         logger.info(
@@ -68,7 +97,7 @@ class BinaryFileReader:
 
     def read_section(self, section_id):
         """ Process a single section. """
-        section_name = self._section_id_to_name[section_id]
+        section_name = SECTION_NAMES[section_id]
         logger.debug("Loading %s section", section_name)
 
         if section_name == "function":
@@ -123,58 +152,102 @@ class BinaryFileReader:
         return mp[cls]()
 
     def read_exactly(self, amount=None):
-        if amount is not None and amount < 0:
+        """Read the given amount of bytes, or all remaining bytes.
+
+        The data is returned as a memoryview into the binary data.
+        """
+        if amount is None:
+            amount = self._end - self._pos
+        elif amount < 0:
             raise ValueError("Cannot read {} bytes".format(amount))
-        data = self._f[-1].read(amount)
-        if amount is not None and len(data) != amount:
+        pos = self._pos
+        if pos + amount > self._end:
             raise EOFError("Reading beyond end of file")
-        return data
+        self._pos = pos + amount
+        return self._data[pos : pos + amount]
 
     @contextmanager
-    def push_data(self, data):
-        """Process the given data first."""
-        self._f.append(BytesIO(data))
+    def limit(self, amount):
+        """Process the next amount of bytes, which must be consumed
+        entirely."""
+        end = self._pos + amount
+        if end > self._end:
+            raise EOFError("Reading beyond end of file")
+        outer_end = self._end
+        self._end = end
         yield
-        f = self._f.pop()
-        remaining = f.read()
-        assert remaining == bytes(), str(remaining)
+        assert self._pos == end, str(bytes(self._data[self._pos : end]))
+        self._end = outer_end
 
     def read_fmt(self, fmt):
         """ Read data according to the given format. """
         size = struct.calcsize(fmt)
-        data = self.read_exactly(size)
-        return struct.unpack(fmt, data)[0]
-
-    def bytefile(self, f):
-        b = f.read(1)
-        while b:
-            yield b[0]
-            b = f.read(1)
-
-    def __next__(self):
-        b = self.read_exactly(1)
-        return b[0]
+        pos = self._pos
+        if pos + size > self._end:
+            raise EOFError("Reading beyond end of file")
+        self._pos = pos + size
+        return struct.unpack_from(fmt, self._data, pos)[0]
 
     def read_byte(self):
         """ Read the value of a single byte """
-        data = self.read_exactly(1)
-        return data[0]
+        pos = self._pos
+        if pos >= self._end:
+            raise EOFError("Reading beyond end of file")
+        self._pos = pos + 1
+        return self._data[pos]
 
     def read_int(self):
         """ Read variable size signed int """
-        return signed_leb128_decode(self)
+        data = self._data
+        pos = self._pos
+        result = 0
+        shift = 0
+        try:
+            while True:
+                byte = data[pos]
+                pos += 1
+                result |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+        except IndexError:
+            raise EOFError("Reading beyond end of file")
+        if pos > self._end:
+            raise EOFError("Reading beyond end of file")
+        self._pos = pos
+        # Sign extend from the last sign bit:
+        if byte & 0x40:
+            result -= 1 << shift
+        return result
 
     def read_uint(self):
         """ Read variable size unsigned integer """
-        return unsigned_leb128_decode(self)
+        data = self._data
+        pos = self._pos
+        try:
+            byte = data[pos]
+            pos += 1
+            result = byte & 0x7F
+            shift = 7
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                result |= (byte & 0x7F) << shift
+                shift += 7
+        except IndexError:
+            raise EOFError("Reading beyond end of file")
+        if pos > self._end:
+            raise EOFError("Reading beyond end of file")
+        self._pos = pos
+        return result
 
     def read_f32(self) -> float:
         """ Read a single f32 value """
-        return self.read_fmt("f")
+        return self.read_fmt("<f")
 
     def read_f64(self) -> float:
         """ Read a single f64 value """
-        return self.read_fmt("d")
+        return self.read_fmt("<d")
 
     def read_u32(self) -> int:
         """ Read a single u32 value """
@@ -183,12 +256,12 @@ class BinaryFileReader:
     def read_length_prefixed_bytes(self) -> bytes:
         """ Read length prefixed raw bytes data """
         amount = self.read_uint()
-        return self.read_exactly(amount)
+        return bytes(self.read_exactly(amount))
 
     def read_str(self):
         """ Read a string """
-        data = self.read_length_prefixed_bytes()
-        return data.decode("utf-8")
+        amount = self.read_uint()
+        return str(self.read_exactly(amount), "utf-8")
 
     def read_type(self):
         """ Read a wasm type """
@@ -249,33 +322,16 @@ class BinaryFileReader:
         if binopcode == 0xFC:
             opcode2 = self.read_uint()
             binopcode = (binopcode, opcode2)
-        opcode = REVERZ[binopcode]
-        operands = OPERANDS[opcode]
-        # print(opcode, type, operands)
-        args = []
-        for operand in operands:
-            if operand in rfm:
-                arg = rfm[operand](self)
-            elif operand == "byte":
-                arg = self.read_byte()
-            elif operand == "br_table":
-                count = self.read_uint()
-                vec = []
-                for _ in range(count + 1):
-                    idx = self.read_space_ref("label")
-                    vec.append(idx)
-                arg = vec
-            else:  # pragma: no cover
-                raise NotImplementedError(operand)
-            args.append(arg)
-        args = tuple(args)
-
-        block_types = ("block", "loop", "if")
-        if opcode in block_types:
-            instruction = components.BlockInstruction(opcode, *args)
+        opcode, cls, readers = instruction_readers[binopcode]
+        if readers:
+            return cls(opcode, *[read(self) for read in readers])
         else:
-            instruction = Instruction(opcode, *args)
-        return instruction
+            return cls(opcode)
+
+    def read_br_table(self):
+        """ Read the labels of a br_table instruction """
+        count = self.read_uint()
+        return [self.read_space_ref("label") for _ in range(count + 1)]
 
     def read_type_definition(self):
         """ Read a type definition. """
@@ -364,27 +420,35 @@ class BinaryFileReader:
         return components.Elem(ref, offset, refs)
 
     def read_func_definition(self, index):
-        """ Read a function with locals and instructions. """
-        # First read on the function body block:
-        body_data = self.read_length_prefixed_bytes()
-
-        with self.push_data(body_data):
-            num_local_pairs = self.read_uint()
-            localz = []
-            for _ in range(num_local_pairs):
-                c = self.read_uint()
-                t = self.read_type()
-                localz.extend([(None, t)] * c)
-            instructions = self.read_expression()
+        """Read a function definition.
+
+        The locals and instructions of the function are not decoded here,
+        but only when they are accessed for the first time.
+        """
+        amount = self.read_uint()
+        body = bytes(self.read_exactly(amount))
 
         # Function type ref:
         ref = Ref("type", index=self._type4func[index])
 
         id = self.gen_id("func")
-        func = components.Func(id, ref, localz, instructions)
+        func = components.Func._from_body(id, ref, body)
         self.add_definition("func", func)
         return func
 
+    def read_func_body(self):
+        """ Read the locals and instructions of a function body. """
+        num_local_pairs = self.read_uint()
+        localz = []
+        for _ in range(num_local_pairs):
+            c = self.read_uint()
+            t = self.read_type()
+            localz.extend([(None, t)] * c)
+        instructions = self.read_expression()
+        if self._pos != self._end:
+            raise ValueError("Function body has trailing data")
+        return localz, instructions
+
     def read_data_definition(self):
         """ Read a data definition. """
         ref = self.read_space_ref("memory")
@@ -395,7 +459,7 @@ class BinaryFileReader:
     def read_custom_definition(self):
         """ Read a custom definition. """
         name = self.read_str()
-        data = self.read_exactly()
+        data = bytes(self.read_exactly())
         return components.Custom(name, data)
 
 
@@ -413,4 +477,17 @@ rfm = {
     ArgType.I64: lambda reader: reader.read_int(),
     ArgType.F32: lambda reader: reader.read_f32(),
     ArgType.F64: lambda reader: reader.read_f64(),
+    "byte": lambda reader: reader.read_byte(),
+    "br_table": lambda reader: reader.read_br_table(),
+}
+
+# Per binary opcode the opcode, instruction class and argument readers:
+block_types = ("block", "loop", "if")
+instruction_readers = {
+    binopcode: (
+        opcode,
+        components.BlockInstruction if opcode in block_types else Instruction,
+        tuple(rfm[operand] for operand in OPERANDS[opcode]),
+    )
+    for binopcode, opcode in REVERZ.items()
 }
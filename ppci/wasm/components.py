@@ -240,11 +240,20 @@ class Module(WASMComponent):
 
         load_tuple(self, t)
 
+    def _from_bytes(self, b):
+        from .binary.reader import BinaryFileReader
+
+        reader = BinaryFileReader(b)
+        reader.read_module(self)
+
     def _from_file(self, f):
         from .binary.reader import BinaryFileReader
 
         reader = BinaryFileReader(f)
-        reader.read_module(self)
+        try:
+            reader.read_module(self)
+        finally:
+            reader.close()
 
     def to_string(self):
         from .text.writer import TextWriter
@@ -668,11 +677,14 @@ class Func(Definition):
       implicit id's (note that the id is offset by the parameters).
     * instructions: a list of instructions (may be given as tuples).
 
+    When loaded from binary wasm, the locals and instructions are decoded
+    from the function body when they are accessed for the first time.
     """
 
     # todo: force local ids to be either int or str?
 
-    __slots__ = ("id", "ref", "locals", "instructions")  # ref to type
+    __slots__ = ("id", "ref", "_locals", "_instructions", "_body")
+    _fields = ("id", "ref", "locals", "instructions")  # ref to type
 
     def _from_args(self, id, ref, locals, instructions):
         if not isinstance(ref, Ref):
@@ -682,17 +694,63 @@ class Func(Definition):
         assert all(isinstance(el, tuple) and len(el) == 2 for el in locals)
         self.id = check_id(id)
         self.ref = ref
-        self.locals = tuple(locals)
+        self._body = None
+        self._locals = tuple(locals)
         # Parse instructions
         if instructions and isinstance(instructions[0], Instruction):
-            self.instructions = instructions  # assume all are instructions
+            self._instructions = instructions  # assume all are instructions
         else:
             blocktypes = ("block", "loop", "if")
-            self.instructions = [
+            self._instructions = [
                 (BlockInstruction if i[0] in blocktypes else Instruction)(*i)
                 for i in instructions
             ]
 
+    @classmethod
+    def _from_body(cls, id, ref, body):
+        """Create a function from its binary body, which is decoded
+        lazily."""
+        func = cls.__new__(cls)
+        func.id = id
+        func.ref = ref
+        func._body = body
+        return func
+
+    def __getitem__(self, i):
+        return getattr(self, self._fields[i])
+
+    def _decode_body(self):
+        from .binary.reader import BinaryFileReader
+
+        localz, instructions = BinaryFileReader(self._body).read_func_body()
+        self._body = None
+        self._locals = tuple(localz)
+        self._instructions = instructions
+
+    @property
+    def locals(self):
+        if self._body is not None:
+            self._decode_body()
+        return self._locals
+
+    @locals.setter
+    def locals(self, locals):
+        if self._body is not None:
+            self._decode_body()
+        self._locals = locals
+
+    @property
+    def instructions(self):
+        if self._body is not None:
+            self._decode_body()
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, instructions):
+        if self._body is not None:
+            self._decode_body()
+        self._instructions = instructions
+
     def __repr__(self):
         return "<WASM-Func %s>" % (self.id)
 
@@ -1,10 +1,53 @@
 import logging
 import abc
+from ...irutils import verify_module
+from ...opt import (
+    CleanPass,
+    ConstantFolder,
+    DeleteUnusedInstructionsPass,
+    LoadAfterStorePass,
+    Mem2RegPromotor,
+    RemoveAddZeroPass,
+)
 from .. import components
 
 logger = logging.getLogger("instantiate")
 
 
+def optimize_wasm_ir(ppci_module, opt_level, reporter):
+    """Optimize ir-code generated from wasm.
+
+    Wasm locals are translated into stack variables, so that promoting
+    them into registers is by far the most effective optimization. This
+    is done at level 1. Level 2 adds constant folding and the removal of
+    redundant loads.
+
+    Common subexpression elimination is left out, since it increases the
+    register pressure of native code, which results in spilling with the
+    linear scan register allocator.
+    """
+    if opt_level == 0:
+        return
+    elif opt_level == 1:
+        opt_passes = [Mem2RegPromotor()]
+    elif opt_level == 2:
+        opt_passes = [
+            Mem2RegPromotor(),
+            RemoveAddZeroPass(),
+            ConstantFolder(),
+            LoadAfterStorePass(),
+        ]
+    else:
+        raise ValueError("Invalid optimization level {}".format(opt_level))
+    opt_passes += [DeleteUnusedInstructionsPass(), CleanPass()]
+
+    for opt_pass in opt_passes:
+        opt_pass.run(ppci_module)
+    verify_module(ppci_module)
+    reporter.message("{} after optimization:".format(ppci_module))
+    reporter.dump_ir(ppci_module)
+
+
 class ModuleInstance(abc.ABC):
     """ Web assembly module instance """
 
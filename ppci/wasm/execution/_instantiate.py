@@ -19,7 +19,12 @@ __all__ = ("instantiate",)
 
 
 def instantiate(
-    module, imports=None, target="native", reporter=None, cache_file=None
+    module,
+    imports=None,
+    target="native",
+    reporter=None,
+    cache_file=None,
+    opt_level=2,
 ):
     """Instantiate a wasm module.
 
@@ -30,7 +35,11 @@ def instantiate(
                 Use 'python' to generate python code. This option is slower
                 but more reliable.
         reporter: A reporter which can record detailed compilation information.
-        cache_file: a file to use as cache
+        cache_file: a directory or :class:`ppci.build.cache.ObjectCache`
+                    used to cache the compiled code of the 'native' target.
+                    When not given, the directory in the PPCI_CACHE_DIR
+                    environment variable is used, if it is set.
+        opt_level: the optimization level of the ir-code. Can be 0, 1 or 2.
 
     """
     if imports is None:
@@ -66,9 +75,13 @@ def instantiate(
         symbols["wasm_rt_{}".format(func_name)] = func
 
     if target == "native":
-        instance = native_instantiate(module, symbols, reporter, cache_file)
+        instance = native_instantiate(
+            module, symbols, reporter, cache_file, opt_level
+        )
     elif target == "python":
-        instance = python_instantiate(module, symbols, reporter, cache_file)
+        instance = python_instantiate(
+            module, symbols, reporter, cache_file, opt_level
+        )
     else:
         raise ValueError("Unknown instantiation target {}".format(target))
 
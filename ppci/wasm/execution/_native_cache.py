@@ -0,0 +1,118 @@
+""" Persistent cache for natively compiled wasm modules.
+
+Compiling a wasm module into native code takes a while, so the compiled
+code is stored on disk, keyed by a hash of the wasm binary, the host
+architecture and the optimization level. A second instantiation of the
+same module can skip the translation into ir-code and code generation.
+
+The format of a cache entry is:
+
+- the magic bytes ``PPCIWASM``
+- the format version and the size of the header, as two 32 bits integers
+- a json header with the function and global names of the module
+- the object file in the compact binary object format
+
+"""
+
+import hashlib
+import json
+import os
+import struct
+from ... import __version__
+from ...build.cache import ObjectCache, CACHE_DIR_ENV
+from ...binutils.binary_object import read_object, object_to_bytes
+
+#: Version of the format of the cached modules, increment this when
+#: the format or the compiled code changes.
+FORMAT_VERSION = 1
+
+MAGIC = b"PPCIWASM"
+HEADER_FMT = "<II"
+
+
+class CompiledModule:
+    """ A wasm module compiled into an object file """
+
+    def __init__(self, obj, function_names, global_names):
+        self.obj = obj
+        self.function_names = function_names
+        self.global_names = global_names
+
+
+class NativeModuleCache(ObjectCache):
+    """Persistent on-disk cache of natively compiled wasm modules.
+
+    Args:
+        directory: the directory in which the modules are stored.
+        max_size: the maximum amount of bytes to store in the cache.
+    """
+
+    # Listed in CACHE_SUFFIXES, so that the size bound of a cache
+    # directory includes the compiled modules:
+    suffix = ".wasmobj"
+
+    def make_key(self, module, march, opt_level):
+        """Calculate the cache key for the given wasm module.
+
+        The key is a hash of the binary wasm module, the machine id
+        string and the optimization level.
+        """
+        h = hashlib.sha256()
+        h.update(
+            "ppci {} wasm {}\n".format(__version__, FORMAT_VERSION).encode()
+        )
+        h.update("{} {}\n".format(march.make_id_str(), opt_level).encode())
+        h.update(module.to_bytes())
+        return h.hexdigest()
+
+    def serialize(self, compiled_module):
+        header = json.dumps(
+            {
+                "function_names": compiled_module.function_names,
+                "global_names": compiled_module.global_names,
+            }
+        ).encode("utf-8")
+        return b"".join(
+            [
+                MAGIC,
+                struct.pack(HEADER_FMT, FORMAT_VERSION, len(header)),
+                header,
+                object_to_bytes(compiled_module.obj),
+            ]
+        )
+
+    def deserialize(self, data):
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError("Not a compiled wasm module")
+        offset = len(MAGIC)
+        version, header_size = struct.unpack_from(HEADER_FMT, data, offset)
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported format version {}".format(version))
+        offset += struct.calcsize(HEADER_FMT)
+        header = json.loads(
+            data[offset : offset + header_size].decode("utf-8")
+        )
+        obj = read_object(data[offset + header_size :])
+        return CompiledModule(
+            obj, header["function_names"], header["global_names"]
+        )
+
+
+def get_native_cache(cache):
+    """Get a compiled module cache from the given argument.
+
+    The argument can be a directory name, an ObjectCache, in which case
+    its directory is used, or None. When None is given, the directory
+    in the PPCI_CACHE_DIR environment variable is used, if set.
+    """
+    if cache is None:
+        cache = os.environ.get(CACHE_DIR_ENV) or None
+
+    if cache is None or isinstance(cache, NativeModuleCache):
+        return cache
+    elif isinstance(cache, ObjectCache):
+        return NativeModuleCache(cache.directory, max_size=cache.max_size)
+    elif isinstance(cache, str):
+        return NativeModuleCache(cache)
+    else:
+        raise TypeError("Invalid cache {}".format(cache))
@@ -3,8 +3,6 @@
 """
 
 import logging
-import os
-import shelve
 import struct
 
 from ...utils.codepage import load_obj, MemoryPage
@@ -13,51 +11,67 @@ from .. import wasm_to_ir
 from ..components import Table
 from ..util import PAGE_SIZE
 from ._base_instance import ModuleInstance, WasmMemory, WasmGlobal
+from ._base_instance import optimize_wasm_ir
+from ._native_cache import CompiledModule, get_native_cache
 
 
 logger = logging.getLogger("instantiate")
 
 
-def native_instantiate(module, imports, reporter, cache_file):
+def native_instantiate(module, imports, reporter, cache_file, opt_level=2):
     """ Load wasm module native """
-    from ...api import ir_to_object, get_current_arch
+    from ...api import get_current_arch
 
     logger.info("Instantiating wasm module as native code")
     arch = get_current_arch()
-    # key = (arch, module)
-    # TODO: think of clever caching trickery:
-    cache_file = None
-    if cache_file and os.path.exists(cache_file):
-        logger.info("Using cached object from %s", cache_file)
-        with shelve.open(cache_file) as s:
-            obj = s["obj"]
-            ppci_module = s["ppci_module"]
+
+    # The cache short circuits compilation when this module was
+    # compiled before:
+    cache = get_native_cache(cache_file)
+    if cache:
+        cache_key = cache.make_key(module, arch, opt_level)
+        compiled_module = cache.get(cache_key)
+        if compiled_module:
+            reporter.message("Using cached module {}".format(cache_key))
     else:
-        # TODO: use cache here to short circuit re-compilation
-        # hash(key)
-        # print(hash(key))
-        # hgkfdg
-        ppci_module = wasm_to_ir(
-            module, arch.info.get_type_info("ptr"), reporter=reporter
-        )
-        verify_module(ppci_module)
-
-        # This is fun: optimizing might slow down actual performance X-(
-        # from ...api import optimize
-        # optimize(ppci_module, level=2, reporter=reporter)
-
-        obj = ir_to_object([ppci_module], arch, debug=True, reporter=reporter)
-        if cache_file:
-            logger.info("Saving object to %s for later use", cache_file)
-            with shelve.open(cache_file) as s:
-                s["obj"] = obj
-                s["ppci_module"] = ppci_module
-    instance = NativeModuleInstance(obj, imports)
-    instance._wasm_function_names = ppci_module._wasm_function_names
-    instance._wasm_global_names = ppci_module._wasm_global_names
+        compiled_module = None
+
+    if not compiled_module:
+        compiled_module = native_compile(module, arch, reporter, opt_level)
+        if cache:
+            cache.put(cache_key, compiled_module)
+
+    instance = NativeModuleInstance(compiled_module.obj, imports)
+    instance._wasm_function_names = compiled_module.function_names
+    instance._wasm_global_names = compiled_module.global_names
     return instance
 
 
+def native_compile(module, arch, reporter, opt_level):
+    """ Compile a wasm module into native code """
+    from ...api import ir_to_object
+
+    ppci_module = wasm_to_ir(
+        module, arch.info.get_type_info("ptr"), reporter=reporter
+    )
+    verify_module(ppci_module)
+    optimize_wasm_ir(ppci_module, opt_level, reporter)
+
+    # Use the fast linear scan register allocator, since the code is
+    # compiled just in time:
+    obj = ir_to_object(
+        [ppci_module],
+        arch,
+        debug=True,
+        reporter=reporter,
+        register_allocator="linear_scan",
+    )
+    global_names = [g[1].name for g in ppci_module._wasm_global_names]
+    return CompiledModule(
+        obj, ppci_module._wasm_function_names, global_names
+    )
+
+
 class NativeModuleInstance(ModuleInstance):
     """ Wasm module loaded as natively compiled code """
 
@@ -184,7 +198,7 @@ class NativeWasmGlobal(WasmGlobal):
 
     def _get_ptr(self):
         # print('Getting address of', self.name)
-        vpointer = getattr(self._code_obj, self.name[1].name)
+        vpointer = getattr(self._code_obj, self.name)
         return vpointer
 
     def read(self):
@@ -11,11 +11,12 @@ from ..components import Table
 from .. import wasm_to_ir
 from ..util import PAGE_SIZE
 from ._base_instance import ModuleInstance, WasmMemory, WasmGlobal
+from ._base_instance import optimize_wasm_ir
 
 logger = logging.getLogger("instantiate")
 
 
-def python_instantiate(module, imports, reporter, cache_file):
+def python_instantiate(module, imports, reporter, cache_file, opt_level=2):
     """ Load wasm module as a PythonModuleInstance """
     from ...api import ir_to_python
 
@@ -23,6 +24,7 @@ def python_instantiate(module, imports, reporter, cache_file):
     ptr_info = TypeInfo(4, 4)
     ppci_module = wasm_to_ir(module, ptr_info, reporter=reporter)
     verify_module(ppci_module)
+    optimize_wasm_ir(ppci_module, opt_level, reporter)
     f = io.StringIO()
     ir_to_python([ppci_module], f, reporter=reporter)
     pysrc = f.getvalue()
@@ -156,8 +158,8 @@ class PythonWasmGlobal(WasmGlobal):
         addr = self._get_ptr()
         # print('Writing', self.name, addr)
         mp = {
-            ir.i32: self.instance._py_module.write_i32,
-            ir.i64: self.instance._py_module.write_i64,
+            ir.i32: self.instance._py_module.store_i32,
+            ir.i64: self.instance._py_module.store_i64,
         }
         f = mp[self.name[0]]
-        f(addr, value)
+        f(value, addr)
@@ -18,6 +18,7 @@ from functools import reduce
 import operator
 from .. import ir
 from ..graph import relooper
+from ..irutils import lower_jump_tables
 from . import components
 from ..codegen.irdag import SelectionGraphBuilder, prepare_function_info
 from ..codegen.irdag import FunctionInfo
@@ -247,6 +248,9 @@ class IrToWasmCompiler:
         self.stack = 0
         self.logger.debug("Generating wasm for %s", ir_function)
 
+        # The relooper only knows two way branches:
+        lower_jump_tables(ir_function)
+
         # Generate function code:
         # Create a selection graph, so that we have expression trees
         arch = WasmArchitecture()
@@ -565,6 +565,9 @@ class WasmToIrCompiler:
         )
         self.stack = []
         self.block_stack = []
+        self.memory_base = None
+        self.memory_base_changes = 0
+        self.hoisted_loops = find_hoistable_loops(wasm_function.instructions)
 
         # Create correct debug signature for function:
 
@@ -1102,16 +1105,50 @@ class WasmToIrCompiler:
             self.emit(ir.Store(value, address))
 
     def get_memory_address(self, offset):
-        """ Emit code to retrieve a memory address """
+        """Emit code to retrieve a memory address.
+
+        The constant offset is added last, so that it can be folded into
+        the load or store by instruction selection.
+        """
         base = self.pop_value()
         if base.ty is not ir.ptr:
             base = self.emit(ir.Cast(base, "cast", ir.ptr))
-        offset = self.emit(ir.Const(offset, "offset", ir.ptr))
-        address = self.emit(ir.add(base, offset, "address", ir.ptr))
-        mem0 = self.emit(ir.Load(self.memory_base_address, "mem0", ir.ptr))
-        address = self.emit(ir.add(mem0, address, "address", ir.ptr))
+        mem0 = self.get_memory_base()
+        address = self.emit(ir.add(mem0, base, "address", ir.ptr))
+        if offset:
+            offset = self.emit(ir.Const(offset, "offset", ir.ptr))
+            address = self.emit(ir.add(address, offset, "address", ir.ptr))
         return address
 
+    def get_memory_base(self):
+        """Get the memory base address.
+
+        The base address is loaded once, and reused for as long as
+        the loaded value dominates the code. It only changes during
+        memory growth, which can happen during calls.
+        """
+        if self.memory_base is None:
+            self.memory_base = self.emit(
+                ir.Load(self.memory_base_address, "mem0", ir.ptr)
+            )
+        return self.memory_base
+
+    def invalidate_memory_base(self):
+        """ The memory might have moved, load the base address again """
+        self.memory_base = None
+        self.memory_base_changes += 1
+
+    def restore_memory_base(self, block):
+        """Determine the memory base after a block.
+
+        The memory base of the start of the block can be used after the
+        block, if it was not changed inside the block.
+        """
+        if block.memory_base_changes == self.memory_base_changes:
+            self.memory_base = block.memory_base
+        else:
+            self.memory_base = None
+
     @property
     def is_reachable(self):
         """ Determine if the current position is reachable """
@@ -1149,6 +1186,8 @@ class WasmToIrCompiler:
                 param_phis,
                 result_phis,
                 stack_start,
+                self.memory_base,
+                self.memory_base_changes,
             )
         )
 
@@ -1160,6 +1199,11 @@ class WasmToIrCompiler:
             inner_block = self.new_block()
             continue_block = self.new_block()
             self.fill_phis(param_phis)
+            if id(instruction) in self.hoisted_loops:
+                # Load the memory base before the loop:
+                self.get_memory_base()
+            else:
+                self.memory_base = None
             self.emit(ir.Jump(inner_block))
             self.builder.set_block(inner_block)
             for phi in param_phis:
@@ -1178,6 +1222,8 @@ class WasmToIrCompiler:
                 param_phis,
                 result_phis,
                 stack_start,
+                self.memory_base,
+                self.memory_base_changes,
             )
         )
 
@@ -1188,6 +1234,7 @@ class WasmToIrCompiler:
         code as well.
         """
         block = self.pop_block()
+        self.restore_memory_base(block)
 
         # If we are not unreachable:
         if self.is_reachable:
@@ -1257,6 +1304,8 @@ class WasmToIrCompiler:
                 param_values,
                 result_phis,
                 stack_start,
+                self.memory_base,
+                self.memory_base_changes,
             )
         )
 
@@ -1275,6 +1324,9 @@ class WasmToIrCompiler:
         if self.is_reachable:
             self.emit(ir.Jump(continue_block))
         self.builder.set_block(else_block)
+
+        # The else block is reached from the start of the if:
+        self.memory_base = if_block.memory_base
         self.block_stack.append(
             BlockLevel(
                 "else",
@@ -1283,6 +1335,8 @@ class WasmToIrCompiler:
                 if_block.param_phis,
                 if_block.result_phis,
                 if_block.stack_start,
+                if_block.memory_base,
+                if_block.memory_base_changes,
             )
         )
 
@@ -1337,6 +1391,7 @@ class WasmToIrCompiler:
                 value = self.emit(
                     ir.FunctionCall(target, args, "call", ir_typ)
                 )
+                self.invalidate_memory_base()
                 self.push_value(value)
             else:
                 assert len(signature.results) > 1
@@ -1357,6 +1412,7 @@ class WasmToIrCompiler:
 
                 # Invoke function:
                 self.emit(ir.ProcedureCall(target, args))
+                self.invalidate_memory_base()
 
                 # Unpack the multiple return values:
                 inc = self.emit(ir.Const(8, "inc", ir.ptr))
@@ -1376,6 +1432,7 @@ class WasmToIrCompiler:
 
         else:
             self.emit(ir.ProcedureCall(target, args))
+            self.invalidate_memory_base()
 
     def gen_select_instruction(self, instruction):
         """ Generate code for the select wasm instruction """
@@ -1453,31 +1510,21 @@ class WasmToIrCompiler:
         """Generate code for br_table instruction.
         This is a sort of switch case.
 
-        This is called a jump table. Implement for now by chain of
-        if else.
+        Large tables are implemented with a jump table, small ones by
+        a chain of if else.
         """
 
-        # TODO: when ir supports jump table, use it!
         test_value = self.pop_value()
         assert test_value.ty in [ir.i32, ir.i64]
-        ir_typ = test_value.ty
-        option_labels = instruction.args[0]
-        default_label = option_labels.pop(-1)
-        for i, option_label in enumerate(option_labels):
-            # Figure which block we must jump to:
-            depth = option_label
-            target_block = self.get_jump_target_block(depth)
-            ja_block = target_block
-            nein_block = self.new_block()
-            c = self.emit(ir.Const(i, "label", ir_typ))
-            self.emit(ir.CJump(test_value, "==", c, ja_block, nein_block))
-            self.builder.set_block(nein_block)
+        *option_labels, default_label = instruction.args[0]
+        options = {
+            i: self.get_jump_target_block(option_label)
+            for i, option_label in enumerate(option_labels)
+        }
 
         # Determine default block:
-        depth = default_label
-        target_block = self.get_jump_target_block(depth)
-        default_block = target_block
-        self.emit(ir.Jump(default_block))
+        default_block = self.get_jump_target_block(default_label)
+        self.builder.emit_switch(test_value, options, default_block)
         self.builder.set_block(None)
 
     def get_jump_target_block(self, depth):
@@ -1537,6 +1584,9 @@ class WasmToIrCompiler:
             )
             self.push_value(value)
 
+        if opcode == "memory.grow":
+            self.invalidate_memory_base()
+
 
 class BlockLevel:
     """Store some info about blocks.
@@ -1558,6 +1608,8 @@ class BlockLevel:
         param_phis,
         result_phis,
         stack_start,
+        memory_base=None,
+        memory_base_changes=0,
     ):
         self.typ = typ
         self.continue_block = continue_block
@@ -1565,3 +1617,35 @@ class BlockLevel:
         self.param_phis = param_phis
         self.result_phis = result_phis
         self.stack_start = stack_start
+        self.memory_base = memory_base
+        self.memory_base_changes = memory_base_changes
+
+
+def find_hoistable_loops(instructions):
+    """Find loops for which the memory base can be loaded before the loop.
+
+    These are loops which access memory, and do not call anything which
+    could grow the memory.
+
+    Returns a set with the ids of these loop instructions.
+    """
+    hoistable = set()
+    stack = []  # Per nesting level: [instruction, accesses memory, calls]
+    for instruction in instructions:
+        opcode = instruction.opcode
+        if opcode in ("block", "loop", "if"):
+            stack.append([instruction, False, False])
+        elif opcode == "end":
+            start, accesses_memory, calls = stack.pop()
+            if start.opcode == "loop" and accesses_memory and not calls:
+                hoistable.add(id(start))
+            if stack:
+                stack[-1][1] |= accesses_memory
+                stack[-1][2] |= calls
+        elif not stack:
+            pass
+        elif opcode in LOAD_OPS or opcode in STORE_OPS:
+            stack[-1][1] = True
+        elif opcode in ("call", "call_indirect", "memory.grow"):
+            stack[-1][2] = True
+    return hoistable
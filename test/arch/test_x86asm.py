@@ -267,6 +267,12 @@ class AssemblerTestCase(AsmTestCaseBase):
         self.feed('shl bl, cl')
         self.check('40d2e4 40d2e3')
 
+    def test_shift_immediate(self):
+        self.feed('shl rax, 3')
+        self.feed('shr r9, 1')
+        self.feed('sar rdx, 63')
+        self.check('48c1e003 49c1e901 48c1fa3f')
+
 
 class X87TestCase(AsmTestCaseBase):
     """ Checks floating point x87 instructions """
@@ -17,6 +17,18 @@ class ArchiveFileTestCase(unittest.TestCase):
         lib2 = get_archive(f2)
         self.assertTrue(lib2)
 
+    def test_save_load_binary(self):
+        arch = get_arch('msp430')
+        obj1 = ObjectFile(arch)
+        obj1.create_section('foo').add_data(bytes(range(10)))
+        obj1.add_symbol(0, 'syscall', 'global', 0, 'foo', 'func', 0)
+        obj2 = ObjectFile(arch)
+        lib = archive([obj1, obj2])
+        f = io.BytesIO()
+        lib.save(f, fmt='binary')
+        lib2 = get_archive(io.BytesIO(f.getvalue()))
+        self.assertEqual([obj1, obj2], list(lib2))
+
     def test_linking(self):
         """ Test pull in of undefined symbols from libraries. """
         arch = get_arch('msp430')
@@ -133,6 +133,58 @@ class DebuggerTestCase(unittest.TestCase):
         self.debugger.current_function()
 
 
+class DebugLookupTestCase(unittest.TestCase):
+    """ Test the mapping between program counter and source locations """
+    arch = get_arch('arm')
+
+    def setUp(self):
+        obj = ObjectFile(self.arch)
+        obj.debug_info = debuginfo.DebugInfo()
+        self.pc = 0
+
+        def address(value):
+            symbol_id = len(obj.symbols)
+            obj.add_symbol(
+                symbol_id, 'L{}'.format(symbol_id), 'local', value, None,
+                'func', 0)
+            return debuginfo.DebugAddress(symbol_id)
+
+        for row, addr in [(3, 0x20), (1, 0x10), (2, 0x18), (3, 0x40)]:
+            loc = SourceLocation('a.c', row, 1, 1)
+            obj.debug_info.add(debuginfo.DebugLocation(loc, address(addr)))
+        for name, begin, end in [('g', 0x30, 0x50), ('f', 0x10, 0x30)]:
+            loc = SourceLocation('a.c', 1, 1, 1)
+            function = debuginfo.DebugFunction(
+                name, loc, None, [], begin=address(begin), end=address(end))
+            obj.debug_info.add(function)
+
+        driver = DummyDebugDriver()
+        driver.get_pc = lambda: self.pc
+        self.debugger = Debugger(self.arch, driver)
+        self.debugger.load_symbols(obj)
+
+    def test_find_pc(self):
+        for pc, row in [(0, 1), (0x10, 1), (0x15, 2), (0x1c, 2), (0x1d, 3),
+                        (0x31, 3), (0x100, 3)]:
+            self.pc = pc
+            self.assertEqual(('a.c', row), self.debugger.find_pc())
+
+    def test_current_function(self):
+        for pc, name in [(0x10, 'f'), (0x2f, 'f'), (0x30, 'g'), (0x4f, 'g')]:
+            self.pc = pc
+            self.assertEqual(name, self.debugger.current_function().name)
+        for pc in [0, 0xf, 0x50]:
+            self.pc = pc
+            self.assertIsNone(self.debugger.current_function())
+
+    def test_find_address(self):
+        """ The first location of a row is used """
+        self.assertEqual(0x10, self.debugger.find_address('a.c', 1))
+        self.assertEqual(0x20, self.debugger.find_address('a.c', 3))
+        self.assertIsNone(self.debugger.find_address('a.c', 4))
+        self.assertIsNone(self.debugger.find_address('b.c', 1))
+
+
 class DebugCliTestCase(unittest.TestCase):
     """ Test the command line interface for the debugger """
     def setUp(self):
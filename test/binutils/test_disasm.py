@@ -0,0 +1,169 @@
+import io
+import unittest
+from ppci.api import asm, c_to_ir, get_arch, ir_to_object, link, optimize
+from ppci.arch.data_instructions import DByte
+from ppci.binutils.disasm import Disassembler, get_decode_tree
+from ppci.binutils.outstream import FunctionOutputStream
+
+
+LAYOUT = """
+MEMORY flash LOCATION=0x100 SIZE=0x1000 {
+    SECTION(code)
+}
+"""
+
+SOURCE = """
+int *table;
+static int lookup(int *values, int n, int key) {
+  int i;
+  for (i = 0; i < n; i++) {
+    if (values[i] == key) return i;
+  }
+  return -1;
+}
+int work(int a, int b, char c, unsigned d) {
+  int local[10];
+  int i, r = 0;
+  for (i = 0; i < 10; i++) {
+    local[i] = a * i + b - c;
+    table[i + 20] = local[i] | d;
+  }
+  r = lookup(local, 10, 1000);
+  r += (a << 3) | (b >> 2) | (d & 0x1234);
+  switch (r) {
+    case 1: r = 7000; break;
+    case 2: r = -6000; break;
+    case 3: r = a < b; break;
+    default: r = d > (unsigned)b;
+  }
+  return r;
+}
+"""
+
+# A frame too large for short offsets and immediates:
+FRAME_SOURCE = """
+int frame(int a) {
+  int local[100];
+  int i;
+  for (i = 0; i < 100; i++) {
+    local[i] = a + i;
+  }
+  return local[a & 63] + local[99];
+}
+"""
+
+
+class DisassemblerTestCase(unittest.TestCase):
+    """ Compile some code, and check that each instruction disassembles
+    into the same instruction, of which the text assembles into the same
+    instructions again.
+    """
+
+    def disasm(self, data, disassembler, address=0):
+        instructions = []
+        disassembler.disasm(
+            data, FunctionOutputStream(instructions.append), address=address
+        )
+        return instructions
+
+    def compile(self, source, march):
+        ir_module = c_to_ir(io.StringIO(source), march)
+        optimize(ir_module, level=2)
+        instructions = []
+        ir_to_object(
+            [ir_module],
+            march,
+            outstream=FunctionOutputStream(instructions.append),
+        )
+        return instructions
+
+    def round_trip(self, source, march):
+        disassembler = Disassembler(get_arch(march))
+        decodable = {
+            encoding.instruction
+            for encoding in disassembler.decode_tree.encodings
+        }
+        lines = []
+        for ins in self.compile(source, march):
+            if type(ins) not in decodable:
+                continue
+            data = ins.encode()
+            decoded = self.disasm(data, disassembler)
+            self.assertEqual(1, len(decoded), str(ins))
+            self.assertNotIsInstance(decoded[0], DByte, str(ins))
+
+            # Targets of relocations are not filled in yet:
+            if not ins.relocations():
+                self.assertEqual(data, decoded[0].encode(), str(ins))
+                lines.append(str(decoded[0]))
+        self.assertTrue(lines)
+
+        # Some instructions have several encodings, so compare the text:
+        obj = asm(io.StringIO("\n".join(lines)), march)
+        decoded = self.disasm(obj.get_section("code").data, disassembler)
+        self.assertEqual(lines, [str(i) for i in decoded])
+
+    def test_riscv(self):
+        self.round_trip(SOURCE, "riscv")
+        self.round_trip(FRAME_SOURCE, "riscv")
+
+    def test_arm(self):
+        self.round_trip(SOURCE, "arm")
+        self.round_trip(FRAME_SOURCE, "arm")
+
+    def test_thumb(self):
+        self.round_trip(SOURCE, "arm:thumb")
+        self.round_trip(FRAME_SOURCE, "arm:thumb")
+
+    def test_msp430(self):
+        self.round_trip(SOURCE, "msp430")
+
+    def test_x86_64(self):
+        self.round_trip(SOURCE, "x86_64")
+        self.round_trip(FRAME_SOURCE, "x86_64")
+
+    def test_arm_rotated_immediate(self):
+        """ Immediates are decoded from their rotated form """
+        obj = asm(io.StringIO("sub sp, sp, 404\nadd r1, r2, 0xff000"), "arm")
+        disassembler = Disassembler(get_arch("arm"))
+        decoded = self.disasm(obj.get_section("code").data, disassembler)
+        self.assertEqual(
+            ["sub SP, SP, 404", "add R1, R2, 1044480"],
+            [str(i) for i in decoded],
+        )
+
+    def test_addresses(self):
+        """ Each instruction is given its address """
+        obj = asm(io.StringIO("add rbx, rcx\nret\n"), "x86_64")
+        obj = link([obj], layout=io.StringIO(LAYOUT))
+        disassembler = Disassembler(get_arch("x86_64"))
+        instructions = self.disasm(
+            obj.get_section("code").data, disassembler, address=0x100
+        )
+        self.assertEqual([0x100, 0x103], [i.address for i in instructions])
+
+    def test_undecodable_data(self):
+        """ Data that is no instruction is emitted as bytes """
+        instructions = []
+        disassembler = Disassembler(get_arch("riscv"))
+        disassembler.disasm(
+            bytes(4) + bytes([0x13, 0x04]),
+            FunctionOutputStream(instructions.append),
+        )
+        self.assertEqual(6, len(instructions))
+        self.assertTrue(all(isinstance(i, DByte) for i in instructions))
+        self.assertEqual(
+            [0, 0, 0, 0, 0x13, 0x4], [i.v for i in instructions]
+        )
+
+    def test_decode_tree_is_shared(self):
+        arch = get_arch("riscv")
+        self.assertIs(get_decode_tree(arch.isa), get_decode_tree(arch.isa))
+        self.assertIs(
+            Disassembler(arch).decode_tree,
+            Disassembler(get_arch("riscv")).decode_tree,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -133,11 +133,13 @@ class GdbClientTestCase(unittest.TestCase):
         self.check_send(b'$z0,62,4#9E+')
 
     def test_read_mem(self):
-        """ Test reading of memory """
-        self.prepare_response(b'+$01027309#96')
-        contents = self.gdbc.read_mem(101, 4)
+        """ Test reading of memory, memory is read in aligned blocks """
+        data = '01027309' + '00' * 60
+        pkt = RspHandler.rsp_pack(data).encode('ascii')
+        self.prepare_response(b'+' + pkt)
+        contents = self.gdbc.read_mem(64, 4)
         self.assertEqual(bytes([1, 2, 0x73, 9]), contents)
-        self.check_send(b'$m 65,4#58+')
+        self.check_send(b'$m 40,40#81+')
 
     def test_write_mem(self):
         """ Test write to memory """
@@ -158,5 +160,158 @@ class GdbClientTestCase(unittest.TestCase):
         self.assertEqual(data, self.transport_mock.send_data)
 
 
+class FakeRspServer:
+    """ A gdb server in the test process, which counts the packets """
+    def __init__(self, arch, memory_size=0x1000):
+        self.arch = arch
+        self.memory = bytearray(i % 251 for i in range(memory_size))
+        self.registers = [0] * len(arch.gdb_registers)
+        self.packets = []
+        self.on_byte = None
+        self._decoder = decoder()
+        next(self._decoder)
+
+    def send(self, data):
+        for byte in data:
+            msg = self._decoder.send(bytes([byte]))
+            if msg and msg.startswith('$'):
+                command = RspHandler.rsp_unpack(msg)
+                self.packets.append(command)
+                self.reply('+')
+                self.reply(RspHandler.rsp_pack(self.handle(command)))
+
+    def reply(self, data):
+        for byte in data.encode('ascii'):
+            self.on_byte(bytes([byte]))
+
+    def handle(self, command):
+        """ Execute a command and return the response """
+        cmd, args = command[0], command[1:].strip()
+        if cmd == 'g':
+            return ''.join(
+                self.register_hex(i) for i in range(len(self.registers)))
+        elif cmd == 'p':
+            return self.register_hex(int(args, 16))
+        elif cmd == 'P':
+            index, value = args.split('=')
+            value = int.from_bytes(bytes.fromhex(value), 'little')
+            self.registers[int(index, 16)] = value
+            return 'OK'
+        elif cmd == 'm':
+            address, size = (int(a, 16) for a in args.split(','))
+            if address + size > len(self.memory):
+                return 'E01'
+            return self.memory[address:address + size].hex()
+        elif cmd == 'M':
+            address, data = args.split(':')
+            address = int(address.split(',')[0], 16)
+            data = bytes.fromhex(data)
+            self.memory[address:address + len(data)] = data
+            return 'OK'
+        elif cmd == 's':
+            pc = self.arch.gdb_registers.index(self.arch.gdb_pc)
+            self.registers[pc] += 4
+            return 'T05{:02x}:{};'.format(pc, self.register_hex(pc))
+        else:  # pragma: no cover
+            return ''
+
+    def register_hex(self, index):
+        size = self.arch.gdb_registers[index].bitsize // 8
+        return self.registers[index].to_bytes(size, 'little').hex()
+
+    def count(self, cmd):
+        """ Count the received packets of the given command """
+        return sum(1 for packet in self.packets if packet.startswith(cmd))
+
+
+class GdbClientCacheTestCase(unittest.TestCase):
+    """ Check the amount of packets needed to inspect a stopped target """
+    arch = get_arch('example')
+
+    def setUp(self):
+        self.server = FakeRspServer(self.arch)
+        self.gdbc = GdbDebugDriver(self.arch, transport=self.server)
+        self.gdbc.status = DebugState.STOPPED
+
+    def step(self):
+        """ Step and process the stop reply, as the stop thread does """
+        self.gdbc.step()
+        self.gdbc._process_stop_status(self.gdbc._stop_msg_queue.get())
+
+    def test_read_mem_once(self):
+        """ Small reads from a block only need a single packet """
+        for address in range(0x100, 0x140, 4):
+            data = self.gdbc.read_mem(address, 4)
+            self.assertEqual(self.server.memory[address:address + 4], data)
+        self.assertEqual(['m 100,40'], self.server.packets)
+
+    def test_adjacent_blocks(self):
+        """ Adjacent blocks are read with a single packet """
+        data = self.gdbc.read_mem(0x13c, 8)
+        self.assertEqual(self.server.memory[0x13c:0x144], data)
+        self.assertEqual(['m 100,80'], self.server.packets)
+
+    def test_pipelined_reads(self):
+        """ The missing blocks around a cached block are read together """
+        self.gdbc.read_mem(0x140, 4)
+        data = self.gdbc.read_mem(0x100, 0xc0)
+        self.assertEqual(self.server.memory[0x100:0x1c0], data)
+        self.assertEqual(
+            ['m 140,40', 'm 100,40', 'm 180,40'], self.server.packets)
+
+    def test_unreadable_block(self):
+        """ Reads near the end of memory are done exactly """
+        self.server.memory = self.server.memory[:0x110]
+        data = self.gdbc.read_mem(0x104, 8)
+        self.assertEqual(self.server.memory[0x104:0x10c], data)
+        self.assertEqual(['m 100,40', 'm 104,8'], self.server.packets)
+
+    def test_write_mem(self):
+        """ Writing to memory invalidates the cached blocks """
+        self.gdbc.read_mem(0x100, 4)
+        self.gdbc.write_mem(0x102, bytes([7, 8, 9]))
+        self.assertEqual(bytes([5, 6, 7, 8]), self.gdbc.read_mem(0x100, 4))
+        self.assertEqual(2, self.server.count('m'))
+
+    def test_step_invalidates(self):
+        """ After a step the memory must be read again """
+        self.gdbc.read_mem(0x100, 4)
+        self.server.memory[0x100] = 42
+        self.step()
+        self.assertEqual(DebugState.STOPPED, self.gdbc.status)
+        self.assertEqual(42, self.gdbc.read_mem(0x100, 4)[0])
+        self.assertEqual(2, self.server.count('m'))
+
+    def test_registers(self):
+        """ All registers are retrieved with a single packet """
+        self.server.registers = [0x100, 2, 3]
+        self.assertEqual(0x100, self.gdbc.get_pc())
+        regs = self.gdbc.get_registers(self.arch.gdb_registers)
+        self.assertEqual([0x100, 2, 3], list(regs.values()))
+        self.assertEqual(['g'], self.server.packets)
+
+    def test_stop_reply_registers(self):
+        """ The program counter in the stop reply is used """
+        self.step()
+        self.assertEqual(['s'], self.server.packets)
+        self.assertEqual(4, self.gdbc.get_pc())
+        self.gdbc.set_pc(0x20)
+        self.assertEqual(0x20, self.gdbc.get_pc())
+        self.assertEqual(0x20, self.server.registers[0])
+        self.assertEqual(['s', 'P 0=20000000'], self.server.packets)
+
+    def test_inspect_stopped_target(self):
+        """ Inspect the target as the debugger does after a stop """
+        self.server.registers = [0xfc, 0, 0]
+        self.step()
+        self.gdbc.get_registers(self.arch.gdb_registers)
+        pc = self.gdbc.get_pc()
+        for offset in range(0, 0x40, 4):
+            self.gdbc.read_mem(pc + offset, 4)  # disassembly
+            self.gdbc.read_mem(0x200 + offset, 4)  # variables
+        self.assertEqual(['s', 'g', 'm 100,40', 'm 200,40'],
+                         self.server.packets)
+
+
 if __name__ == '__main__':
     unittest.main()
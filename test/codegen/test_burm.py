@@ -2,11 +2,17 @@ import unittest
 import io
 import os
 import argparse
+import json
+import shutil
+import tempfile
 
 from ppci.utils.tree import Tree, from_string
 from ppci.codegen import burg
 from ppci.codegen.burg import BurgSystem
 from ppci.codegen.instructionselector import TreeSelector
+from ppci.codegen import burs
+from ppci.codegen.burs import BursTables, make_key
+from ppci.build.cache import StateTableStore
 
 brg_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample4.brg')
 
@@ -181,5 +187,95 @@ class TreeMatchingTestCase(unittest.TestCase):
         self.assertEqual((1, '+', 2), v)
 
 
+class BursTablesTestCase(unittest.TestCase):
+    """ Test the precomputed state tables """
+    def setUp(self):
+        self.system = BurgSystem()
+        for terminal in ['ADD', 'MUL', 'VAL']:
+            self.system.add_terminal(terminal)
+        self.system.add_rule(
+            'stm', Tree('ADD', Tree('reg'), Tree('reg')), 1, None, None)
+        self.system.add_rule(
+            'reg', Tree('ADD', Tree('reg'), Tree('reg')), 1, None, None)
+        self.system.add_rule(
+            'reg', Tree('MUL', Tree('reg'), Tree('reg')), 3, None, None)
+        self.system.add_rule(
+            'reg',
+            Tree('ADD', Tree('MUL', Tree('reg'), Tree('reg')), Tree('reg')),
+            2, None, None)
+        self.system.add_rule(
+            'reg', Tree('VAL'), 1, None, None)
+        self.system.add_rule(
+            'imm', Tree('VAL'), 0, lambda t: t.value < 10, None)
+        self.system.add_rule(
+            'reg', Tree('ADD', Tree('reg'), Tree('imm')), 0, None, None)
+        self.system.check()
+        self.tables = BursTables(self.system, make_key(self.system))
+
+    def label(self, tree):
+        self.tables.label(tree, self.system.rules)
+        return tree.state
+
+    def test_multi_level_pattern(self):
+        """ Check that a multiply add is selected over two instructions """
+        tree = Tree(
+            'ADD',
+            Tree('MUL', Tree('VAL', value=10), Tree('VAL', value=11)),
+            Tree('VAL', value=12))
+        self.assertEqual(4, self.label(tree).get_rule('reg'))
+
+    def test_acceptance(self):
+        """ Small values can be used as immediate values """
+        tree = Tree('ADD', Tree('VAL', value=10), Tree('VAL', value=1))
+        self.assertEqual(7, self.label(tree).get_rule('reg'))
+        self.assertTrue(tree[1].state.has_goal('imm'))
+        tree = Tree('ADD', Tree('VAL', value=10), Tree('VAL', value=11))
+        self.assertEqual(2, self.label(tree).get_rule('reg'))
+        self.assertFalse(tree[1].state.has_goal('imm'))
+
+    def test_shared_states(self):
+        """ Identical trees must be labelled without new states """
+        tree = Tree('ADD', Tree('VAL', value=10), Tree('VAL', value=11))
+        self.label(tree)
+        num_states = len(self.tables.states)
+        tree = Tree('ADD', Tree('VAL', value=20), Tree('VAL', value=30))
+        self.label(tree)
+        self.assertEqual(num_states, len(self.tables.states))
+
+    def test_json(self):
+        tree = Tree(
+            'ADD',
+            Tree('MUL', Tree('VAL', value=1), Tree('VAL', value=11)),
+            Tree('VAL', value=12))
+        self.label(tree)
+        self.assertTrue(self.tables.dirty)
+        tables = BursTables(self.system, make_key(self.system))
+        tables.from_json(json.loads(json.dumps(self.tables.to_json())))
+        self.assertEqual(self.tables.labels, tables.labels)
+        self.assertEqual(self.tables.transitions, tables.transitions)
+        self.assertFalse(tables.dirty)
+        with self.assertRaises(ValueError):
+            tables.from_json(self.tables.to_json())
+
+    def test_store(self):
+        """ The build layer loads new tables, and saves them at the end """
+        directory = tempfile.mkdtemp()
+        try:
+            with StateTableStore(directory):
+                tables = burs.get_tables(self.system)
+                self.assertIn(tables, burs.get_all_tables())
+                tables.label(Tree('VAL', value=1), self.system.rules)
+                self.assertTrue(tables.dirty)
+            self.assertFalse(tables.dirty)
+            self.assertIn(
+                'burs-{}.json'.format(tables.key), os.listdir(directory))
+
+            tables2 = BursTables(self.system, make_key(self.system))
+            StateTableStore(directory).load(tables2)
+            self.assertEqual(tables.labels, tables2.labels)
+            self.assertEqual([], burs.table_hooks)
+        finally:
+            shutil.rmtree(directory)
+
 if __name__ == '__main__':
     unittest.main()
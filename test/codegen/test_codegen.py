@@ -9,7 +9,7 @@ from ppci.codegen.irdag import SelectionGraphBuilder
 from ppci.codegen.irdag import FunctionInfo, prepare_function_info
 from ppci.arch.example import ExampleArch
 from ppci.binutils.debuginfo import DebugDb
-from ppci.api import get_arch
+from ppci.api import get_arch, c_to_ir, ir_to_object
 
 
 def print_module(m):
@@ -189,5 +189,33 @@ class IrDagTestCase(unittest.TestCase):
         # self.assertTrue(sg_value.vreg)
 
 
+class ParallelCodegenTestCase(unittest.TestCase):
+    """ Check that parallel code generation gives identical output """
+    source = """
+    int g[10];
+    static int helper(int x) { return x + 1; }
+    int f1(int a, int b) {
+      int s = 0;
+      for (int i = 0; i < a; i++) { s += g[i % 10] * b + helper(i); }
+      return s;
+    }
+    int f2(int a) { return f1(a, a + 2) - helper(a); }
+    """
+
+    def compile(self, march, jobs):
+        ir_module = c_to_ir(io.StringIO(self.source), march)
+        obj = ir_to_object([ir_module], march, jobs=jobs)
+        f = io.StringIO()
+        obj.save(f)
+        return f.getvalue()
+
+    def test_arm(self):
+        self.assertEqual(self.compile('arm', 1), self.compile('arm', 2))
+
+    def test_x86_64(self):
+        self.assertEqual(
+            self.compile('x86_64', 1), self.compile('x86_64', 2))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,93 @@
+import io
+import unittest
+from ppci.api import get_arch, c_to_ir, ir_to_object
+from ppci.arch.arch import Frame
+from ppci.arch.generic_instructions import Label
+from ppci.arch.riscv.instructions import Addi, Lw, Mul, Sw
+from ppci.arch.riscv.registers import R10, R11, R12, R13, R14, R15
+from ppci.codegen.instructionscheduler import InstructionScheduler
+from ppci.utils.reporting import DummyReportGenerator
+
+
+class InstructionSchedulerTestCase(unittest.TestCase):
+    """ Schedule riscv instructions, which have a load use delay """
+    def setUp(self):
+        self.scheduler = InstructionScheduler(get_arch('riscv'))
+        self.frame = Frame('test')
+
+    def schedule(self, instructions):
+        for instruction in instructions:
+            self.frame.emit(instruction)
+        return self.scheduler.schedule(self.frame)
+
+    def test_load_use(self):
+        """ Independent instructions are placed after a load """
+        load = Lw(R10, 0, R12)
+        use = Addi(R11, R10, 1)
+        other = Addi(R13, R14, 2)
+        cycles = self.schedule([load, use, other])
+        self.assertEqual([load, other, use], self.frame.instructions)
+        self.assertEqual((4, 3), cycles)
+
+    def test_critical_path(self):
+        """ The multiply must be started first """
+        add = Addi(R13, R14, 2)
+        mul = Mul(R10, R11, R12)
+        use = Addi(R15, R10, 1)
+        self.schedule([add, mul, use])
+        self.assertEqual([mul, add, use], self.frame.instructions)
+
+    def test_memory_order(self):
+        """ Loads may not pass stores """
+        store = Sw(R11, 0, R12)
+        load = Lw(R10, 0, R13)
+        self.schedule([store, load, Addi(R14, R10, 1), Addi(R15, R15, 1)])
+        instructions = self.frame.instructions
+        self.assertLess(instructions.index(store), instructions.index(load))
+
+    def test_anti_dependency(self):
+        """ A register may not be redefined before it is used """
+        load = Lw(R10, 0, R12)
+        use = Addi(R11, R10, 1)
+        redefine = Addi(R10, R14, 2)
+        self.schedule([load, use, redefine])
+        self.assertEqual([load, use, redefine], self.frame.instructions)
+
+    def test_fixed_instructions(self):
+        """ Labels are not moved and nothing crosses them """
+        load = Lw(R10, 0, R12)
+        label = Label('x')
+        other = Addi(R13, R14, 2)
+        use = Addi(R11, R10, 1)
+        self.schedule([load, label, other, use])
+        self.assertEqual([load, label, other, use], self.frame.instructions)
+
+    def test_no_pipeline(self):
+        """ Targets without pipeline description are not scheduled """
+        scheduler = InstructionScheduler(get_arch('msp430'))
+        self.assertIsNone(scheduler.schedule(self.frame))
+
+    def test_compile(self):
+        """ Compile with scheduling and check the cycle estimate report """
+        src = """
+        int f(int *a, int *b, int n) {
+          int s = 0;
+          for (int i = 0; i < n; i++) { s += a[i] * b[i] + a[i + 1]; }
+          return s;
+        }
+        """
+        messages = []
+
+        class Reporter(DummyReportGenerator):
+            def message(self, msg):
+                messages.append(msg)
+
+        march = get_arch('riscv')
+        ir_module = c_to_ir(io.StringIO(src), march)
+        ir_to_object([ir_module], march, reporter=Reporter(), schedule=True)
+        self.assertTrue(
+            any(m.startswith('Estimated cycles') for m in messages))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,12 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+import io
+from ppci.codegen import CodeGenerator
 from ppci.codegen.registerallocator import GraphColoringRegisterAllocator
-from ppci.api import get_arch
+from ppci.codegen.registerallocator import LinearScanRegisterAllocator
+from ppci.codegen.flowgraph import FlowGraph
+from ppci.codegen.interferencegraph import InterferenceGraph
+from ppci.api import get_arch, c_to_ir, optimize, ir_to_object
 from ppci.arch.arch import Frame
 from ppci.arch.example import Def, Use, Add, Mov, R0, R1, ExampleRegister
 from ppci.arch.example import R10, R10l, DefHalf, UseHalf
@@ -168,5 +173,205 @@ class GraphColoringRegisterAllocatorTestCase(unittest.TestCase):
         assert frame.is_used(xmm6, arch.info.alias)
 
 
+class LinearScanRegisterAllocatorTestCase(unittest.TestCase):
+    """ Test the linear scan register allocator on the example target """
+    def setUp(self):
+        arch = get_arch('example')
+        self.register_allocator = LinearScanRegisterAllocator(
+            arch, None, None)
+
+    def conflict(self, ta, tb):
+        self.assertNotEqual(ta.get_real(), tb.get_real())
+
+    def test_register_allocation(self):
+        f = Frame('tst')
+        t1 = ExampleRegister('t1')
+        t2 = ExampleRegister('t2')
+        t3 = ExampleRegister('t3')
+        t4 = ExampleRegister('t4')
+        t5 = ExampleRegister('t5')
+        f.instructions.append(Def(t1))
+        f.instructions.append(Def(t2))
+        f.instructions.append(Def(t3))
+        f.instructions.append(Add(t4, t1, t2))
+        f.instructions.append(Add(t5, t4, t3))
+        f.instructions.append(Use(t5))
+        self.register_allocator.alloc_frame(f)
+        self.conflict(t1, t2)
+        self.conflict(t2, t3)
+        self.conflict(t1, t3)
+        self.conflict(t3, t4)
+
+    def test_move_hint(self):
+        """ Moved registers get the same register, removing the move """
+        f = Frame('tst')
+        t1 = ExampleRegister('t1')
+        t2 = ExampleRegister('t2')
+        move = Mov(t2, t1, ismove=True)
+        f.instructions.append(Def(t1))
+        f.instructions.append(move)
+        f.instructions.append(Use(t2))
+        self.register_allocator.alloc_frame(f)
+        self.assertIs(t1.get_real(), t2.get_real())
+        self.assertNotIn(move, f.instructions)
+
+    def test_pre_colored_alias(self):
+        """ Aliases of pre-colored registers may not be used """
+        f = Frame('tst')
+        t1 = ExampleRegister('t1')
+        t2 = ExampleRegister('t2')
+        t3 = ExampleRegister('t3')
+        t4 = ExampleRegister('t4')
+        f.instructions.append(Def(t1))
+        f.instructions.append(Def(t2))
+        f.instructions.append(Def(t3))
+        f.instructions.append(Def(t4))
+        f.instructions.append(DefHalf(R10l))
+        f.instructions.append(UseHalf(R10l))
+        f.instructions.append(Use(t1))
+        f.instructions.append(Use(t2))
+        f.instructions.append(Use(t3))
+        f.instructions.append(Use(t4))
+        self.register_allocator.alloc_frame(f)
+        for t in (t1, t2, t3, t4):
+            self.assertIsNot(R10, t.get_real())
+        self.assertEqual(4, len({t.get_real() for t in (t1, t2, t3, t4)}))
+        self.assertEqual(0, self.register_allocator.spill_count)
+
+
+class RegisterAllocatorChoiceTestCase(unittest.TestCase):
+    """ Check selection of the register allocator """
+    source = """
+    int calc(int a, int b, int c, int d, int e, int f, int g, int h) {
+      int s1 = a * b, s2 = b * c, s3 = c * d, s4 = d * e, s5 = e * f;
+      int s6 = f * g, s7 = g * h, s8 = h * a, s9 = a + h, s10 = b + g;
+      return s1 / s2 - s3 / s4 + s5 / s6 - s7 / s8 + s9 / s10
+        + s10 * s1 + s9 * s2 + s8 * s3 + s7 * s4 + s6 * s5;
+    }
+    """
+
+    def test_invalid_allocator(self):
+        with self.assertRaises(ValueError):
+            CodeGenerator(get_arch('arm'), None, register_allocator='magic')
+
+    def test_linear_scan_with_spilling(self):
+        for march in ['arm', 'x86_64', 'riscv', 'msp430']:
+            ir_module = c_to_ir(io.StringIO(self.source), march)
+            optimize(ir_module, level=2)
+            obj = ir_to_object(
+                [ir_module], march, register_allocator='linear_scan')
+            self.assertTrue(obj.get_section('code').data)
+
+
+class CheckedRegisterAllocator(GraphColoringRegisterAllocator):
+    """ Register allocator which compares the updated interference graph
+    with a freshly calculated interference graph """
+    updates = 0
+
+    def init_data(self, frame):
+        updated = self.cfg is not None
+        super().init_data(frame)
+        if updated:
+            CheckedRegisterAllocator.updates += 1
+            self.check_graph(frame)
+
+    def check_graph(self, frame):
+        # Keep the incrementally updated liveness information:
+        live_sets = [(i.live_in, i.live_out) for i in frame.instructions]
+        cfg = FlowGraph(frame.instructions)
+        cfg.calculate_liveness()
+        ig = InterferenceGraph()
+        ig.calculate_interference(cfg)
+
+        for ins, (live_in, live_out) in zip(frame.instructions, live_sets):
+            assert ins.live_in == live_in, str(ins)
+            assert ins.live_out == live_out, str(ins)
+            ins.live_in, ins.live_out = live_in, live_out
+
+        def edges(graph):
+            return {
+                (tmp, tuple(graph.get_node(tmp2).temps))
+                for tmp, node in graph.temp_map.items()
+                for tmp2 in graph.temp_map
+                if graph.get_node(tmp2) in node.adjecent
+            }
+
+        # The updated graph is not colored yet, so each node holds a
+        # single register:
+        assert set(frame.ig.temp_map) == set(ig.temp_map)
+        assert edges(frame.ig) == edges(ig)
+        for tmp in ig.temp_map:
+            assert set(frame.ig.defs(tmp)) == set(ig.defs(tmp)), str(tmp)
+            assert set(frame.ig.uses(tmp)) == set(ig.uses(tmp)), str(tmp)
+
+
+class IncrementalSpillTestCase(unittest.TestCase):
+    """ Updating the liveness after spilling must give the same result as
+    recalculating it for the whole frame """
+    source = """
+    int sum(int *x, int n) {
+      int a = x[0], b = x[1], c = x[2], d = x[3], e = x[4], f = x[5];
+      int g = x[6], h = x[7], i = x[8], j = x[9], k = x[10], l = x[11];
+      while (n > 0) {
+        a += b * c; b += c * d; c += d * e; d += e * f; e += f * g;
+        f += g * h; g += h * i; h += i * j; i += j * k; j += k * l;
+        k += l * a; l += a * b; n--;
+      }
+      return a + b + c + d + e + f + g + h + i + j + k + l;
+    }
+    """
+
+    def test_updated_interference(self):
+        CheckedRegisterAllocator.updates = 0
+        allocators = {'graph_coloring': CheckedRegisterAllocator}
+        with patch.dict(CodeGenerator.register_allocators, allocators):
+            for march in ['x86_64', 'riscv', 'msp430']:
+                ir_module = c_to_ir(io.StringIO(self.source), march)
+                optimize(ir_module, level=2)
+                ir_to_object([ir_module], march)
+        self.assertGreater(CheckedRegisterAllocator.updates, 0)
+
+    def test_spill_liveness(self):
+        """ Spill a single register and check the updated liveness """
+        arch = get_arch('example')
+        allocator = CheckedRegisterAllocator(arch, None, None)
+        allocator.spill_gen = MagicMock()
+        allocator.spill_gen.gen_load.side_effect = (
+            lambda frame, vreg, slot: [Def(vreg)])
+        allocator.spill_gen.gen_store.side_effect = (
+            lambda frame, vreg, slot: [Use(vreg)])
+        f = Frame('tst')
+        t1 = ExampleRegister('t1')
+        t2 = ExampleRegister('t2')
+        t3 = ExampleRegister('t3')
+        t4 = ExampleRegister('t4')
+        f.instructions.append(Def(t1))
+        f.instructions.append(Def(t2))
+        f.instructions.append(Add(t3, t1, t2))
+        f.instructions.append(Add(t4, t3, t1))
+        f.instructions.append(Use(t4))
+        f.instructions.append(Use(t2))
+        allocator.init_data(f)
+        allocator.rewrite_program(allocator.node(t1))
+        allocator.update_frame()
+
+        # The next round compares the liveness with a full recompute,
+        # which is the only time the interference is calculated:
+        CheckedRegisterAllocator.updates = 0
+        calculate_interference = InterferenceGraph.calculate_interference
+        with patch.object(
+            InterferenceGraph,
+            'calculate_interference',
+            autospec=True,
+            side_effect=calculate_interference,
+        ) as calculate:
+            allocator.init_data(f)
+        self.assertEqual(1, calculate.call_count)
+        self.assertEqual(1, CheckedRegisterAllocator.updates)
+        self.assertEqual(9, len(f.instructions))
+        self.assertFalse(f.ig.has_node(t1))
+        self.assertTrue(f.ig.interfere(t2, t3))
+
+
 if __name__ == '__main__':
     unittest.main()
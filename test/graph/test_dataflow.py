@@ -0,0 +1,74 @@
+""" Test the bit vector data flow engine """
+
+import unittest
+from ppci.graph import DiGraph, DiNode
+from ppci.graph import dataflow
+from ppci.graph.algorithm.fixed_point_dominator import calculate_dominators
+
+
+class NumberingTestCase(unittest.TestCase):
+    def test_bits(self):
+        numbering = dataflow.Numbering(["a", "b"])
+        self.assertEqual(2, numbering.add("c"))
+        self.assertEqual(0, numbering.add("a"))
+        self.assertEqual(3, len(numbering))
+        self.assertEqual(0b110, numbering.bits(["c", "b"]))
+        self.assertEqual(0b111, numbering.full)
+        self.assertEqual(["a", "c"], numbering.members(0b101))
+        self.assertEqual([], numbering.members(0))
+
+
+class DataFlowTestCase(unittest.TestCase):
+    """Solve problems on a loop:
+
+    1 -> 2 -> 3 -> 4
+         ^    |
+         +----+
+    """
+
+    def setUp(self):
+        self.graph = DiGraph()
+        self.nodes = [DiNode(self.graph) for _ in range(4)]
+        node_1, node_2, node_3, node_4 = self.nodes
+        node_1.add_edge(node_2)
+        node_2.add_edge(node_3)
+        node_3.add_edge(node_2)
+        node_3.add_edge(node_4)
+
+    def test_reverse_postorder(self):
+        order = dataflow.reverse_postorder(
+            self.nodes[:1], lambda n: n.successors
+        )
+        self.assertEqual(self.nodes, order)
+
+    def test_liveness(self):
+        """ Variable x is defined in 1 and used in 3, y defined in 3 """
+        node_1, node_2, node_3, node_4 = self.nodes
+        numbering = dataflow.Numbering(["x", "y"])
+        gen = {n: 0 for n in self.nodes}
+        kill = {n: 0 for n in self.nodes}
+        kill[node_1] = numbering.bits(["x"])
+        gen[node_3] = numbering.bits(["x"])
+        kill[node_3] = numbering.bits(["y"])
+        gen[node_4] = numbering.bits(["y"])
+        live_in, live_out = dataflow.solve(
+            self.nodes, gen, kill, backward=True
+        )
+        self.assertEqual(0, live_in[node_1])
+        self.assertEqual(["x"], numbering.members(live_out[node_1]))
+        self.assertEqual(["x"], numbering.members(live_in[node_2]))
+        self.assertEqual(["x", "y"], numbering.members(live_out[node_3]))
+        self.assertEqual(["y"], numbering.members(live_in[node_4]))
+        self.assertEqual(0, live_out[node_4])
+
+    def test_dominators(self):
+        node_1, node_2, node_3, node_4 = self.nodes
+        dominators = calculate_dominators(self.nodes, node_1)
+        self.assertEqual({node_1}, dominators[node_1])
+        self.assertEqual({node_1, node_2}, dominators[node_2])
+        self.assertEqual({node_1, node_2, node_3}, dominators[node_3])
+        self.assertEqual(set(self.nodes), dominators[node_4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@
 
 import unittest
 from ppci.graph import Graph, Node, DiGraph, DiNode, MaskableGraph
+from ppci.graph.digraph import strongly_connected_components
 from ppci.codegen.interferencegraph import InterferenceGraph
 from ppci.codegen.flowgraph import FlowGraph
 from ppci.arch.generic_instructions import Nop
@@ -116,6 +117,23 @@ class DigraphTestCase(unittest.TestCase):
         g.del_node(c)
         self.assertEqual(set(), b.successors)
 
+    def test_strongly_connected_components(self):
+        g = DiGraph()
+        a = DiNode(g)
+        b = DiNode(g)
+        c = DiNode(g)
+        d = DiNode(g)
+        g.add_edge(a, b)
+        g.add_edge(b, c)
+        g.add_edge(c, b)
+        g.add_edge(c, d)
+        g.add_edge(d, d)
+        components = strongly_connected_components(g)
+        self.assertEqual(3, len(components))
+        self.assertEqual([d], components[0])
+        self.assertEqual({b, c}, set(components[1]))
+        self.assertEqual([a], components[2])
+
 
 class InterferenceGraphTestCase(unittest.TestCase):
     def test_normal_use(self):
@@ -0,0 +1,78 @@
+""" Compare the instruction encoder with encoding via tokens.
+
+Idea: create instructions with random operands, encode them with the
+instruction encoder and by setting the fields of tokens, and check that
+the results are the same.
+
+Run this with:
+
+    $ python -m pytest -v -s encoding.py
+
+"""
+
+from hypothesis import given, settings, strategies as st
+from ppci.api import get_arch
+from ppci.arch.encoding import Instruction
+from ppci.arch.registers import Register
+
+archs = ["arm", "avr", "msp430", "riscv", "stm8", "x86_64", "xtensa"]
+
+
+def encoded_instructions(arch):
+    return [
+        instruction
+        for instruction in get_arch(arch).isa.instructions
+        if instruction.syntax
+        and hasattr(instruction, "tokens")
+        and instruction.encode is Instruction.encode
+    ]
+
+
+@st.composite
+def constructors(draw, constructor):
+    args = []
+    for argument in constructor.syntax.formal_arguments:
+        cls = argument._cls
+        if isinstance(cls, tuple):
+            sub_constructor = draw(st.sampled_from(cls))
+            args.append(draw(constructors(sub_constructor)))
+        elif cls is int:
+            value = draw(st.integers(min_value=-(2 ** 33), max_value=2 ** 33))
+            args.append(value)
+        elif cls is str:
+            args.append(draw(st.text(min_size=1)))
+        elif issubclass(cls, Register):
+            args.append(draw(st.sampled_from(cls.all_registers())))
+        else:
+            args.append(cls())
+    return constructor(*args)
+
+
+instructions = st.sampled_from(archs).flatmap(
+    lambda arch: st.sampled_from(encoded_instructions(arch))
+).flatmap(constructors)
+
+
+def outcome(encode, instruction):
+    try:
+        return encode(instruction)
+    except (ValueError, AssertionError, KeyError) as ex:
+        return type(ex)
+
+
+def encode_via_tokens(instruction):
+    tokens = instruction.get_tokens()
+    instruction.set_all_patterns(tokens)
+    return tokens.encode()
+
+
+@given(instructions)
+@settings(max_examples=5000)
+def test_encoder(instruction):
+    assert outcome(encode_via_tokens, instruction) == outcome(
+        Instruction.encode, instruction
+    )
+
+
+if __name__ == "__main__":
+    test_encoder()
@@ -1,5 +1,8 @@
 import unittest
 import io
+import os
+import shutil
+import tempfile
 from unittest import mock
 from ppci.common import CompilerError
 from ppci.lang.c import CPreProcessor
@@ -631,5 +634,101 @@ class CPreProcessorTestCase(unittest.TestCase):
         self.preprocess(src, expected)
 
 
+class IncludeTestCase(unittest.TestCase):
+    """ Test including header files """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        coptions = COptions()
+        coptions.add_include_path(self.directory)
+        self.preprocessor = CPreProcessor(coptions)
+
+    def add_header(self, filename, src):
+        with open(os.path.join(self.directory, filename), "w") as f:
+            f.write(src)
+
+    def preprocess(self, src):
+        """ Preprocess source, and return the output without line info """
+        f = io.StringIO(src)
+        tokens = list(self.preprocessor.process_file(f, "dummy.t"))
+        f2 = io.StringIO()
+        CTokenPrinter().dump(tokens, file=f2)
+        lines = f2.getvalue().splitlines()
+        return [
+            line.strip()
+            for line in lines
+            if line.strip() and not line.startswith("#")
+        ]
+
+    def test_include_guard(self):
+        """ A guarded header is not opened again """
+        self.add_header(
+            "a.h",
+            """// Header a
+            #ifndef A_H
+            #define A_H
+            int a;
+            #endif
+            """,
+        )
+        src = """#include "a.h"
+        #include <a.h>
+        """
+        with mock.patch(
+            "ppci.lang.c.preprocessor.open", create=True, side_effect=open
+        ) as mock_open:
+            self.assertEqual(["int a;"], self.preprocess(src))
+        self.assertEqual(1, mock_open.call_count)
+        self.assertEqual(
+            {os.path.join(self.directory, "a.h"): "A_H"},
+            self.preprocessor.include_guards,
+        )
+
+    def test_include_guard_undefined(self):
+        """ A guarded header is included again when the guard is undone """
+        self.add_header(
+            "a.h", "#ifndef A_H\n#define A_H\nint a;\n#endif\n"
+        )
+        src = """#include "a.h"
+        #undef A_H
+        #include "a.h"
+        """
+        self.assertEqual(["int a;", "int a;"], self.preprocess(src))
+
+    def test_no_include_guard(self):
+        """ Text outside the #ifndef, or an #else, are not guards """
+        self.add_header(
+            "a.h", "#ifndef A_H\n#define A_H\n#endif\nint a;\n"
+        )
+        self.add_header(
+            "b.h", "#ifndef B_H\n#define B_H\n#else\nint b;\n#endif\n"
+        )
+        src = """#include "a.h"
+        #include "a.h"
+        #include "b.h"
+        #include "b.h"
+        """
+        self.assertEqual(["int a;", "int a;", "int b;"], self.preprocess(src))
+        self.assertEqual({}, self.preprocessor.include_guards)
+
+    def test_pragma_once(self):
+        self.add_header("a.h", "#pragma once\nint a;\n")
+        src = """#include "a.h"
+        #include "a.h"
+        """
+        self.assertEqual(["int a;"], self.preprocess(src))
+
+    def test_locate_include_cache(self):
+        """ The file system is searched only once for a header """
+        self.add_header("a.h", "int a;\n")
+        src = """#include "a.h"
+        #include "a.h"
+        """
+        with mock.patch("os.path.exists", side_effect=os.path.exists) as m:
+            self.assertEqual(["int a;", "int a;"], self.preprocess(src))
+        self.assertEqual(2, m.call_count)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -43,6 +43,22 @@ class CLexerTestCase(unittest.TestCase):
             [c.loc.col for c in chars],
         )
 
+    def test_create_lines(self):
+        """ Lines are glued, and positions refer to the original source """
+        src = "a??/\nb \\n\nc"
+        source_file = SourceFile("a.h")
+        lines = lexer.create_lines(
+            io.StringIO(src), source_file, True, True
+        )
+        text, positions = next(lines)
+        self.assertEqual("ab \\n\n", text)
+        self.assertEqual(1, source_file.row)
+        self.assertSequenceEqual(
+            [(0, 1), (1, 1), (1, 2), (1, 3), (1, 4), (1, 5)], positions
+        )
+        self.assertEqual(("c", None), next(lines))
+        self.assertEqual(3, source_file.row)
+
     def test_trigraph_challenge(self):
         """ Test a nice example for the lexer including some trigraphs """
         src = "Hell??/\no world"
@@ -196,6 +212,56 @@ class CLexerTestCase(unittest.TestCase):
             assert isinstance(lexed_val, float)
             assert math.isclose(lexed_val, value)
 
+    def test_multiline_block_comment(self):
+        src = "a /* x\ny */ b\n/* z */ c"
+        tokens = self.tokenize(src)
+        self.assertSequenceEqual(["a", "b", "c"], [t.val for t in tokens])
+        self.assertSequenceEqual([1, 2, 3], [t.loc.row for t in tokens])
+        self.assertSequenceEqual(["", "  ", " "], [t.space for t in tokens])
+        self.assertSequenceEqual(
+            [True, False, True], [t.first for t in tokens]
+        )
+
+    def test_unterminated_block_comment(self):
+        with self.assertRaises(CompilerError):
+            self.tokenize("a /* x\n")
+
+    def test_string_with_newline(self):
+        """ Strings are not terminated at the end of the line """
+        src = 'a "x\ny" b'
+        tokens = self.tokenize(src)
+        self.assertSequenceEqual(
+            ["ID", "STRING", "ID"], [t.typ for t in tokens]
+        )
+        self.assertSequenceEqual([1, 1, 2], [t.loc.row for t in tokens])
+        self.assertSequenceEqual([1, 3, 4], [t.loc.col for t in tokens])
+
+    def test_same_tokens(self):
+        """ The fast path gives the same tokens as the character lexer """
+        src = """# define x(a) a ## 1 \\
+        + 0x1eUL // text
+        L'\\x1' L"w" ?""" + """?= 2.5e+3f\t1e+2 /**/ "??/"" \\\\
+        \f '\\'' <<= ... """
+        character_lexer = CLexer(self.lexer.coptions, fast=False)
+        tokens = [
+            (t.typ, t.val, t.space, t.first, t.loc.row, t.loc.col)
+            for t in self.tokenize(src)
+        ]
+        expected_tokens = [
+            (t.typ, t.val, t.space, t.first, t.loc.row, t.loc.col)
+            for t in character_lexer.lex(io.StringIO(src), SourceFile("a.h"))
+        ]
+        self.assertSequenceEqual(expected_tokens, tokens)
+
+
+class CharacterLexerTestCase(CLexerTestCase):
+    """ Test the character based lexer """
+
+    def setUp(self):
+        coptions = COptions()
+        self.lexer = CLexer(coptions, fast=False)
+        coptions.enable("trigraphs")
+
 
 if __name__ == "__main__":
     unittest.main()
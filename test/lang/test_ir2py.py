@@ -0,0 +1,124 @@
+""" Test the generation of python code from ir-code """
+
+import io
+import unittest
+from types import ModuleType
+from ppci import api
+from ppci.arch.arch_info import TypeInfo
+from ppci.lang.python import ir_to_python
+from ppci.wasm import Module, wasm_to_ir
+
+
+def compile_ir(ir_modules):
+    f = io.StringIO()
+    ir_to_python(ir_modules, f)
+    source = f.getvalue()
+    py_module = ModuleType("gen")
+    exec(compile(source, "<string>", "exec"), py_module.__dict__)
+    return py_module, source[source.index("# Module"):]
+
+
+def compile_c(source):
+    ir_module = api.c_to_ir(io.StringIO(source), "x86_64")
+    api.optimize(ir_module, level=2)
+    return compile_ir([ir_module])
+
+
+class StructuredControlFlowTestCase(unittest.TestCase):
+    """ Check that loops and conditionals become python control flow """
+
+    def test_loops(self):
+        py_module, source = compile_c(
+            """
+            int sum(int n) {
+              int s = 0;
+              for (int i = 0; i < n; i++) {
+                if (i % 3 == 0) continue;
+                for (int j = 0; j < i; j++) s += j;
+              }
+              return s;
+            }
+            """
+        )
+        self.assertIn("while True:", source)
+        self.assertNotIn("_irpy_current_block", source)
+        expected = sum(j for i in range(20) if i % 3 for j in range(i))
+        self.assertEqual(expected, py_module.sum(20))
+
+    def test_break_out_of_nested_loops(self):
+        """ A jump out of two loops is done with a flag """
+        wat = """
+        (module
+          (func (export "find") (param $n i32) (result i32)
+            (local $i i32) (local $j i32)
+            (block $found
+              (loop $outer
+                (local.set $j (i32.const 0))
+                (loop $inner
+                  (br_if $found (i32.eq
+                    (i32.mul (local.get $i) (local.get $j)) (local.get $n)))
+                  (local.set $j (i32.add (local.get $j) (i32.const 1)))
+                  (br_if $inner (i32.lt_s (local.get $j) (local.get $i))))
+                (local.set $i (i32.add (local.get $i) (i32.const 1)))
+                (br_if $outer (i32.lt_s (local.get $i) (i32.const 100))))
+              (return (i32.const -1)))
+            (local.get $i))
+        )
+        """
+        ir_module = wasm_to_ir(Module(wat), TypeInfo(4, 4))
+        api.optimize(ir_module, level=1)
+        py_module, source = compile_ir([ir_module])
+        self.assertIn("_irpy_target", source)
+        self.assertNotIn("_irpy_current_block", source)
+        self.assertEqual(7, py_module.find(35))
+        self.assertEqual(-1, py_module.find(10007))
+
+    def test_irreducible_control_flow(self):
+        """ A loop with two entries is done with a switch on blocks """
+        py_module, source = compile_c(
+            """
+            int f(int n) {
+              int s = 0;
+              if (n > 5) goto inside;
+              again:
+              s += 1;
+              inside:
+              s += 2;
+              if (s < n) goto again;
+              return s;
+            }
+            """
+        )
+        self.assertIn("_irpy_current_block", source)
+        self.assertEqual(6, py_module.f(4))
+        self.assertEqual(8, py_module.f(7))
+
+
+class IntegerWrapTestCase(unittest.TestCase):
+    def test_wrap_around(self):
+        py_module, source = compile_c(
+            """
+            int hash(int a, int b) {
+              return (a * 31 + b) * 31 + 7;
+            }
+            unsigned char add(unsigned char a, unsigned char b) {
+              return a + b;
+            }
+            short neg(short a) {
+              return -a;
+            }
+            """
+        )
+
+        def hash(a, b):
+            value = ((a * 31 + b) * 31 + 7) % 2 ** 32
+            return value - 2 ** 32 if value >= 2 ** 31 else value
+
+        for a, b in [(123456789, 987654321), (-5, 3)]:
+            self.assertEqual(hash(a, b), py_module.hash(a, b))
+        self.assertEqual(44, py_module.add(200, 100))
+        self.assertEqual(-32768, py_module.neg(-32768))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+/*
+ Test switch statements which are dense enough for a jump table,
+ mixed with sparse case values.
+*/
+#include <stdio.h>
+
+int dense(int x)
+{
+    switch (x) {
+        case -2: return 100;
+        case -1: return 101;
+        case 0: return 102;
+        case 1:
+        case 2: return 103;
+        case 4: return 104;
+        case 5: return 105;
+        default: return 0;
+    }
+}
+
+int mixed(int x)
+{
+    unsigned char c = x;
+    int r = 1;
+    switch (c) {
+        case 'a': r += 1;
+        case 'b': r += 2; break;
+        case 'c': r = 7; break;
+        case 'd': r = 9; break;
+        case 'e': r = 11; break;
+        case 200: r = 12; break;
+        case 250: r = 13; break;
+    }
+    return r;
+}
+
+long sparse(long x)
+{
+    switch (x) {
+        case 1: return 1;
+        case 10: return 2;
+        case 100: return 3;
+        case 1000: return 4;
+        case 10000: return 5;
+        case 100000: return 6;
+        default: return -1;
+    }
+}
+
+int negative_cases(int y)
+{
+    unsigned x = y;
+    switch (x) {
+        case -1: return 1;
+        case -2: return 2;
+        case 100: return 3;
+        case 1000: return 4;
+        case 10000: return 5;
+        default: return 0;
+    }
+}
+
+void main_main()
+{
+    int i;
+    for (i = -4; i < 7; i++) {
+        printf("dense(%d) = %d\n", i, dense(i));
+    }
+    printf("mixed: %d %d %d %d %d %d %d %d\n",
+        mixed('a'), mixed('b'), mixed('c'), mixed('d'), mixed('e'),
+        mixed('f'), mixed(200), mixed(250));
+    printf("sparse: %d %d %d %d\n",
+        (int)sparse(1), (int)sparse(100), (int)sparse(100000),
+        (int)sparse(5));
+    printf("negative_cases: %d %d %d %d %d\n",
+        negative_cases(-1), negative_cases(-2), negative_cases(100),
+        negative_cases(10000), negative_cases(5));
+}
@@ -2,13 +2,14 @@
 
 import io
 import unittest
-from ppci.common import CompilerError, DiagnosticsManager
-from ppci.binutils.assembler import AsmLexer, BaseAssembler
+from ppci.common import CompilerError, DiagnosticsManager, ParseError
+from ppci.binutils.assembler import AsmLexer, BaseAssembler, DispatchParser
 from ppci.binutils.objectfile import ObjectFile
 from ppci.binutils.outstream import BinaryOutputStream
 from ppci.arch.generic_instructions import Label
 from ppci.api import link, get_arch
 from ppci.binutils.layout import Layout
+from ppci.lang.tools.grammar import Grammar
 from helper_util import gnu_assemble
 
 
@@ -79,6 +80,52 @@ class AssemblerTestCase(unittest.TestCase):
             assembler.assemble('abc def', ostream, diag)
 
 
+class DispatchParserTestCase(unittest.TestCase):
+    """ Test the parser which parses assembly lines """
+
+    def setUp(self):
+        self.grammar = Grammar()
+        self.grammar.add_terminals(['ID', 'NUMBER', ','])
+
+    def parse(self, line):
+        tokens = list(AsmLexer().tokenize(line))
+        parser = DispatchParser(self.grammar)
+        derivation = parser.parse(tokens)
+        if derivation:
+            return parser.evaluate(derivation)
+
+    def test_priority(self):
+        """ The derivation with the lowest priority is used """
+        self.grammar.add_production(
+            'line', ['ID', 'NUMBER'], lambda a, b: 'low', priority=1)
+        self.grammar.add_production(
+            'line', ['ID', 'number'], lambda a, b: 'high')
+        self.grammar.add_production('number', ['NUMBER'])
+        self.grammar.start_symbol = 'line'
+        self.assertEqual('high', self.parse('a 1'))
+
+    def test_left_recursion(self):
+        self.grammar.add_production(
+            'list', ['list', ',', 'ID'], lambda a, _, b: a + [b.val])
+        self.grammar.add_production('list', ['ID'], lambda a: [a.val])
+        self.grammar.start_symbol = 'list'
+        self.assertEqual(['a', 'b', 'c'], self.parse('a, b, c'))
+
+    def test_indirect_left_recursion(self):
+        """ The parser gives up on indirect left recursion """
+        self.grammar.add_production('a', ['b', 'ID'])
+        self.grammar.add_production('a', ['ID'])
+        self.grammar.add_production('b', ['a', ','])
+        self.grammar.start_symbol = 'a'
+        self.assertIsNone(self.parse('a, b'))
+
+    def test_parse_failure(self):
+        self.grammar.add_production('line', ['ID', 'NUMBER'])
+        self.grammar.start_symbol = 'line'
+        with self.assertRaises(ParseError):
+            self.parse('a b')
+
+
 class AsmTestCaseBase(unittest.TestCase):
     """ Base testcase for assembly """
     def setUp(self):
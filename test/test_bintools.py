@@ -1,12 +1,16 @@
 import unittest
 import io
+import os
+import tempfile
 from unittest.mock import patch
 
 from ppci.binutils.objectfile import ObjectFile, serialize, deserialize, Image
+from ppci.binutils.objectfile import get_object
+from ppci.binutils import debuginfo
 from ppci.binutils.outstream import DummyOutputStream, TextOutputStream
 from ppci.binutils.outstream import binary_and_logging_stream
 from ppci.common import CompilerError
-from ppci.api import link, get_arch
+from ppci.api import link, get_arch, cc
 from ppci.binutils import layout
 from ppci.arch.example import Mov, R0, R1, ExampleArch
 
@@ -176,6 +180,72 @@ class ObjectFileTestCase(unittest.TestCase):
         object3 = deserialize(serialize(object1))
         self.assertEqual(object3, object1)
 
+    def test_save_and_load_binary(self):
+        object1, object2 = self.make_twins()
+        object1.entry_symbol_id = 1
+        f1 = io.BytesIO()
+        object1.save(f1, fmt='binary')
+        object3 = ObjectFile.load(io.BytesIO(f1.getvalue()))
+        self.assertEqual(object3, object1)
+        self.assertEqual(1, object3.entry_symbol_id)
+        self.assertTrue(object3.get_symbol('A').undefined)
+
+    def test_binary_format_detection(self):
+        """ Check that get_object detects the format of a file """
+        object1, object2 = self.make_twins()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            json_filename = os.path.join(tmpdir, 'a.oj')
+            with open(json_filename, 'w') as f:
+                object1.save(f)
+            binary_filename = os.path.join(tmpdir, 'a.obj')
+            with open(binary_filename, 'wb') as f:
+                object1.save(f, fmt='binary')
+            self.assertLess(
+                os.path.getsize(binary_filename),
+                os.path.getsize(json_filename))
+            for filename in (json_filename, binary_filename):
+                self.assertEqual(object1, get_object(filename))
+                with open(filename, 'r') as f:
+                    self.assertEqual(object1, ObjectFile.load(f))
+
+    def test_overwrite_after_load(self):
+        """ Objects loaded from a file do not refer to the file """
+        object1, object2 = self.make_twins()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'a.obj')
+            with open(filename, 'wb') as f:
+                object1.save(f, fmt='binary')
+            object3 = get_object(filename)
+            with open(filename, 'rb') as f:
+                object4 = ObjectFile.load(f)
+            with open(filename, 'wb') as f:
+                f.write(b'garbage')
+            os.remove(filename)
+        self.assertEqual(object1, object3)
+        self.assertEqual(object1, object4)
+
+    def test_binary_debug_info(self):
+        """ Check that debug information survives the binary format """
+        source = io.StringIO("""
+        struct S { int a; char *b; };
+        struct S s;
+        int x[10];
+        int f(int a) { int b = a + 1; return b; }
+        """)
+        object1 = cc(source, 'arm', debug=True)
+        f1 = io.BytesIO()
+        object1.save(f1, fmt='binary')
+        object2 = ObjectFile.load(io.BytesIO(f1.getvalue()))
+        self.assertEqual(object1, object2)
+        self.assertEqual(
+            debuginfo.serialize(object1.debug_info),
+            debuginfo.serialize(object2.debug_info))
+
+    def test_invalid_format(self):
+        object1, object2 = self.make_twins()
+        with self.assertRaises(ValueError):
+            object1.save(io.BytesIO(), fmt='elf')
+
     def test_overlapping_sections(self):
         """ Check that overlapping sections are detected """
         obj = ObjectFile(get_arch('msp430'))
@@ -0,0 +1,127 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from ppci.api import c_to_ir, ir_to_object, get_arch
+from ppci.build.cache import ObjectCache, get_cache
+
+
+C_SRC = """
+int add(int a, int b) { return a + b; }
+int sub(int a, int b) { return a - b; }
+"""
+
+
+class ObjectCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ObjectCache(self.directory)
+        self.march = get_arch("arm")
+        self.ir_module = c_to_ir(io.StringIO(C_SRC), self.march)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hit_and_miss(self):
+        obj1 = ir_to_object([self.ir_module], self.march, cache=self.cache)
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+        obj2 = ir_to_object([self.ir_module], self.march, cache=self.cache)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual(obj1, obj2)
+
+    def test_debug_hit(self):
+        """ Code generation fills in debug addresses, this must not change
+        the key of the module """
+        ir_to_object(
+            [self.ir_module], self.march, debug=True, cache=self.cache
+        )
+        ir_to_object(
+            [self.ir_module], self.march, debug=True, cache=self.cache
+        )
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_cache_directory(self):
+        """ Test that a directory name can be used as cache """
+        ir_to_object([self.ir_module], self.march, cache=self.directory)
+        self.assertEqual(1, len(ObjectCache(self.directory).entries()))
+
+    def test_invalid_cache(self):
+        with self.assertRaises(TypeError):
+            get_cache(42)
+
+    def test_key_depends_on_options(self):
+        keys = {
+            self.cache.make_key([self.ir_module], self.march),
+            self.cache.make_key([self.ir_module], self.march, opt="size"),
+            self.cache.make_key([self.ir_module], self.march, debug=True),
+            self.cache.make_key([self.ir_module], get_arch("x86_64")),
+            self.cache.make_key(
+                [self.ir_module], self.march, register_allocator="linear_scan"
+            ),
+            self.cache.make_key([self.ir_module], self.march, schedule=True),
+        }
+        self.assertEqual(6, len(keys))
+
+    def test_key_depends_on_code(self):
+        other_module = c_to_ir(
+            io.StringIO("int add(int a, int b) { return a * b; }"),
+            self.march,
+        )
+        key1 = self.cache.make_key([self.ir_module], self.march)
+        key2 = self.cache.make_key([other_module], self.march)
+        self.assertNotEqual(key1, key2)
+
+    def test_lru_eviction(self):
+        obj = ir_to_object([self.ir_module], self.march)
+        for key in ("a", "b", "c"):
+            self.cache.put(key, obj)
+        entry_size = self.cache.entries()[0][1]
+
+        # Make 'a' the least recently used entry, followed by 'c':
+        for age, key in ((30, "a"), (20, "c"), (10, "b")):
+            filename = os.path.join(self.directory, key + ".obj")
+            timestamp = os.path.getmtime(filename) - age
+            os.utime(filename, (timestamp, timestamp))
+
+        self.cache.max_size = 2 * entry_size
+        self.cache.evict()
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+        statistics = self.cache.statistics()
+        self.assertEqual(1, statistics["evictions"])
+        self.assertEqual(2, statistics["entries"])
+
+    def test_shared_directory(self):
+        """ The size bound holds for all caches in the directory """
+        obj = ir_to_object([self.ir_module], self.march)
+        self.cache.put("a", obj)
+        entry_size = self.cache.size
+
+        # An older entry of the wasm module cache, and an unrelated file:
+        wasm_filename = os.path.join(self.directory, "b.wasmobj")
+        other_filename = os.path.join(self.directory, "notes.txt")
+        for filename in (wasm_filename, other_filename):
+            with open(filename, "wb") as f:
+                f.write(bytes(entry_size))
+            timestamp = os.path.getmtime(filename) - 10
+            os.utime(filename, (timestamp, timestamp))
+
+        self.cache.max_size = entry_size
+        self.cache.evict()
+        self.assertFalse(os.path.exists(wasm_filename))
+        self.assertTrue(os.path.exists(other_filename))
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertEqual(1, self.cache.evictions)
+
+    def test_clear(self):
+        obj = ir_to_object([self.ir_module], self.march)
+        self.cache.put("a", obj)
+        self.cache.clear()
+        self.assertEqual(0, self.cache.size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,15 @@
+import random
 import unittest
-from ppci.arch.encoding import Syntax
+from ppci.api import get_arch
+from ppci.arch.encoding import Instruction, Syntax
+from ppci.arch.registers import Register
 from ppci.arch.token import bit_range, Token
 from ppci.arch.avr import instructions as avr_instructions
 from ppci.arch.avr import registers as avr_registers
 from ppci.arch.arm import arm_instructions
 from ppci.arch.arm import registers as arm_registers
 from ppci.arch.arm.arm_instructions import ArmToken
+from ppci.arch.x86_64 import instructions as x86_64_instructions
 
 
 class TokenTestCase(unittest.TestCase):
@@ -103,5 +107,77 @@ class DecodeTestCase(unittest.TestCase):
         pass
 
 
+def make_instruction(constructor, rng):
+    """ Create a constructor with random operands """
+    args = []
+    for argument in constructor.syntax.formal_arguments:
+        cls = argument._cls
+        if isinstance(cls, tuple):
+            args.append(make_instruction(rng.choice(cls), rng))
+        elif cls is int:
+            bits = rng.choice([1, 3, 4, 5, 8, 12, 16, 20, 32, 33])
+            args.append(rng.randrange(-(1 << bits), 1 << bits))
+        elif cls is str:
+            args.append('label')
+        elif issubclass(cls, Register):
+            args.append(rng.choice(cls.all_registers()))
+        else:
+            args.append(cls())
+    return constructor(*args)
+
+
+def encode_via_tokens(instruction):
+    """ Encode an instruction by setting the fields of tokens """
+    tokens = instruction.get_tokens()
+    instruction.set_all_patterns(tokens)
+    return tokens.encode()
+
+
+def outcome(encode, instruction):
+    """ Get the encoding, or the type of error raised by encoding """
+    try:
+        return encode(instruction)
+    except (ValueError, AssertionError, KeyError) as ex:
+        return type(ex)
+
+
+class InstructionEncoderTestCase(unittest.TestCase):
+    """ Compare the instruction encoder with encoding via tokens """
+
+    def check_isa(self, arch, rng):
+        instructions = [
+            instruction
+            for instruction in get_arch(arch).isa.instructions
+            if instruction.syntax
+            and hasattr(instruction, 'tokens')
+            and instruction.encode is Instruction.encode
+        ]
+        self.assertTrue(instructions)
+        for instruction in instructions:
+            for _ in range(10):
+                ins = make_instruction(instruction, rng)
+                self.assertEqual(
+                    outcome(encode_via_tokens, ins),
+                    outcome(Instruction.encode, ins),
+                    str(instruction),
+                )
+
+    def test_isas(self):
+        rng = random.Random(3)
+        for arch in ['arm', 'avr', 'msp430', 'riscv', 'stm8', 'x86_64']:
+            with self.subTest(arch=arch):
+                self.check_isa(arch, rng)
+
+    def test_token_initial_value(self):
+        """ Tokens which set bits when created, like the x86 rex prefix """
+        ins = x86_64_instructions.Cdqe()
+        self.assertEqual(bytes([0x48, 0x98]), ins.encode())
+
+    def test_concatenated_field(self):
+        """ Check a field which consists of several bit ranges """
+        ins = avr_instructions.Adiw(avr_registers.W, 63)
+        self.assertEqual(bytes([0xcf, 0x96]), ins.encode())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,6 +2,7 @@ import unittest
 import io
 from ppci import ir
 from ppci import irutils
+from ppci import api
 from ppci.opt import ConstantFolder
 from ppci.binutils.debuginfo import DebugDb
 from helper_util import relpath
@@ -32,6 +33,21 @@ class IrCodeTestCase(unittest.TestCase):
         self.assertEqual({c3, c4}, add.uses)
         self.assertEqual(c4, add.b)
 
+    def test_replace_double_use(self):
+        """ Replace a value which is used twice by the same instruction """
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        add = ir.add(c1, c1, "add", ir.i32)
+        phi = ir.Phi("phi", ir.i32)
+        phi.set_incoming(ir.Block("a"), c1)
+        phi.set_incoming(ir.Block("b"), c1)
+        c1.replace_by(c2)
+        self.assertIs(c2, add.a)
+        self.assertIs(c2, add.b)
+        self.assertEqual([c2, c2], list(phi.inputs.values()))
+        self.assertFalse(c1.is_used)
+        self.assertEqual({add, phi}, set(c2.used_by))
+
 
 class IrBuilderTestCase(unittest.TestCase):
     def setUp(self):
@@ -54,6 +70,100 @@ class IrBuilderTestCase(unittest.TestCase):
         # r = self.m.getFunction('add').call(1, 2)
         # self.assertEqual(3, r)
 
+    def make_switch(self, options):
+        f = self.b.new_function("switch", ir.Binding.GLOBAL, ir.i32)
+        self.b.set_function(f)
+        x = ir.Parameter("x", ir.i32)
+        f.add_parameter(x)
+        entry = self.b.new_block()
+        f.entry = entry
+        self.b.set_block(entry)
+        blocks = {}
+        for option in options:
+            blocks[option] = self.b.new_block()
+        default = self.b.new_block()
+        final = self.b.new_block()
+        self.b.emit_switch(x, blocks, default)
+        phi = ir.Phi("result", ir.i32)
+        for option, block in blocks.items():
+            self.b.set_block(block)
+            phi.set_incoming(block, self.b.emit_const(option, ir.i32))
+            self.b.emit_jump(final)
+        self.b.set_block(default)
+        phi.set_incoming(default, self.b.emit_const(-1, ir.i32))
+        self.b.emit_jump(final)
+        self.b.set_block(final)
+        self.b.emit(phi)
+        self.b.emit(ir.Return(phi))
+        irutils.verify_module(self.m)
+        return f
+
+    def test_switch_jump_table(self):
+        """ Dense switch options result in a jump table """
+        f = self.make_switch([3, 4, 5, 7, 8])
+        jump_tables = [
+            b.last_instruction
+            for b in f
+            if isinstance(b.last_instruction, ir.JumpTable)
+        ]
+        self.assertEqual(1, len(jump_tables))
+        self.assertEqual(6, len(jump_tables[0].table))
+
+        irutils.lower_jump_tables(f)
+        irutils.verify_module(self.m)
+        self.assertFalse(
+            any(isinstance(b.last_instruction, ir.JumpTable) for b in f)
+        )
+
+    def test_switch_jump_table_code(self):
+        """ Jump tables are placed in the code, so that layouts which
+        only place the code section still work.
+        """
+        self.make_switch([3, 4, 5, 7, 8])
+        obj = api.ir_to_object([self.m], "x86_64")
+        self.assertEqual(["code"], [s.name for s in obj.sections if s.size])
+        table = next(s for s in obj.symbols if s.name == "switch_literal_0")
+        self.assertEqual("code", table.section)
+
+        # The linked table holds addresses in the code:
+        layout = io.StringIO(
+            "MEMORY code LOCATION=0x1000 SIZE=0x1000 { SECTION(code) }"
+        )
+        obj = api.link([obj], layout=layout)
+        data = obj.get_section("code").data
+        for index in range(6):
+            offset = table.value + index * 8
+            address = int.from_bytes(data[offset : offset + 8], "little")
+            self.assertIn(address, range(0x1000, 0x1000 + len(data)))
+
+    def test_switch_sparse(self):
+        """ Sparse switch options result in a tree of compares """
+        f = self.make_switch([1, 10, 100, 1000, 10000, 100000])
+        self.assertFalse(
+            any(isinstance(b.last_instruction, ir.JumpTable) for b in f)
+        )
+
+    def test_switch_phi(self):
+        """ Phi nodes get an incoming value for each switch block """
+        f = self.b.new_function("switch", ir.Binding.GLOBAL, ir.i32)
+        self.b.set_function(f)
+        x = ir.Parameter("x", ir.i32)
+        f.add_parameter(x)
+        entry = self.b.new_block()
+        f.entry = entry
+        self.b.set_block(entry)
+        one = self.b.emit_const(1, ir.i32)
+        final = self.b.new_block()
+        self.b.set_block(final)
+        phi = self.b.emit(ir.Phi("result", ir.i32))
+        phi.set_incoming(entry, one)
+        self.b.emit(ir.Return(phi))
+        self.b.set_block(entry)
+        self.b.emit_switch(x, {i * 7: final for i in range(8)}, final)
+        irutils.verify_module(self.m)
+        self.assertNotIn(entry, phi.inputs)
+        self.assertEqual(set(final.predecessors), set(phi.inputs))
+
 
 class ConstantFolderTestCase(unittest.TestCase):
     def setUp(self):
@@ -112,6 +222,51 @@ class TestWriter(unittest.TestCase):
         self.assertEqual(f3.getvalue(), f.getvalue())
 
 
+    def test_jump_table(self):
+        """ Check that a jump table survives writing and reading """
+        src = """module mod1;
+
+global function i32 func1(i32 x) {
+  entry: {
+    jmp_table x ? [one, two, one] : other;
+  }
+
+  one: {
+    i32 a = 1;
+    return a;
+  }
+
+  two: {
+    i32 b = 2;
+    return b;
+  }
+
+  other: {
+    i32 c = 3;
+    return c;
+  }
+
+}
+"""
+        module = irutils.read_module(io.StringIO(src))
+        irutils.verify_module(module)
+        jump_table = module.functions[0].entry.last_instruction
+        self.assertIsInstance(jump_table, ir.JumpTable)
+        self.assertEqual(
+            ["one", "two", "one"], [b.name for b in jump_table.table]
+        )
+        self.assertEqual(3, len(jump_table.targets))
+
+        f = io.StringIO()
+        irutils.print_module(module, file=f)
+        self.assertEqual(src, f.getvalue())
+
+        module2 = irutils.from_json(irutils.to_json(module))
+        f2 = io.StringIO()
+        irutils.print_module(module2, file=f2)
+        self.assertEqual(src, f2.getvalue())
+
+
 class TestReader(unittest.TestCase):
     def test_add_example(self):
         with open(relpath("data", "add.pi")) as f:
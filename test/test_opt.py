@@ -6,10 +6,16 @@ import io
 import sys
 from ppci import ir
 from ppci import irutils
+from ppci import api
 from ppci.binutils.debuginfo import DebugDb
 from ppci.irutils import verify_module
+from ppci.lang.python import ir_to_python
 from ppci.opt import Mem2RegPromotor
 from ppci.opt import CleanPass
+from ppci.opt import GlobalValueNumberingPass
+from ppci.opt import InlinePass
+from ppci.opt import FunctionPass, PassManager
+from ppci.opt import SparseConditionalConstantPropagationPass
 from ppci.opt.constantfolding import correct
 from ppci.opt.tailcall import TailCallOptimization
 
@@ -76,6 +82,30 @@ class CleanTestCase(OptTestCase):
         self.clean_pass.run(self.module)
         self.assertNotIn(block4, self.function)
 
+    def test_glue_block_with_phi(self):
+        """ A phi in a glued block is replaced by its single value """
+        block1 = self.builder.new_block()
+        self.builder.emit(ir.Jump(block1))
+        entry = self.builder.block
+        self.builder.set_block(block1)
+        cnst = self.builder.emit(ir.Const(0, 'const', ir.i16))
+        block2 = self.builder.new_block()
+        self.builder.emit(ir.Jump(block2))
+        self.builder.set_block(block2)
+        phi = self.builder.emit(ir.Phi('res', ir.i16))
+        phi.set_incoming(block1, cnst)
+        cnst2 = self.builder.emit(ir.Const(2, 'cnst2', ir.i16))
+        binop = self.builder.emit(ir.add(phi, cnst2, 'binop', ir.i16))
+        self.builder.emit(ir.Exit())
+        verify_module(self.module)
+
+        # Act:
+        self.clean_pass.run(self.module)
+        self.assertEqual([entry], list(self.function))
+        self.assertEqual([], entry.phis)
+        self.assertIs(cnst, binop.a)
+        verify_module(self.module)
+
 
 class Mem2RegTestCase(OptTestCase):
     """ Test the memory to register lifter """
@@ -137,6 +167,454 @@ class Mem2RegTestCase(OptTestCase):
         self.assertIn(alloc, self.function.entry.instructions)
 
 
+class GlobalValueNumberingTestCase(OptTestCase):
+    """ Test the global value numbering """
+    def setUp(self):
+        super().setUp()
+        self.gvn = GlobalValueNumberingPass()
+        self.a = ir.Parameter('a', ir.i32)
+        self.function.add_parameter(self.a)
+        self.b = ir.Parameter('b', ir.i32)
+        self.function.add_parameter(self.b)
+
+    def test_dominated_block(self):
+        """ A value in a dominated block is replaced, also when swapped """
+        block1 = self.builder.new_block()
+        c = self.builder.emit(ir.add(self.a, self.b, 'c', ir.i32))
+        self.builder.emit(ir.Jump(block1))
+        self.builder.set_block(block1)
+        d = self.builder.emit(ir.add(self.b, self.a, 'd', ir.i32))
+        e = self.builder.emit(ir.sub(d, self.a, 'e', ir.i32))
+        f = self.builder.emit(ir.sub(self.a, c, 'f', ir.i32))
+        g = self.builder.emit(ir.sub(c, self.a, 'g', ir.i32))
+        self.builder.emit(ir.ProcedureCall(self.function, [e, f]))
+        call = self.builder.emit(ir.ProcedureCall(self.function, [g, g]))
+        self.builder.emit(ir.Exit())
+        self.gvn.run(self.module)
+        self.assertNotIn(d, block1)
+        self.assertIn(f, block1)
+        self.assertNotIn(g, block1)
+        self.assertEqual([e, e], call.arguments)
+
+    def test_sibling_blocks(self):
+        """ Values in blocks which do not dominate each other remain """
+        block1 = self.builder.new_block()
+        block2 = self.builder.new_block()
+        zero = self.builder.emit(ir.Const(0, 'zero', ir.i32))
+        self.builder.emit(ir.CJump(self.a, '<', zero, block1, block2))
+        self.builder.set_block(block1)
+        c = self.builder.emit(ir.Unop('-', self.a, 'c', ir.i32))
+        self.builder.emit(ir.ProcedureCall(self.function, [c, c]))
+        self.builder.emit(ir.Exit())
+        self.builder.set_block(block2)
+        d = self.builder.emit(ir.Unop('-', self.a, 'd', ir.i32))
+        self.builder.emit(ir.ProcedureCall(self.function, [d, d]))
+        self.builder.emit(ir.Exit())
+        self.gvn.run(self.module)
+        self.assertIn(c, block1)
+        self.assertIn(d, block2)
+
+    def test_loads(self):
+        """ Loads are replaced until the memory changes """
+        alloc = self.builder.emit(ir.Alloc('A', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        self.builder.emit(ir.Store(self.a, addr))
+        block1 = self.builder.new_block()
+        self.builder.emit(ir.Jump(block1))
+        self.builder.set_block(block1)
+        load1 = self.builder.emit(ir.Load(addr, 'load1', ir.i32))
+        self.builder.emit(ir.ProcedureCall(self.function, [load1, load1]))
+        load2 = self.builder.emit(ir.Load(addr, 'load2', ir.i32))
+        load3 = self.builder.emit(ir.Load(addr, 'load3', ir.i32))
+        call = self.builder.emit(ir.ProcedureCall(
+            self.function, [load2, load3]))
+        self.builder.emit(ir.Exit())
+        self.gvn.run(self.module)
+        self.assertNotIn(load1, block1)
+        self.assertNotIn(load3, block1)
+        self.assertEqual([load2, load2], call.arguments)
+
+    def test_loop_header_loads(self):
+        """ A load in a loop is not replaced by a load before the loop """
+        alloc = self.builder.emit(ir.Alloc('A', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        load1 = self.builder.emit(ir.Load(addr, 'load1', ir.i32))
+        loop = self.builder.new_block()
+        self.builder.emit(ir.Jump(loop))
+        self.builder.set_block(loop)
+        load2 = self.builder.emit(ir.Load(addr, 'load2', ir.i32))
+        self.builder.emit(ir.Store(load1, addr))
+        self.builder.emit(ir.Store(load2, addr))
+        self.builder.emit(ir.Jump(loop))
+        self.gvn.run(self.module)
+        self.assertIn(load2, loop)
+
+
+class InlineTestCase(unittest.TestCase):
+    """ Test the inlining of functions """
+    def setUp(self):
+        self.builder = irutils.Builder()
+        self.module = ir.Module('test')
+        self.builder.set_module(self.module)
+
+    def tearDown(self):
+        verify_module(self.module)
+
+    def new_function(self, name, parameter_types=(ir.i32,), return_ty=None):
+        if return_ty:
+            function = self.builder.new_function(
+                name, ir.Binding.GLOBAL, return_ty)
+        else:
+            function = self.builder.new_procedure(name, ir.Binding.GLOBAL)
+        self.builder.set_function(function)
+        for index, ty in enumerate(parameter_types):
+            function.add_parameter(ir.Parameter('p{}'.format(index), ty))
+        function.entry = self.builder.new_block()
+        self.builder.set_block(function.entry)
+        return function
+
+    def make_add_one(self):
+        """ Create a function returning its argument plus one """
+        function = self.new_function('add_one', return_ty=ir.i32)
+        one = self.builder.emit_const(1, ir.i32)
+        result = self.builder.emit_add(function.arguments[0], one, ir.i32)
+        self.builder.emit(ir.Return(result))
+        return function
+
+    def make_caller(self, callee, amount=1):
+        """ Create a function calling the callee a couple of times """
+        caller = self.new_function('caller', return_ty=ir.i32)
+        value = caller.arguments[0]
+        for _ in range(amount):
+            value = self.builder.emit(
+                ir.FunctionCall(callee, [value], 'result', ir.i32))
+        self.builder.emit(ir.Return(value))
+        return caller
+
+    def calls(self, function):
+        return [
+            i for i in function.get_instructions()
+            if isinstance(i, (ir.FunctionCall, ir.ProcedureCall))]
+
+    def test_inline_function(self):
+        add_one = self.make_add_one()
+        caller = self.make_caller(add_one, amount=2)
+        inline_pass = InlinePass()
+        inline_pass.run(self.module)
+        self.assertEqual([], self.calls(caller))
+        self.assertEqual(
+            [('caller', 'add_one'), ('caller', 'add_one')],
+            inline_pass.inlined)
+        self.assertEqual(2, len(inline_pass.report()))
+
+    def test_inline_multiple_returns(self):
+        """ The results of the returns are merged with a phi """
+        function = self.new_function('max', return_ty=ir.i32)
+        block1 = self.builder.new_block()
+        block2 = self.builder.new_block()
+        zero = self.builder.emit_const(0, ir.i32)
+        self.builder.emit(
+            ir.CJump(function.arguments[0], '>', zero, block1, block2))
+        self.builder.set_block(block1)
+        self.builder.emit(ir.Return(function.arguments[0]))
+        self.builder.set_block(block2)
+        self.builder.emit(ir.Return(zero))
+        caller = self.make_caller(function)
+        InlinePass().run(self.module)
+        self.assertEqual([], self.calls(caller))
+        phis = [i for i in caller.get_instructions() if isinstance(i, ir.Phi)]
+        self.assertEqual(1, len(phis))
+        self.assertEqual(2, len(phis[0].inputs))
+
+    def test_inline_procedure(self):
+        procedure = self.new_function('store', (ir.ptr, ir.i32))
+        self.builder.emit(
+            ir.Store(procedure.arguments[1], procedure.arguments[0]))
+        self.builder.emit(ir.Exit())
+        caller = self.new_function('caller', (ir.ptr,))
+        five = self.builder.emit_const(5, ir.i32)
+        self.builder.emit(
+            ir.ProcedureCall(procedure, [caller.arguments[0], five]))
+        self.builder.emit(ir.Exit())
+        InlinePass().run(self.module)
+        self.assertEqual([], self.calls(caller))
+        stores = [
+            i for i in caller.get_instructions() if isinstance(i, ir.Store)]
+        self.assertEqual(1, len(stores))
+        self.assertIs(five, stores[0].value)
+
+    def test_recursion_not_inlined(self):
+        function = self.new_function('loop', return_ty=ir.i32)
+        result = self.builder.emit(ir.FunctionCall(
+            function, [function.arguments[0]], 'result', ir.i32))
+        self.builder.emit(ir.Return(result))
+        InlinePass().run(self.module)
+        self.assertEqual(1, len(self.calls(function)))
+
+    def test_optimize_for_size(self):
+        """ Only functions smaller than the call are inlined for size """
+        function = self.new_function('big', return_ty=ir.i32)
+        value = function.arguments[0]
+        for _ in range(10):
+            value = self.builder.emit_add(value, value, ir.i32)
+        self.builder.emit(ir.Return(value))
+        add_one = self.make_add_one()
+        caller = self.new_function('caller', return_ty=ir.i32)
+        call1 = self.builder.emit(ir.FunctionCall(
+            function, [caller.arguments[0]], 'result1', ir.i32))
+        call2 = self.builder.emit(
+            ir.FunctionCall(add_one, [call1], 'result2', ir.i32))
+        self.builder.emit(ir.Return(call2))
+        InlinePass(optimize_for='size').run(self.module)
+        self.assertEqual([call1], self.calls(caller))
+        InlinePass(optimize_for='speed').run(self.module)
+        self.assertEqual([], self.calls(caller))
+
+
+class CountingPass(FunctionPass):
+    """ Pass which changes each function a couple of times """
+    preserves_cfg = True
+
+    def __init__(self, changes):
+        super().__init__()
+        self.changes = changes
+        self.runs = {}
+        self.cfg_infos = []
+
+    def on_function(self, function):
+        self.runs[function.name] = self.runs.get(function.name, 0) + 1
+        self.cfg_infos.append(self.get_cfg_info(function))
+        return self.runs[function.name] <= self.changes.get(function.name, 0)
+
+
+class PassManagerTestCase(unittest.TestCase):
+    """ Test the pass manager """
+    def setUp(self):
+        self.builder = irutils.Builder()
+        self.module = ir.Module('test')
+        self.builder.set_module(self.module)
+        for name in ['f1', 'f2']:
+            function = self.builder.new_procedure(name, ir.Binding.GLOBAL)
+            self.builder.set_function(function)
+            function.entry = self.builder.new_block()
+            self.builder.set_block(function.entry)
+            self.builder.emit(ir.Exit())
+
+    def test_fixed_point(self):
+        """ Only changed functions are run through the passes again """
+        pass1 = CountingPass({'f1': 2})
+        pass2 = CountingPass({})
+        pass_manager = PassManager([pass1, pass2])
+        self.assertTrue(pass_manager.run(self.module))
+        self.assertEqual({'f1': 3, 'f2': 1}, pass1.runs)
+        self.assertEqual({'f1': 3, 'f2': 1}, pass2.runs)
+        self.assertEqual(1, len(pass_manager.report()))
+        statistics = pass_manager.statistics['CountingPass']
+        self.assertEqual(8, statistics.runs)
+        self.assertEqual(2, statistics.changes)
+
+    def test_max_rounds(self):
+        pass1 = CountingPass({'f1': 100})
+        pass_manager = PassManager([pass1], max_rounds=5)
+        pass_manager.run(self.module)
+        self.assertEqual({'f1': 5, 'f2': 1}, pass1.runs)
+
+    def test_no_change(self):
+        pass_manager = PassManager([CountingPass({})])
+        self.assertFalse(pass_manager.run(self.module))
+
+    def test_cached_analyses(self):
+        """ The control flow info is shared, until the cfg is changed """
+        pass1 = CountingPass({'f1': 1})
+        pass_manager = PassManager([pass1])
+        pass_manager.run(self.module)
+        f1_info1, f2_info, f1_info2 = pass1.cfg_infos
+        self.assertIs(f1_info1, f1_info2)
+        self.assertIsNot(f1_info1, f2_info)
+
+        pass1 = CountingPass({'f1': 1})
+        pass1.preserves_cfg = False
+        pass_manager = PassManager([pass1])
+        pass_manager.run(self.module)
+        f1_info1, f2_info, f1_info2 = pass1.cfg_infos
+        self.assertIsNot(f1_info1, f1_info2)
+
+    def test_module_pass(self):
+        """ Module passes split the function passes in two groups """
+        pass1 = CountingPass({})
+        pass2 = CountingPass({})
+        inline_pass = InlinePass()
+        pass_manager = PassManager([pass1, inline_pass, pass2])
+        self.assertEqual(
+            [[pass1], inline_pass, [pass2]], pass_manager.groups())
+        pass_manager.run(self.module)
+        self.assertEqual({'f1': 1, 'f2': 1}, pass2.runs)
+
+    def test_optimization_levels(self):
+        for level in api.OPT_LEVELS:
+            api.optimize(self.module, level=level)
+
+
+class SccpTestCase(OptTestCase):
+    """ Test sparse conditional constant propagation """
+    def setUp(self):
+        super().setUp()
+        self.sccp = SparseConditionalConstantPropagationPass()
+        self.parameter = ir.Parameter('p', ir.i32)
+        self.function.add_parameter(self.parameter)
+
+    def assert_const(self, value, instruction):
+        """ Check that the instruction was replaced by a constant """
+        self.assertIsNone(instruction.block)
+        self.assertEqual(1, len(self.calls))
+        argument = self.calls[0].arguments[0]
+        self.assertIsInstance(argument, ir.Const)
+        self.assertEqual(value, argument.value)
+
+    def emit_use(self, value):
+        """ Use a value in a call, so it is not removed """
+        external = ir.ExternalProcedure('use', [value.ty])
+        self.module.add_external(external)
+        self.calls = [self.builder.emit(ir.ProcedureCall(external, [value]))]
+
+    def test_phi(self):
+        """ A phi of the same constant twice is constant """
+        block1 = self.builder.new_block()
+        block2 = self.builder.new_block()
+        block3 = self.builder.new_block()
+        one = self.builder.emit_const(1, ir.i32)
+        zero = self.builder.emit_const(0, ir.i32)
+        self.builder.emit(
+            ir.CJump(self.parameter, '>', zero, block1, block2))
+        self.builder.set_block(block1)
+        self.builder.emit(ir.Jump(block3))
+        self.builder.set_block(block2)
+        self.builder.emit(ir.Jump(block3))
+        self.builder.set_block(block3)
+        phi = ir.Phi('phi', ir.i32)
+        phi.set_incoming(block1, one)
+        phi.set_incoming(block2, one)
+        self.builder.emit(phi)
+        value = self.builder.emit_add(phi, one, ir.i32)
+        self.emit_use(value)
+        self.builder.emit(ir.Exit())
+        self.assertTrue(self.sccp.run(self.module))
+        self.assert_const(2, value)
+        self.assertIsNone(phi.block)
+        self.assertEqual(4, len(self.function.blocks))
+
+    def test_branch(self):
+        """ A jump on a constant condition becomes a jump """
+        block1 = self.builder.new_block()
+        block2 = self.builder.new_block()
+        block3 = self.builder.new_block()
+        three = self.builder.emit_const(3, ir.i32)
+        two = self.builder.emit_const(2, ir.i32)
+        self.builder.emit(ir.CJump(three, '>', two, block1, block2))
+        self.builder.set_block(block1)
+        self.builder.emit(ir.Jump(block3))
+        self.builder.set_block(block2)
+        self.builder.emit(ir.Jump(block3))
+        self.builder.set_block(block3)
+        phi = ir.Phi('phi', ir.i32)
+        phi.set_incoming(block1, three)
+        phi.set_incoming(block2, self.parameter)
+        self.builder.emit(phi)
+        self.emit_use(phi)
+        self.builder.emit(ir.Exit())
+        self.sccp.run(self.module)
+        self.assert_const(3, phi)
+        self.assertIsInstance(self.function.entry.last_instruction, ir.Jump)
+        self.assertNotIn(block2, self.function.blocks)
+
+    def test_loop(self):
+        """ A value which is the same each time around the loop """
+        loop = self.builder.new_block()
+        body = self.builder.new_block()
+        done = self.builder.new_block()
+        one = self.builder.emit_const(1, ir.i32)
+        self.builder.emit(ir.Jump(loop))
+        self.builder.set_block(loop)
+        phi = ir.Phi('x', ir.i32)
+        phi.set_incoming(self.function.entry, one)
+        self.builder.emit(phi)
+        ten = self.builder.emit_const(10, ir.i32)
+        self.builder.emit(ir.CJump(phi, '>', ten, done, body))
+        self.builder.set_block(body)
+        y = self.builder.emit_mul(phi, one, ir.i32)
+        phi.set_incoming(body, y)
+        self.builder.emit(ir.Jump(loop))
+        self.builder.set_block(done)
+        self.emit_use(phi)
+        self.builder.emit(ir.Exit())
+        self.sccp.run(self.module)
+        self.assertIsNone(phi.block)
+        self.assertNotIn(done, self.function.blocks)
+
+    def test_varying(self):
+        """ A value computed from a parameter is not constant """
+        one = self.builder.emit_const(1, ir.i32)
+        value = self.builder.emit_add(self.parameter, one, ir.i32)
+        self.emit_use(value)
+        self.builder.emit(ir.Exit())
+        self.assertFalse(self.sccp.run(self.module))
+        self.assertIs(value, self.calls[0].arguments[0])
+
+    def test_wraparound(self):
+        for ty, a, b, operation, expected in [
+            (ir.i8, 127, 1, '+', -128),
+            (ir.u8, 255, 1, '+', 0),
+            (ir.u16, 0, 1, '-', 65535),
+            (ir.i32, -7, 2, '/', -3),
+            (ir.i32, -7, 2, '%', -1),
+            (ir.u32, 1, 31, '<<', 2147483648),
+            (ir.i64, -8, 1, '>>', -4),
+        ]:
+            self.setUp()
+            const_a = self.builder.emit_const(a, ty)
+            const_b = self.builder.emit_const(b, ty)
+            value = self.builder.emit_binop(const_a, operation, const_b, ty)
+            self.emit_use(value)
+            self.builder.emit(ir.Exit())
+            self.sccp.run(self.module)
+            self.assert_const(expected, value)
+            verify_module(self.module)
+
+    def test_division_by_zero(self):
+        """ A division by zero is left for run time """
+        one = self.builder.emit_const(1, ir.i32)
+        zero = self.builder.emit_const(0, ir.i32)
+        value = self.builder.emit_binop(one, '/', zero, ir.i32)
+        self.emit_use(value)
+        self.builder.emit(ir.Exit())
+        self.assertFalse(self.sccp.run(self.module))
+        self.assertIs(value, self.calls[0].arguments[0])
+
+
+class NegativeOperandsTestCase(unittest.TestCase):
+    """ Folded constants give the same results as unoptimized code """
+    source = """
+    int rem1(void) { int a = -7; int b = 2; return a % b; }
+    int rem2(void) { int a = 7; int b = -2; return a % b; }
+    int rem3(void) { int a = -7; int b = -2; return a % b; }
+    int div1(void) { int a = -7; int b = 2; return a / b; }
+    """
+
+    def compile(self, level):
+        ir_module = api.c_to_ir(io.StringIO(self.source), 'x86_64')
+        api.optimize(ir_module, level=level)
+        f = io.StringIO()
+        ir_to_python([ir_module], f)
+        namespace = {}
+        exec(f.getvalue(), namespace)
+        names = ('rem1', 'rem2', 'rem3', 'div1')
+        return [namespace[name]() for name in names]
+
+    def test_levels(self):
+        self.assertEqual([-1, 1, -1, -3], self.compile(0))
+        self.assertEqual(self.compile(0), self.compile(2))
+
+
 class TypedEvalTestCase(unittest.TestCase):
     """ Test various integer values wrapped at bitsizes and signedness """
     def test_char_overflow(self):
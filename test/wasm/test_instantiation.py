@@ -1,11 +1,22 @@
 """ Test the ppci.wasm.instantiate function
 """
 
+import io
 import math
+import shutil
+import struct
+import tempfile
 import unittest
-from ppci.wasm import instantiate, Module
+from unittest import mock
+from types import ModuleType
+from ppci import ir
+from ppci.arch.arch_info import TypeInfo
+from ppci.lang.python import ir_to_python
+from ppci.wasm import instantiate, Module, wasm_to_ir
+from ppci.wasm.execution._native_cache import NativeModuleCache
+from ppci.wasm.execution._native_cache import get_native_cache
 from ppci.utils.reporting import html_reporter
-from ppci.api import is_platform_supported
+from ppci.api import is_platform_supported, get_arch
 
 # The below snippet is from the wasm spec test suite.
 # It detected an issue in the x86_64 backend.
@@ -111,3 +122,202 @@ class WasmInstantiationTestCase(unittest.TestCase):
         self.assertEqual(b"abcd", instance.exports.mem0ry[0:4])
         instance.exports.mem0ry[1:3] = bytes([1,2])
         self.assertEqual(b'a\x01\x02d', instance.exports.mem0ry[0:4])
+
+
+memory_src = """
+(module
+  (memory (export "mem") 1 4)
+  (func $nop)
+  (func (export "fill") (param $n i32) (result i32)
+    (local $i i32)
+    (block
+      (loop
+        (br_if 1 (i32.ge_u (local.get $i) (local.get $n)))
+        (if (i32.eq (local.get $i) (i32.const 8))
+          (then (drop (memory.grow (i32.const 1)))))
+        (i32.store offset=4
+          (i32.mul (local.get $i) (i32.const 4)) (local.get $i))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br 0)))
+    (memory.size))
+  (func (export "sum") (param $n i32) (result i32)
+    (local $i i32) (local $s i32)
+    (block
+      (loop
+        (br_if 1 (i32.ge_u (local.get $i) (local.get $n)))
+        (local.set $s (i32.add (local.get $s)
+          (i32.load offset=4 (i32.mul (local.get $i) (i32.const 4)))))
+        (local.set $i (i32.add (local.get $i) (i32.const 1)))
+        (br 0)))
+    (local.get $s))
+  (func (export "swap") (param $a i32) (param $b i32)
+    (local $t i32)
+    (local.set $t (i32.load (local.get $a)))
+    (if (local.get $t) (then (call $nop)))
+    (i32.store (local.get $a) (i32.load (local.get $b)))
+    (i32.store (local.get $b) (local.get $t)))
+)
+"""
+
+
+class WasmMemoryBaseTestCase(unittest.TestCase):
+    """ Check that the memory base address is loaded only when needed """
+    def count_base_loads(self):
+        ptr_info = get_arch('x86_64').info.get_type_info('ptr')
+        ir_module = wasm_to_ir(Module(memory_src), ptr_info)
+        counts = {}
+        for function in ir_module.functions:
+            counts[function.name] = sum(
+                1 for block in function for instruction in block
+                if isinstance(instruction, ir.Load)
+                and instruction.address.name == 'wasm_mem0_address')
+        return counts
+
+    def test_base_loads(self):
+        counts = self.count_base_loads()
+        self.assertEqual(1, counts['sum'])  # Hoisted out of the loop
+        self.assertEqual(2, counts['swap'])  # Reloaded after the call
+
+    def test_python_memory_grow(self):
+        self.fill_and_sum('python')
+
+    @unittest.skipUnless(is_platform_supported(), "native code not supported")
+    def test_native_memory_grow(self):
+        self.fill_and_sum('native')
+
+    def fill_and_sum(self, target):
+        """ Fill memory, while the memory grows """
+        instance = instantiate(Module(memory_src), target=target)
+        self.assertEqual(2, instance.exports.fill(16))
+        self.assertEqual(120, instance.exports.sum(16))
+        self.assertEqual(bytes([15, 0, 0, 0]), instance.exports.mem[64:68])
+        instance.exports.swap(4, 64)
+        self.assertEqual(bytes([15, 0, 0, 0]), instance.exports.mem[4:8])
+
+
+access_src = """
+(module
+  (memory (export "mem") 1)
+  (global (export "g1") (mut i32) (i32.const 42))
+  (func (export "i64") (param $v i64) (result i64)
+    (i64.store (i32.const 8) (local.get $v))
+    (i64.load (i32.const 8)))
+  (func (export "f64") (param $v f64) (result f64)
+    (f64.store (i32.const 16) (local.get $v))
+    (f64.load (i32.const 16)))
+  (func (export "load8_s") (param $a i32) (result i32)
+    (i32.load8_s (local.get $a)))
+  (func (export "load16_u") (param $a i32) (result i32)
+    (i32.load16_u (local.get $a)))
+)
+"""
+
+
+class PythonMemoryAccessTestCase(unittest.TestCase):
+    """ Test loads and stores in wasm instantiated as python code """
+    def test_loads_and_stores(self):
+        instance = instantiate(Module(access_src), target='python')
+        self.check(instance)
+
+    def check(self, instance):
+        self.assertEqual(-2 ** 40, instance.exports.i64(-2 ** 40))
+        self.assertEqual(2.5, instance.exports.f64(2.5))
+        instance.exports.mem[0:2] = bytes([0xfe, 0xff])
+        self.assertEqual(-2, instance.exports.load8_s(0))
+        self.assertEqual(0xfffe, instance.exports.load16_u(0))
+        self.assertEqual(42, instance.exports.g1.read())
+        instance.exports.g1.write(7)
+        self.assertEqual(7, instance.exports.g1.read())
+
+    def test_out_of_bounds(self):
+        instance = instantiate(Module(access_src), target='python')
+        with self.assertRaises(struct.error):
+            instance.exports.load16_u(0xffff)
+
+    def test_bounds_check(self):
+        """ Accesses can be checked for valid addresses """
+        ir_module = wasm_to_ir(Module(access_src), TypeInfo(4, 4))
+        for bounds_check in (False, True):
+            f = io.StringIO()
+            ir_to_python([ir_module], f, bounds_check=bounds_check)
+            self.assertEqual(
+                bounds_check, 'load_u16(' in f.getvalue().split('# Module')[1])
+
+        py_module = ModuleType('gen')
+        exec(f.getvalue(), py_module.__dict__)
+        py_module.store_u16(0x1234, py_module._irpy_heap_top() - 2)
+        self.assertEqual(
+            0x1234, py_module.load_u16(py_module._irpy_heap_top() - 2))
+        with self.assertRaises(AssertionError):
+            py_module.load_u16(py_module._irpy_heap_top() - 1)
+        with self.assertRaises(AssertionError):
+            py_module.load_u16(-2)
+        with self.assertRaises(AssertionError):
+            py_module.store_u16(0x1234, -2)
+
+
+@unittest.skipUnless(is_platform_supported(), "native code not supported")
+class NativeModuleCacheTestCase(unittest.TestCase):
+    """ Test the persistent cache of natively compiled modules """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = NativeModuleCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def instantiate(self, opt_level=2):
+        src = memory_src.replace(
+            '(module',
+            '(module (global (export "g1") (mut i32) (i32.const 42))')
+        return instantiate(
+            Module(src), cache_file=self.cache, opt_level=opt_level)
+
+    def check(self, instance):
+        self.assertEqual(2, instance.exports.fill(16))
+        self.assertEqual(120, instance.exports.sum(16))
+        self.assertEqual(42, instance.exports.g1.read())
+
+    def test_hit_and_miss(self):
+        self.check(self.instantiate())
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+        self.check(self.instantiate())
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_hit_skips_translation(self):
+        """ A cached module is not translated into ir-code again """
+        self.instantiate()
+        with mock.patch(
+                'ppci.wasm.execution._native_instance.wasm_to_ir',
+                side_effect=AssertionError('translated')):
+            self.check(self.instantiate())
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_optimization_levels(self):
+        """ Each optimization level is cached separately """
+        for opt_level in (0, 1, 2):
+            self.check(self.instantiate(opt_level=opt_level))
+        self.assertEqual((0, 3), (self.cache.hits, self.cache.misses))
+        self.assertEqual(3, len(self.cache.entries()))
+
+    def test_invalid_optimization_level(self):
+        with self.assertRaises(ValueError):
+            self.instantiate(opt_level=4)
+
+    def test_format_version(self):
+        """ Entries in another format version are compiled again """
+        self.instantiate()
+        _, _, filename = self.cache.entries()[0]
+        with open(filename, 'r+b') as f:
+            f.seek(8)
+            f.write(bytes([99]))
+        self.check(self.instantiate())
+        self.assertEqual((0, 2), (self.cache.hits, self.cache.misses))
+
+    def test_get_native_cache(self):
+        self.assertIs(self.cache, get_native_cache(self.cache))
+        cache = get_native_cache(self.directory)
+        self.assertEqual(self.directory, cache.directory)
+        with self.assertRaises(TypeError):
+            get_native_cache(42)
+
@@ -1,5 +1,8 @@
+import copy
 import io
 import os
+import pickle
+import tempfile
 import unittest
 
 from ppci.arch.arch_info import TypeInfo
@@ -78,6 +81,67 @@ class WasmLoadAndSaveTestCase(unittest.TestCase):
         self.assertEqual(content1, content2)
 
 
+class WasmBinaryReaderTestCase(unittest.TestCase):
+    wat = """
+    (module
+      (func $add (export "add") (param i32 i32) (result i32)
+        (local i64)
+        local.get 0
+        local.get 1
+        i32.add)
+      (func $neg (param f64) (result f64)
+        f64.const -1.5
+        local.get 0
+        f64.mul))
+    """
+
+    def test_lazy_function_bodies(self):
+        """ Function bodies are decoded when accessed """
+        data = read_wat(io.StringIO(self.wat)).to_bytes()
+        wasm_module = read_wasm(data)
+        add, neg = wasm_module.get_definitions_per_section()["func"]
+        self.assertIsNotNone(add._body)
+        self.assertEqual(
+            ['local.get', 'local.get', 'i32.add'],
+            [i.opcode for i in add.instructions])
+        self.assertIsNone(add._body)
+        self.assertIsNotNone(neg._body)
+        self.assertEqual(((None, 'i64'),), add.locals)
+        self.assertEqual((-1.5,), neg.instructions[0].args)
+        self.assertEqual(data, wasm_module.to_bytes())
+
+    def test_read_from_file_offset(self):
+        """ Reading starts at the current position of a file """
+        data = read_wat(io.StringIO(self.wat)).to_bytes()
+        with tempfile.TemporaryFile() as f:
+            f.write(b'garbage' + data)
+            f.seek(7)
+            wasm_module = read_wasm(f)
+        self.assertEqual(data, wasm_module.to_bytes())
+
+    def test_copy_and_pickle(self):
+        """ Modules read from a file do not refer to the file """
+        data = read_wat(io.StringIO(self.wat)).to_bytes()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'module.wasm')
+            with open(filename, 'wb') as f:
+                f.write(data)
+            with open(filename, 'rb') as f:
+                wasm_module = read_wasm(f)
+            with open(filename, 'wb') as f:
+                f.write(b'garbage')
+            copied_module = copy.deepcopy(wasm_module)
+            pickled_module = pickle.loads(pickle.dumps(wasm_module))
+        self.assertEqual(data, wasm_module.to_bytes())
+        self.assertEqual(data, copied_module.to_bytes())
+        self.assertEqual(data, pickled_module.to_bytes())
+
+    def test_truncated_data(self):
+        data = read_wat(io.StringIO(self.wat)).to_bytes()
+        with self.assertRaises(EOFError):
+            read_wasm(data[:-3])
+
+
 class NameNormalizationTestCase(unittest.TestCase):
     def test_sanitize_name(self):
         self.assertEqual('HelloA20World', sanitize_name('Hello World'))
@@ -8,14 +8,48 @@ Run the benchmarks with pytest with the benchmark plugin:
 
 python -m pytest benchmark.py
 
+Run this file as a script to compare the compile time and the amount
+of spilled registers of the register allocators, the time and the
+amount of remaining instructions of the passes which remove redundant
+values and of the optimization levels, the throughput of
+the C lexer, the throughput of the disassembler, the throughput of
+the assembler, the speed of the debugger source lookups, the time
+to instantiate wasm as native code and the speed of that code, and the
+speed of C and wasm kernels compiled into python code, the time and
+memory to load a large wasm module, the speed of a switch statement
+with and without a jump table, and the speed of calls to small functions
+with and without inlining.
+
 """
 
+import io
 import time
 import os
 import logging
+import tempfile
+import tracemalloc
 from glob import glob
+import pytest
 from ppci import api
-from ppci.lang.c import COptions
+from ppci.arch.generic_instructions import VirtualInstruction
+from ppci.arch.generic_instructions import PseudoInstruction
+from ppci.binutils import debuginfo
+from ppci.binutils.dbg.debugger import Debugger
+from ppci.binutils.dbg.dummy_driver import DummyDebugDriver
+from ppci.binutils.disasm import Disassembler
+from ppci.binutils.objectfile import ObjectFile
+from ppci.binutils.outstream import DummyOutputStream, FunctionOutputStream
+from ppci.codegen import CodeGenerator
+from ppci.common import CompilerError, DiagnosticsManager, SourceLocation
+from ppci.irutils import lower_jump_tables
+from ppci.lang.c import COptions, CLexer
+from ppci.lang.c.lexer import SourceFile
+from ppci.opt import CleanPass, CommonSubexpressionEliminationPass
+from ppci.opt import ConstantFolder, DeleteUnusedInstructionsPass
+from ppci.opt import GlobalValueNumberingPass, Mem2RegPromotor
+from ppci.utils.codepage import load_obj
+from ppci.utils.reporting import DummyReportGenerator
+from ppci.wasm import Module, components, instantiate
 
 this_dir = os.path.abspath(os.path.dirname(__file__))
 
@@ -28,6 +62,731 @@ def test_compile_8cc(benchmark):
     benchmark(compile_8cc)
 
 
+@pytest.mark.parametrize(
+    "register_allocator", sorted(CodeGenerator.register_allocators)
+)
+def test_register_allocators(benchmark, register_allocator):
+    ir_modules = samples_to_ir("x86_64")
+    benchmark(generate_code, ir_modules, "x86_64", register_allocator)
+
+
+@pytest.mark.parametrize(
+    "value_numbering",
+    [CommonSubexpressionEliminationPass, GlobalValueNumberingPass],
+)
+def test_value_numbering(benchmark, value_numbering):
+    def setup():
+        ir_modules = samples_to_ir("x86_64", opt_level=0)
+        return (ir_modules, value_numbering()), {}
+
+    benchmark.pedantic(remove_redundancy, setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize("level", api.OPT_LEVELS[1:])
+def test_optimize(benchmark, level):
+    def setup():
+        return (samples_to_ir("x86_64", opt_level=0), level), {}
+
+    benchmark.pedantic(optimize_modules, setup=setup, rounds=3)
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_lex_headers(benchmark, fast):
+    sources = read_headers()
+    benchmark(lex_sources, sources, fast)
+
+
+@pytest.mark.parametrize("arch", ["arm", "riscv", "x86_64"])
+def test_asm(benchmark, arch):
+    source = samples_to_assembly(arch)
+    benchmark(api.asm, io.StringIO(source), arch)
+
+
+def test_disasm(benchmark):
+    code = samples_to_code("x86_64")
+    benchmark(disassemble, code, "x86_64")
+
+
+def test_debugger_stepping(benchmark):
+    obj = debug_program(100000)
+    benchmark(step_through, obj, 10000)
+
+
+@pytest.mark.skipif(
+    not api.is_platform_supported(), reason="native code not supported"
+)
+@pytest.mark.parametrize("opt_level", [0, 2])
+def test_wasm_matmul(benchmark, opt_level):
+    instance = matmul_instance(64, opt_level=opt_level)
+    benchmark(instance.exports.matmul, 64)
+
+
+@pytest.mark.skipif(
+    not api.is_platform_supported(), reason="native code not supported"
+)
+@pytest.mark.parametrize("opt_level", [0, 2])
+def test_wasm_instantiate(benchmark, opt_level):
+    benchmark(instantiate_cold, Module(MATMUL_WAT), opt_level)
+
+
+def test_wasm_load(benchmark):
+    benchmark(Module, large_wasm_module().to_bytes())
+
+
+def test_wasm_matmul_on_python(benchmark):
+    instance = matmul_instance(16, target="python")
+    benchmark(instance.exports.matmul, 16)
+
+
+@pytest.mark.parametrize("kernel", ["crc32", "fib", "interp", "sieve"])
+def test_c_on_python(benchmark, kernel):
+    function, args = c_kernel_on_python(kernel)
+    benchmark(function, *args)
+
+
+@pytest.mark.parametrize("jump_tables", [True, False])
+def test_switch(benchmark, jump_tables):
+    module, args = c_kernel_native("interp", jump_tables=jump_tables)
+    benchmark(module.interp, *args)
+
+
+@pytest.mark.parametrize("opt_level", [1, 2])
+def test_inlining(benchmark, opt_level):
+    module, args = c_kernel_native("accessors", opt_level=opt_level)
+    benchmark(module.accessors, *args)
+
+
+def read_headers():
+    """Read the headers of the C library, and glue them together.
+
+    The result is repeated into a single large header, like the headers
+    seen after including many system headers.
+    """
+    libc_includes = os.path.join(this_dir, "..", "librt", "libc", "include")
+    sources = []
+    pattern = os.path.join(libc_includes, "**", "*.h")
+    for filename in sorted(glob(pattern, recursive=True)):
+        with open(filename) as f:
+            sources.append(f.read())
+    return "\n".join(sources) * 50
+
+
+def lex_sources(source, fast):
+    """ Lex a source, and return the amount of tokens. """
+    lexer = CLexer(COptions(), fast=fast)
+    tokens = lexer.lex(io.StringIO(source), SourceFile("headers.h"))
+    return sum(1 for _ in tokens)
+
+
+def compare_lexers():
+    """ Compare the throughput of the character lexer and the fast lexer """
+    source = read_headers()
+    for fast in [False, True]:
+        t1 = time.perf_counter()
+        token_count = lex_sources(source, fast)
+        t2 = time.perf_counter()
+        print(
+            "{:>15}: {} tokens in {:.3f} seconds, {:.0f} kB/s".format(
+                "fast" if fast else "character",
+                token_count,
+                t2 - t1,
+                len(source) / (t2 - t1) / 1000,
+            )
+        )
+
+
+def samples_to_ir(arch, opt_level=2):
+    """ Translate the C test samples into optimized ir-code. """
+    samples_folder = os.path.join(this_dir, "..", "test", "samples")
+    libc_includes = os.path.join(this_dir, "..", "librt", "libc", "include")
+    coptions = COptions()
+    coptions.add_include_path(libc_includes)
+    ir_modules = []
+    for filename in sorted(glob(os.path.join(samples_folder, "*", "*.c"))):
+        with open(filename) as f:
+            ir_module = api.c_to_ir(f, arch, coptions=coptions)
+        api.optimize(ir_module, level=opt_level)
+        ir_modules.append(ir_module)
+    return ir_modules
+
+
+def generate_code(ir_modules, arch, register_allocator):
+    """ Generate code for the given ir-modules.
+
+    Returns the amount of spilled registers.
+    """
+    code_generator = CodeGenerator(
+        api.get_arch(arch),
+        DummyReportGenerator(),
+        register_allocator=register_allocator,
+    )
+    for ir_module in ir_modules:
+        code_generator.generate(ir_module, DummyOutputStream())
+    return code_generator.register_allocator.spill_count
+
+
+def compare_register_allocators(arch="x86_64"):
+    """ Compare compile time and spill counts of the register allocators. """
+    ir_modules = samples_to_ir(arch)
+    for register_allocator in sorted(CodeGenerator.register_allocators):
+        t1 = time.perf_counter()
+        spill_count = generate_code(ir_modules, arch, register_allocator)
+        t2 = time.perf_counter()
+        print(
+            "{:>15}: {:.3f} seconds, {} spills".format(
+                register_allocator, t2 - t1, spill_count
+            )
+        )
+
+
+def remove_redundancy(ir_modules, value_numbering):
+    """Optimize the given ir-modules with the given pass to remove
+    redundant values.
+
+    Returns the amount of instructions left.
+    """
+    opt_passes = [
+        Mem2RegPromotor(),
+        ConstantFolder(),
+        value_numbering,
+        DeleteUnusedInstructionsPass(),
+        CleanPass(),
+    ] * 2
+    for ir_module in ir_modules:
+        for opt_pass in opt_passes:
+            opt_pass.run(ir_module)
+    return sum(
+        function.num_instructions()
+        for ir_module in ir_modules
+        for function in ir_module.functions
+    )
+
+
+def compare_value_numbering(arch="x86_64"):
+    """Compare the block local common subexpression elimination with
+    global value numbering, on the C test samples."""
+    for value_numbering in [
+        CommonSubexpressionEliminationPass(),
+        GlobalValueNumberingPass(),
+    ]:
+        ir_modules = samples_to_ir(arch, opt_level=0)
+        t1 = time.perf_counter()
+        count = remove_redundancy(ir_modules, value_numbering)
+        t2 = time.perf_counter()
+        print(
+            "{:>15}: {:.3f} seconds, {} instructions".format(
+                "gvn"
+                if isinstance(value_numbering, GlobalValueNumberingPass)
+                else "cse",
+                t2 - t1,
+                count,
+            )
+        )
+
+
+def optimize_modules(ir_modules, level):
+    """Optimize the ir-modules, and return the amount of remaining
+    instructions."""
+    for ir_module in ir_modules:
+        api.optimize(ir_module, level=level)
+    return sum(
+        len(list(function.get_instructions()))
+        for ir_module in ir_modules
+        for function in ir_module.functions
+    )
+
+
+def compare_optimization_levels(arch="x86_64"):
+    """Compare the time and the amount of remaining instructions of the
+    optimization levels, on the C test samples."""
+    for level in api.OPT_LEVELS[1:]:
+        ir_modules = samples_to_ir(arch, opt_level=0)
+        t1 = time.perf_counter()
+        count = optimize_modules(ir_modules, level)
+        t2 = time.perf_counter()
+        print(
+            "{:>15}: {:.3f} seconds, {} instructions".format(
+                "O" + level, t2 - t1, count
+            )
+        )
+
+
+def samples_to_code(arch):
+    """Compile the C test samples, and glue their code together.
+
+    The result is repeated into about a megabyte of code, which is the
+    size of a large firmware image.
+    """
+    code = bytearray()
+    for ir_module in samples_to_ir(arch):
+        obj = api.ir_to_object([ir_module], arch)
+        code += obj.get_section("code").data
+    return bytes(code) * (1000000 // len(code) + 1)
+
+
+def disassemble(code, arch):
+    """ Disassemble code, and return the amount of instructions. """
+    instructions = []
+    disassembler = Disassembler(api.get_arch(arch))
+    disassembler.disasm(code, FunctionOutputStream(instructions.append))
+    return len(instructions)
+
+
+def measure_disassembler(arch="x86_64"):
+    """ Measure the throughput of the disassembler. """
+    code = samples_to_code(arch)
+    t1 = time.perf_counter()
+    disassemble(code, arch)
+    t2 = time.perf_counter()
+    print(
+        "{:>15}: {} bytes in {:.3f} seconds, {:.0f} kB/s".format(
+            "disassembler", len(code), t2 - t1, len(code) / (t2 - t1) / 1000
+        )
+    )
+
+
+def samples_to_assembly(arch):
+    """Compile the C test samples into assembly source.
+
+    Only instructions which the assembler can parse are kept. The result
+    is repeated into about ten thousand lines.
+    """
+    instructions = []
+    for ir_module in samples_to_ir(arch):
+        try:
+            api.ir_to_stream(
+                ir_module, arch, FunctionOutputStream(instructions.append)
+            )
+        except Exception:  # pylint: disable=broad-except
+            # Not all samples can be compiled for all targets.
+            pass
+
+    assembler = api.get_arch(arch).assembler
+    lines = []
+    for instruction in instructions:
+        if isinstance(instruction, (VirtualInstruction, PseudoInstruction)):
+            continue
+        line = str(instruction)
+        try:
+            assembler.assemble(
+                line, DummyOutputStream(), DiagnosticsManager()
+            )
+        except CompilerError:
+            continue
+        lines.append(line)
+    return "\n".join(lines * (10000 // len(lines) + 1))
+
+
+def compare_assemblers():
+    """ Measure the throughput of the assembler for several targets. """
+    for arch in ["arm", "riscv", "x86_64"]:
+        source = samples_to_assembly(arch)
+        line_count = source.count("\n") + 1
+        t1 = time.perf_counter()
+        api.asm(io.StringIO(source), arch)
+        t2 = time.perf_counter()
+        print(
+            "{:>15}: {} lines in {:.3f} seconds, {:.0f} lines/s".format(
+                arch, line_count, t2 - t1, line_count / (t2 - t1)
+            )
+        )
+
+
+def debug_program(location_count):
+    """Create an object with debug info for a large program.
+
+    Each function is 100 source lines long, and each line is one four byte
+    instruction.
+    """
+    obj = ObjectFile(api.get_arch("arm"))
+    obj.debug_info = debuginfo.DebugInfo()
+
+    def address(value):
+        symbol_id = len(obj.symbols)
+        obj.add_symbol(symbol_id, None, "local", value, None, "func", 0)
+        return debuginfo.DebugAddress(symbol_id)
+
+    for row in range(location_count):
+        loc = SourceLocation("main.c", row + 1, 1, 1)
+        obj.debug_info.add(debuginfo.DebugLocation(loc, address(row * 4)))
+    for begin in range(0, location_count, 100):
+        loc = SourceLocation("main.c", begin + 1, 1, 1)
+        function = debuginfo.DebugFunction(
+            "f{}".format(begin),
+            loc,
+            None,
+            [],
+            begin=address(begin * 4),
+            end=address((begin + 100) * 4),
+        )
+        obj.debug_info.add(function)
+    return obj
+
+
+class SteppingDriver(DummyDebugDriver):
+    """ Debug driver which advances one instruction on each step. """
+
+    def __init__(self):
+        super().__init__()
+        self.pc = 0
+
+    def step(self):
+        self.pc += 4
+
+    def get_pc(self):
+        return self.pc
+
+
+def step_through(obj, steps):
+    """ Single step, and lookup the source location as a debugger ui does """
+    driver = SteppingDriver()
+    debugger = Debugger(obj.arch, driver)
+    debugger.load_symbols(obj)
+    for _ in range(steps):
+        debugger.step()
+        debugger.find_pc()
+        debugger.current_function()
+    debugger.find_address("main.c", steps)
+
+
+def measure_debugger(location_count=100000, steps=10000):
+    """ Measure the time to step through a program with debug info. """
+    obj = debug_program(location_count)
+    t1 = time.perf_counter()
+    step_through(obj, steps)
+    t2 = time.perf_counter()
+    print(
+        "{:>15}: {} steps in {:.3f} seconds, {:.0f} steps/s".format(
+            "debugger", steps, t2 - t1, steps / (t2 - t1)
+        )
+    )
+
+
+MATMUL_WAT = """
+(module
+  (memory (export "mem") 1)
+  (func (export "matmul") (param $n i32)
+    (local $i i32) (local $j i32) (local $k i32) (local $sum i32)
+    (local $size i32)
+    (local.set $size (i32.mul (i32.mul (local.get $n) (local.get $n))
+                              (i32.const 4)))
+    (local.set $i (i32.const 0))
+    (loop $rows
+      (local.set $j (i32.const 0))
+      (loop $columns
+        (local.set $sum (i32.const 0))
+        (local.set $k (i32.const 0))
+        (loop $inner
+          (local.set $sum (i32.add (local.get $sum) (i32.mul
+            (i32.load (i32.shl (i32.add
+              (i32.mul (local.get $i) (local.get $n)) (local.get $k))
+              (i32.const 2)))
+            (i32.load offset=0 (i32.add (local.get $size) (i32.shl
+              (i32.add (i32.mul (local.get $k) (local.get $n))
+                       (local.get $j))
+              (i32.const 2)))))))
+          (local.set $k (i32.add (local.get $k) (i32.const 1)))
+          (br_if $inner (i32.lt_u (local.get $k) (local.get $n))))
+        (i32.store (i32.add (i32.shl (local.get $size) (i32.const 1))
+          (i32.shl (i32.add (i32.mul (local.get $i) (local.get $n))
+                            (local.get $j))
+                   (i32.const 2)))
+          (local.get $sum))
+        (local.set $j (i32.add (local.get $j) (i32.const 1)))
+        (br_if $columns (i32.lt_u (local.get $j) (local.get $n))))
+      (local.set $i (i32.add (local.get $i) (i32.const 1)))
+      (br_if $rows (i32.lt_u (local.get $i) (local.get $n)))))
+)
+"""
+
+
+def matmul_instance(n, target="native", opt_level=2, cache_file=None):
+    """Instantiate a wasm matrix multiply kernel.
+
+    The matrices are n by n 32 bits integers. The two input matrices
+    are filled with some values.
+    """
+    instance = instantiate(
+        Module(MATMUL_WAT),
+        target=target,
+        opt_level=opt_level,
+        cache_file=cache_file,
+    )
+    size = n * n * 4
+    instance.exports.mem[0 : 2 * size] = bytes(
+        i % 7 for i in range(2 * size)
+    )
+    return instance
+
+
+def measure_wasm_matmul(n=64, repeat=10):
+    """ Measure a memory bound kernel in natively compiled wasm. """
+    instance = matmul_instance(n)
+    t1 = time.perf_counter()
+    for _ in range(repeat):
+        instance.exports.matmul(n)
+    t2 = time.perf_counter()
+    print(
+        "{:>15}: {} multiplies of {}x{} in {:.3f} seconds".format(
+            "wasm matmul", repeat, n, n, t2 - t1
+        )
+    )
+
+
+C_KERNELS = {
+    "sieve": (
+        """
+        char flags[8192];
+        int sieve(int n) {
+          int count = 0;
+          for (int i = 2; i < n; i++) flags[i] = 1;
+          for (int i = 2; i < n; i++) {
+            if (flags[i]) {
+              count++;
+              for (int j = i + i; j < n; j += i) flags[j] = 0;
+            }
+          }
+          return count;
+        }
+        """,
+        (8192,),
+    ),
+    "crc32": (
+        """
+        unsigned int crc32(int n) {
+          unsigned int crc = 0xffffffff;
+          for (int i = 0; i < n; i++) {
+            crc ^= i & 0xff;
+            for (int k = 0; k < 8; k++)
+              crc = (crc >> 1) ^ (0xedb88320 & -(crc & 1));
+          }
+          return ~crc;
+        }
+        """,
+        (2000,),
+    ),
+    "fib": (
+        """
+        int fib(int n) {
+          return n < 2 ? n : fib(n - 1) + fib(n - 2);
+        }
+        """,
+        (18,),
+    ),
+    "interp": (
+        """
+        int interp(int n) {
+          int acc = 0;
+          for (int i = 0; i < n; i++) {
+            switch ((i * 7) % 12) {
+              case 0: acc += 1; break;
+              case 1: acc -= 3; break;
+              case 2: acc ^= i; break;
+              case 3: acc += i; break;
+              case 4: acc <<= 1; break;
+              case 5: acc >>= 1; break;
+              case 6: acc |= 5; break;
+              case 7: acc &= 0xffff; break;
+              case 8: acc -= i; break;
+              case 9: acc += 7; break;
+              case 10: acc ^= 0x55; break;
+              default: acc++; break;
+            }
+          }
+          return acc;
+        }
+        """,
+        (100000,),
+    ),
+    "accessors": (
+        """
+        struct point { int x; int y; };
+        static int get_x(struct point *p) { return p->x; }
+        static int get_y(struct point *p) { return p->y; }
+        static void set_x(struct point *p, int x) { p->x = x; }
+        static void set_y(struct point *p, int y) { p->y = y; }
+        int accessors(int n) {
+          struct point p;
+          int sum = 0;
+          set_x(&p, 0);
+          set_y(&p, 0);
+          for (int i = 0; i < n; i++) {
+            set_x(&p, get_x(&p) + i);
+            sum += get_x(&p) ^ get_y(&p);
+            set_y(&p, sum & 0xff);
+          }
+          return sum;
+        }
+        """,
+        (100000,),
+    ),
+}
+
+
+def c_kernel_on_python(name):
+    """ Compile a C kernel into python code """
+    source, args = C_KERNELS[name]
+    ir_module = api.c_to_ir(io.StringIO(source), "x86_64")
+    api.optimize(ir_module, level=2)
+    f = io.StringIO()
+    api.ir_to_python([ir_module], f)
+    namespace = {}
+    exec(f.getvalue(), namespace)
+    return namespace[name], args
+
+
+def c_kernel_native(name, jump_tables=True, opt_level=2):
+    """Compile a C kernel into a native code module, optionally with the
+    jump tables replaced by compares."""
+    source, args = C_KERNELS[name]
+    arch = api.get_current_arch()
+    ir_module = api.c_to_ir(io.StringIO(source), arch)
+    api.optimize(ir_module, level=opt_level)
+    if not jump_tables:
+        for function in ir_module.functions:
+            lower_jump_tables(function)
+    return load_obj(api.ir_to_object([ir_module], arch, debug=True)), args
+
+
+def measure_switch(repeat=5):
+    """Measure a switch statement compiled into a jump table and into a
+    tree of compares."""
+    for jump_tables in [True, False]:
+        module, args = c_kernel_native("interp", jump_tables=jump_tables)
+        print(
+            "{:>15}: {:.2f} ms".format(
+                "jump table" if jump_tables else "compares",
+                best_time(module.interp, args, repeat) * 1000,
+            )
+        )
+
+
+def measure_inlining(repeat=5):
+    """Measure calls to small functions, with and without inlining.
+
+    Only optimization level 2 inlines functions.
+    """
+    for opt_level in [1, 2]:
+        module, args = c_kernel_native("accessors", opt_level=opt_level)
+        print(
+            "{:>15}: {:.2f} ms".format(
+                "inlined" if opt_level == 2 else "calls",
+                best_time(module.accessors, args, repeat) * 1000,
+            )
+        )
+
+
+def best_time(function, args, repeat):
+    """ Determine the fastest of several calls to a function """
+    timings = []
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - t1)
+    return min(timings)
+
+
+def measure_python_target(n=16, repeat=5):
+    """Measure the speed of C and wasm kernels compiled into python
+    code."""
+    for name in sorted(C_KERNELS):
+        function, args = c_kernel_on_python(name)
+        print(
+            "{:>15}: {:.2f} ms".format(
+                "C {} on python".format(name),
+                best_time(function, args, repeat) * 1000,
+            )
+        )
+
+    instance = matmul_instance(n, target="python")
+    print(
+        "{:>15}: {}x{} multiply {:.2f} ms".format(
+            "wasm on python",
+            n,
+            n,
+            best_time(instance.exports.matmul, (n,), repeat) * 1000,
+        )
+    )
+
+
+def instantiate_cold(module, opt_level):
+    """ Instantiate wasm as native code, with an empty cache """
+    with tempfile.TemporaryDirectory() as directory:
+        return instantiate(module, cache_file=directory, opt_level=opt_level)
+
+
+def measure_wasm_instantiation(n=64, repeat=20):
+    """Measure the time to instantiate wasm as native code, with and
+    without cache, and the speed of the resulting code, for several
+    optimization levels."""
+    for opt_level in [0, 1, 2]:
+        with tempfile.TemporaryDirectory() as directory:
+            t1 = time.perf_counter()
+            matmul_instance(n, opt_level=opt_level, cache_file=directory)
+            t2 = time.perf_counter()
+            instance = matmul_instance(
+                n, opt_level=opt_level, cache_file=directory
+            )
+            t3 = time.perf_counter()
+
+        # Take the fastest run, to reduce noise:
+        timings = []
+        for _ in range(repeat):
+            t4 = time.perf_counter()
+            instance.exports.matmul(n)
+            timings.append(time.perf_counter() - t4)
+        print(
+            "{:>15}: instantiate {:.3f} seconds, cached {:.3f} seconds,"
+            " {}x{} multiply {:.2f} ms".format(
+                "wasm O{}".format(opt_level),
+                t2 - t1,
+                t3 - t2,
+                n,
+                n,
+                min(timings) * 1000,
+            )
+        )
+
+
+def large_wasm_module(function_count=2000):
+    """Create a large binary wasm module, by repeating the matrix multiply
+    kernel."""
+    module = Module(MATMUL_WAT)
+    definitions = module.get_definitions_per_section()
+    func = definitions["func"][0]
+    functions = [
+        components.Func(i, func.ref, func.locals, func.instructions)
+        for i in range(function_count)
+    ]
+    return Module(*(definitions["type"] + definitions["memory"] + functions))
+
+
+def measure_wasm_loading(function_count=2000, repeat=5):
+    """Measure the time and peak memory usage to load a large binary wasm
+    module, and the time to decode all its functions."""
+    data = large_wasm_module(function_count).to_bytes()
+    load_time = best_time(Module, (data,), repeat)
+    tracemalloc.start()
+    module = Module(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    t1 = time.perf_counter()
+    for func in module.get_definitions_per_section()["func"]:
+        func.instructions
+    t2 = time.perf_counter()
+    print(
+        "{:>15}: {} kB in {:.2f} ms, peak memory {} kB,"
+        " decoded in {:.3f} seconds".format(
+            "wasm load",
+            len(data) // 1024,
+            load_time * 1000,
+            peak // 1024,
+            t2 - t1,
+        )
+    )
+
+
 def compile_nos_for_riscv():
     """ Compile nOS for riscv architecture. """
     logging.basicConfig(level=logging.INFO)
@@ -116,4 +875,20 @@ def compile_8cc():
         with open(source_path, 'r') as f:
             objs.append(api.cc(f, arch, coptions=coptions))
 
-    # TODO: maybe link it?
\ No newline at end of file
+    # TODO: maybe link it?
+
+
+if __name__ == "__main__":
+    compare_register_allocators()
+    compare_value_numbering()
+    compare_optimization_levels()
+    compare_lexers()
+    measure_disassembler()
+    compare_assemblers()
+    measure_debugger()
+    measure_wasm_matmul()
+    measure_wasm_instantiation()
+    measure_wasm_loading()
+    measure_python_target()
+    measure_switch()
+    measure_inlining()